@@ -1,5 +1,10 @@
 from .pyrobot_model import *
 from .pycontact_estimator import *
+from .pycontact_estimator_calibration import *
 from .pylegged_state_estimator_settings import *
 from .pylegged_state_estimator import *
-from .pynoise_params import *
\ No newline at end of file
+from .pylegged_state_estimator_pool import *
+from .pynoise_params import *
+from .pyinekf_state import *
+from .pysensor_log import *
+from .pyestimate_publisher import *
\ No newline at end of file
@@ -25,7 +25,8 @@ PYBIND11_MODULE(pycontact_estimator, m) {
     .def(py::init<>())
     .def("reset", &ContactEstimator::reset)
     .def("update", &ContactEstimator::update,
-          py::arg("robot_model"), py::arg("tauJ"))
+          py::arg("robot_model"), py::arg("tauJ"),
+          py::call_guard<py::gil_scoped_release>())
     .def("get_contact_state", &ContactEstimator::getContactState)
     .def("get_contact_force_estimate", &ContactEstimator::getContactForceEstimate)
     .def("get_normal_contact_force_estimate", &ContactEstimator::getNormalContactForceEstimate)
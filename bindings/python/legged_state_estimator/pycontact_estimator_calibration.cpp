@@ -0,0 +1,47 @@
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+#include <pybind11/eigen.h>
+#include <pybind11/numpy.h>
+
+#include "legged_state_estimator/contact_estimator_calibration.hpp"
+
+
+namespace legged_state_estimator {
+namespace python {
+
+namespace py = pybind11;
+
+PYBIND11_MODULE(pycontact_estimator_calibration, m) {
+  py::class_<ContactCalibrationMetrics>(m, "ContactCalibrationMetrics")
+    .def(py::init<>())
+    .def_readwrite("true_positives", &ContactCalibrationMetrics::true_positives)
+    .def_readwrite("false_positives", &ContactCalibrationMetrics::false_positives)
+    .def_readwrite("true_negatives", &ContactCalibrationMetrics::true_negatives)
+    .def_readwrite("false_negatives", &ContactCalibrationMetrics::false_negatives)
+    .def_readwrite("num_switches", &ContactCalibrationMetrics::num_switches)
+    .def_readwrite("accuracy", &ContactCalibrationMetrics::accuracy)
+    .def_readwrite("precision", &ContactCalibrationMetrics::precision)
+    .def_readwrite("recall", &ContactCalibrationMetrics::recall)
+    .def_readwrite("f1_score", &ContactCalibrationMetrics::f1_score)
+    .def_readwrite("log_loss", &ContactCalibrationMetrics::log_loss)
+    .def_readwrite("mean_contact_force_covariance", &ContactCalibrationMetrics::mean_contact_force_covariance);
+
+  py::class_<ContactEstimatorCalibration>(m, "ContactEstimatorCalibration")
+    .def(py::init<const LeggedStateEstimatorSettings&>(),
+          py::arg("legged_state_estimator_settings"))
+    .def(py::init<>())
+    .def("set_log", &ContactEstimatorCalibration::setLog,
+          py::arg("qJ"), py::arg("dqJ"), py::arg("tauJ"), py::arg("contact_labels"),
+          py::call_guard<py::gil_scoped_release>())
+    .def("evaluate", &ContactEstimatorCalibration::evaluate,
+          py::arg("beta0"), py::arg("beta1"), py::arg("contact_force_covariance_alpha"),
+          py::arg("contact_probability_threshold"), py::arg("num_threads")=0,
+          py::call_guard<py::gil_scoped_release>())
+    .def("get_normal_contact_force_estimate", &ContactEstimatorCalibration::getNormalContactForceEstimate)
+    .def("get_contact_labels", &ContactEstimatorCalibration::getContactLabels)
+    .def("num_samples", &ContactEstimatorCalibration::numSamples)
+    .def("num_contacts", &ContactEstimatorCalibration::numContacts);
+}
+
+} // namespace python
+} // namespace legged_state_estimator
@@ -0,0 +1,72 @@
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+#include <pybind11/eigen.h>
+
+#include "legged_state_estimator/estimate_publisher.hpp"
+
+
+namespace legged_state_estimator {
+namespace python {
+
+namespace py = pybind11;
+
+// Maps a field of the snapshot, which is returned as a writable view that
+// keeps the snapshot alive.
+template <int Size, typename Scalar>
+Eigen::Map<Eigen::Matrix<Scalar, Size, 1>> field(Scalar* data) {
+  return Eigen::Map<Eigen::Matrix<Scalar, Size, 1>>(data);
+}
+
+template <typename Scalar>
+Eigen::Map<Eigen::Matrix<Scalar, Eigen::Dynamic, 1>> contactField(EstimateSnapshot& self, Scalar* data) {
+  return Eigen::Map<Eigen::Matrix<Scalar, Eigen::Dynamic, 1>>(
+      data, std::min<int>(self.num_contacts, EstimateSnapshot::kMaxContacts));
+}
+
+PYBIND11_MODULE(pyestimate_publisher, m) {
+  const auto ref = py::return_value_policy::reference_internal;
+  py::class_<EstimateSnapshot>(m, "EstimateSnapshot")
+    .def(py::init([]() { return EstimateSnapshot(); }))
+    .def_readonly_static("max_contacts", &EstimateSnapshot::kMaxContacts)
+    .def_readonly("sequence_number", &EstimateSnapshot::sequence_number)
+    .def_readwrite("time", &EstimateSnapshot::time)
+    .def_property_readonly("base_position", [](EstimateSnapshot& self) { return field<3>(self.base_position); }, ref)
+    .def_property_readonly("base_quaternion", [](EstimateSnapshot& self) { return field<4>(self.base_quaternion); }, ref)
+    .def_property_readonly("base_linear_velocity_world", [](EstimateSnapshot& self) { return field<3>(self.base_linear_velocity_world); }, ref)
+    .def_property_readonly("base_linear_velocity_local", [](EstimateSnapshot& self) { return field<3>(self.base_linear_velocity_local); }, ref)
+    .def_property_readonly("base_angular_velocity_world", [](EstimateSnapshot& self) { return field<3>(self.base_angular_velocity_world); }, ref)
+    .def_property_readonly("base_angular_velocity_local", [](EstimateSnapshot& self) { return field<3>(self.base_angular_velocity_local); }, ref)
+    .def_property_readonly("imu_gyro_bias", [](EstimateSnapshot& self) { return field<3>(self.imu_gyro_bias); }, ref)
+    .def_property_readonly("imu_linear_acceleration_bias", [](EstimateSnapshot& self) { return field<3>(self.imu_linear_acceleration_bias); }, ref)
+    .def_readwrite("num_contacts", &EstimateSnapshot::num_contacts)
+    .def_property_readonly("contact_state", [](EstimateSnapshot& self) { return contactField(self, self.contact_state); }, ref)
+    .def_property_readonly("contact_probability", [](EstimateSnapshot& self) { return contactField(self, self.contact_probability); }, ref);
+
+  py::class_<EstimatePublisher>(m, "EstimatePublisher")
+    .def(py::init<const std::string&>(),
+          py::arg("name"))
+    .def("publish", &EstimatePublisher::publish,
+          py::arg("snapshot"))
+    .def_property_readonly("num_published", &EstimatePublisher::numPublished)
+    .def_property_readonly("name", &EstimatePublisher::name);
+
+  // read() without arguments returns a new snapshot. read(snapshot) fills an
+  // existing snapshot in place, i.e., the record is the only copy.
+  py::class_<EstimateSubscriber>(m, "EstimateSubscriber")
+    .def(py::init<const std::string&>(),
+          py::arg("name"))
+    .def("read", [](const EstimateSubscriber& self) {
+        EstimateSnapshot snapshot;
+        self.read(snapshot);
+        return snapshot;
+      })
+    .def("read", [](const EstimateSubscriber& self, EstimateSnapshot& snapshot) {
+        self.read(snapshot);
+      },  py::arg("snapshot"))
+    .def("try_read", &EstimateSubscriber::tryRead,
+          py::arg("snapshot"))
+    .def_property_readonly("sequence_number", &EstimateSubscriber::sequenceNumber);
+}
+
+} // namespace python
+} // namespace legged_state_estimator
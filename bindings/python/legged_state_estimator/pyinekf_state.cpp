@@ -0,0 +1,66 @@
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+#include <pybind11/eigen.h>
+#include <pybind11/numpy.h>
+
+#include <sstream>
+
+#include "legged_state_estimator/inekf/inekf_state.hpp"
+
+
+namespace legged_state_estimator {
+namespace python {
+
+namespace py = pybind11;
+
+// X, Theta, P, and their blocks are returned as copies. The state gains and
+// loses columns with the contacts and landmarks, which reallocates the storage
+// of the dynamic-size state and changes the shape and the column stride of the
+// storage of the fixed-capacity state, so views would be left dangling or
+// show the wrong entries.
+template <int MaxAugmented>
+py::class_<InEKFStateTpl<MaxAugmented>> defineInEKFState(py::module& m, const char* name) {
+  using State = InEKFStateTpl<MaxAugmented>;
+  return py::class_<State>(m, name)
+    .def(py::init<>())
+    .def_property_readonly("X", [](const State& self) { return Eigen::MatrixXd(self.getX()); })
+    .def_property_readonly("Theta", [](const State& self) { return Eigen::VectorXd(self.getTheta()); })
+    .def_property_readonly("P", [](const State& self) { return Eigen::MatrixXd(self.getP()); })
+    .def("get_rotation", [](const State& self) { return Eigen::Matrix3d(self.getRotation()); })
+    .def("get_velocity", [](const State& self) { return Eigen::Vector3d(self.getVelocity()); })
+    .def("get_position", [](const State& self) { return Eigen::Vector3d(self.getPosition()); })
+    .def("get_gyroscope_bias", [](const State& self) { return Eigen::Vector3d(self.getGyroscopeBias()); })
+    .def("get_accelerometer_bias", [](const State& self) { return Eigen::Vector3d(self.getAccelerometerBias()); })
+    .def("get_rotation_covariance", [](const State& self) { return Eigen::Matrix3d(self.getRotationCovariance()); })
+    .def("get_velocity_covariance", [](const State& self) { return Eigen::Matrix3d(self.getVelocityCovariance()); })
+    .def("get_position_covariance", [](const State& self) { return Eigen::Matrix3d(self.getPositionCovariance()); })
+    .def("get_gyroscope_bias_covariance", [](const State& self) { return Eigen::Matrix3d(self.getGyroscopeBiasCovariance()); })
+    .def("get_accelerometer_bias_covariance", [](const State& self) { return Eigen::Matrix3d(self.getAccelerometerBiasCovariance()); })
+    .def("get_state_type", &State::getStateType)
+    .def("dim_X", &State::dimX)
+    .def("dim_Theta", &State::dimTheta)
+    .def("dim_P", &State::dimP)
+    .def("__str__", [](const State& self) {
+        std::stringstream ss;
+        ss << self;
+        return ss.str();
+      });
+}
+
+PYBIND11_MODULE(pyinekf_state, m) {
+  py::enum_<StateType>(m, "StateType")
+    .value("WorldCentric", StateType::WorldCentric)
+    .value("BodyCentric", StateType::BodyCentric)
+    .export_values();
+
+  defineInEKFState<Eigen::Dynamic>(m, "InEKFState")
+    .def(py::init<const Eigen::MatrixXd&, const Eigen::VectorXd&, const Eigen::MatrixXd&>(),
+          py::arg("X"), py::arg("Theta"), py::arg("P"));
+
+  // State of the fixed-capacity InEKF used by LeggedStateEstimator (at most 
+  // four augmented contacts).
+  defineInEKFState<4>(m, "InEKFState4");
+}
+
+} // namespace python
+} // namespace legged_state_estimator
@@ -3,6 +3,8 @@
 #include <pybind11/eigen.h>
 #include <pybind11/numpy.h>
 
+#include <stdexcept>
+
 #include "legged_state_estimator/legged_state_estimator.hpp"
 
 
@@ -11,6 +13,174 @@ namespace python {
 
 namespace py = pybind11;
 
+using RowMajorMatrixXd = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor>;
+using InputArray = py::array_t<double, py::array::c_style | py::array::forcecast>;
+
+///
+/// @brief Runs LeggedStateEstimator::update() over a whole log. The loop runs 
+/// in C++ without the GIL and writes the estimates into preallocated arrays.
+///
+py::dict updateBatch(LeggedStateEstimator& estimator, 
+                     const InputArray& imu_gyro_raw, 
+                     const InputArray& imu_lin_accel_raw, 
+                     const InputArray& qJ, const InputArray& dqJ, 
+                     const InputArray& tauJ) {
+  if (imu_gyro_raw.ndim() != 2 || imu_gyro_raw.shape(1) != 3) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimator] invalid argment: imu_gyro_raw must have shape (T, 3)");
+  }
+  const py::ssize_t T = imu_gyro_raw.shape(0);
+  if (imu_lin_accel_raw.ndim() != 2 || imu_lin_accel_raw.shape(0) != T 
+      || imu_lin_accel_raw.shape(1) != 3) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimator] invalid argment: imu_lin_accel_raw must have shape (T, 3)");
+  }
+  if (qJ.ndim() != 2 || qJ.shape(0) != T) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimator] invalid argment: qJ must have shape (T, nJ)");
+  }
+  const py::ssize_t nJ = qJ.shape(1);
+  if (dqJ.ndim() != 2 || dqJ.shape(0) != T || dqJ.shape(1) != nJ) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimator] invalid argment: dqJ must have shape (T, nJ)");
+  }
+  if (tauJ.ndim() != 2 || tauJ.shape(0) != T || tauJ.shape(1) != nJ) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimator] invalid argment: tauJ must have shape (T, nJ)");
+  }
+  const py::ssize_t nc 
+      = static_cast<py::ssize_t>(estimator.getContactEstimator().getContactProbability().size());
+  py::array_t<double> base_pos({T, py::ssize_t(3)}), base_quat({T, py::ssize_t(4)}), 
+                      base_lin_vel_world({T, py::ssize_t(3)}), base_lin_vel_local({T, py::ssize_t(3)}), 
+                      base_ang_vel_world({T, py::ssize_t(3)}), base_ang_vel_local({T, py::ssize_t(3)}), 
+                      imu_gyro_bias({T, py::ssize_t(3)}), imu_lin_accel_bias({T, py::ssize_t(3)}), 
+                      contact_probability({T, nc}), normal_contact_force({T, nc});
+  Eigen::Map<const RowMajorMatrixXd> gyro_in(imu_gyro_raw.data(), T, 3),
+                                     accel_in(imu_lin_accel_raw.data(), T, 3),
+                                     qJ_in(qJ.data(), T, nJ), dqJ_in(dqJ.data(), T, nJ),
+                                     tauJ_in(tauJ.data(), T, nJ);
+  Eigen::Map<RowMajorMatrixXd> base_pos_out(base_pos.mutable_data(), T, 3),
+                               base_quat_out(base_quat.mutable_data(), T, 4),
+                               base_lin_vel_world_out(base_lin_vel_world.mutable_data(), T, 3),
+                               base_lin_vel_local_out(base_lin_vel_local.mutable_data(), T, 3),
+                               base_ang_vel_world_out(base_ang_vel_world.mutable_data(), T, 3),
+                               base_ang_vel_local_out(base_ang_vel_local.mutable_data(), T, 3),
+                               imu_gyro_bias_out(imu_gyro_bias.mutable_data(), T, 3),
+                               imu_lin_accel_bias_out(imu_lin_accel_bias.mutable_data(), T, 3),
+                               contact_probability_out(contact_probability.mutable_data(), T, nc),
+                               normal_contact_force_out(normal_contact_force.mutable_data(), T, nc);
+  {
+    py::gil_scoped_release release;
+    Eigen::Vector3d gyro, accel;
+    Eigen::VectorXd q(nJ), dq(nJ), tau(nJ);
+    for (py::ssize_t t=0; t<T; ++t) {
+      gyro  = gyro_in.row(t).transpose();
+      accel = accel_in.row(t).transpose();
+      q     = qJ_in.row(t).transpose();
+      dq    = dqJ_in.row(t).transpose();
+      tau   = tauJ_in.row(t).transpose();
+      estimator.update(gyro, accel, q, dq, tau);
+      base_pos_out.row(t)           = estimator.getBasePositionEstimate().transpose();
+      base_quat_out.row(t)          = estimator.getBaseQuaternionEstimate().transpose();
+      base_lin_vel_world_out.row(t) = estimator.getBaseLinearVelocityEstimateWorld().transpose();
+      base_lin_vel_local_out.row(t) = estimator.getBaseLinearVelocityEstimateLocal().transpose();
+      base_ang_vel_world_out.row(t) = estimator.getBaseAngularVelocityEstimateWorld().transpose();
+      base_ang_vel_local_out.row(t) = estimator.getBaseAngularVelocityEstimateLocal().transpose();
+      imu_gyro_bias_out.row(t)      = estimator.getIMUGyroBiasEstimate().transpose();
+      imu_lin_accel_bias_out.row(t) = estimator.getIMULinearAccelerationBiasEstimate().transpose();
+      const ContactEstimator& contact_estimator = estimator.getContactEstimator();
+      for (py::ssize_t i=0; i<nc; ++i) {
+        contact_probability_out(t, i)  = contact_estimator.getContactProbability()[i];
+        normal_contact_force_out(t, i) = contact_estimator.getNormalContactForceEstimate()[i];
+      }
+    }
+  }
+  py::dict estimates;
+  estimates["base_position"] = base_pos;
+  estimates["base_quaternion"] = base_quat;
+  estimates["base_linear_velocity_world"] = base_lin_vel_world;
+  estimates["base_linear_velocity_local"] = base_lin_vel_local;
+  estimates["base_angular_velocity_world"] = base_ang_vel_world;
+  estimates["base_angular_velocity_local"] = base_ang_vel_local;
+  estimates["imu_gyro_bias"] = imu_gyro_bias;
+  estimates["imu_linear_acceleration_bias"] = imu_lin_accel_bias;
+  estimates["contact_probability"] = contact_probability;
+  estimates["normal_contact_force"] = normal_contact_force;
+  return estimates;
+}
+
+///
+/// @brief Returns a read-only structured NumPy view of the estimate record. 
+/// The view shares memory with the estimator and reflects the latest update.
+///
+py::array estimateRecord(const py::object& self) {
+  const LeggedStateEstimator& estimator = self.cast<const LeggedStateEstimator&>();
+  py::list names, formats, offsets;
+  for (const auto& field : estimator.getEstimateRecordLayout()) {
+    names.append(field.name);
+    if (field.cols == 1) {
+      formats.append(py::make_tuple("f8", field.rows));
+    }
+    else {
+      formats.append(py::make_tuple("f8", py::make_tuple(field.rows, field.cols)));
+    }
+    offsets.append(sizeof(double) * field.offset);
+  }
+  py::dict spec;
+  spec["names"] = names;
+  spec["formats"] = formats;
+  spec["offsets"] = offsets;
+  spec["itemsize"] = sizeof(double) * estimator.getEstimateRecord().size();
+  py::array record(py::dtype::from_args(spec), std::vector<py::ssize_t>(), 
+                   std::vector<py::ssize_t>(), estimator.getEstimateRecord().data(), self);
+  record.attr("setflags")(py::arg("write")=false);
+  return record;
+}
+
+///
+/// @brief Returns the timing stats as a dict of the stage names to dicts of 
+/// count, mean_us, p99_us, and max_us, together with the counters of the 
+/// contact augmentations and removals.
+///
+py::dict timingStats(const LeggedStateEstimator& estimator) {
+  const TimingStats& timing_stats = estimator.getTimingStats();
+  py::dict stats;
+  for (int i=0; i<TimingStats::kNumStages; ++i) {
+    const auto stage = static_cast<UpdateStage>(i);
+    const LatencyHistogram& latency = timing_stats.getStageLatency(stage);
+    py::dict stage_stats;
+    stage_stats["count"] = latency.count();
+    stage_stats["mean_us"] = latency.mean();
+    stage_stats["p99_us"] = latency.percentile(99.0);
+    stage_stats["max_us"] = latency.max();
+    stats[py::str(TimingStats::stageName(stage))] = stage_stats;
+  }
+  stats["num_contact_augmentations"] = timing_stats.numContactAugmentations();
+  stats["num_contact_removals"] = timing_stats.numContactRemovals();
+  return stats;
+}
+
+///
+/// @brief Returns the checkpoint of the estimator as bytes.
+///
+py::bytes saveCheckpoint(const LeggedStateEstimator& estimator) {
+  std::string checkpoint;
+  {
+    py::gil_scoped_release release;
+    checkpoint = estimator.saveCheckpoint();
+  }
+  return py::bytes(checkpoint);
+}
+
+///
+/// @brief Restores the estimator from a checkpoint given as bytes.
+///
+void loadCheckpoint(LeggedStateEstimator& estimator, const py::bytes& checkpoint) {
+  const std::string data = checkpoint;
+  py::gil_scoped_release release;
+  estimator.loadCheckpoint(data);
+}
+
 PYBIND11_MODULE(pylegged_state_estimator, m) {
   py::class_<LeggedStateEstimator>(m, "LeggedStateEstimator")
     .def(py::init<const LeggedStateEstimatorSettings&>(),
@@ -24,7 +194,8 @@ PYBIND11_MODULE(pylegged_state_estimator, m) {
           py::arg("base_pos"), py::arg("base_quat"), 
           py::arg("base_lin_vel_world")=Eigen::Vector3d::Zero(), 
           py::arg("imu_gyro_bias")=Eigen::Vector3d::Zero(), 
-          py::arg("imu_lin_accel_bias")=Eigen::Vector3d::Zero())
+          py::arg("imu_lin_accel_bias")=Eigen::Vector3d::Zero(),
+          py::call_guard<py::gil_scoped_release>())
     .def("init", static_cast<void (LeggedStateEstimator::*)(const Eigen::Vector3d&, 
                                                       const Eigen::Vector4d&,
                                                       const Eigen::VectorXd&,
@@ -36,10 +207,23 @@ PYBIND11_MODULE(pylegged_state_estimator, m) {
           py::arg("ground_height")=std::vector<double>({0., 0., 0., 0.}), 
           py::arg("base_lin_vel_world")=Eigen::Vector3d::Zero(), 
           py::arg("imu_gyro_bias")=Eigen::Vector3d::Zero(), 
-          py::arg("imu_lin_accel_bias")=Eigen::Vector3d::Zero())
+          py::arg("imu_lin_accel_bias")=Eigen::Vector3d::Zero(),
+          py::call_guard<py::gil_scoped_release>())
     .def("update", &LeggedStateEstimator::update,
           py::arg("imu_gyro_raw"), py::arg("imu_lin_accel_raw"), 
-          py::arg("qJ"), py::arg("dqJ"), py::arg("tauJ"))
+          py::arg("qJ"), py::arg("dqJ"), py::arg("tauJ"),
+          py::call_guard<py::gil_scoped_release>())
+    .def("push_imu", &LeggedStateEstimator::pushIMU,
+          py::arg("t"), py::arg("imu_gyro_raw"), py::arg("imu_lin_accel_raw"), 
+          py::call_guard<py::gil_scoped_release>())
+    .def("push_joints", &LeggedStateEstimator::pushJoints,
+          py::arg("t"), py::arg("qJ"), py::arg("dqJ"), py::arg("tauJ"),
+          py::call_guard<py::gil_scoped_release>())
+    .def_property_readonly("estimate_time", &LeggedStateEstimator::getEstimateTime)
+    .def("update_batch", &updateBatch,
+          py::arg("imu_gyro_raw"), py::arg("imu_lin_accel_raw"), 
+          py::arg("qJ"), py::arg("dqJ"), py::arg("tauJ"),
+          "Runs update() over (T, 3) IMU and (T, nJ) joint arrays and returns a dict of (T, ...) estimate arrays.")
     .def_property_readonly("base_position_estimate", &LeggedStateEstimator::getBasePositionEstimate)
     .def_property_readonly("base_rotation_estimate", &LeggedStateEstimator::getBaseRotationEstimate)
     .def_property_readonly("base_quaternion_estimate", &LeggedStateEstimator::getBaseQuaternionEstimate)
@@ -52,8 +236,28 @@ PYBIND11_MODULE(pylegged_state_estimator, m) {
     .def_property_readonly("joint_velocity_estimate", &LeggedStateEstimator::getJointVelocityEstimate)
     .def_property_readonly("joint_acceleration_estimate", &LeggedStateEstimator::getJointAccelerationEstimate)
     .def_property_readonly("joint_torque_estimate", &LeggedStateEstimator::getJointTorqueEstimate)
+    .def_property_readonly("estimate_record", &estimateRecord,
+          "Read-only structured view of all the estimates. The view shares memory with the estimator, so it can be created once and read after every update() and load_checkpoint() of a checkpoint with the same settings.")
+    .def_property_readonly("inekf_state", &LeggedStateEstimator::getInEKFState)
     .def("get_contact_estimator", &LeggedStateEstimator::getContactEstimator)
-    .def("get_settings", &LeggedStateEstimator::getSettings);
+    .def("get_robot_model", &LeggedStateEstimator::getRobotModel)
+    .def("get_settings", &LeggedStateEstimator::getSettings)
+    .def("get_timing_stats", &timingStats,
+          "Returns the latency stats (count, mean_us, p99_us, max_us) of each stage of update() and the counters of the contact augmentations and removals.")
+    .def("reset_timing_stats", &LeggedStateEstimator::resetTimingStats)
+    .def("save_checkpoint", &saveCheckpoint,
+          "Returns a binary checkpoint of the filter state, the low pass filters, the contact estimator, and the estimates.")
+    .def("load_checkpoint", &loadCheckpoint, py::arg("checkpoint"),
+          "Restores the estimator from a checkpoint returned by save_checkpoint(). The subsequent updates are identical to those of the checkpointed estimator.")
+    .def(py::pickle(
+      [](const LeggedStateEstimator& estimator) {
+        return saveCheckpoint(estimator);
+      },
+      [](const py::bytes& checkpoint) {
+        LeggedStateEstimator estimator;
+        loadCheckpoint(estimator, checkpoint);
+        return estimator;
+      }));
 }
 
 } // namespace python
@@ -0,0 +1,54 @@
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+#include <pybind11/eigen.h>
+#include <pybind11/numpy.h>
+
+#include "legged_state_estimator/legged_state_estimator_pool.hpp"
+
+
+namespace legged_state_estimator {
+namespace python {
+
+namespace py = pybind11;
+
+PYBIND11_MODULE(pylegged_state_estimator_pool, m) {
+  py::class_<LeggedStateEstimatorPool>(m, "LeggedStateEstimatorPool")
+    .def(py::init<const std::vector<LeggedStateEstimatorSettings>&, const int>(),
+          py::arg("legged_state_estimator_settings"), py::arg("num_threads")=0)
+    .def(py::init<const LeggedStateEstimatorSettings&, const int, const int>(),
+          py::arg("legged_state_estimator_settings"), py::arg("num_estimators"),
+          py::arg("num_threads")=0)
+    .def("init", static_cast<void (LeggedStateEstimatorPool::*)(const Eigen::MatrixXd&,
+                                                          const Eigen::MatrixXd&)>(&LeggedStateEstimatorPool::init),
+          py::arg("base_pos"), py::arg("base_quat"))
+    .def("init", static_cast<void (LeggedStateEstimatorPool::*)(const Eigen::MatrixXd&,
+                                                          const Eigen::MatrixXd&,
+                                                          const Eigen::MatrixXd&,
+                                                          const Eigen::MatrixXd&,
+                                                          const Eigen::MatrixXd&)>(&LeggedStateEstimatorPool::init),
+          py::arg("base_pos"), py::arg("base_quat"), py::arg("base_lin_vel_world"),
+          py::arg("imu_gyro_bias"), py::arg("imu_lin_accel_bias"))
+    .def("update", &LeggedStateEstimatorPool::update,
+          py::arg("imu_gyro_raw"), py::arg("imu_lin_accel_raw"),
+          py::arg("qJ"), py::arg("dqJ"), py::arg("tauJ"),
+          py::call_guard<py::gil_scoped_release>())
+    .def("size", &LeggedStateEstimatorPool::size)
+    .def("__len__", &LeggedStateEstimatorPool::size)
+    .def("num_threads", &LeggedStateEstimatorPool::numThreads)
+    .def("nJ", &LeggedStateEstimatorPool::nJ)
+    .def("num_contacts", &LeggedStateEstimatorPool::numContacts)
+    .def("get_estimator", static_cast<LeggedStateEstimator& (LeggedStateEstimatorPool::*)(const int)>(&LeggedStateEstimatorPool::getEstimator),
+          py::arg("i"), py::return_value_policy::reference_internal)
+    .def_property_readonly("base_position_estimate", &LeggedStateEstimatorPool::getBasePositionEstimate)
+    .def_property_readonly("base_quaternion_estimate", &LeggedStateEstimatorPool::getBaseQuaternionEstimate)
+    .def_property_readonly("base_linear_velocity_estimate_world", &LeggedStateEstimatorPool::getBaseLinearVelocityEstimateWorld)
+    .def_property_readonly("base_linear_velocity_estimate_local", &LeggedStateEstimatorPool::getBaseLinearVelocityEstimateLocal)
+    .def_property_readonly("base_angular_velocity_estimate_world", &LeggedStateEstimatorPool::getBaseAngularVelocityEstimateWorld)
+    .def_property_readonly("base_angular_velocity_estimate_local", &LeggedStateEstimatorPool::getBaseAngularVelocityEstimateLocal)
+    .def_property_readonly("imu_gyro_bias_estimate", &LeggedStateEstimatorPool::getIMUGyroBiasEstimate)
+    .def_property_readonly("imu_linear_acceleration_bias_estimate", &LeggedStateEstimatorPool::getIMULinearAccelerationBiasEstimate)
+    .def_property_readonly("contact_probability", &LeggedStateEstimatorPool::getContactProbability);
+}
+
+} // namespace python
+} // namespace legged_state_estimator
@@ -12,6 +12,11 @@ namespace python {
 namespace py = pybind11;
 
 PYBIND11_MODULE(pylegged_state_estimator_settings, m) {
+  py::enum_<LegOdometryMode>(m, "LegOdometryMode")
+    .value("ContactPosition", LegOdometryMode::ContactPosition)
+    .value("BaseVelocity", LegOdometryMode::BaseVelocity)
+    .export_values();
+
   py::class_<LeggedStateEstimatorSettings>(m, "LeggedStateEstimatorSettings")
     .def(py::init<>())
     .def_static("UnitreeA1", &LeggedStateEstimatorSettings::UnitreeA1,
@@ -22,8 +27,15 @@ PYBIND11_MODULE(pylegged_state_estimator_settings, m) {
     .def_readwrite("contact_estimator_settings", &LeggedStateEstimatorSettings::contact_estimator_settings)
     .def_readwrite("inekf_noise_params", &LeggedStateEstimatorSettings::inekf_noise_params)
     .def_readwrite("dynamic_contact_estimation", &LeggedStateEstimatorSettings::dynamic_contact_estimation)
+    .def_readwrite("contact_slot_mode", &LeggedStateEstimatorSettings::contact_slot_mode)
+    .def_readwrite("kinematics_backend", &LeggedStateEstimatorSettings::kinematics_backend)
+    .def_readwrite("leg_odometry_mode", &LeggedStateEstimatorSettings::leg_odometry_mode)
+    .def_readwrite("enable_timing_stats", &LeggedStateEstimatorSettings::enable_timing_stats)
+    .def_readwrite("estimate_publisher_name", &LeggedStateEstimatorSettings::estimate_publisher_name)
+    .def_readwrite("robot_model_cache_dir", &LeggedStateEstimatorSettings::robot_model_cache_dir)
     .def_readwrite("contact_position_noise", &LeggedStateEstimatorSettings::contact_position_noise)
     .def_readwrite("contact_rotation_noise", &LeggedStateEstimatorSettings::contact_rotation_noise)
+    .def_readwrite("leg_odometry_velocity_noise", &LeggedStateEstimatorSettings::leg_odometry_velocity_noise)
     .def_readwrite("sampling_time", &LeggedStateEstimatorSettings::sampling_time)
     .def_readwrite("lpf_gyro_accel_cutoff_frequency", &LeggedStateEstimatorSettings::lpf_gyro_accel_cutoff_frequency)
     .def_readwrite("lpf_lin_accel_cutoff_frequency", &LeggedStateEstimatorSettings::lpf_lin_accel_cutoff_frequency)
@@ -18,27 +18,39 @@ PYBIND11_MODULE(pyrobot_model, m) {
     .value("LOCAL_WORLD_ALIGNED", pinocchio::ReferenceFrame::LOCAL_WORLD_ALIGNED)
     .export_values();
 
+  py::enum_<KinematicsBackend>(m, "KinematicsBackend")
+    .value("Pinocchio", KinematicsBackend::Pinocchio)
+    .value("LegChain", KinematicsBackend::LegChain)
+    .export_values();
+
   py::class_<RobotModel>(m, "RobotModel")
     .def(py::init<const std::string&, const int, const std::vector<int>&>(),
           py::arg("urdf_path"), py::arg("imu_frame"), py::arg("contact_frames"))
     .def(py::init<const std::string&, const std::string&, const std::vector<std::string>&>(),
           py::arg("urdf_path"), py::arg("imu_frame"), py::arg("contact_frames"))
     .def(py::init<>())
+    .def("set_kinematics_backend", &RobotModel::setKinematicsBackend,
+          py::arg("backend"))
+    .def("get_kinematics_backend", &RobotModel::getKinematicsBackend)
     .def("update_leg_kinematics", static_cast<void (RobotModel::*)(const Eigen::VectorXd&, 
                                                                    const pinocchio::ReferenceFrame)>(&RobotModel::updateLegKinematics),
-          py::arg("qJ"), py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED)
+          py::arg("qJ"), py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED,
+          py::call_guard<py::gil_scoped_release>())
     .def("update_leg_kinematics", static_cast<void (RobotModel::*)(const Eigen::VectorXd&, const Eigen::VectorXd&, 
                                                                    const pinocchio::ReferenceFrame)>(&RobotModel::updateLegKinematics),
-          py::arg("qJ"), py::arg("dqJ"), py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED)
+          py::arg("qJ"), py::arg("dqJ"), py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED,
+          py::call_guard<py::gil_scoped_release>())
     .def("update_kinematics", static_cast<void (RobotModel::*)(const Eigen::VectorXd&, 
                                                                const pinocchio::ReferenceFrame)>(&RobotModel::updateLegKinematics),
-          py::arg("qJ"), py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED)
+          py::arg("qJ"), py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED,
+          py::call_guard<py::gil_scoped_release>())
     .def("update_kinematics", static_cast<void (RobotModel::*)(const Eigen::Vector3d&, 
                                                                const Eigen::Vector4d&,  
                                                                const Eigen::VectorXd&,  
                                                                const pinocchio::ReferenceFrame)>(&RobotModel::updateKinematics),
           py::arg("base_pos"), py::arg("base_quat"), py::arg("qJ"),  
-          py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED)
+          py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED,
+          py::call_guard<py::gil_scoped_release>())
     .def("update_kinematics", static_cast<void (RobotModel::*)(const Eigen::Vector3d&, 
                                                                const Eigen::Vector4d&, 
                                                                const Eigen::Vector3d&, 
@@ -49,14 +61,36 @@ PYBIND11_MODULE(pyrobot_model, m) {
           py::arg("base_pos"), py::arg("base_quat"), 
           py::arg("base_linear_vel"), py::arg("base_angular_vel"), 
           py::arg("qJ"), py::arg("dqJ"), 
-          py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED)
+          py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED,
+          py::call_guard<py::gil_scoped_release>())
     .def("update_leg_dynamics", &RobotModel::updateLegDynamics,
-          py::arg("qJ"), py::arg("dqJ"))
+          py::arg("qJ"), py::arg("dqJ"),
+          py::call_guard<py::gil_scoped_release>())
+    .def("update_leg_kinematics_and_dynamics", static_cast<void (RobotModel::*)(const Eigen::VectorXd&, const Eigen::VectorXd&, 
+                                                                                const pinocchio::ReferenceFrame)>(&RobotModel::updateLegKinematicsAndDynamics),
+          py::arg("qJ"), py::arg("dqJ"), py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED,
+          py::call_guard<py::gil_scoped_release>())
+    .def("update_leg_kinematics_and_dynamics", static_cast<void (RobotModel::*)(const Eigen::Vector4d&, 
+                                                                                const Eigen::Vector3d&, 
+                                                                                const Eigen::Vector3d&, 
+                                                                                const Eigen::Vector3d&, 
+                                                                                const Eigen::Vector3d&, 
+                                                                                const Eigen::VectorXd&, 
+                                                                                const Eigen::VectorXd&, 
+                                                                                const Eigen::VectorXd&, 
+                                                                                const pinocchio::ReferenceFrame)>(&RobotModel::updateLegKinematicsAndDynamics),
+          py::arg("base_quat"), 
+          py::arg("base_linear_vel"), py::arg("base_angular_vel"), 
+          py::arg("base_linear_acc"), py::arg("base_angular_acc"), 
+          py::arg("qJ"), py::arg("dqJ"), py::arg("ddqJ"),
+          py::arg("rf")=pinocchio::LOCAL_WORLD_ALIGNED,
+          py::call_guard<py::gil_scoped_release>())
     .def("update_dynamics", &RobotModel::updateDynamics,
           py::arg("base_pos"), py::arg("base_quat"), 
           py::arg("base_linear_vel"), py::arg("base_angular_vel"), 
           py::arg("base_linear_acc"), py::arg("base_angular_acc"), 
-          py::arg("qJ"), py::arg("dqJ"), py::arg("ddqJ"))
+          py::arg("qJ"), py::arg("dqJ"), py::arg("ddqJ"),
+          py::call_guard<py::gil_scoped_release>())
     .def("get_base_position", &RobotModel::getBasePosition)
     .def("get_base_rotation", &RobotModel::getBaseRotation)
     .def("get_contact_position", &RobotModel::getContactPosition,
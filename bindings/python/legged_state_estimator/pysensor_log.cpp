@@ -0,0 +1,66 @@
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+#include <pybind11/eigen.h>
+#include <pybind11/numpy.h>
+
+#include "legged_state_estimator/sensor_log.hpp"
+#include "legged_state_estimator/sensor_log_replay.hpp"
+
+
+namespace legged_state_estimator {
+namespace python {
+
+namespace py = pybind11;
+
+PYBIND11_MODULE(pysensor_log, m) {
+  py::enum_<SensorLogStreamType>(m, "SensorLogStreamType")
+    .value("IMUStream", SensorLogStreamType::IMUStream)
+    .value("JointStream", SensorLogStreamType::JointStream)
+    .value("ContactStream", SensorLogStreamType::ContactStream)
+    .value("KinematicStream", SensorLogStreamType::KinematicStream)
+    .value("LandmarkStream", SensorLogStreamType::LandmarkStream)
+    .value("GroundTruthStream", SensorLogStreamType::GroundTruthStream)
+    .export_values();
+
+  py::class_<SensorLogWriter>(m, "SensorLogWriter")
+    .def(py::init<const std::string&>(),
+          py::arg("path"))
+    .def("write", static_cast<void (SensorLogWriter::*)(const SensorLogStreamType, 
+                                                        const Eigen::VectorXd&, 
+                                                        const SensorLogWriter::MatrixXdRowMajor&)>(&SensorLogWriter::write),
+          py::arg("type"), py::arg("time"), py::arg("values"))
+    .def("close", &SensorLogWriter::close)
+    .def("__enter__", [](SensorLogWriter& self) -> SensorLogWriter& { return self; },
+          py::return_value_policy::reference)
+    .def("__exit__", [](SensorLogWriter& self, py::object, py::object, py::object) { self.close(); });
+
+  // The timestamps and records are returned as read-only views of the 
+  // memory-mapped log, which keep the log alive.
+  py::class_<SensorLog>(m, "SensorLog")
+    .def(py::init<const std::string&>(),
+          py::arg("path"))
+    .def(py::init<>())
+    .def("has_stream", &SensorLog::hasStream,
+          py::arg("type"))
+    .def("num_records", &SensorLog::numRecords,
+          py::arg("type"))
+    .def("width", &SensorLog::width,
+          py::arg("type"))
+    .def("get_time", &SensorLog::getTime,
+          py::arg("type"), py::return_value_policy::reference_internal)
+    .def("get_values", &SensorLog::getValues,
+          py::arg("type"), py::return_value_policy::reference_internal);
+
+  m.def("convert_text_sensor_log", &convertTextSensorLog,
+        py::arg("text_path"), py::arg("binary_path"),
+        py::call_guard<py::gil_scoped_release>());
+
+  m.def("replay_sensor_log", 
+        static_cast<Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor> (*)(
+            const SensorLog&, LeggedStateEstimator&, const int)>(&replaySensorLog),
+        py::arg("log"), py::arg("legged_state_estimator"), py::arg("record_decimation")=1,
+        py::call_guard<py::gil_scoped_release>());
+}
+
+} // namespace python
+} // namespace legged_state_estimator
@@ -0,0 +1,189 @@
+import a1_simulator
+import numpy as np
+import argparse
+import json
+import os
+import time
+
+
+# Generates labeled datasets of the A1 simulator faster than real time. The
+# simulator runs headless (pybullet.DIRECT without sleeping) and the streams
+# are written to a directory in chunks as raw little-endian doubles, one file
+# per stream, with the widths and the settings in meta.json. The layouts of
+# the imu, joint, contact, and ground_truth streams are those of
+# legged_state_estimator.SensorLogStreamType so that the dataset can be
+# converted into a binary sensor log by to_sensor_log(). Usage:
+#   python a1_dataset.py --out dataset --duration 3600 --seed 0 --sensor-log dataset.bin
+
+URDF_PATH = "a1_description/urdf/a1_friction.urdf"
+TIME_STEP = 0.0025
+
+# Widths of the streams.
+# - imu: gyro (3), linear acceleration (3)
+# - joint: qJ (12), dqJ (12), tauJ (12)
+# - contact: pairs of contact id and contact state (0 or 1) of the 4 feet
+# - ground_truth: base position (3), base quaternion (x, y, z, w), base linear
+#   velocity expressed in the world frame (3)
+# - ground_truth_local: base linear and angular velocities expressed in the
+#   local frame (3 + 3)
+# - contact_force: normal contact forces of the 4 feet
+# - imu_bias: gyro bias (3), linear acceleration bias (3)
+STREAMS = {'time': 1, 'imu': 6, 'joint': 36, 'contact': 8, 'ground_truth': 10,
+           'ground_truth_local': 6, 'contact_force': 4, 'imu_bias': 6}
+# Streams converted into the binary sensor log
+SENSOR_LOG_STREAMS = {'imu': 'IMUStream', 'joint': 'JointStream',
+                      'contact': 'ContactStream', 'ground_truth': 'GroundTruthStream'}
+
+
+class DatasetWriter(object):
+    """Writes the streams of a dataset in chunks. The records are buffered in
+    preallocated arrays and each full chunk is appended to the stream files."""
+    def __init__(self, directory, chunk_size=10000, meta=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.meta = dict(meta) if meta is not None else {}
+        self.buffers = {name: np.zeros((chunk_size, width)) for name, width in STREAMS.items()}
+        self.files = {name: open(os.path.join(directory, name+'.f64'), 'wb') for name in STREAMS}
+        self.num_buffered = 0
+        self.num_records = 0
+
+    def row(self, name):
+        """Returns the row of the stream of the current record, which is
+        filled in place."""
+        return self.buffers[name][self.num_buffered]
+
+    def commit(self):
+        """Commits the current record and flushes the chunk if it is full."""
+        self.num_buffered += 1
+        self.num_records += 1
+        if self.num_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        for name, buffer in self.buffers.items():
+            buffer[:self.num_buffered].astype('<f8', copy=False).tofile(self.files[name])
+            self.files[name].flush()
+        self.num_buffered = 0
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+        meta = dict(self.meta)
+        meta['num_records'] = self.num_records
+        meta['streams'] = STREAMS
+        meta['dtype'] = '<f8'
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+
+def load_dataset(directory):
+    """Maps the streams of a dataset without reading them into memory.
+    Returns the meta data and a dict of arrays of num_records x width."""
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    streams = {}
+    for name, width in meta['streams'].items():
+        streams[name] = np.memmap(os.path.join(directory, name+'.f64'), dtype=meta['dtype'],
+                                  mode='r', shape=(meta['num_records'], width))
+    return meta, streams
+
+
+def to_sensor_log(directory, path):
+    """Converts a dataset into a binary sensor log, which can be replayed by
+    legged_state_estimator.replay_sensor_log()."""
+    import legged_state_estimator
+    meta, streams = load_dataset(directory)
+    t = np.ascontiguousarray(streams['time'][:, 0])
+    with legged_state_estimator.SensorLogWriter(path) as writer:
+        for name, stream_type in SENSOR_LOG_STREAMS.items():
+            writer.write(getattr(legged_state_estimator.SensorLogStreamType, stream_type),
+                         t, streams[name])
+
+
+def generate_dataset(directory, duration, seed=None, time_step=TIME_STEP, urdf_path=URDF_PATH,
+                     command_amplitude=0.05, command_interval=100, chunk_size=10000,
+                     noise_params=None):
+    """Simulates the A1 standing under random joint position commands for
+    duration [s] and writes the dataset. The joint position commands are
+    resampled around the reference every command_interval steps. Returns the
+    number of records and the real-time factor."""
+    noise_params = dict(noise_params) if noise_params is not None else {}
+    sim_seed, command_seed = np.random.SeedSequence(seed).spawn(2)
+    sim = a1_simulator.A1Simulator(urdf_path, time_step, headless=True, seed=sim_seed,
+                                   **noise_params)
+    command_rng = np.random.default_rng(command_seed)
+    meta = {'urdf_path': urdf_path, 'time_step': time_step, 'seed': seed,
+            'command_amplitude': command_amplitude, 'command_interval': command_interval,
+            'noise_params': noise_params}
+    writer = DatasetWriter(directory, chunk_size, meta)
+    contacts = [sim.contact_info_LF, sim.contact_info_RF, sim.contact_info_LH, sim.contact_info_RH]
+    contact_ids = np.arange(len(contacts))
+    num_steps = int(round(duration / time_step))
+
+    sim.init()
+    for i in range(200):
+        sim.step_simulation()
+
+    start_time = time.perf_counter()
+    for i in range(num_steps):
+        sim.step_simulation()
+        if i%command_interval == 0:
+            qJ_cmd = sim.qJ_ref + command_amplitude * command_rng.standard_normal(12)
+            sim.apply_position_command(qJ_cmd)
+        imu_gyro_raw, imu_lin_acc_raw = sim.get_imu_state()
+        qJ, dqJ, tauJ = sim.get_joint_state()
+        base_pos, base_quat, base_lin_vel_world, _ = sim.get_base_state(coordinate='world')
+        _, _, base_lin_vel, base_ang_vel = sim.get_base_state(coordinate='local')
+        writer.row('time')[0] = i * time_step
+        imu = writer.row('imu')
+        imu[0:3] = imu_gyro_raw
+        imu[3:6] = imu_lin_acc_raw
+        joint = writer.row('joint')
+        joint[0:12] = qJ
+        joint[12:24] = dqJ
+        joint[24:36] = tauJ
+        contact = writer.row('contact')
+        contact[0::2] = contact_ids
+        contact[1::2] = [e.active for e in contacts]
+        writer.row('contact_force')[:] = [e.normal_force for e in contacts]
+        ground_truth = writer.row('ground_truth')
+        ground_truth[0:3] = base_pos
+        ground_truth[3:7] = base_quat
+        ground_truth[7:10] = base_lin_vel_world
+        ground_truth_local = writer.row('ground_truth_local')
+        ground_truth_local[0:3] = base_lin_vel
+        ground_truth_local[3:6] = base_ang_vel
+        imu_bias = writer.row('imu_bias')
+        imu_bias[0:3] = sim.imu_gyro_bias
+        imu_bias[3:6] = sim.imu_accel_bias
+        writer.commit()
+    elapsed_time = time.perf_counter() - start_time
+    sim.disconnect()
+    writer.meta['elapsed_time'] = elapsed_time
+    writer.close()
+    return num_steps, num_steps * time_step / max(elapsed_time, 1.0e-9)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates a labeled dataset of the A1 simulator.')
+    parser.add_argument('--out', required=True, help='output directory')
+    parser.add_argument('--duration', type=float, default=60.0, help='simulated time [s]')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--time-step', type=float, default=TIME_STEP)
+    parser.add_argument('--urdf', default=URDF_PATH)
+    parser.add_argument('--command-amplitude', type=float, default=0.05)
+    parser.add_argument('--command-interval', type=int, default=100)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--sensor-log', default=None,
+                        help='path of the binary sensor log converted from the dataset')
+    args = parser.parse_args()
+    num_records, real_time_factor = generate_dataset(args.out, args.duration, seed=args.seed,
+                                                     time_step=args.time_step, urdf_path=args.urdf,
+                                                     command_amplitude=args.command_amplitude,
+                                                     command_interval=args.command_interval,
+                                                     chunk_size=args.chunk_size)
+    print('records:', num_records, ', real-time factor:', real_time_factor)
+    if args.sensor_log is not None:
+        to_sensor_log(args.out, args.sensor_log)
@@ -0,0 +1,68 @@
+import a1_simulator
+import numpy as np
+import legged_state_estimator
+import time
+
+
+# Compares the leg odometry velocity correction mode (BaseVelocity) with the
+# contact position correction mode (ContactPosition) on the A1 simulator.
+
+URDF_PATH = "a1_description/urdf/a1_friction.urdf"
+TIME_STEP = 0.0025
+NUM_STEPS = 10000
+sim = a1_simulator.A1Simulator(URDF_PATH, TIME_STEP,
+                               imu_gyro_noise=0.01, imu_lin_accel_noise=0.1,
+                               imu_gyro_bias_noise=0.00001,
+                               imu_lin_accel_bias_noise=0.0001,
+                               qJ_noise=0.001, dqJ_noise=0.1,
+                               tauJ_noise=0.1)
+
+estimators = {}
+for mode in [legged_state_estimator.LegOdometryMode.ContactPosition,
+             legged_state_estimator.LegOdometryMode.BaseVelocity]:
+    estimator_settings = legged_state_estimator.LeggedStateEstimatorSettings.UnitreeA1(URDF_PATH, TIME_STEP)
+    estimator_settings.contact_estimator_settings.beta0 = [-20.0, -20.0, -20.0, -20.0]
+    estimator_settings.contact_estimator_settings.beta1 = [0.7, 0.7, 0.7, 0.7]
+    estimator_settings.contact_estimator_settings.contact_force_covariance_alpha = 10.0
+    estimator_settings.inekf_noise_params.contact_cov = 0.01 * np.eye(3, 3)
+    estimator_settings.contact_position_noise = 0.1
+    estimator_settings.contact_rotation_noise = 0.1
+    estimator_settings.leg_odometry_velocity_noise = 0.1
+    estimator_settings.leg_odometry_mode = mode
+    estimators[mode.name] = legged_state_estimator.LeggedStateEstimator(estimator_settings)
+
+sim.init()
+for i in range(200):
+    sim.step_simulation()
+
+base_pos, base_quat, base_lin_vel_world, base_ang_vel_world = sim.get_base_state(coordinate='world')
+for estimator in estimators.values():
+    estimator.init(base_pos=base_pos, base_quat=base_quat, base_lin_vel_world=base_lin_vel_world,
+                   imu_gyro_bias=np.zeros(3), imu_lin_accel_bias=np.zeros(3))
+
+update_time = {name: 0.0 for name in estimators}
+base_pos_error = {name: [] for name in estimators}
+base_lin_vel_error = {name: [] for name in estimators}
+
+for i in range(NUM_STEPS):
+    sim.step_simulation()
+    if i%100 == 0:
+        sim.apply_position_command(sim.qJ_ref)
+    imu_gyro_raw, imu_lin_acc_raw = sim.get_imu_state()
+    qJ, dqJ, tauJ = sim.get_joint_state()
+    base_pos, base_quat, base_lin_vel, base_ang_vel = sim.get_base_state(coordinate='local')
+    for name, estimator in estimators.items():
+        start_time = time.perf_counter()
+        estimator.update(imu_gyro_raw=imu_gyro_raw, imu_lin_accel_raw=imu_lin_acc_raw,
+                         qJ=qJ, dqJ=dqJ, tauJ=tauJ)
+        update_time[name] += time.perf_counter() - start_time
+        base_pos_error[name].append(estimator.base_position_estimate - base_pos)
+        base_lin_vel_error[name].append(estimator.base_linear_velocity_estimate_local - base_lin_vel)
+
+sim.disconnect()
+
+for name in estimators:
+    print(name + ':')
+    print('  update [us]: ', 1.0e6 * update_time[name] / NUM_STEPS)
+    print('  base position RMSE [m]: ', np.sqrt(np.mean(np.square(base_pos_error[name]), axis=0)))
+    print('  base linear velocity RMSE [m/s]: ', np.sqrt(np.mean(np.square(base_lin_vel_error[name]), axis=0)))
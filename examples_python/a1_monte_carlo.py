@@ -0,0 +1,206 @@
+import os
+# One BLAS thread per worker process so that the runs scale across the cores
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+os.environ.setdefault('OPENBLAS_NUM_THREADS', '1')
+os.environ.setdefault('MKL_NUM_THREADS', '1')
+import a1_simulator
+import numpy as np
+import legged_state_estimator
+from scipy.spatial.transform import Rotation
+from scipy.stats import chi2
+import argparse
+import json
+import multiprocessing
+import time
+
+
+# Monte Carlo evaluation of LeggedStateEstimator on the headless A1 simulator.
+# Each run simulates the A1 standing under random joint position commands
+# with one seed and one noise configuration, and computes the RMSEs of the
+# base position, orientation, and linear velocity and the NEES of the base
+# state (rotation, velocity, position) with the InEKF covariance. The runs are
+# distributed over a process pool. The seed of each run is derived from the
+# base seed and the run index, so any run can be reproduced alone by --run.
+# Usage:
+#   python a1_monte_carlo.py --num-seeds 32 --noise-scales 0.5 1 2 --json results.json
+
+URDF_PATH = "a1_description/urdf/a1_friction.urdf"
+TIME_STEP = 0.0025
+NOMINAL_NOISE = {'imu_gyro_noise': 0.01, 'imu_lin_accel_noise': 0.1,
+                 'imu_gyro_bias_noise': 0.00001, 'imu_lin_accel_bias_noise': 0.0001,
+                 'qJ_noise': 0.001, 'dqJ_noise': 0.1, 'tauJ_noise': 0.1}
+NUM_SETTLING_STEPS = 200
+# Dimension of the base state of the NEES
+NEES_DIM = 9
+
+
+def make_estimator_settings(urdf_path, time_step):
+    estimator_settings = legged_state_estimator.LeggedStateEstimatorSettings.UnitreeA1(urdf_path, time_step)
+    estimator_settings.contact_estimator_settings.beta0 = [-20.0, -20.0, -20.0, -20.0]
+    estimator_settings.contact_estimator_settings.beta1 = [0.7, 0.7, 0.7, 0.7]
+    estimator_settings.contact_estimator_settings.contact_force_covariance_alpha = 10.0
+    estimator_settings.inekf_noise_params.contact_cov = 0.01 * np.eye(3, 3)
+    estimator_settings.contact_position_noise = 0.1
+    estimator_settings.contact_rotation_noise = 0.1
+    estimator_settings.lpf_gyro_accel_cutoff_frequency = 250
+    estimator_settings.lpf_lin_accel_cutoff_frequency  = 250
+    estimator_settings.lpf_dqJ_cutoff_frequency  = 10
+    estimator_settings.lpf_ddqJ_cutoff_frequency = 5
+    estimator_settings.lpf_tauJ_cutoff_frequency = 10
+    estimator_settings.dynamic_contact_estimation = True
+    return estimator_settings
+
+
+def make_runs(base_seed, num_seeds, noise_scales, duration, time_step=TIME_STEP, urdf_path=URDF_PATH,
+              command_amplitude=0.05, command_interval=100):
+    """Returns the configurations of the runs. The run index determines the
+    seed, i.e., the runs are reproducible independently of the pool."""
+    runs = []
+    for noise_scale in noise_scales:
+        for seed_index in range(num_seeds):
+            runs.append({'run': len(runs), 'base_seed': base_seed, 'seed_index': seed_index,
+                         'noise_scale': noise_scale, 'duration': duration,
+                         'time_step': time_step, 'urdf_path': urdf_path,
+                         'command_amplitude': command_amplitude,
+                         'command_interval': command_interval})
+    return runs
+
+
+def left_invariant_error(R_est, v_est, p_est, R_true, v_true, p_true):
+    """Left-invariant errors log(X_est^{-1} X_true) of the base states, which
+    are stacked along the first axis, to first order."""
+    R_est_T = np.transpose(R_est, (0, 2, 1))
+    xi = np.zeros((R_est.shape[0], NEES_DIM))
+    xi[:, 0:3] = Rotation.from_matrix(R_est_T @ R_true).as_rotvec()
+    xi[:, 3:6] = np.einsum('nij,nj->ni', R_est_T, v_true-v_est)
+    xi[:, 6:9] = np.einsum('nij,nj->ni', R_est_T, p_true-p_est)
+    return xi
+
+
+def run_single(run):
+    """Runs one configuration and returns its metrics."""
+    start_time = time.perf_counter()
+    # Each run has its own seed sequence of (base_seed, seed_index)
+    seed_sequence = np.random.SeedSequence(run['base_seed'], spawn_key=(run['seed_index'],))
+    sim_seed, command_seed = seed_sequence.spawn(2)
+    noise_params = {k: run['noise_scale']*v for k, v in NOMINAL_NOISE.items()}
+    time_step = run['time_step']
+    sim = a1_simulator.A1Simulator(run['urdf_path'], time_step, headless=True, seed=sim_seed,
+                                   **noise_params)
+    command_rng = np.random.default_rng(command_seed)
+    estimator = legged_state_estimator.LeggedStateEstimator(make_estimator_settings(run['urdf_path'], time_step))
+
+    sim.init()
+    for i in range(NUM_SETTLING_STEPS):
+        sim.step_simulation()
+    base_pos, base_quat, base_lin_vel_world, base_ang_vel_world = sim.get_base_state(coordinate='world')
+    estimator.init(base_pos=base_pos, base_quat=base_quat, base_lin_vel_world=base_lin_vel_world,
+                   imu_gyro_bias=np.zeros(3), imu_lin_accel_bias=np.zeros(3))
+
+    num_steps = int(round(run['duration'] / time_step))
+    p_true = np.zeros((num_steps, 3))
+    quat_true = np.zeros((num_steps, 4))
+    v_true = np.zeros((num_steps, 3))
+    p_est = np.zeros((num_steps, 3))
+    R_est = np.zeros((num_steps, 3, 3))
+    v_est = np.zeros((num_steps, 3))
+    P = np.zeros((num_steps, NEES_DIM, NEES_DIM))
+    update_time = 0.0
+    for i in range(num_steps):
+        sim.step_simulation()
+        if i%run['command_interval'] == 0:
+            sim.apply_position_command(sim.qJ_ref + run['command_amplitude']*command_rng.standard_normal(12))
+        imu_gyro_raw, imu_lin_acc_raw = sim.get_imu_state()
+        qJ, dqJ, tauJ = sim.get_joint_state()
+        update_start_time = time.perf_counter()
+        estimator.update(imu_gyro_raw=imu_gyro_raw, imu_lin_accel_raw=imu_lin_acc_raw,
+                         qJ=qJ, dqJ=dqJ, tauJ=tauJ)
+        update_time += time.perf_counter() - update_start_time
+        p_true[i], quat_true[i], v_true[i], _ = sim.get_base_state(coordinate='world')
+        p_est[i] = estimator.base_position_estimate
+        R_est[i] = estimator.base_rotation_estimate
+        v_est[i] = estimator.base_linear_velocity_estimate_world
+        P[i] = estimator.inekf_state.P[0:NEES_DIM, 0:NEES_DIM]
+    sim.disconnect()
+
+    R_true = Rotation.from_quat(quat_true).as_matrix()
+    xi = left_invariant_error(R_est, v_est, p_est, R_true, v_true, p_true)
+    nees = np.einsum('ni,ni->n', xi, np.linalg.solve(P, xi[:, :, np.newaxis])[:, :, 0])
+    nees_lower, nees_upper = chi2.ppf([0.025, 0.975], NEES_DIM)
+    elapsed_time = time.perf_counter() - start_time
+    return {'run': run['run'], 'seed_index': run['seed_index'], 'noise_scale': run['noise_scale'],
+            'num_steps': num_steps,
+            'position_rmse': float(np.sqrt(np.mean(np.sum((p_est-p_true)**2, axis=1)))),
+            'orientation_rmse': float(np.sqrt(np.mean(np.sum(xi[:, 0:3]**2, axis=1)))),
+            'velocity_rmse': float(np.sqrt(np.mean(np.sum((v_est-v_true)**2, axis=1)))),
+            'mean_nees': float(np.mean(nees)),
+            'nees_in_bounds': float(np.mean((nees >= nees_lower) & (nees <= nees_upper))),
+            'elapsed_time': elapsed_time,
+            'steps_per_second': num_steps / elapsed_time,
+            'real_time_factor': num_steps * time_step / elapsed_time,
+            'update_time': update_time / num_steps}
+
+
+def aggregate(results):
+    """Aggregates the metrics of the runs of each noise configuration."""
+    metrics = ['position_rmse', 'orientation_rmse', 'velocity_rmse', 'mean_nees',
+               'nees_in_bounds', 'steps_per_second', 'real_time_factor', 'update_time']
+    summary = {}
+    for noise_scale in sorted(set(e['noise_scale'] for e in results)):
+        runs = [e for e in results if e['noise_scale'] == noise_scale]
+        summary[str(noise_scale)] = {'num_runs': len(runs)}
+        for metric in metrics:
+            values = np.array([e[metric] for e in runs])
+            summary[str(noise_scale)][metric] = {'mean': float(np.mean(values)), 'std': float(np.std(values)),
+                                                 'min': float(np.min(values)), 'max': float(np.max(values))}
+    return summary
+
+
+def run_monte_carlo(runs, num_processes=None):
+    """Runs the configurations over a process pool and returns the results
+    sorted by the run index and the total wall-clock time."""
+    start_time = time.perf_counter()
+    if num_processes == 1:
+        results = [run_single(run) for run in runs]
+    else:
+        with multiprocessing.get_context('spawn').Pool(processes=num_processes) as pool:
+            results = list(pool.imap_unordered(run_single, runs, chunksize=1))
+    results.sort(key=lambda e: e['run'])
+    return results, time.perf_counter() - start_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte Carlo evaluation of LeggedStateEstimator on the A1 simulator.')
+    parser.add_argument('--num-seeds', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0, help='base seed')
+    parser.add_argument('--noise-scales', type=float, nargs='+', default=[1.0],
+                        help='scales of the nominal sensor noise')
+    parser.add_argument('--duration', type=float, default=20.0, help='simulated time of each run [s]')
+    parser.add_argument('--time-step', type=float, default=TIME_STEP)
+    parser.add_argument('--urdf', default=URDF_PATH)
+    parser.add_argument('--jobs', type=int, default=None, help='number of processes (default: all cores)')
+    parser.add_argument('--run', type=int, default=None, help='reproduces only the run of this index')
+    parser.add_argument('--json', default=None, help='path of the results in JSON')
+    args = parser.parse_args()
+
+    runs = make_runs(args.seed, args.num_seeds, args.noise_scales, args.duration,
+                     time_step=args.time_step, urdf_path=args.urdf)
+    if args.run is not None:
+        runs = [runs[args.run]]
+    results, elapsed_time = run_monte_carlo(runs, args.jobs)
+    summary = aggregate(results)
+    for e in results:
+        print('run {run}: noise scale {noise_scale}, seed {seed_index}: position RMSE {position_rmse:.4f} m, '
+              'orientation RMSE {orientation_rmse:.4f} rad, velocity RMSE {velocity_rmse:.4f} m/s, '
+              'mean NEES {mean_nees:.2f}, {steps_per_second:.0f} steps/s'.format(**e))
+    for noise_scale, e in summary.items():
+        print('noise scale {}: {} runs, position RMSE {:.4f} m, orientation RMSE {:.4f} rad, '
+              'velocity RMSE {:.4f} m/s, mean NEES {:.2f} (ideal {}), NEES in 95% bounds {:.2f}'.format(
+              noise_scale, e['num_runs'], e['position_rmse']['mean'], e['orientation_rmse']['mean'],
+              e['velocity_rmse']['mean'], e['mean_nees']['mean'], NEES_DIM, e['nees_in_bounds']['mean']))
+    total_steps = sum(e['num_steps'] for e in results)
+    print('{} runs in {:.1f} s: {:.0f} steps/s in total'.format(len(results), elapsed_time, total_steps/elapsed_time))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': results, 'summary': summary, 'elapsed_time': elapsed_time,
+                       'steps_per_second': total_steps/elapsed_time}, f, indent=2)
@@ -2,7 +2,7 @@ import a1_simulator
 import numpy as np
 import legged_state_estimator
 from scipy.spatial.transform import Rotation
-import matplotlib.pyplot as plt
+import telemetry_plotter
 import mpc_factory 
 import robotoc
 
@@ -46,65 +46,13 @@ robot = mpc_factory.create_robot()
 mpc, planner = mpc_factory.create_mpc_trot()
 # mpc, planner = mpc_factory.create_mpc_jump()
 
-base_pos_true = []
-base_quat_true = []
-base_lin_vel_true = []
-base_ang_vel_true = []
-base_pos_est = []
-base_quat_est = []
-base_lin_vel_est = []
-base_ang_vel_est = []
-
 if PLOT:
-    plt.ion()
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    ax_pos, ax_quat, ax_lin_vel, ax_ang_vel = axes[0][0], axes[0][1], axes[1][0], axes[1][1],
-    PLT_WINDOW_SIZE = 200
-
-    line_pos_x_est, = ax_pos.plot([0], [0], linestyle='solid', color='blue', label=r'$x$'+' (est)')
-    line_pos_x_true,  = ax_pos.plot([0], [0], linestyle='dashed', color='blue', label=r'$x$'+' (true)')
-    line_pos_y_est, = ax_pos.plot([0], [0], linestyle='solid', color='red', label=r'$y$'+' (est)')
-    line_pos_y_true,  = ax_pos.plot([0], [0], linestyle='dashed', color='red', label=r'$y$'+' (true)')
-    line_pos_z_est, = ax_pos.plot([0], [0], linestyle='solid', color='green', label=r'$z$'+' (est)')
-    line_pos_z_true,  = ax_pos.plot([0], [0], linestyle='dashed', color='green', label=r'$z$'+' (true)')
-
-    line_quat_x_est,  = ax_quat.plot([0], [0], linestyle='solid', color='blue', label=r'$q_x$'+' (est)')
-    line_quat_x_true, = ax_quat.plot([0], [0], linestyle='dashed', color='blue', label=r'$q_x$'+' (true)')
-    line_quat_y_est,  = ax_quat.plot([0], [0], linestyle='solid', color='red', label=r'$q_y$'+' (est)')
-    line_quat_y_true, = ax_quat.plot([0], [0], linestyle='dashed', color='red', label=r'$q_y$'+' (true)')
-    line_quat_z_est,  = ax_quat.plot([0], [0], linestyle='solid', color='green', label=r'$q_z$'+' (est)')
-    line_quat_z_true, = ax_quat.plot([0], [0], linestyle='dashed', color='green', label=r'$q_z$'+' (true)')
-    line_quat_w_est,  = ax_quat.plot([0], [0], linestyle='solid', color='yellow', label=r'$q_w$'+' (est)')
-    line_quat_w_true, = ax_quat.plot([0], [0], linestyle='dashed', color='yellow', label=r'$q_w$'+' (true)')
-
-    line_lin_vel_x_est,  = ax_lin_vel.plot([0], [0], linestyle='solid', color='blue', label=r'$v_x$'+' (est)')
-    line_lin_vel_x_true, = ax_lin_vel.plot([0], [0], linestyle='dashed', color='blue', label=r'$v_x$'+' (true)')
-    line_lin_vel_y_est,  = ax_lin_vel.plot([0], [0], linestyle='solid', color='red', label=r'$v_y$'+' (est)')
-    line_lin_vel_y_true, = ax_lin_vel.plot([0], [0], linestyle='dashed', color='red', label=r'$v_y$'+' (true)')
-    line_lin_vel_z_est,  = ax_lin_vel.plot([0], [0], linestyle='solid', color='green', label=r'$v_z$'+' (est)')
-    line_lin_vel_z_true, = ax_lin_vel.plot([0], [0], linestyle='dashed', color='green', label=r'$v_z$'+' (true)')
-
-    line_ang_vel_x_est,  = ax_ang_vel.plot([0], [0], linestyle='solid', color='blue', label=r'$w_x$'+' (est)')
-    line_ang_vel_x_true, = ax_ang_vel.plot([0], [0], linestyle='dashed', color='blue', label=r'$w_x$'+' (true)')
-    line_ang_vel_y_est,  = ax_ang_vel.plot([0], [0], linestyle='solid', color='red', label=r'$w_y$'+' (est)')
-    line_ang_vel_y_true, = ax_ang_vel.plot([0], [0], linestyle='dashed', color='red', label=r'$w_x$'+' (true)')
-    line_ang_vel_z_est,  = ax_ang_vel.plot([0], [0], linestyle='solid', color='green', label=r'$w_z$'+' (est)')
-    line_ang_vel_z_true, = ax_ang_vel.plot([0], [0], linestyle='dashed', color='green', label=r'$w_x$'+' (true)')
-
-    ax_pos.set_title('Base position [m]')
-    ax_quat.set_title('Base orientation (quaternion)')
-    ax_lin_vel.set_title('Base linear velocity [m/s]')
-    ax_ang_vel.set_title('Base angular velocity [rad/s]')
-
-    ax_pos.set_ylim([-0.5, 0.5])
-    ax_quat.set_ylim([-0.5, 1.2])
-    ax_lin_vel.set_ylim([-5, 5])
-    ax_ang_vel.set_ylim([-2, 2])
-
-    ax_pos.legend(ncol=3)
-    ax_quat.legend(ncol=4)
-    ax_lin_vel.legend(ncol=3)
-    ax_ang_vel.legend(ncol=3)
+    panels = [('Base position [m]', [r'$x$', r'$y$', r'$z$'], (-0.5, 0.5)),
+              ('Base orientation (quaternion)', [r'$q_x$', r'$q_y$', r'$q_z$', r'$q_w$'], (-0.5, 1.2)),
+              ('Base linear velocity [m/s]', [r'$v_x$', r'$v_y$', r'$v_z$'], (-5, 5)),
+              ('Base angular velocity [rad/s]', [r'$w_x$', r'$w_y$', r'$w_z$'], (-2, 2))]
+    plotter = telemetry_plotter.TelemetryPlotter(panels, TIME_STEP, window_size=200, frame_rate=20)
+    plotter.start()
 
 t = 0
 for i in range(30000):
@@ -119,16 +67,15 @@ for i in range(30000):
     qJ, dqJ, tauJ = sim.get_joint_state()
     estimator.update(imu_gyro_raw=imu_gyro_raw, imu_lin_accel_raw=imu_lin_acc_raw, 
                      qJ=qJ, dqJ=dqJ, tauJ=tauJ)
-    base_pos_est.append(estimator.base_position_estimate.copy())
-    base_quat_est.append(estimator.base_quaternion_estimate.copy())
-    base_lin_vel_est.append(estimator.base_linear_velocity_estimate_local.copy())
-    base_ang_vel_est.append(estimator.base_angular_velocity_estimate_local.copy())
     # true state
     base_pos, base_quat, base_lin_vel, base_ang_vel = sim.get_base_state(coordinate='local')
-    base_pos_true.append(base_pos.copy())
-    base_quat_true.append(base_quat.copy())
-    base_lin_vel_true.append(base_lin_vel.copy())
-    base_ang_vel_true.append(base_ang_vel.copy())
+    if PLOT:
+        estimate = np.concatenate([estimator.base_position_estimate, 
+                                   estimator.base_quaternion_estimate, 
+                                   estimator.base_linear_velocity_estimate_local, 
+                                   estimator.base_angular_velocity_estimate_local])
+        ground_truth = np.concatenate([base_pos, base_quat, base_lin_vel, base_ang_vel])
+        plotter.push(t, estimate, ground_truth)
 
     # print('t: ', t)
     # print('contact probability: ', estimator.contact_probability)
@@ -156,78 +103,6 @@ for i in range(30000):
     sim.apply_torque_command(mpc.get_initial_control_input().copy())
     t = t + TIME_STEP
 
-    if PLOT:
-        if len(base_pos_est) > PLT_WINDOW_SIZE:
-            base_pos_true.pop(0)
-            base_quat_true.pop(0) 
-            base_lin_vel_true.pop(0) 
-            base_ang_vel_true.pop(0) 
-            base_pos_est.pop(0) 
-            base_quat_est.pop(0) 
-            base_lin_vel_est.pop(0) 
-            base_ang_vel_est.pop(0) 
-
-        ndata = len(base_pos_est)
-        tstart = (i-ndata) * TIME_STEP
-        tend = i * TIME_STEP
-        times = np.linspace(tstart, tend, ndata)
-        line_pos_x_true.set_xdata(times)
-        line_pos_y_true.set_xdata(times)
-        line_pos_z_true.set_xdata(times)
-        line_pos_x_est.set_xdata(times)
-        line_pos_y_est.set_xdata(times)
-        line_pos_z_est.set_xdata(times)
-        line_quat_x_true.set_xdata(times)
-        line_quat_y_true.set_xdata(times)
-        line_quat_z_true.set_xdata(times)
-        line_quat_w_true.set_xdata(times)
-        line_quat_x_est.set_xdata(times)
-        line_quat_y_est.set_xdata(times)
-        line_quat_z_est.set_xdata(times)
-        line_quat_w_est.set_xdata(times)
-        line_lin_vel_x_true.set_xdata(times)
-        line_lin_vel_y_true.set_xdata(times)
-        line_lin_vel_z_true.set_xdata(times)
-        line_lin_vel_x_est.set_xdata(times)
-        line_lin_vel_y_est.set_xdata(times)
-        line_lin_vel_z_est.set_xdata(times)
-        line_ang_vel_x_true.set_xdata(times)
-        line_ang_vel_y_true.set_xdata(times)
-        line_ang_vel_z_true.set_xdata(times)
-        line_ang_vel_x_est.set_xdata(times)
-        line_ang_vel_y_est.set_xdata(times)
-        line_ang_vel_z_est.set_xdata(times)
-        line_pos_x_true.set_ydata(np.array(base_pos_true).T[0])
-        line_pos_y_true.set_ydata(np.array(base_pos_true).T[1])
-        line_pos_z_true.set_ydata(np.array(base_pos_true).T[2])
-        line_pos_x_est.set_ydata(np.array(base_pos_est).T[0])
-        line_pos_y_est.set_ydata(np.array(base_pos_est).T[1])
-        line_pos_z_est.set_ydata(np.array(base_pos_est).T[2])
-        line_quat_x_true.set_ydata(np.array(base_quat_true).T[0])
-        line_quat_y_true.set_ydata(np.array(base_quat_true).T[1])
-        line_quat_z_true.set_ydata(np.array(base_quat_true).T[2])
-        line_quat_w_true.set_ydata(np.array(base_quat_true).T[3])
-        line_quat_x_est.set_ydata(np.array(base_quat_est).T[0])
-        line_quat_y_est.set_ydata(np.array(base_quat_est).T[1])
-        line_quat_z_est.set_ydata(np.array(base_quat_est).T[2])
-        line_quat_w_est.set_ydata(np.array(base_quat_est).T[3])
-        line_lin_vel_x_true.set_ydata(np.array(base_lin_vel_true).T[0])
-        line_lin_vel_y_true.set_ydata(np.array(base_lin_vel_true).T[1])
-        line_lin_vel_z_true.set_ydata(np.array(base_lin_vel_true).T[2])
-        line_lin_vel_x_est.set_ydata(np.array(base_lin_vel_est).T[0])
-        line_lin_vel_y_est.set_ydata(np.array(base_lin_vel_est).T[1])
-        line_lin_vel_z_est.set_ydata(np.array(base_lin_vel_est).T[2])
-        line_ang_vel_x_true.set_ydata(np.array(base_ang_vel_true).T[0])
-        line_ang_vel_y_true.set_ydata(np.array(base_ang_vel_true).T[1])
-        line_ang_vel_z_true.set_ydata(np.array(base_ang_vel_true).T[2])
-        line_ang_vel_x_est.set_ydata(np.array(base_ang_vel_est).T[0])
-        line_ang_vel_y_est.set_ydata(np.array(base_ang_vel_est).T[1])
-        line_ang_vel_z_est.set_ydata(np.array(base_ang_vel_est).T[2])
-        ax_pos.set_xlim([tstart, tend])
-        ax_quat.set_xlim([tstart, tend])
-        ax_lin_vel.set_xlim([tstart, tend])
-        ax_ang_vel.set_xlim([tstart, tend])
-        fig.canvas.draw()
-        fig.canvas.flush_events()
-
+if PLOT:
+    plotter.close()
 sim.disconnect()
\ No newline at end of file
@@ -2,7 +2,6 @@ import pybullet
 import pybullet_data
 import numpy as np
 import time
-from scipy.spatial.transform import Rotation
 
 
 class ContactInfo(object):
@@ -33,6 +32,25 @@ class ContactInfo(object):
                 self.normal_force = np.array(e[9])
                 self.force = self.normal_force * self.normal
 
+class NoiseBuffer(object):
+    """Draws Gaussian noise in blocks of rows so that the random generator is
+    called once per block instead of once per sample."""
+    def __init__(self, rng, stddev, block_size=1000):
+        self.rng = rng
+        self.stddev = np.array(stddev, dtype=float)
+        self.block_size = block_size
+        self.block = np.zeros((0, self.stddev.size))
+        self.index = 0
+
+    def next(self):
+        if self.index >= self.block.shape[0]:
+            self.block = self.rng.standard_normal((self.block_size, self.stddev.size)) * self.stddev
+            self.index = 0
+        row = self.block[self.index]
+        self.index += 1
+        return row
+
+
 # imu_gyro_noise: 0.01 
 # imu_lin_accel_noise: 0.1
 # qJ_noise: ~= 0
@@ -43,7 +61,8 @@ class A1Simulator:
                  imu_gyro_noise=0.01, imu_lin_accel_noise=0.1,
                  imu_gyro_bias_noise=0.00001,
                  imu_lin_accel_bias_noise=0.0001,
-                 qJ_noise=0.001, dqJ_noise=0.1, tauJ_noise=0.1):
+                 qJ_noise=0.001, dqJ_noise=0.1, tauJ_noise=0.1,
+                 headless=False, seed=None, noise_block_size=1000):
         self.urdf_path = urdf_path
         self.time_step = time_step
         self.imu_gyro_noise = imu_gyro_noise
@@ -78,6 +97,19 @@ class A1Simulator:
         self.contact_info_LH = ContactInfo(contact_name='LH', link_id=21) 
         self.contact_info_RF = ContactInfo(contact_name='RF', link_id=6) 
         self.contact_info_RH = ContactInfo(contact_name='RH', link_id=16) 
+        # pybullet joint ids in the order of qJ (FL, FR, RL, RR)
+        self.joint_ids = [7, 9, 10, 2, 4, 5, 17, 19, 20, 12, 14, 15]
+        # headless: DIRECT mode without sleeping in step_simulation(), i.e., 
+        # faster than real time.
+        self.headless = headless
+        self.rng = np.random.default_rng(seed)
+        self.imu_noise = NoiseBuffer(self.rng, 
+                                     [imu_gyro_noise]*3 + [imu_lin_accel_noise]*3
+                                     + [imu_gyro_bias_noise]*3 + [imu_lin_accel_bias_noise]*3,
+                                     noise_block_size)
+        self.joint_noise = NoiseBuffer(self.rng, 
+                                       [qJ_noise]*12 + [dqJ_noise]*12 + [tauJ_noise]*12,
+                                       noise_block_size)
 
     def set_urdf(self, urdf_path):
         self.urdf_path = urdf_path
@@ -88,6 +120,8 @@ class A1Simulator:
         self.camera_yaw = camera_yaw
         self.camera_pitch = camera_pitch
         self.camera_target_pos = camera_target_pos
+        if self.headless:
+            return
         pybullet.resetDebugVisualizerCamera(self.camera_distance,
                                             self.camera_yaw,
                                             self.camera_pitch,
@@ -96,7 +130,7 @@ class A1Simulator:
     def init(self, q=None):
         if q is not None:
             self.q = q
-        pybullet.connect(pybullet.GUI)
+        pybullet.connect(pybullet.DIRECT if self.headless else pybullet.GUI)
         pybullet.setGravity(0, 0, -9.81)
         pybullet.setTimeStep(self.time_step)
         pybullet.setAdditionalSearchPath(pybullet_data.getDataPath())
@@ -105,7 +139,8 @@ class A1Simulator:
                                        useFixedBase=False, 
                                        useMaximalCoordinates=False)
         self.init_state(self.q[0:3], self.q[3:7], self.q[7:19])
-        pybullet.configureDebugVisualizer(pybullet.COV_ENABLE_GUI, 0)
+        if not self.headless:
+            pybullet.configureDebugVisualizer(pybullet.COV_ENABLE_GUI, 0)
 
     def disconnect(self):
         pybullet.disconnect()
@@ -117,7 +152,8 @@ class A1Simulator:
         self.contact_info_LH.set_from_pybullet(contacts)
         self.contact_info_RF.set_from_pybullet(contacts)
         self.contact_info_RH.set_from_pybullet(contacts)
-        time.sleep(self.time_step)
+        if not self.headless:
+            time.sleep(self.time_step)
 
     def print_joint_info(self):
         pybullet.connect(pybullet.DIRECT)
@@ -147,132 +183,54 @@ class A1Simulator:
     def get_imu_state(self):
         base_pos, base_orn, base_lin_vel_world, base_ang_vel_world = self.get_base_state('world')
         base_lin_acc_world = (base_lin_vel_world - self.base_lin_vel_world_prev) / self.time_step + np.array([0, 0, 9.81])
-        R = Rotation.from_quat(base_orn).as_matrix()
+        R = np.reshape(pybullet.getMatrixFromQuaternion(base_orn), [3, 3]) 
         base_lin_acc_local = R.T @ base_lin_acc_world
+        base_ang_vel_local = R.T @ base_ang_vel_world
         self.base_lin_vel_world_prev = base_lin_vel_world.copy()
-        base_pos, base_orn, base_lin_vel_local, base_ang_vel_local = self.get_base_state('local')
-        base_ang_vel_noise = np.random.normal(0, self.imu_gyro_noise, 3) 
-        base_lin_acc_noise = np.random.normal(0, self.imu_lin_accel_noise, 3) 
-        self.imu_gyro_bias  = self.imu_gyro_bias + np.random.normal(0, self.imu_gyro_bias_noise, 3)
-        self.imu_accel_bias = self.imu_accel_bias + np.random.normal(0, self.imu_lin_accel_bias_noise, 3)
-        base_ang_vel_local = base_ang_vel_local + base_ang_vel_noise + self.imu_gyro_bias
-        base_lin_acc_local = base_lin_acc_local + base_lin_acc_noise + self.imu_accel_bias
+        noise = self.imu_noise.next()
+        self.imu_gyro_bias  = self.imu_gyro_bias + noise[6:9]
+        self.imu_accel_bias = self.imu_accel_bias + noise[9:12]
+        base_ang_vel_local = base_ang_vel_local + noise[0:3] + self.imu_gyro_bias
+        base_lin_acc_local = base_lin_acc_local + noise[3:6] + self.imu_accel_bias
         return base_ang_vel_local.copy(), base_lin_acc_local.copy()
 
     def get_joint_state(self, noise=True):
-        # joint angles
-        qJ = np.zeros(12)
-        # FL
-        qJ[0] = pybullet.getJointState(self.robot, 7)[0]
-        qJ[1] = pybullet.getJointState(self.robot, 9)[0]
-        qJ[2] = pybullet.getJointState(self.robot, 10)[0]
-        # FR
-        qJ[3] = pybullet.getJointState(self.robot, 2)[0]
-        qJ[4] = pybullet.getJointState(self.robot, 4)[0]
-        qJ[5] = pybullet.getJointState(self.robot, 5)[0]
-        # RF
-        qJ[6] = pybullet.getJointState(self.robot, 17)[0]
-        qJ[7] = pybullet.getJointState(self.robot, 19)[0]
-        qJ[8] = pybullet.getJointState(self.robot, 20)[0]
-        # RH
-        qJ[9]  = pybullet.getJointState(self.robot, 12)[0]
-        qJ[10] = pybullet.getJointState(self.robot, 14)[0]
-        qJ[11] = pybullet.getJointState(self.robot, 15)[0]
-        # joint velocities
-        dqJ = np.zeros(12)
-        # FL
-        dqJ[0] = pybullet.getJointState(self.robot, 7)[1]
-        dqJ[1] = pybullet.getJointState(self.robot, 9)[1]
-        dqJ[2] = pybullet.getJointState(self.robot, 10)[1]
-        # FR
-        dqJ[3] = pybullet.getJointState(self.robot, 2)[1]
-        dqJ[4] = pybullet.getJointState(self.robot, 4)[1]
-        dqJ[5] = pybullet.getJointState(self.robot, 5)[1]
-        # RF
-        dqJ[6] = pybullet.getJointState(self.robot, 17)[1]
-        dqJ[7] = pybullet.getJointState(self.robot, 19)[1]
-        dqJ[8] = pybullet.getJointState(self.robot, 20)[1]
-        # RH
-        dqJ[9]  = pybullet.getJointState(self.robot, 12)[1]
-        dqJ[10] = pybullet.getJointState(self.robot, 14)[1]
-        dqJ[11] = pybullet.getJointState(self.robot, 15)[1]
-        # joint torques
-        tauJ = np.zeros(12)
-        tauJ[0] = pybullet.getJointState(self.robot, 7)[3] 
-        tauJ[1] = pybullet.getJointState(self.robot, 9)[3] 
-        tauJ[2] = pybullet.getJointState(self.robot, 10)[3] 
-        # FR
-        tauJ[3] = pybullet.getJointState(self.robot, 2)[3] 
-        tauJ[4] = pybullet.getJointState(self.robot, 4)[3] 
-        tauJ[5] = pybullet.getJointState(self.robot, 5)[3] 
-        # RF
-        tauJ[6] = pybullet.getJointState(self.robot, 17)[3] 
-        tauJ[7] = pybullet.getJointState(self.robot, 19)[3] 
-        tauJ[8] = pybullet.getJointState(self.robot, 20)[3] 
-        # RH
-        tauJ[9]  = pybullet.getJointState(self.robot, 12)[3] 
-        tauJ[10] = pybullet.getJointState(self.robot, 14)[3] 
-        tauJ[11] = pybullet.getJointState(self.robot, 15)[3] 
+        # joint angles, velocities, and torques of all the joints in one query
+        joint_states = pybullet.getJointStates(self.robot, self.joint_ids)
+        qJ = np.array([e[0] for e in joint_states])
+        dqJ = np.array([e[1] for e in joint_states])
+        tauJ = np.array([e[3] for e in joint_states])
         if self.torque_control_mode:
             tauJ = self.tauJ.copy()
         if noise:
-            qJ_noise = np.random.normal(0, self.qJ_noise, 12) 
-            dqJ_noise = np.random.normal(0, self.dqJ_noise, 12) 
-            tauJ_noise = np.random.normal(0, self.tauJ_noise, 12) 
-            qJ = qJ + qJ_noise
-            dqJ = dqJ + dqJ_noise
-            tauJ = tauJ + tauJ_noise
+            joint_noise = self.joint_noise.next()
+            qJ = qJ + joint_noise[0:12]
+            dqJ = dqJ + joint_noise[12:24]
+            tauJ = tauJ + joint_noise[24:36]
         return qJ, dqJ, tauJ
 
     def apply_torque_command(self, tauJ):
+        if not self.torque_control_mode:
+            # turn off position and velocity controls
+            zeros = np.zeros(12)
+            pybullet.setJointMotorControlArray(self.robot, self.joint_ids, 
+                                               controlMode=pybullet.VELOCITY_CONTROL, forces=zeros)
+            pybullet.setJointMotorControlArray(self.robot, self.joint_ids, 
+                                               controlMode=pybullet.POSITION_CONTROL, forces=zeros)
         self.torque_control_mode = True
         self.tauJ = tauJ.copy()
-        # turn off position and velocity controls
-        joints = [7, 9, 10, 2, 4, 5, 17, 19, 20, 12, 14, 15]
-        for e in joints:
-            pybullet.setJointMotorControl2(self.robot, e, controlMode=pybullet.VELOCITY_CONTROL, force=0.)
-            pybullet.setJointMotorControl2(self.robot, e, controlMode=pybullet.POSITION_CONTROL, force=0.)
         # apply torque control
-        mode = pybullet.TORQUE_CONTROL
-        # FL
-        pybullet.setJointMotorControl2(self.robot, 7, controlMode=mode, force=tauJ[0])
-        pybullet.setJointMotorControl2(self.robot, 9, controlMode=mode, force=tauJ[1])
-        pybullet.setJointMotorControl2(self.robot, 10, controlMode=mode, force=tauJ[2])
-        # FR 
-        pybullet.setJointMotorControl2(self.robot, 2, controlMode=mode, force=tauJ[3])
-        pybullet.setJointMotorControl2(self.robot, 4, controlMode=mode, force=tauJ[4])
-        pybullet.setJointMotorControl2(self.robot, 5, controlMode=mode, force=tauJ[5])
-        # RF
-        pybullet.setJointMotorControl2(self.robot, 17, controlMode=mode, force=tauJ[6])
-        pybullet.setJointMotorControl2(self.robot, 19, controlMode=mode, force=tauJ[7])
-        pybullet.setJointMotorControl2(self.robot, 20, controlMode=mode, force=tauJ[8])
-        # RH
-        pybullet.setJointMotorControl2(self.robot, 12, controlMode=mode, force=tauJ[9])
-        pybullet.setJointMotorControl2(self.robot, 14, controlMode=mode, force=tauJ[10])
-        pybullet.setJointMotorControl2(self.robot, 15, controlMode=mode, force=tauJ[11])
+        pybullet.setJointMotorControlArray(self.robot, self.joint_ids, 
+                                           controlMode=pybullet.TORQUE_CONTROL, forces=tauJ)
 
     def apply_position_command(self, qJ):
         self.torque_control_mode = False
-        mode = pybullet.POSITION_CONTROL
         maxForce = 30
         Kp = 0.1
-        Kd = 0.0001
-        # FL
-        pybullet.setJointMotorControl2(self.robot, 7, controlMode=mode, targetPosition=qJ[0], positionGain=Kp, force=maxForce)
-        pybullet.setJointMotorControl2(self.robot, 9, controlMode=mode, targetPosition=qJ[1], positionGain=Kp, force=maxForce)
-        pybullet.setJointMotorControl2(self.robot, 10, controlMode=mode, targetPosition=qJ[2], positionGain=Kp, force=maxForce)
-        # FR 
-        pybullet.setJointMotorControl2(self.robot, 2, controlMode=mode, targetPosition=qJ[3], positionGain=Kp, force=maxForce)
-        pybullet.setJointMotorControl2(self.robot, 4, controlMode=mode, targetPosition=qJ[4], positionGain=Kp, force=maxForce)
-        pybullet.setJointMotorControl2(self.robot, 5, controlMode=mode, targetPosition=qJ[5], positionGain=Kp, force=maxForce)
-        # RF
-        pybullet.setJointMotorControl2(self.robot, 17, controlMode=mode, targetPosition=qJ[6], positionGain=Kp, force=maxForce)
-        pybullet.setJointMotorControl2(self.robot, 19, controlMode=mode, targetPosition=qJ[7], positionGain=Kp, force=maxForce)
-        pybullet.setJointMotorControl2(self.robot, 20, controlMode=mode, targetPosition=qJ[8], positionGain=Kp, force=maxForce)
-        # RH
-        pybullet.setJointMotorControl2(self.robot, 12, controlMode=mode, targetPosition=qJ[9], positionGain=Kp, force=maxForce)
-        pybullet.setJointMotorControl2(self.robot, 14, controlMode=mode, targetPosition=qJ[10], positionGain=Kp, force=maxForce)
-        pybullet.setJointMotorControl2(self.robot, 15, controlMode=mode, targetPosition=qJ[11], positionGain=Kp, force=maxForce)
+        pybullet.setJointMotorControlArray(self.robot, self.joint_ids, 
+                                           controlMode=pybullet.POSITION_CONTROL, 
+                                           targetPositions=qJ, positionGains=[Kp]*12, 
+                                           forces=[maxForce]*12)
 
     def init_state(self, base_pos, base_orn, qJ):
         # Base
@@ -0,0 +1,221 @@
+import numpy as np
+from multiprocessing import shared_memory
+import json
+import subprocess
+import sys
+import time
+
+
+# Live telemetry of the estimate and the ground truth for the example loops.
+# The control loop writes each sample into a preallocated ring buffer in
+# shared memory, which neither allocates nor blocks. A separate process reads
+# the latest window, decimates it, and redraws the lines with blitting at a
+# fixed frame rate, so that plotting does not stretch the control loop. The
+# render process runs this file as a script, so that the example scripts need
+# no __main__ guard.
+# Usage:
+#   plotter = TelemetryPlotter(BASE_STATE_PANELS, TIME_STEP)
+#   plotter.start()
+#   for i in range(num_steps):
+#       ...
+#       plotter.push(t, estimate, ground_truth)
+#   plotter.close()
+
+# Panels of the base state: title, labels of the components, and y limits.
+# The estimate and the ground truth pushed to TelemetryPlotter are the
+# components of all the panels stacked, i.e., base position (3), base
+# quaternion (x, y, z, w), base linear velocity (3), and base angular
+# velocity (3).
+BASE_STATE_PANELS = [('Base position [m]', [r'$x$', r'$y$', r'$z$'], (-0.5, 0.5)),
+                     ('Base orientation (quaternion)', [r'$q_x$', r'$q_y$', r'$q_z$', r'$q_w$'], (-0.5, 1.2)),
+                     ('Base linear velocity [m/s]', [r'$v_x$', r'$v_y$', r'$v_z$'], (-2, 2)),
+                     ('Base angular velocity [rad/s]', [r'$w_x$', r'$w_y$', r'$w_z$'], (-5, 5))]
+COLORS = ['blue', 'red', 'green', 'yellow']
+
+
+class TelemetryRingBuffer(object):
+    """Ring buffer of the samples in shared memory. Each row is the time
+    followed by the channels. There is a single writer. The header holds the
+    number of the written samples and a stop flag."""
+    HEADER_SIZE = 2
+
+    def __init__(self, capacity, num_channels, name=None):
+        self.capacity = capacity
+        self.num_channels = num_channels
+        size = 8 * (self.HEADER_SIZE + capacity * (num_channels+1))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = attach_shared_memory(name)
+            self.owner = False
+        self.header = np.ndarray((self.HEADER_SIZE,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((capacity, num_channels+1), dtype=np.float64, buffer=self.shm.buf,
+                               offset=8*self.HEADER_SIZE)
+        if self.owner:
+            self.header[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def push(self, t, *channels):
+        """Writes a sample. channels are the arrays of the channels, which are
+        stored contiguously."""
+        count = self.header[0]
+        row = self.data[count % self.capacity]
+        row[0] = t
+        begin = 1
+        for e in channels:
+            end = begin + np.size(e)
+            row[begin:end] = e
+            begin = end
+        self.header[0] = count + 1
+
+    def latest(self, window_size, out):
+        """Copies up to window_size latest samples into out, which has at
+        least window_size rows, and returns the number of the copied samples.
+        The samples overwritten by the writer during the copy are dropped."""
+        count = int(self.header[0])
+        num = min(window_size, count, self.capacity)
+        begin = count - num
+        out[:num] = self.data[np.arange(begin, count) % self.capacity]
+        # Drop the rows that the writer may have overwritten while copying
+        overwritten = int(self.header[0]) - self.capacity - begin + 1
+        if overwritten > 0:
+            num = max(num - overwritten, 0)
+            out[:num] = out[overwritten:overwritten+num]
+        return num
+
+    def stop(self):
+        self.header[1] = 1
+
+    def stopped(self):
+        return self.header[1] != 0
+
+    def close(self):
+        del self.header
+        del self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def attach_shared_memory(name):
+    """Attaches an existing shared memory segment without registering it in
+    the resource tracker, because the segment is unlinked by its owner."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def render_loop(name, panels, capacity, time_step, window_size, frame_rate, max_points):
+    """Render process. Redraws the latest window_size samples at frame_rate
+    with at most max_points points per line until the ring buffer is stopped.
+    The time axis is relative to the latest sample so that the axes are
+    static and only the lines are redrawn."""
+    import matplotlib.pyplot as plt
+    num_components = sum(len(e[1]) for e in panels)
+    buffer = TelemetryRingBuffer(capacity, 2*num_components, name)
+    window = np.zeros((window_size, 2*num_components+1))
+
+    plt.ion()
+    num_rows = (len(panels)+1) // 2
+    fig, axes = plt.subplots(num_rows, 2, figsize=(14, 5*num_rows), squeeze=False)
+    axes = axes.flatten()
+    lines_est = []
+    lines_true = []
+    for ax, (title, labels, ylim) in zip(axes, panels):
+        for label, color in zip(labels, COLORS):
+            line_est, = ax.plot([0], [0], linestyle='solid', color=color, label=label+' (est)', animated=True)
+            line_true, = ax.plot([0], [0], linestyle='dashed', color=color, label=label+' (true)', animated=True)
+            lines_est.append(line_est)
+            lines_true.append(line_true)
+        ax.set_title(title)
+        ax.set_xlim([-window_size*time_step, 0])
+        ax.set_ylim(ylim)
+        ax.legend(ncol=len(labels))
+    fig.canvas.draw()
+    plt.show(block=False)
+    backgrounds = [fig.canvas.copy_from_bbox(ax.bbox) for ax in axes]
+    figure_size = fig.canvas.get_width_height()
+
+    frame_period = 1.0 / frame_rate
+    next_frame_time = time.perf_counter()
+    while not buffer.stopped() and plt.fignum_exists(fig.number):
+        # Re-captures the backgrounds if the window was resized
+        if fig.canvas.get_width_height() != figure_size:
+            fig.canvas.draw()
+            backgrounds = [fig.canvas.copy_from_bbox(ax.bbox) for ax in axes]
+            figure_size = fig.canvas.get_width_height()
+        num = buffer.latest(window_size, window)
+        if num > 0:
+            stride = max(num // max_points, 1)
+            samples = window[num-1::-stride][::-1]
+            times = samples[:, 0] - samples[-1, 0]
+            for k, (line_est, line_true) in enumerate(zip(lines_est, lines_true)):
+                line_est.set_data(times, samples[:, 1+k])
+                line_true.set_data(times, samples[:, 1+num_components+k])
+            k = 0
+            for ax, background, (_, labels, _) in zip(axes, backgrounds, panels):
+                fig.canvas.restore_region(background)
+                for line in lines_est[k:k+len(labels)] + lines_true[k:k+len(labels)]:
+                    ax.draw_artist(line)
+                fig.canvas.blit(ax.bbox)
+                k += len(labels)
+        fig.canvas.flush_events()
+        next_frame_time += frame_period
+        sleep_time = next_frame_time - time.perf_counter()
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+        else:
+            next_frame_time = time.perf_counter()
+    buffer.close()
+    plt.close(fig)
+
+
+class TelemetryPlotter(object):
+    """Plots the estimate and the ground truth live in a separate process.
+    push() only writes into the shared ring buffer and never blocks on the
+    rendering."""
+    def __init__(self, panels, time_step, window_size=200, frame_rate=20.0, max_points=200):
+        self.panels = panels
+        self.time_step = time_step
+        self.window_size = window_size
+        self.frame_rate = frame_rate
+        self.max_points = max_points
+        self.num_components = sum(len(e[1]) for e in panels)
+        # Margin so that the latest window is rarely overwritten during a copy
+        self.buffer = TelemetryRingBuffer(2*window_size, 2*self.num_components)
+        self.process = None
+
+    def start(self):
+        args = {'name': self.buffer.name, 'panels': self.panels, 'capacity': self.buffer.capacity,
+                'time_step': self.time_step, 'window_size': self.window_size,
+                'frame_rate': self.frame_rate, 'max_points': self.max_points}
+        self.process = subprocess.Popen([sys.executable, __file__, json.dumps(args)])
+
+    def push(self, t, estimate, ground_truth):
+        self.buffer.push(t, estimate, ground_truth)
+
+    def close(self):
+        self.buffer.stop()
+        if self.process is not None:
+            self.process.wait()
+            self.process = None
+        self.buffer.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == '__main__':
+    render_loop(**json.loads(sys.argv[1]))
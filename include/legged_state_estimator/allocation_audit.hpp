@@ -0,0 +1,87 @@
+#ifndef LEGGED_STATE_ESTIMATOR_ALLOCATION_AUDIT_HPP_
+#define LEGGED_STATE_ESTIMATOR_ALLOCATION_AUDIT_HPP_
+
+#include <cstddef>
+
+
+namespace legged_state_estimator {
+
+///
+/// @enum AllocationAuditMode
+/// @brief Mode of AllocationAudit.
+/// - NoAllocationAudit: heap allocations are not audited.
+/// - CountAllocations: heap allocations are counted.
+/// - TrapAllocations: the process prints the backtrace and aborts at the
+/// first heap allocation.
+///
+enum AllocationAuditMode {
+  NoAllocationAudit,
+  CountAllocations,
+  TrapAllocations
+};
+
+
+///
+/// @class AllocationAudit
+/// @brief Audits the heap allocations in the current thread while the object
+/// is alive. Audits can be nested; the innermost audit is active.
+/// @note The allocations are only observed if the program includes
+/// "legged_state_estimator/allocation_audit_hooks.hpp" in exactly one
+/// translation unit, which interposes malloc() and its variants (glibc).
+/// Otherwise, hooksInstalled() is false and nothing is counted.
+///
+class AllocationAudit {
+public:
+  ///
+  /// @brief Starts auditing the heap allocations in the current thread.
+  /// @param[in] mode Audit mode. Default is AllocationAuditMode::CountAllocations.
+  ///
+  AllocationAudit(const AllocationAuditMode mode=CountAllocations);
+
+  ///
+  /// @brief Stops auditing and reactivates the enclosing audit if any.
+  ///
+  ~AllocationAudit();
+
+  AllocationAudit(const AllocationAudit&) = delete;
+  AllocationAudit& operator=(const AllocationAudit&) = delete;
+  AllocationAudit(AllocationAudit&&) = delete;
+  AllocationAudit& operator=(AllocationAudit&&) = delete;
+
+  ///
+  /// @return Number of the heap allocations counted by this audit.
+  ///
+  long numAllocations() const;
+
+  ///
+  /// @return Number of the bytes allocated during this audit.
+  ///
+  std::size_t numAllocatedBytes() const;
+
+  ///
+  /// @return true if the allocation hooks are installed in the program and
+  /// false if not.
+  ///
+  static bool hooksInstalled();
+
+  ///
+  /// @brief Called by the allocation hooks at the static initialization.
+  ///
+  static bool installHooks();
+
+  ///
+  /// @brief Called by the allocation hooks at each heap allocation.
+  /// @param[in] size Size of the allocation in bytes.
+  ///
+  static void onAllocation(const std::size_t size);
+
+private:
+  AllocationAuditMode mode_;
+  AllocationAudit* enclosing_audit_;
+  long num_allocations_;
+  std::size_t num_allocated_bytes_;
+};
+
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_ALLOCATION_AUDIT_HPP_
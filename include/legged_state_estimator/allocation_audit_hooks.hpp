@@ -0,0 +1,71 @@
+#ifndef LEGGED_STATE_ESTIMATOR_ALLOCATION_AUDIT_HOOKS_HPP_
+#define LEGGED_STATE_ESTIMATOR_ALLOCATION_AUDIT_HOOKS_HPP_
+
+///
+/// @file allocation_audit_hooks.hpp
+/// @brief Allocation hooks of AllocationAudit. Include this header in exactly
+/// one translation unit of the program, e.g., the file with main(). The hooks
+/// interpose malloc(), calloc(), realloc(), and the aligned variants, which
+/// also covers operator new and the allocations of Eigen, and forward them to
+/// glibc. Only intended for debug and test builds.
+///
+
+#include <cstddef>
+#include <cerrno>
+
+#include "legged_state_estimator/allocation_audit.hpp"
+
+
+extern "C" {
+
+void* __libc_malloc(std::size_t size);
+void* __libc_calloc(std::size_t num, std::size_t size);
+void* __libc_realloc(void* ptr, std::size_t size);
+void* __libc_memalign(std::size_t alignment, std::size_t size);
+
+void* malloc(std::size_t size) {
+  legged_state_estimator::AllocationAudit::onAllocation(size);
+  return __libc_malloc(size);
+}
+
+void* calloc(std::size_t num, std::size_t size) {
+  legged_state_estimator::AllocationAudit::onAllocation(num*size);
+  return __libc_calloc(num, size);
+}
+
+void* realloc(void* ptr, std::size_t size) {
+  legged_state_estimator::AllocationAudit::onAllocation(size);
+  return __libc_realloc(ptr, size);
+}
+
+void* memalign(std::size_t alignment, std::size_t size) {
+  legged_state_estimator::AllocationAudit::onAllocation(size);
+  return __libc_memalign(alignment, size);
+}
+
+void* aligned_alloc(std::size_t alignment, std::size_t size) {
+  legged_state_estimator::AllocationAudit::onAllocation(size);
+  return __libc_memalign(alignment, size);
+}
+
+int posix_memalign(void** ptr, std::size_t alignment, std::size_t size) {
+  legged_state_estimator::AllocationAudit::onAllocation(size);
+  void* p = __libc_memalign(alignment, size);
+  if (p == nullptr) {
+    return ENOMEM;
+  }
+  *ptr = p;
+  return 0;
+}
+
+} // extern "C"
+
+namespace legged_state_estimator {
+namespace {
+
+const bool allocation_audit_hooks_installed = AllocationAudit::installHooks();
+
+} // namespace
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_ALLOCATION_AUDIT_HOOKS_HPP_
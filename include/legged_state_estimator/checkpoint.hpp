@@ -0,0 +1,251 @@
+#ifndef LEGGED_STATE_ESTIMATOR_CHECKPOINT_HPP_
+#define LEGGED_STATE_ESTIMATOR_CHECKPOINT_HPP_
+
+#include <string>
+#include <vector>
+#include <map>
+#include <utility>
+#include <cstdint>
+#include <cstring>
+#include <stdexcept>
+#include <type_traits>
+
+#include "Eigen/Core"
+
+
+namespace legged_state_estimator {
+
+///
+/// @class CheckpointWriter
+/// @brief Writes the state of the estimator components into a binary buffer
+/// (native byte order). The values are written without tags, so that they
+/// must be read back by CheckpointReader in the same order and with the same
+/// types.
+///
+class CheckpointWriter {
+public:
+  ///
+  /// @brief Default constructor. The buffer is empty.
+  ///
+  CheckpointWriter() : data_() {}
+
+  ///
+  /// @brief Writes an arithmetic or enum value.
+  /// @param[in] value Value.
+  ///
+  template <typename T>
+  typename std::enable_if<std::is_arithmetic<T>::value || std::is_enum<T>::value>::type
+  write(const T value) {
+    data_.append(reinterpret_cast<const char*>(&value), sizeof(T));
+  }
+
+  ///
+  /// @brief Writes the dimensions and the coefficients of a matrix.
+  /// @param[in] matrix Matrix.
+  ///
+  template <typename Derived>
+  void write(const Eigen::MatrixBase<Derived>& matrix) {
+    write(static_cast<std::int64_t>(matrix.rows()));
+    write(static_cast<std::int64_t>(matrix.cols()));
+    for (Eigen::Index j=0; j<matrix.cols(); ++j) {
+      for (Eigen::Index i=0; i<matrix.rows(); ++i) {
+        write(matrix.coeff(i, j));
+      }
+    }
+  }
+
+  ///
+  /// @brief Writes a string.
+  /// @param[in] value String.
+  ///
+  void write(const std::string& value) {
+    write(static_cast<std::uint64_t>(value.size()));
+    data_.append(value);
+  }
+
+  ///
+  /// @brief Writes a pair.
+  /// @param[in] value Pair.
+  ///
+  template <typename T1, typename T2>
+  void write(const std::pair<T1, T2>& value) {
+    write(value.first);
+    write(value.second);
+  }
+
+  ///
+  /// @brief Writes a vector.
+  /// @param[in] value Vector.
+  ///
+  template <typename T, typename Allocator>
+  void write(const std::vector<T, Allocator>& value) {
+    write(static_cast<std::uint64_t>(value.size()));
+    for (const auto& e : value) {
+      write(e);
+    }
+  }
+
+  ///
+  /// @brief Writes a map.
+  /// @param[in] value Map.
+  ///
+  template <typename Key, typename T, typename Compare, typename Allocator>
+  void write(const std::map<Key, T, Compare, Allocator>& value) {
+    write(static_cast<std::uint64_t>(value.size()));
+    for (const auto& e : value) {
+      write(e.first);
+      write(e.second);
+    }
+  }
+
+  ///
+  /// @return const reference to the buffer.
+  ///
+  const std::string& data() const { return data_; }
+
+private:
+  std::string data_;
+};
+
+
+///
+/// @class CheckpointReader
+/// @brief Reads the values written by CheckpointWriter. Throws
+/// std::runtime_error if the buffer is truncated or does not match the
+/// read values.
+///
+class CheckpointReader {
+public:
+  ///
+  /// @brief Constructor.
+  /// @param[in] data Buffer written by CheckpointWriter. Must outlive the
+  /// reader.
+  ///
+  CheckpointReader(const std::string& data) : data_(data), offset_(0) {}
+
+  ///
+  /// @brief Reads an arithmetic or enum value.
+  /// @param[out] value Value.
+  ///
+  template <typename T>
+  typename std::enable_if<std::is_arithmetic<T>::value || std::is_enum<T>::value>::type
+  read(T& value) {
+    std::memcpy(&value, next(sizeof(T)), sizeof(T));
+  }
+
+  ///
+  /// @brief Reads an arithmetic or enum value.
+  /// @return Value.
+  ///
+  template <typename T>
+  T read() {
+    T value;
+    read(value);
+    return value;
+  }
+
+  ///
+  /// @brief Reads a matrix. Dynamic-size matrices are resized.
+  /// @param[out] matrix Matrix.
+  ///
+  template <typename Scalar, int Rows, int Cols, int Options, int MaxRows, int MaxCols>
+  void read(Eigen::Matrix<Scalar, Rows, Cols, Options, MaxRows, MaxCols>& matrix) {
+    const std::int64_t rows = read<std::int64_t>();
+    const std::int64_t cols = read<std::int64_t>();
+    if (rows < 0 || cols < 0
+        || (Rows != Eigen::Dynamic && rows != Rows) || (Cols != Eigen::Dynamic && cols != Cols)
+        || (MaxRows != Eigen::Dynamic && rows > MaxRows) || (MaxCols != Eigen::Dynamic && cols > MaxCols)
+        || static_cast<std::uint64_t>(rows*cols) > remaining() / sizeof(Scalar)) {
+      throw std::runtime_error("[CheckpointReader] matrix dimensions do not match");
+    }
+    matrix.resize(rows, cols);
+    for (Eigen::Index j=0; j<cols; ++j) {
+      for (Eigen::Index i=0; i<rows; ++i) {
+        read(matrix.coeffRef(i, j));
+      }
+    }
+  }
+
+  ///
+  /// @brief Reads a string.
+  /// @param[out] value String.
+  ///
+  void read(std::string& value) {
+    const std::uint64_t size = readSize(1);
+    value.assign(next(size), size);
+  }
+
+  ///
+  /// @brief Reads a pair.
+  /// @param[out] value Pair.
+  ///
+  template <typename T1, typename T2>
+  void read(std::pair<T1, T2>& value) {
+    read(value.first);
+    read(value.second);
+  }
+
+  ///
+  /// @brief Reads a vector.
+  /// @param[out] value Vector.
+  ///
+  template <typename T, typename Allocator>
+  void read(std::vector<T, Allocator>& value) {
+    const std::uint64_t size = readSize(1);
+    value.resize(size);
+    for (auto& e : value) {
+      read(e);
+    }
+  }
+
+  ///
+  /// @brief Reads a map.
+  /// @param[out] value Map.
+  ///
+  template <typename Key, typename T, typename Compare, typename Allocator>
+  void read(std::map<Key, T, Compare, Allocator>& value) {
+    const std::uint64_t size = readSize(1);
+    value.clear();
+    for (std::uint64_t i=0; i<size; ++i) {
+      Key key;
+      read(key);
+      read(value[key]);
+    }
+  }
+
+  ///
+  /// @brief Reads the size of a container and checks that the buffer can
+  /// hold its elements.
+  /// @param[in] element_size Minimum size of an element in bytes.
+  /// @return Size of the container.
+  ///
+  std::uint64_t readSize(const std::size_t element_size) {
+    const std::uint64_t size = read<std::uint64_t>();
+    if (size > remaining() / element_size) {
+      throw std::runtime_error("[CheckpointReader] checkpoint is truncated");
+    }
+    return size;
+  }
+
+  ///
+  /// @return Number of the bytes that have not been read yet.
+  ///
+  std::size_t remaining() const { return data_.size() - offset_; }
+
+private:
+  const std::string& data_;
+  std::size_t offset_;
+
+  const char* next(const std::size_t size) {
+    if (size > remaining()) {
+      throw std::runtime_error("[CheckpointReader] checkpoint is truncated");
+    }
+    const char* begin = data_.data() + offset_;
+    offset_ += size;
+    return begin;
+  }
+};
+
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_CHECKPOINT_HPP_
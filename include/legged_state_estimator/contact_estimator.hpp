@@ -9,6 +9,7 @@
 #include "Eigen/StdVector"
 
 #include "legged_state_estimator/robot_model.hpp"
+#include "legged_state_estimator/checkpoint.hpp"
 
 
 namespace legged_state_estimator {
@@ -37,12 +38,27 @@ struct ContactEstimatorSettings {
   /// @brief Threshold to determine the contact state from contact probabilities.
   ///
   double contact_probability_threshold;
+
+  ///
+  /// @brief Writes the settings into a checkpoint.
+  /// @param[in] writer Checkpoint writer.
+  ///
+  void saveCheckpoint(CheckpointWriter& writer) const;
+
+  ///
+  /// @brief Reads the settings from a checkpoint.
+  /// @param[in] reader Checkpoint reader.
+  ///
+  void loadCheckpoint(CheckpointReader& reader);
 };
 
 
 ///
 /// @class ContactEstimator
 /// @brief Contact estimator.
+/// @note Thread safety: an instance must not be updated from multiple threads
+/// at the same time. Distinct instances can be updated concurrently, given 
+/// that their robot models are not updated concurrently either.
 ///
 class ContactEstimator {
 public:
@@ -128,6 +144,19 @@ public:
   ///
   void setContactSurfaceNormal(const std::vector<Eigen::Vector3d>& contact_surface_normal);
 
+  ///
+  /// @brief Writes the settings and the estimates, including those of the 
+  /// previous update, into a checkpoint.
+  /// @param[in] writer Checkpoint writer.
+  ///
+  void saveCheckpoint(CheckpointWriter& writer) const;
+
+  ///
+  /// @brief Restores the settings and the estimates from a checkpoint.
+  /// @param[in] reader Checkpoint reader.
+  ///
+  void loadCheckpoint(CheckpointReader& reader);
+
   void disp(std::ostream& os) const;
 
   friend std::ostream& operator<<(std::ostream& os, const ContactEstimator& d);
@@ -0,0 +1,202 @@
+#ifndef LEGGED_STATE_ESTIMATOR_CONTACT_ESTIMATOR_CALIBRATION_HPP_
+#define LEGGED_STATE_ESTIMATOR_CONTACT_ESTIMATOR_CALIBRATION_HPP_
+
+#include <vector>
+
+#include "Eigen/Core"
+
+#include "legged_state_estimator/robot_model.hpp"
+#include "legged_state_estimator/contact_estimator.hpp"
+#include "legged_state_estimator/low_pass_filter.hpp"
+#include "legged_state_estimator/legged_state_estimator_settings.hpp"
+
+
+namespace legged_state_estimator {
+
+///
+/// @class ContactCalibrationMetrics
+/// @brief Classification metrics of the contact estimator for a batch of
+/// parameter combinations. The (n, i) element of each matrix belongs to the
+/// n-th parameter combination and the i-th contact.
+///
+struct ContactCalibrationMetrics {
+  ///
+  /// @brief Number of samples estimated in contact and labeled in contact.
+  ///
+  Eigen::MatrixXi true_positives;
+
+  ///
+  /// @brief Number of samples estimated in contact and labeled not in contact.
+  ///
+  Eigen::MatrixXi false_positives;
+
+  ///
+  /// @brief Number of samples estimated not in contact and labeled not in
+  /// contact.
+  ///
+  Eigen::MatrixXi true_negatives;
+
+  ///
+  /// @brief Number of samples estimated not in contact and labeled in contact.
+  ///
+  Eigen::MatrixXi false_negatives;
+
+  ///
+  /// @brief Number of switches of the estimated contact state.
+  ///
+  Eigen::MatrixXi num_switches;
+
+  ///
+  /// @brief Ratio of the correctly classified samples.
+  ///
+  Eigen::MatrixXd accuracy;
+
+  ///
+  /// @brief true_positives / (true_positives + false_positives). Zero if there
+  /// are no samples estimated in contact.
+  ///
+  Eigen::MatrixXd precision;
+
+  ///
+  /// @brief true_positives / (true_positives + false_negatives). Zero if there
+  /// are no samples labeled in contact.
+  ///
+  Eigen::MatrixXd recall;
+
+  ///
+  /// @brief Harmonic mean of the precision and recall.
+  ///
+  Eigen::MatrixXd f1_score;
+
+  ///
+  /// @brief Mean binary cross entropy of the contact probabilities and the
+  /// contact labels.
+  ///
+  Eigen::MatrixXd log_loss;
+
+  ///
+  /// @brief Mean contact force covariance over the samples labeled in contact.
+  ///
+  Eigen::MatrixXd mean_contact_force_covariance;
+};
+
+
+///
+/// @class ContactEstimatorCalibration
+/// @brief Offline calibration of the parameters of the contact estimator. The
+/// normal contact force estimates are computed from a recorded log once in
+/// the same way as LeggedStateEstimator. The contact probabilities, contact
+/// states, and contact force covariances are then evaluated for a batch of
+/// parameter combinations and compared with the ground-truth contact labels.
+/// @note The normal contact forces are computed with the leg dynamics, i.e.,
+/// LeggedStateEstimatorSettings::dynamic_contact_estimation must be false.
+///
+class ContactEstimatorCalibration {
+public:
+  using ContactLabels = Eigen::Matrix<bool, Eigen::Dynamic, Eigen::Dynamic>;
+
+  ///
+  /// @brief Constructor.
+  /// @param[in] settings Settings of the state estimator that produced (or
+  /// will process) the log.
+  ///
+  ContactEstimatorCalibration(const LeggedStateEstimatorSettings& settings);
+
+  ///
+  /// @brief Default constructor.
+  ///
+  ContactEstimatorCalibration();
+
+  ///
+  /// @brief Default destructor.
+  ///
+  ~ContactEstimatorCalibration() = default;
+
+  ContactEstimatorCalibration(const ContactEstimatorCalibration&) = default;
+  ContactEstimatorCalibration& operator=(const ContactEstimatorCalibration&) = default;
+  ContactEstimatorCalibration(ContactEstimatorCalibration&&) noexcept = default;
+  ContactEstimatorCalibration& operator=(ContactEstimatorCalibration&&) noexcept = default;
+
+  ///
+  /// @brief Sets a recorded log and computes the normal contact force
+  /// estimates. Each row of the inputs is a sample.
+  /// @param[in] qJ Joint positions. Size must be numSamples x RobotModel::nJ().
+  /// @param[in] dqJ Joint velocities. Size must be numSamples x RobotModel::nJ().
+  /// @param[in] tauJ Joint torques. Size must be numSamples x RobotModel::nJ().
+  /// @param[in] contact_labels Ground-truth contact states. Size must be
+  /// numSamples x RobotModel::numContacts().
+  ///
+  void setLog(const Eigen::MatrixXd& qJ, const Eigen::MatrixXd& dqJ,
+              const Eigen::MatrixXd& tauJ, const ContactLabels& contact_labels);
+
+  ///
+  /// @brief Evaluates a batch of parameter combinations on the log. The n-th
+  /// row (element) of the inputs is the n-th combination.
+  /// @param[in] beta0 ContactEstimatorSettings::beta0 of each combination.
+  /// Size must be numCombinations x RobotModel::numContacts().
+  /// @param[in] beta1 ContactEstimatorSettings::beta1 of each combination.
+  /// Size must be numCombinations x RobotModel::numContacts().
+  /// @param[in] contact_force_covariance_alpha
+  /// ContactEstimatorSettings::contact_force_covariance_alpha of each
+  /// combination. Size must be numCombinations.
+  /// @param[in] contact_probability_threshold
+  /// ContactEstimatorSettings::contact_probability_threshold of each
+  /// combination. Size must be numCombinations.
+  /// @param[in] num_threads Number of threads. If non-positive, the number of
+  /// hardware threads is used. Default is 0.
+  /// @return Classification metrics of each combination.
+  ///
+  ContactCalibrationMetrics evaluate(const Eigen::MatrixXd& beta0,
+                                     const Eigen::MatrixXd& beta1,
+                                     const Eigen::VectorXd& contact_force_covariance_alpha,
+                                     const Eigen::VectorXd& contact_probability_threshold,
+                                     const int num_threads=0) const;
+
+  ///
+  /// @brief Gets the normal contact force estimates of the log.
+  /// @return const reference to the normal contact force estimates. Size is
+  /// numSamples x RobotModel::numContacts().
+  ///
+  const Eigen::MatrixXd& getNormalContactForceEstimate() const;
+
+  ///
+  /// @brief Gets the contact labels of the log.
+  /// @return const reference to the contact labels. Size is numSamples x
+  /// RobotModel::numContacts().
+  ///
+  const ContactLabels& getContactLabels() const;
+
+  ///
+  /// @return Number of samples of the log.
+  ///
+  int numSamples() const;
+
+  ///
+  /// @return Number of contacts.
+  ///
+  int numContacts() const;
+
+private:
+  struct Workspace {
+    Eigen::ArrayXd z, p, x;
+    Eigen::Array<bool, Eigen::Dynamic, 1> contact;
+  };
+
+  RobotModel robot_model_;
+  ContactEstimator contact_estimator_;
+  LowPassFilter<double> lpf_tauJ_;
+  Eigen::MatrixXd normal_contact_force_estimate_;
+  ContactLabels contact_labels_;
+  // Mean squared difference of the normal contact force estimates over the
+  // samples labeled in contact
+  Eigen::VectorXd mean_squared_force_difference_;
+
+  void evaluateCombination(const int n, const int i, const double beta0,
+                           const double beta1, const double alpha,
+                           const double threshold, Workspace& workspace,
+                           ContactCalibrationMetrics& metrics) const;
+};
+
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_CONTACT_ESTIMATOR_CALIBRATION_HPP_
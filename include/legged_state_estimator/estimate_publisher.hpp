@@ -0,0 +1,157 @@
+#ifndef LEGGED_STATE_ESTIMATOR_ESTIMATE_PUBLISHER_HPP_
+#define LEGGED_STATE_ESTIMATOR_ESTIMATE_PUBLISHER_HPP_
+
+#include <string>
+#include <atomic>
+#include <cstdint>
+#include <cstddef>
+
+
+namespace legged_state_estimator {
+
+///
+/// @struct EstimateSnapshot
+/// @brief Fixed binary layout of the estimates published by
+/// EstimatePublisher (296 bytes, native byte order). The quaternion is
+/// (x, y, z, w). The first num_contacts entries of contact_state (0 or 1) and
+/// contact_probability are valid.
+///
+struct EstimateSnapshot {
+  static constexpr int kMaxContacts = 8;
+
+  /// @brief Number of the published snapshots including this one.
+  std::uint64_t sequence_number;
+  /// @brief Time of the estimates.
+  double time;
+  double base_position[3];
+  double base_quaternion[4];
+  double base_linear_velocity_world[3];
+  double base_linear_velocity_local[3];
+  double base_angular_velocity_world[3];
+  double base_angular_velocity_local[3];
+  double imu_gyro_bias[3];
+  double imu_linear_acceleration_bias[3];
+  std::uint32_t num_contacts;
+  std::uint32_t reserved;
+  std::uint8_t contact_state[kMaxContacts];
+  double contact_probability[kMaxContacts];
+};
+
+
+///
+/// @class EstimatePublisher
+/// @brief Publishes EstimateSnapshot into a POSIX shared-memory segment
+/// protected by a seqlock. There is a single publisher per segment: the
+/// publisher creates the segment and fails if the name is already taken.
+/// Publishing is a few stores and a copy of the snapshot without syscalls or
+/// locks, and never waits for the subscribers. The segment is unlinked when
+/// the publisher is destroyed.
+///
+class EstimatePublisher {
+public:
+  ///
+  /// @brief Creates and maps a shared-memory segment. Throws
+  /// std::runtime_error if a segment of the name already exists, e.g., of
+  /// another publisher or left by a crashed process (remove it from
+  /// /dev/shm in that case).
+  /// @param[in] name Name of the segment, e.g., "legged_state_estimator". A
+  /// leading '/' is added if missing.
+  ///
+  EstimatePublisher(const std::string& name);
+
+  ///
+  /// @brief Destructor. Unmaps the segment and unlinks it if the name still
+  /// refers to the segment created by this publisher.
+  ///
+  ~EstimatePublisher();
+
+  EstimatePublisher(const EstimatePublisher&) = delete;
+  EstimatePublisher& operator=(const EstimatePublisher&) = delete;
+  EstimatePublisher(EstimatePublisher&&) = delete;
+  EstimatePublisher& operator=(EstimatePublisher&&) = delete;
+
+  ///
+  /// @brief Publishes a snapshot. The sequence number of the snapshot is
+  /// overwritten by that of the publisher.
+  /// @param[in] snapshot Snapshot.
+  ///
+  void publish(const EstimateSnapshot& snapshot);
+
+  ///
+  /// @return Number of the published snapshots.
+  ///
+  std::uint64_t numPublished() const;
+
+  ///
+  /// @return Name of the segment.
+  ///
+  const std::string& name() const;
+
+private:
+  std::string name_;
+  void* data_;
+  std::size_t size_;
+  std::atomic<std::uint64_t>* sequence_;
+  EstimateSnapshot* snapshot_;
+  std::uint64_t num_published_;
+  std::uint64_t device_, inode_;
+};
+
+
+///
+/// @class EstimateSubscriber
+/// @brief Reads the snapshots of EstimatePublisher from the shared-memory
+/// segment. Reading copies the snapshot and retries if the publisher wrote
+/// it during the copy, so the snapshots are never torn. Reading does not
+/// make syscalls and does not block the publisher.
+///
+class EstimateSubscriber {
+public:
+  ///
+  /// @brief Opens and maps the shared-memory segment of a publisher
+  /// read-only.
+  /// @param[in] name Name of the segment. A leading '/' is added if missing.
+  ///
+  EstimateSubscriber(const std::string& name);
+
+  ///
+  /// @brief Destructor. Unmaps the segment.
+  ///
+  ~EstimateSubscriber();
+
+  EstimateSubscriber(const EstimateSubscriber&) = delete;
+  EstimateSubscriber& operator=(const EstimateSubscriber&) = delete;
+  EstimateSubscriber(EstimateSubscriber&&) = delete;
+  EstimateSubscriber& operator=(EstimateSubscriber&&) = delete;
+
+  ///
+  /// @brief Reads the latest snapshot. Spins while the publisher writes it.
+  /// @param[out] snapshot Snapshot. The sequence number is 0 if nothing has
+  /// been published yet.
+  ///
+  void read(EstimateSnapshot& snapshot) const;
+
+  ///
+  /// @brief Reads the latest snapshot without spinning.
+  /// @param[out] snapshot Snapshot. Invalid if the read failed.
+  /// @return true if the read succeeded and false if the publisher was
+  /// writing the snapshot.
+  ///
+  bool tryRead(EstimateSnapshot& snapshot) const;
+
+  ///
+  /// @return Sequence number of the latest snapshot, i.e., the number of the
+  /// published snapshots, without reading the snapshot.
+  ///
+  std::uint64_t sequenceNumber() const;
+
+private:
+  void* data_;
+  std::size_t size_;
+  const std::atomic<std::uint64_t>* sequence_;
+  const EstimateSnapshot* snapshot_;
+};
+
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_ESTIMATE_PUBLISHER_HPP_
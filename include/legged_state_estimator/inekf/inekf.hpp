@@ -27,14 +27,43 @@
 #include "legged_state_estimator/inekf/noise_params.hpp"
 #include "legged_state_estimator/inekf/lie_group.hpp"
 #include "legged_state_estimator/inekf/observations.hpp"
+#include "legged_state_estimator/checkpoint.hpp"
 
 
 namespace legged_state_estimator {
 
 enum ErrorType {LeftInvariant, RightInvariant};
 
-class InEKF {
+/**
+ * Policy to select the estimated landmarks that are evicted from the state 
+ * when the landmark budget is exceeded.
+ * LeastRecentlyObserved: evicts the landmarks observed least recently.
+ * LowestInformation: evicts the landmarks with the largest trace of the 
+ * marginal position covariance.
+ */
+enum LandmarkEvictionPolicy {LeastRecentlyObserved, LowestInformation};
+
+/**
+ * Invariant EKF. If MaxAugmented is not Eigen::Dynamic, at most MaxAugmented 
+ * contacts and landmarks can be augmented to the state and all the matrices 
+ * are stored in fixed-capacity (stack allocated) storage. Augmentations that 
+ * exceed the capacity are skipped.
+ */
+template <int MaxAugmented>
+class InEKFTpl {
 public:
+  using State = InEKFStateTpl<MaxAugmented>;
+  using MatrixX = typename State::MatrixX;
+  using VectorTheta = typename State::VectorTheta;
+  using MatrixP = typename State::MatrixP;
+  static constexpr int MaxDimP = State::MaxDimP;
+  static constexpr int MaxDimZ = (MaxAugmented == Eigen::Dynamic) ? Eigen::Dynamic : 3*MaxAugmented;
+  using VectorP = Eigen::Matrix<double, Eigen::Dynamic, 1, Eigen::ColMajor, MaxDimP, 1>;
+  using VectorZ = Eigen::Matrix<double, Eigen::Dynamic, 1, Eigen::ColMajor, MaxDimZ, 1>;
+  using MatrixH = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::ColMajor, MaxDimZ, MaxDimP>;
+  using MatrixS = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::ColMajor, MaxDimZ, MaxDimZ>;
+  using MatrixK = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::ColMajor, MaxDimP, MaxDimZ>;
+
 /// @name Constructors
 /// @{
   /**
@@ -42,39 +71,39 @@ public:
    * No contacts, prior landmarks, or magnetic field is set.            gfc = [
 
     */
-  InEKF();
+  InEKFTpl();
   /**
    * Initialize filter with noise parameters. Initializes th            gfc = [
 the default (identity rotation, zero velocity, zero position).
     * @param params: The noise parameters to be assigned.
     */
-  InEKF(const NoiseParams& params);
+  InEKFTpl(const NoiseParams& params);
   /**
    * Initialize filter with state. Initializes the noise par            gfc = [
 the default.
     * @param state: The state to be assigned.
     */
-  InEKF(const InEKFState& state);
+  InEKFTpl(const State& state);
   /**
    * Initialize filter with state and noise parameters.
    * @param state: The state to be assigned.
    * @param params: The noise parameters to be assigned.
    */        
-  InEKF(const InEKFState& state, const NoiseParams& params);
+  InEKFTpl(const State& state, const NoiseParams& params);
   /**
    * Initialize filter with state, noise, and error type.
    * @param state: The state to be assigned.
    * @param params: The noise parameters to be assigned.
    * @param error_type: The type of invariant error to be used (affects covariance).
    */       
-  InEKF(const InEKFState& state, const NoiseParams& params, const ErrorType error_type);
+  InEKFTpl(const State& state, const NoiseParams& params, const ErrorType error_type);
 
-  ~InEKF() = default;
+  ~InEKFTpl() = default;
 
-  InEKF(const InEKF&) = default;
-  InEKF& operator=(const InEKF&) = default;
-  InEKF(InEKF&&) noexcept = default;
-  InEKF& operator=(InEKF&&) noexcept = default;
+  InEKFTpl(const InEKFTpl&) = default;
+  InEKFTpl& operator=(const InEKFTpl&) = default;
+  InEKFTpl(InEKFTpl&&) noexcept = default;
+  InEKFTpl& operator=(InEKFTpl&&) noexcept = default;
 /// @}
 
 /// @name Getters
@@ -86,7 +115,7 @@ the default.
   /**
    * Gets the current state estimate.
    */
-  const InEKFState& getState() const;
+  const State& getState() const;
   /**
    * Gets the current noise parameters.
    */
@@ -101,6 +130,38 @@ the default.
    * @return  map of contact ID and associated index in the state matrix X
    */
   const std::map<int, int>& getEstimatedContactPositions() const;
+  /**
+   * Gets the number of contact positions augmented to the state (or reactivated in the contact slot mode) by 
+   * CorrectKinematics() since the construction or clear().
+   */
+  long getNumContactAugmentations() const;
+  /**
+   * Gets the number of contact positions removed from the state (or deactivated in the contact slot mode) by 
+   * CorrectKinematics() since the construction or clear().
+   */
+  long getNumContactRemovals() const;
+  /**
+   * Gets the number of the contact and landmark measurements dropped by CorrectKinematics() and CorrectLandmarks() 
+   * because the stacked observation exceeds the capacity of the fixed-capacity filter, since the construction or 
+   * clear(). Always zero for the dynamic-size filter.
+   */
+  long getNumDroppedMeasurements() const;
+  /**
+   * Gets the number of the contact and landmark augmentations dropped by CorrectKinematics() and CorrectLandmarks() 
+   * because the state exceeds the capacity of the fixed-capacity filter, since the construction or clear(). Always 
+   * zero for the dynamic-size filter.
+   */
+  long getNumDroppedAugmentations() const;
+  /**
+   * Gets whether the contact slot mode is enabled.
+   */
+  bool getContactSlotMode() const;
+  /**
+   * Gets the contact slots, i.e., the active and inactive contact positions
+   * kept in the state in the contact slot mode.
+   * @return  map of contact ID and associated index in the state matrix X
+   */
+  const std::map<int, int>& getContactSlots() const;
 
   /**
    * Gets the filter's prior landmarks.
@@ -112,21 +173,62 @@ the default.
    * @return  map of landmark ID and associated index in the state matrix X
    */
   const std::map<int, int>& getEstimatedLandmarks() const;
+  /**
+   * Gets the maximum number of estimated landmarks (negative if unlimited).
+   */
+  int getLandmarkBudget() const;
+  /**
+   * Gets the number of the new landmarks that CorrectLandmarks() did not augment because the landmark budget was 
+   * exceeded even after the eviction, since the construction or clear().
+   */
+  long getNumDroppedLandmarks() const;
   /**
    * Gets the filter's set magnetic field.
    * @return  magnetic field in world frame
    */
   const Eigen::Vector3d& getMagneticField() const;
+  /**
+   * Gets the time of the state estimate, i.e., the time set by setTime() advanced by the time steps of Propagate().
+   */
+  double getTime() const;
+  /**
+   * Gets the length of the state history (zero if the history is disabled).
+   */
+  int getStateHistoryLength() const;
+  /**
+   * Gets the number of the propagation steps currently stored in the state history.
+   */
+  int getStateHistorySize() const;
+  /**
+   * Gets the latency of the replay of the state history by the last CorrectLandmarksAt() in microseconds.
+   */
+  double getLastReplayLatency() const;
+  /**
+   * Gets the number of the propagation steps replayed by the last CorrectLandmarksAt().
+   */
+  int getLastReplaySteps() const;
 /// @}
 
 
 /// @name Setters
 /// @{
   /**
-   * Sets the current state estimate
+   * Sets the current state estimate. Clears the state history.
    * @param state: The state estimate to be assigned.
    */
-  void setState(const InEKFState& state);
+  void setState(const State& state);
+  /**
+   * Sets the time of the state estimate.
+   * @param time: The time to be assigned.
+   */
+  void setTime(const double time);
+  /**
+   * Sets the length of the state history, i.e., the number of the latest propagation steps whose prior states, 
+   * IMU measurements, and subsequent kinematics, velocity, and landmark corrections are kept to apply delayed 
+   * measurements with CorrectLandmarksAt(). The buffer is allocated here and the history is cleared.
+   * @param length: The number of the propagation steps. Zero disables the history (default).
+   */
+  void setStateHistoryLength(const int length);
   /**
    * Sets the current noise parameters
    * @param params: The noise parameters to be assigned.
@@ -137,11 +239,37 @@ the default.
    * @param contacts: A vector of contact ID and indicator pairs. A true indicator means contact is detected.
    */
   void setContacts(const std::vector<std::pair<int,bool>>& contacts);
+  /**
+   * Enables or disables the contact slot mode. In the contact slot mode, each
+   * contact keeps a fixed slot (3 columns) in the state after its first 
+   * touchdown. A lift-off deactivates the slot by resetting its covariance 
+   * and a touchdown reactivates it instead of removing and augmenting the 
+   * state. The inactive slots are decoupled from the rest of the state, so 
+   * the estimates are the same as without the slots. Disabling the mode 
+   * removes the inactive slots from the state.
+   * @param enabled: true to enable the contact slot mode.
+   */
+  void setContactSlotMode(const bool enabled);
   /**
    * Sets the filter's prior landmarks.
    * @param prior_landmarks: A map of prior landmark IDs and associated position in the world frame.
    */
   void setPriorLandmarks(const mapIntVector3d& prior_landmarks);
+  /**
+   * Sets the landmark budget, i.e., the maximum number of landmarks estimated
+   * in the state. If CorrectLandmarks() detects new landmarks that exceed the
+   * budget, the landmarks that are not measured in that call are evicted 
+   * according to the policy. The evicted landmarks are removed from the 
+   * state at once and, if keep_evicted_landmarks is true, are kept as prior 
+   * landmarks at their estimated positions. New landmarks that still do not 
+   * fit into the budget are skipped.
+   * @param max_landmarks: The maximum number of estimated landmarks. Negative values disable the budget.
+   * @param policy: The eviction policy.
+   * @param keep_evicted_landmarks: If true, the evicted landmarks are added to the prior landmarks.
+   */
+  void setLandmarkBudget(const int max_landmarks, 
+                         const LandmarkEvictionPolicy policy=LandmarkEvictionPolicy::LeastRecentlyObserved, 
+                         const bool keep_evicted_landmarks=true);
   /** TODO: Sets magnetic field for untested magnetometer measurement */
   void setMagneticField(const Eigen::Vector3d& true_magnetic_field);
 /// @}
@@ -171,14 +299,28 @@ the default.
   void RemoveLandmarks(const int landmark_id);
   /**
    * Removes a set of landmarks from the filter's estimated landmark set.
+   * The landmarks are removed from the state in a single pass.
    * @param landmark_ids: A vector of IDs for the landmarks to remove.
    */
   void RemoveLandmarks(const std::vector<int>& landmark_ids);
   /**
    * Keeps a set of landmarks from the filter's estimated landmark set.
+   * The other landmarks are removed from the state in a single pass.
    * @param landmark_ids: A vector of IDs for the landmarks to keep.
    */
   void KeepLandmarks(const std::vector<int>& landmark_ids);
+  /**
+   * Writes the filter into a checkpoint: the error type, the state, the noise parameters, the contact and landmark 
+   * index maps, the counters, the time, and the state history. The workspaces are not written.
+   * @param writer: The checkpoint writer.
+   */
+  void saveCheckpoint(CheckpointWriter& writer) const;
+  /**
+   * Restores the filter from a checkpoint written by saveCheckpoint(). The capacity of the state must be able to 
+   * hold the stored state.
+   * @param reader: The checkpoint reader.
+   */
+  void loadCheckpoint(CheckpointReader& reader);
 /// @}
 
 
@@ -207,6 +349,7 @@ the default.
    * Corrects the state estimate using the measured forward kinematics between the IMU and a set of contact frames.
    * If contact is indicated but not included in the state, the state is augmented to include the estimated contact position.
    * If contact is not indicated but is included in the state, the contact position is marginalized out of the state. 
+   * In the contact slot mode, the contact slot is deactivated or reactivated instead.
    * This is a right-invariant measurement model. Example usage can be found in @include kinematics.cpp
    * @param measured_kinematics: the measured kinematics containing the contact id, relative pose measurement in the IMU frame, and covariance
    */
@@ -218,6 +361,26 @@ the default.
    * @param measured_landmarks: the measured landmarks containing the contact id, relative position measurement in the IMU frame, and covariance
    */
   void CorrectLandmarks(const vectorLandmarks& measured_landmarks);
+  /** 
+   * Corrects the state estimate using landmark measurements taken at a past time, e.g., delayed by a vision pipeline.
+   * The measurements are applied after the latest stored propagation step that ends at or before the time, and the 
+   * filter is then re-propagated to the current time with the stored IMU measurements and corrections. The 
+   * corrections of each step are replayed in the order kinematics, velocity, and landmarks. Measurements older 
+   * than the state history are skipped. If the time is not in the past or the history is disabled, this is the 
+   * same as CorrectLandmarks().
+   * @param time: the time at which the landmarks were measured
+   * @param measured_landmarks: the measured landmarks containing the contact id, relative position measurement in the IMU frame, and covariance
+   * @return false if the measurements are older than the state history and skipped, true otherwise
+   */
+  bool CorrectLandmarksAt(const double time, const vectorLandmarks& measured_landmarks);
+  /** 
+   * Corrects the state estimate using the measured velocity of the IMU expressed in the IMU frame, e.g., leg odometry
+   * computed from the kinematics of the stance legs. The state is not augmented.
+   * This is a left-invariant measurement model (the correction is right-invariant for the world-centric state).
+   * @param measured_velocity: the measured velocity of the IMU expressed in the IMU frame
+   * @param covariance: covariance of the measured velocity in the IMU frame
+   */
+  void CorrectVelocity(const Eigen::Vector3d& measured_velocity, const Eigen::Matrix3d& covariance);
 
   /** TODO: Untested magnetometer measurement*/
   void CorrectMagnetometer(const Eigen::Vector3d& measured_magnetic_field, const Eigen::Matrix3d& covariance);
@@ -236,27 +399,165 @@ the default.
 private:
   ErrorType error_type_ = ErrorType::LeftInvariant; 
   bool estimate_bias_ = true;  
-  InEKFState state_;
+  State state_;
   NoiseParams noise_params_;
   Eigen::Vector3d g_; // Gravity vector in world frame (z-up)
   std::map<int,bool> contacts_;
   std::map<int,int> estimated_contact_positions_;
+  bool contact_slot_mode_ = false;
+  std::map<int,int> contact_slots_; // Active and inactive contact slots
+  long num_contact_augmentations_ = 0;
+  long num_contact_removals_ = 0;
+  long num_dropped_measurements_ = 0; // Dropped due to the capacity
+  long num_dropped_augmentations_ = 0; // Dropped due to the capacity
   mapIntVector3d prior_landmarks_;
   std::map<int,int> estimated_landmarks_;
+  int max_landmarks_ = -1; // The landmark budget is unlimited if negative
+  LandmarkEvictionPolicy landmark_eviction_policy_ = LandmarkEvictionPolicy::LeastRecentlyObserved;
+  bool keep_evicted_landmarks_ = true;
+  long landmark_step_ = 0; // Number of calls of CorrectLandmarks()
+  long num_dropped_landmarks_ = 0; // Dropped due to the landmark budget
+  std::map<int,long> landmark_last_observed_; // Landmark ID and the step last observed
   Eigen::Vector3d magnetic_field_;
-  Eigen::LDLT<Eigen::MatrixXd> ldlt_;
+  Eigen::LDLT<MatrixS> ldlt_;
+
+  /**
+   * Workspace of the stacked observation of CorrectKinematics() and 
+   * CorrectLandmarks(). It is owned by the filter and reused across the 
+   * corrections. H is stored by its nonzero 3x3 blocks.
+   */
+  struct MeasurementWorkspace {
+    struct HBlock {
+      int row; // First row of the block in H
+      int col; // First column of the block in H
+      Eigen::Matrix3d value;
+    };
+    /**
+     * Clears H and resizes Z and N (set to zero) for dimZ measurements.
+     */
+    void reset(const int dimZ);
+    void addHBlock(const int row, const int col, const Eigen::Matrix3d& value);
+    std::vector<HBlock> H_blocks;
+    VectorZ Z;
+    MatrixS N, S;
+    MatrixH HP;
+    MatrixK PHT, K, KS;
+    VectorP delta;
+  };
+  MeasurementWorkspace workspace_;
+
+  /**
+   * Index buffers of CorrectKinematics() and RemoveAugmentedStates(). They are
+   * owned by the filter and cleared (not freed) at each call, so that the
+   * corrections do not allocate once the buffers have grown.
+   */
+  struct IndexWorkspace {
+    std::vector<int> used_contact_ids;
+    std::vector<std::pair<int,int> > remove_contacts;
+    vectorKinematics new_contacts;
+    std::vector<std::pair<vectorKinematicsIterator,int> > correct_contacts;
+    std::vector<int> remove_indices;
+    std::vector<int> new_index;
+    std::vector<int> keep_indices_P;
+  };
+  IndexWorkspace index_workspace_;
+  // Nodes of the removed contacts, reused by the next augmentations
+  std::map<int,int> spare_contact_positions_;
 
-  Eigen::MatrixXd StateTransitionMatrix(const Eigen::Vector3d& w, const Eigen::Vector3d& a, double dt);
-  Eigen::MatrixXd DiscreteNoiseMatrix(const Eigen::MatrixXd& Phi, double dt);
+  /**
+   * Entry of the state history: the state and the index maps before a 
+   * propagation step, the IMU measurement and time step of the propagation, 
+   * and the corrections applied after it until the next propagation. The
+   * entries are reused as a ring buffer, so that recording does not allocate
+   * once the containers of the entries have grown.
+   */
+  struct HistoryEntry {
+    double time;
+    double dt;
+    Eigen::Matrix<double,6,1> imu;
+    State state;
+    std::map<int,int> estimated_contact_positions;
+    std::map<int,int> contact_slots;
+    std::map<int,int> estimated_landmarks;
+    std::map<int,long> landmark_last_observed;
+    long landmark_step;
+    long num_contact_augmentations;
+    long num_contact_removals;
+    bool has_kinematics;
+    std::map<int,bool> contacts;
+    vectorKinematics kinematics;
+    bool has_velocity;
+    Eigen::Vector3d velocity;
+    Eigen::Matrix3d velocity_covariance;
+    vectorLandmarks landmarks;
+    EIGEN_MAKE_ALIGNED_OPERATOR_NEW
+  };
+  double time_ = 0;
+  std::vector<HistoryEntry, Eigen::aligned_allocator<HistoryEntry> > history_;
+  int history_begin_ = 0; // Index of the oldest entry in history_
+  int history_size_ = 0;
+  bool replaying_ = false;
+  int first_counted_landmark_ = 0; // Drops of the landmark measurements from this index on are counted
+  std::map<int,bool> replay_contacts_; // contacts_ saved during a replay
+  double last_replay_latency_ = 0; // [us]
+  int last_replay_steps_ = 0;
+
+  /**
+   * State transition matrix in block form. It is the identity except for the
+   * 9x9 block of the rotation, velocity, and position (X), the 3x3 diagonal
+   * blocks of the augmented contacts and landmarks (Aug), and the columns of
+   * the biases (Theta).
+   */
+  struct StateTransition {
+    Eigen::Matrix<double,9,9> X;
+    Eigen::Matrix3d Aug;
+    Eigen::Matrix<double, Eigen::Dynamic, 6, Eigen::ColMajor, MaxDimP, 6> Theta;
+    EIGEN_MAKE_ALIGNED_OPERATOR_NEW
+  };
+
+  // G0, G1, G2, and G3 are Gamma_SO3(w*dt, m), m = 0, 1, 2, 3
+  void StateTransitionMatrix(const Eigen::Vector3d& w, const Eigen::Vector3d& a, double dt,
+                             const Eigen::Matrix3d& G0, const Eigen::Matrix3d& G1, 
+                             const Eigen::Matrix3d& G2, const Eigen::Matrix3d& G3,
+                             StateTransition& Phi) const;
+  // Computes Phi * P * Phi^T + Qd block-wise, where Qd is the discretized noise
+  // in closed form. w and a are the bias-corrected IMU measurements.
+  void PropagateCovariance(const StateTransition& Phi, const Eigen::Vector3d& w, 
+                           const Eigen::Vector3d& a, double dt, MatrixP& P_pred) const;
+
+  // Removes the augmented states (the columns of X) at the given indices 
+  // from X and P in a single pass and updates the contact and landmark maps
+  void RemoveAugmentedStates(const std::vector<int>& indices);
+  // Inserts and erases estimated contact positions, recycling the map nodes
+  // through spare_contact_positions_
+  void InsertContactPosition(const int id, const int index);
+  std::map<int,int>::iterator EraseContactPosition(std::map<int,int>::iterator it);
+  // Returns the i-th oldest entry of the state history
+  HistoryEntry& HistoryAt(const int i);
+  // Appends an entry for a propagation step to the state history
+  void RecordPropagation(const Eigen::Vector3d& imu_w, const Eigen::Vector3d& imu_a, const double dt);
+  // Saves and restores the state, the time, and the index maps
+  void SaveHistoryEntry(HistoryEntry& entry) const;
+  void RestoreHistoryEntry(const HistoryEntry& entry);
+  // Evicts num_evict estimated landmarks whose IDs are not in excluded_ids
+  void EvictLandmarks(const int num_evict, const std::vector<int>& excluded_ids);
 
   // Corrects state using invariant observation models
   void CorrectRightInvariant(const Observation& obs);
   void CorrectLeftInvariant(const Observation& obs);
-  void CorrectRightInvariant(const Eigen::MatrixXd& Z, const Eigen::MatrixXd& H, const Eigen::MatrixXd& N);
-  void CorrectLeftInvariant(const Eigen::MatrixXd& Z, const Eigen::MatrixXd& H, const Eigen::MatrixXd& N);
+  void CorrectRightInvariant(const VectorZ& Z, const MatrixH& H, const MatrixS& N);
+  void CorrectLeftInvariant(const VectorZ& Z, const MatrixH& H, const MatrixS& N);
+  // Corrects state using the observation stored in workspace_
+  void CorrectRightInvariant();
+  void CorrectLeftInvariant();
+  // Computes the Kalman gain and the state correction vector (workspace_.delta)
+  // and updates the covariance P in place, exploiting the sparsity of H. 
+  void SparseKalmanUpdate(MatrixP& P);
   // void CorrectFullState(const Observation& obs); // TODO
 };
 
+using InEKF = InEKFTpl<Eigen::Dynamic>;
+
 } // namespace legged_state_estimator 
 
 #endif // LEGGED_STATE_ESTIMATOR_INEKF_HPP_
@@ -18,55 +18,73 @@
 
 #include "Eigen/Core"
 
+#include "legged_state_estimator/checkpoint.hpp"
+
 
 namespace legged_state_estimator {
 
 enum StateType {WorldCentric, BodyCentric};
 
-class InEKFState {
+template <int MaxAugmented>
+class InEKFTpl;
+
+/**
+ * State of the InEKF. If MaxAugmented is not Eigen::Dynamic, the matrices have
+ * a fixed capacity for at most MaxAugmented augmented columns (contacts or 
+ * landmarks) and are stored without heap allocation. 
+ */
+template <int MaxAugmented>
+class InEKFStateTpl {
 public:
-  InEKFState();
-  InEKFState(const Eigen::MatrixXd& X);
-  InEKFState(const Eigen::MatrixXd& X, const Eigen::VectorXd& Theta);
-  InEKFState(const Eigen::MatrixXd& X, const Eigen::VectorXd& Theta, const Eigen::MatrixXd& P);
-
-  ~InEKFState() = default;
-
-  InEKFState(const InEKFState&) = default;
-  InEKFState& operator=(const InEKFState&) = default;
-  InEKFState(InEKFState&&) noexcept = default;
-  InEKFState& operator=(InEKFState&&) noexcept = default;
-
-  const Eigen::MatrixXd& getX() const;
-  const Eigen::VectorXd& getTheta() const;
-  const Eigen::MatrixXd& getP() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 3> getRotation() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 1> getVelocity() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 1> getPosition() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 1> getVector(int id) const;
-  const Eigen::VectorBlock<const Eigen::VectorXd, 3> getGyroscopeBias() const;
-  const Eigen::VectorBlock<const Eigen::VectorXd, 3> getAccelerometerBias() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 3> getRotationCovariance() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 3> getVelocityCovariance() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 3> getPositionCovariance() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 3> getGyroscopeBiasCovariance() const;
-  const Eigen::Block<const Eigen::MatrixXd, 3, 3> getAccelerometerBiasCovariance() const;
+  static constexpr int MaxDimX = (MaxAugmented == Eigen::Dynamic) ? Eigen::Dynamic : 5+MaxAugmented;
+  static constexpr int MaxDimTheta = (MaxAugmented == Eigen::Dynamic) ? Eigen::Dynamic : 6;
+  static constexpr int MaxDimP = (MaxAugmented == Eigen::Dynamic) ? Eigen::Dynamic : 15+3*MaxAugmented;
+  using MatrixX = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::ColMajor, MaxDimX, MaxDimX>;
+  using VectorTheta = Eigen::Matrix<double, Eigen::Dynamic, 1, Eigen::ColMajor, MaxDimTheta, 1>;
+  using MatrixP = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::ColMajor, MaxDimP, MaxDimP>;
+
+  InEKFStateTpl();
+  InEKFStateTpl(const MatrixX& X);
+  InEKFStateTpl(const MatrixX& X, const VectorTheta& Theta);
+  InEKFStateTpl(const MatrixX& X, const VectorTheta& Theta, const MatrixP& P);
+
+  ~InEKFStateTpl() = default;
+
+  InEKFStateTpl(const InEKFStateTpl&) = default;
+  InEKFStateTpl& operator=(const InEKFStateTpl&) = default;
+  InEKFStateTpl(InEKFStateTpl&&) noexcept = default;
+  InEKFStateTpl& operator=(InEKFStateTpl&&) noexcept = default;
+
+  const MatrixX& getX() const;
+  const VectorTheta& getTheta() const;
+  const MatrixP& getP() const;
+  const Eigen::Block<const MatrixX, 3, 3> getRotation() const;
+  const Eigen::Block<const MatrixX, 3, 1> getVelocity() const;
+  const Eigen::Block<const MatrixX, 3, 1> getPosition() const;
+  const Eigen::Block<const MatrixX, 3, 1> getVector(int id) const;
+  const Eigen::VectorBlock<const VectorTheta, 3> getGyroscopeBias() const;
+  const Eigen::VectorBlock<const VectorTheta, 3> getAccelerometerBias() const;
+  const Eigen::Block<const MatrixP, 3, 3> getRotationCovariance() const;
+  const Eigen::Block<const MatrixP, 3, 3> getVelocityCovariance() const;
+  const Eigen::Block<const MatrixP, 3, 3> getPositionCovariance() const;
+  const Eigen::Block<const MatrixP, 3, 3> getGyroscopeBiasCovariance() const;
+  const Eigen::Block<const MatrixP, 3, 3> getAccelerometerBiasCovariance() const;
   int dimX() const;
   int dimTheta() const;
   int dimP() const;
   const StateType getStateType() const;
-  const Eigen::MatrixXd getWorldX() const;
+  const MatrixX getWorldX() const;
   const Eigen::Matrix3d getWorldRotation() const;
   const Eigen::Vector3d getWorldVelocity() const;
   const Eigen::Vector3d getWorldPosition() const;
-  const Eigen::MatrixXd getBodyX() const;
+  const MatrixX getBodyX() const;
   const Eigen::Matrix3d getBodyRotation() const;
   const Eigen::Vector3d getBodyVelocity() const;
   const Eigen::Vector3d getBodyPosition() const;
 
-  void setX(const Eigen::MatrixXd& X);
-  void setP(const Eigen::MatrixXd& P);
-  void setTheta(const Eigen::VectorXd& Theta);
+  void setX(const MatrixX& X);
+  void setP(const MatrixP& P);
+  void setTheta(const VectorTheta& Theta);
   void setRotation(const Eigen::Matrix3d& R);
   void setVelocity(const Eigen::Vector3d& v);
   void setPosition(const Eigen::Vector3d& p);
@@ -80,19 +98,28 @@ public:
   void copyDiagX(const int n, Eigen::MatrixXd& BigX) const;
   void copyDiagXinv(const int n, Eigen::MatrixXd& BigXinv) const;
 
-  Eigen::MatrixXd calcXinv() const;
+  MatrixX calcXinv() const;
 
-  friend std::ostream& operator<<(std::ostream& os, const InEKFState& s);  
+  void saveCheckpoint(CheckpointWriter& writer) const;
+  void loadCheckpoint(CheckpointReader& reader);
 
   EIGEN_MAKE_ALIGNED_OPERATOR_NEW
 
 private:
+  // InEKF edits the blocks of X and P in place, e.g., for the contact slots
+  template <int> friend class InEKFTpl;
+
   StateType state_type_ = StateType::WorldCentric; 
-  Eigen::MatrixXd X_;
-  Eigen::VectorXd Theta_;
-  Eigen::MatrixXd P_;
+  MatrixX X_;
+  VectorTheta Theta_;
+  MatrixP P_;
 };
 
+template <int MaxAugmented>
+std::ostream& operator<<(std::ostream& os, const InEKFStateTpl<MaxAugmented>& s);
+
+using InEKFState = InEKFStateTpl<Eigen::Dynamic>;
+
 } // namespace legged_state_estimator 
 
 #endif // LEGGED_STATE_ESTIMATOR_INEKF_STATE_HPP_
\ No newline at end of file
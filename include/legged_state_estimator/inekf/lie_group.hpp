@@ -24,6 +24,9 @@ long int factorial(const int n);
 Eigen::Matrix3d skew(const Eigen::Vector3d& v);
 Eigen::Matrix3d Gamma_SO3(const Eigen::Vector3d& w, const int n,
                           const double exp_map_tol=1.0e-10);
+// Computes Gamma_SO3(w, m) for m = 0, 1, 2, 3 at once
+void Gamma_SO3(const Eigen::Vector3d& w, Eigen::Matrix3d& G0, Eigen::Matrix3d& G1,
+               Eigen::Matrix3d& G2, Eigen::Matrix3d& G3);
 Eigen::Matrix3d Exp_SO3(const Eigen::Vector3d& w);
 Eigen::Matrix3d LeftJacobian_SO3(const Eigen::Vector3d& w);
 Eigen::Matrix3d RightJacobian_SO3(const Eigen::Vector3d& w);
@@ -31,6 +34,54 @@ Eigen::MatrixXd Exp_SEK3(const Eigen::VectorXd& v,
                          const double exp_map_tol=1.0e-10);
 Eigen::MatrixXd Adjoint_SEK3(const Eigen::MatrixXd& X);
 
+// Overloads of Exp_SEK3() and Adjoint_SEK3() that write into preallocated
+// (e.g., fixed-capacity) matrices.
+template <typename VectorType, typename MatrixType>
+void Exp_SEK3(const Eigen::MatrixBase<VectorType>& v, 
+              Eigen::PlainObjectBase<MatrixType>& X, 
+              const double exp_map_tol=1.0e-10) {
+  // Computes the vectorized exponential map for SE_K(3)
+  const int K = (v.size()-3)/3;
+  X.setIdentity(3+K,3+K);
+  Eigen::Matrix3d R;
+  Eigen::Matrix3d Jl;
+  const Eigen::Vector3d w = v.template head<3>();
+  const double theta = w.norm();
+  if (theta < exp_map_tol) {
+    R = Eigen::Matrix3d::Identity();
+    Jl = Eigen::Matrix3d::Identity();
+  } else {
+    const Eigen::Matrix3d A = skew(w);
+    const double theta2 = theta*theta;
+    const double stheta = std::sin(theta);
+    const double ctheta = std::cos(theta);
+    const double oneMinusCosTheta2 = (1-ctheta)/(theta2);
+    const Eigen::Matrix3d A2 = A*A;
+    R.noalias() = Eigen::Matrix3d::Identity() 
+                   + (stheta/theta) * A + oneMinusCosTheta2 * A2;
+    Jl.noalias() = Eigen::Matrix3d::Identity() 
+                   + oneMinusCosTheta2*A + ((theta-stheta)/(theta2*theta)) * A2;
+  }
+  X.template block<3,3>(0,0) = R;
+  for (int i=0; i<K; ++i) {
+    X.template block<3,1>(0,3+i).noalias() = Jl * v.template segment<3>(3+3*i);
+  }
+}
+
+template <typename MatrixType1, typename MatrixType2>
+void Adjoint_SEK3(const Eigen::MatrixBase<MatrixType1>& X, 
+                  Eigen::PlainObjectBase<MatrixType2>& Adj) {
+  // Compute Adjoint(X) for X in SE_K(3)
+  const int K = X.cols()-3;
+  Adj.setZero(3+3*K, 3+3*K);
+  const Eigen::Matrix3d R = X.template block<3,3>(0,0);
+  Adj.template block<3,3>(0,0) = R;
+  for (int i=0; i<K; ++i) {
+    Adj.template block<3,3>(3+3*i,3+3*i) = R;
+    Adj.template block<3,3>(3+3*i,0).noalias() = skew(X.template block<3,1>(0,3+i)) * R;
+  }
+}
+
 } // namespace legged_state_estimator 
 
 #endif // LEGGED_STATE_ESTIMATOR_LIEGROUP_HPP_
\ No newline at end of file
@@ -17,6 +17,8 @@
 
 #include "Eigen/Core"
 
+#include "legged_state_estimator/checkpoint.hpp"
+
 
 namespace legged_state_estimator {
 
@@ -57,6 +59,9 @@ public:
   const Eigen::Matrix3d& getAccelerometerBiasCov() const;
   const Eigen::Matrix3d& getContactCov() const;
 
+  void saveCheckpoint(CheckpointWriter& writer) const;
+  void loadCheckpoint(CheckpointReader& reader);
+
   friend std::ostream& operator<<(std::ostream& os, const NoiseParams& p);  
 
   EIGEN_MAKE_ALIGNED_OPERATOR_NEW
@@ -3,6 +3,8 @@
 
 #include <string>
 #include <vector>
+#include <chrono>
+#include <memory>
 
 #include "Eigen/Core"
 #include "Eigen/Geometry"
@@ -15,13 +17,46 @@
 #include "legged_state_estimator/contact_estimator.hpp"
 #include "legged_state_estimator/low_pass_filter.hpp"
 #include "legged_state_estimator/legged_state_estimator_settings.hpp"
+#include "legged_state_estimator/timing_stats.hpp"
+#include "legged_state_estimator/allocation_audit.hpp"
+#include "legged_state_estimator/estimate_publisher.hpp"
 
 
 namespace legged_state_estimator {
 
+///
+/// @struct EstimateRecordField
+/// @brief Field of the contiguous record of the state estimates.
+///
+struct EstimateRecordField {
+  /// 
+  /// @brief Name of the field.
+  ///
+  std::string name;
+  /// 
+  /// @brief Offset of the field in the record (number of doubles).
+  ///
+  int offset;
+  /// 
+  /// @brief Number of rows of the field.
+  ///
+  int rows;
+  /// 
+  /// @brief Number of columns of the field. Matrices are stored in row-major
+  /// order.
+  ///
+  int cols;
+};
+
+
 ///
 /// @class LeggedStateEstimator
 /// @brief State estimator for legged robots.
+/// @note Thread safety: an instance must not be used from multiple threads at
+/// the same time. Distinct instances share no mutable state (each owns its 
+/// robot model, contact estimator, and InEKF) and can be updated concurrently, 
+/// e.g., from the Python bindings, which release the GIL in init() and 
+/// update().
 ///
 class LeggedStateEstimator {
 public:
@@ -31,6 +66,12 @@ public:
   using Matrix3d = Eigen::Matrix<double, 3, 3>;
   using Matrix6d = Eigen::Matrix<double, 6, 6>;
 
+  ///
+  /// @brief InEKF with fixed-capacity (stack allocated) storage for the four 
+  /// contacts of a quadruped. RobotModel supports exactly four contact frames.
+  ///
+  using InEKFType = InEKFTpl<4>;
+
   ///
   /// @brief Constructor.
   /// @param[in] settings State estimator settings.
@@ -47,13 +88,25 @@ public:
   ///
   ~LeggedStateEstimator();
 
-  LeggedStateEstimator(const LeggedStateEstimator&) = default;
-  LeggedStateEstimator& operator=(const LeggedStateEstimator&) = default;
+  ///
+  /// @brief Copy constructor. The copy does not publish the estimates (its 
+  /// estimate_publisher_name is empty), since the shared-memory segment of 
+  /// the estimate publisher has a single writer.
+  ///
+  LeggedStateEstimator(const LeggedStateEstimator& other);
+
+  ///
+  /// @brief Copy assignment. The estimate publisher of this estimator is kept
+  /// and publishes the copied estimates.
+  ///
+  LeggedStateEstimator& operator=(const LeggedStateEstimator& other);
+
   LeggedStateEstimator(LeggedStateEstimator&&) noexcept = default;
   LeggedStateEstimator& operator=(LeggedStateEstimator&&) noexcept = default;
 
   ///
-  /// @brief Initializes the state estimator.
+  /// @brief Initializes the state estimator. The estimates (and the estimate
+  /// record) are set to the initial state, but are not published.
   /// @param[in] base_pos Base position. 
   /// @param[in] base_quat Base orientation expressed by quaternion (x, y, z, w). 
   /// @param[in] base_lin_vel_world Base linear velocity expressed in the world
@@ -103,6 +156,43 @@ public:
               const Eigen::VectorXd& qJ, const Eigen::VectorXd& dqJ, 
               const Eigen::VectorXd& tauJ);
 
+  ///
+  /// @brief Processes a timestamped IMU measurement, i.e., propagates the 
+  /// state with the time since the previous measurement (IMU or joints). Can 
+  /// be called at a higher rate than pushJoints() instead of update(). 
+  /// @param[in] t Time of the measurement. Must be greater than that of the 
+  /// previous IMU measurement.
+  /// @param[in] imu_gyro_raw Raw measurement of the base angular velocity 
+  /// expressed in the body local coordinate from IMU gyro sensor.
+  /// @param[in] imu_lin_accel_raw Raw measurement of the base linear 
+  /// acceleration expressed in the body local coordinate from IMU accelerometer. 
+  ///
+  void pushIMU(const double t, const Eigen::Vector3d& imu_gyro_raw, 
+               const Eigen::Vector3d& imu_lin_accel_raw);
+
+  ///
+  /// @brief Processes timestamped joint measurements, i.e., propagates the 
+  /// state to t with the latest IMU measurement and corrects it with the leg 
+  /// kinematics. The low pass filters of the joint measurements use the time 
+  /// since the previous joint measurements. 
+  /// @param[in] t Time of the measurements. Must be greater than that of the 
+  /// previous joint measurements. If t is less than the time of the latest 
+  /// IMU measurement, the correction is applied at the time of the latter.
+  /// @param[in] qJ Raw measurement of the joint positions. 
+  /// @param[in] dqJ Raw measurement of the joint velocities. 
+  /// @param[in] tauJ Raw measurement of the joint torques. 
+  ///
+  void pushJoints(const double t, const Eigen::VectorXd& qJ, 
+                  const Eigen::VectorXd& dqJ, const Eigen::VectorXd& tauJ);
+
+  ///
+  /// @brief Gets the time of the estimates, i.e., the time up to which the 
+  /// state has been propagated by pushIMU() and pushJoints(). update() 
+  /// advances the time by the sampling time.
+  /// @return Time of the estimates.
+  ///
+  double getEstimateTime() const;
+
   ///
   /// @return const reference to the base position estimate.
   ///
@@ -130,7 +220,7 @@ public:
   /// @return const reference to the base linear velocity estimate expressed in 
   /// the body local coordinate.
   ///
-  const Eigen::Vector3d getBaseLinearVelocityEstimateLocal() const;
+  const Eigen::Vector3d& getBaseLinearVelocityEstimateLocal() const;
 
   ///
   /// @return const reference to the base angular velocity estimate expressed in 
@@ -169,34 +259,129 @@ public:
   ///
   const Eigen::VectorXd& getJointTorqueEstimate() const;
 
+  ///
+  /// @return const reference to the contiguous record of all the estimates 
+  /// above and the contact probabilities. The record is updated in place in 
+  /// update() and its address does not change during the lifetime of the 
+  /// estimator. See getEstimateRecordLayout() for the layout.
+  ///
+  const Eigen::VectorXd& getEstimateRecord() const;
+
+  ///
+  /// @return const reference to the layout of the estimate record. 
+  ///
+  const std::vector<EstimateRecordField>& getEstimateRecordLayout() const;
+
+  ///
+  /// @return const reference to the state of the InEKF. 
+  ///
+  const InEKFType::State& getInEKFState() const;
+
   ///
   /// @return const reference to the conatct estimator. 
   ///
   const ContactEstimator& getContactEstimator() const;
 
+  ///
+  /// @return const reference to the robot model. 
+  ///
+  const RobotModel& getRobotModel() const;
+
   ///
   /// @return const reference to the state estimator settings. 
   ///
   const LeggedStateEstimatorSettings& getSettings() const;
 
+  ///
+  /// @return const reference to the latency histograms of the stages of 
+  /// update() and the counters of the contact augmentations and removals. 
+  /// Only recorded if LeggedStateEstimatorSettings::enable_timing_stats is 
+  /// true.
+  ///
+  const TimingStats& getTimingStats() const;
+
+  ///
+  /// @brief Clears the timing stats.
+  ///
+  void resetTimingStats();
+
+  ///
+  /// @brief Writes the estimator into a binary checkpoint: the settings, the 
+  /// state, the index maps, and the state history of InEKF, the states of the 
+  /// low pass filters, the contact estimator including the estimates of the
+  /// previous update, the estimates, and the times of the measurements. The 
+  /// timing stats, the allocation count, and the estimate publisher are not 
+  /// written.
+  /// @return Checkpoint.
+  ///
+  std::string saveCheckpoint() const;
+
+  ///
+  /// @brief Restores the estimator from a checkpoint written by 
+  /// saveCheckpoint(). The subsequent updates are identical to those of the 
+  /// checkpointed estimator. If the settings of the checkpoint differ from 
+  /// those of this estimator, e.g., if this estimator is default-constructed,
+  /// the estimator is reconstructed from the settings of the checkpoint. The 
+  /// estimate publisher, the timing stats, and the allocation count of this 
+  /// estimator are kept. The estimate record keeps its storage if its layout
+  /// is unchanged. The estimator is unchanged if an exception is thrown.
+  /// @param[in] checkpoint Checkpoint.
+  ///
+  void loadCheckpoint(const std::string& checkpoint);
+
+  ///
+  /// @brief Gets the number of the heap allocations in update() counted since
+  /// the construction. Only counted if 
+  /// LeggedStateEstimatorSettings::allocation_audit_mode is not 
+  /// AllocationAuditMode::NoAllocationAudit.
+  /// @return Number of the heap allocations.
+  ///
+  long getNumUpdateAllocations() const;
+
   EIGEN_MAKE_ALIGNED_OPERATOR_NEW
 
 private:
   LeggedStateEstimatorSettings settings_;
-  InEKF inekf_;
+  InEKFType inekf_;
   vectorKinematics leg_kinematics_;
   RobotModel robot_model_;
   ContactEstimator contact_estimator_;
   LowPassFilter<double, 3> lpf_gyro_accel_world_, lpf_lin_accel_world_;
   LowPassFilter<double, Eigen::Dynamic> lpf_dqJ_, lpf_ddqJ_, lpf_tauJ_;
+  Eigen::VectorXd ddqJ_raw_;
   Vector3d imu_gyro_raw_world_, imu_gyro_raw_world_prev_, imu_gyro_accel_world_, 
            imu_gyro_accel_local_, imu_lin_accel_raw_world_, imu_lin_accel_local_,
            base_pos_estimate_, base_lin_vel_world_estimate_, base_lin_vel_local_estimate_,
            base_ang_vel_world_estimate_, base_ang_vel_local_estimate_,
-           imu_gyro_bias_estimate_, imu_lin_acc_bias_estimate_;
+           imu_gyro_bias_estimate_, imu_lin_acc_bias_estimate_,
+           base_lin_vel_leg_odometry_, base_ang_vel_leg_odometry_, leg_velocity_;
   Matrix3d base_rot_estimate_;
   Vector6d imu_raw_;
   Vector4d base_quat_estimate_;
+  Eigen::VectorXd estimate_record_;
+  std::vector<EstimateRecordField> estimate_record_layout_;
+  TimingStats timing_stats_;
+  long num_update_allocations_;
+  double imu_time_, joint_time_, estimate_time_;
+  bool imu_received_, joints_received_;
+  std::shared_ptr<EstimatePublisher> estimate_publisher_;
+  EstimateSnapshot estimate_snapshot_;
+
+  void checkJointMeasurements(const Eigen::VectorXd& qJ, const Eigen::VectorXd& dqJ, 
+                              const Eigen::VectorXd& tauJ) const;
+  void propagate(const Eigen::Vector3d& imu_gyro_raw, 
+                 const Eigen::Vector3d& imu_lin_accel_raw, const double dt,
+                 std::chrono::steady_clock::time_point& stage_start_time);
+  void correct(const Eigen::VectorXd& qJ, const Eigen::VectorXd& dqJ, 
+               const Eigen::VectorXd& tauJ, const double dt,
+               std::chrono::steady_clock::time_point& stage_start_time);
+  void restoreEstimates();
+  void updateEstimates();
+  void publishEstimates();
+  void initEstimateRecord();
+  void updateEstimateRecord();
+  void recordStage(const UpdateStage stage, 
+                   std::chrono::steady_clock::time_point& stage_start_time);
 
 };
 
@@ -0,0 +1,225 @@
+#ifndef LEGGED_STATE_ESTIMATOR_LEGGED_STATE_ESTIMATOR_POOL_HPP_
+#define LEGGED_STATE_ESTIMATOR_LEGGED_STATE_ESTIMATOR_POOL_HPP_
+
+#include <vector>
+#include <thread>
+#include <mutex>
+#include <condition_variable>
+#include <exception>
+
+#include "Eigen/Core"
+#include "Eigen/StdVector"
+
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/legged_state_estimator_settings.hpp"
+
+
+namespace legged_state_estimator {
+
+///
+/// @class LeggedStateEstimatorPool
+/// @brief Owns a set of independent state estimators and updates them in
+/// parallel on a persistent pool of native threads. The sensor measurements
+/// and the estimates are stacked row-wise, i.e., the i-th row belongs to the
+/// i-th estimator.
+/// @note Thread safety: the pool itself must not be used from multiple threads
+/// at the same time. 
+///
+class LeggedStateEstimatorPool {
+public:
+  using MatrixXdRowMajor = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor>;
+
+  ///
+  /// @brief Constructor.
+  /// @param[in] settings Settings of each state estimator. All the estimators
+  /// must have the same number of joints and contacts.
+  /// @param[in] num_threads Number of threads. If non-positive, the number of
+  /// hardware threads is used. The number of threads is limited by the number
+  /// of the estimators. Default is 0.
+  ///
+  LeggedStateEstimatorPool(const std::vector<LeggedStateEstimatorSettings>& settings,
+                           const int num_threads=0);
+
+  ///
+  /// @brief Constructor.
+  /// @param[in] settings Settings shared by all the state estimators.
+  /// @param[in] num_estimators Number of the state estimators. Must be positive.
+  /// @param[in] num_threads Number of threads. If non-positive, the number of
+  /// hardware threads is used. The number of threads is limited by the number
+  /// of the estimators. Default is 0.
+  ///
+  LeggedStateEstimatorPool(const LeggedStateEstimatorSettings& settings,
+                           const int num_estimators, const int num_threads=0);
+
+  ///
+  /// @brief Destructor. Joins the worker threads.
+  ///
+  ~LeggedStateEstimatorPool();
+
+  LeggedStateEstimatorPool(const LeggedStateEstimatorPool&) = delete;
+  LeggedStateEstimatorPool& operator=(const LeggedStateEstimatorPool&) = delete;
+  LeggedStateEstimatorPool(LeggedStateEstimatorPool&&) = delete;
+  LeggedStateEstimatorPool& operator=(LeggedStateEstimatorPool&&) = delete;
+
+  ///
+  /// @brief Initializes all the state estimators with zero velocity and biases.
+  /// @param[in] base_pos Base positions. Size must be size() x 3.
+  /// @param[in] base_quat Base orientations expressed by quaternions
+  /// (x, y, z, w). Size must be size() x 4.
+  ///
+  void init(const Eigen::MatrixXd& base_pos, const Eigen::MatrixXd& base_quat);
+
+  ///
+  /// @brief Initializes all the state estimators.
+  /// @param[in] base_pos Base positions. Size must be size() x 3.
+  /// @param[in] base_quat Base orientations expressed by quaternions
+  /// (x, y, z, w). Size must be size() x 4.
+  /// @param[in] base_lin_vel_world Base linear velocities expressed in the
+  /// world coordinate. Size must be size() x 3.
+  /// @param[in] imu_gyro_bias Initial guesses of the IMU gyro biases. Size
+  /// must be size() x 3.
+  /// @param[in] imu_lin_accel_bias Initial guesses of the IMU linear
+  /// acceleration biases. Size must be size() x 3.
+  ///
+  void init(const Eigen::MatrixXd& base_pos, const Eigen::MatrixXd& base_quat,
+            const Eigen::MatrixXd& base_lin_vel_world,
+            const Eigen::MatrixXd& imu_gyro_bias,
+            const Eigen::MatrixXd& imu_lin_accel_bias);
+
+  ///
+  /// @brief Updates all the state estimators in parallel. The sizes of the
+  /// arguments are checked before any estimator is updated.
+  /// @param[in] imu_gyro_raw Raw measurements of the base angular velocities.
+  /// Size must be size() x 3.
+  /// @param[in] imu_lin_accel_raw Raw measurements of the base linear
+  /// accelerations. Size must be size() x 3.
+  /// @param[in] qJ Raw measurements of the joint positions. Size must be
+  /// size() x nJ().
+  /// @param[in] dqJ Raw measurements of the joint velocities. Size must be
+  /// size() x nJ().
+  /// @param[in] tauJ Raw measurements of the joint torques. Size must be
+  /// size() x nJ().
+  ///
+  void update(const Eigen::MatrixXd& imu_gyro_raw,
+              const Eigen::MatrixXd& imu_lin_accel_raw,
+              const Eigen::MatrixXd& qJ, const Eigen::MatrixXd& dqJ,
+              const Eigen::MatrixXd& tauJ);
+
+  ///
+  /// @return Number of the state estimators.
+  ///
+  int size() const;
+
+  ///
+  /// @return Number of the threads used in update().
+  ///
+  int numThreads() const;
+
+  ///
+  /// @return Number of the joints of each robot.
+  ///
+  int nJ() const;
+
+  ///
+  /// @return Number of the contacts of each robot.
+  ///
+  int numContacts() const;
+
+  ///
+  /// @param[in] i Index of the state estimator.
+  /// @return Reference to the i-th state estimator.
+  ///
+  LeggedStateEstimator& getEstimator(const int i);
+
+  ///
+  /// @param[in] i Index of the state estimator.
+  /// @return const reference to the i-th state estimator.
+  ///
+  const LeggedStateEstimator& getEstimator(const int i) const;
+
+  ///
+  /// @return const reference to the stacked base position estimates
+  /// (size() x 3).
+  ///
+  const MatrixXdRowMajor& getBasePositionEstimate() const;
+
+  ///
+  /// @return const reference to the stacked base orientation estimates
+  /// expressed by quaternions (size() x 4).
+  ///
+  const MatrixXdRowMajor& getBaseQuaternionEstimate() const;
+
+  ///
+  /// @return const reference to the stacked base linear velocity estimates
+  /// expressed in the world frame (size() x 3).
+  ///
+  const MatrixXdRowMajor& getBaseLinearVelocityEstimateWorld() const;
+
+  ///
+  /// @return const reference to the stacked base linear velocity estimates
+  /// expressed in the body local coordinate (size() x 3).
+  ///
+  const MatrixXdRowMajor& getBaseLinearVelocityEstimateLocal() const;
+
+  ///
+  /// @return const reference to the stacked base angular velocity estimates
+  /// expressed in the world frame (size() x 3).
+  ///
+  const MatrixXdRowMajor& getBaseAngularVelocityEstimateWorld() const;
+
+  ///
+  /// @return const reference to the stacked base angular velocity estimates
+  /// expressed in the local frame (size() x 3).
+  ///
+  const MatrixXdRowMajor& getBaseAngularVelocityEstimateLocal() const;
+
+  ///
+  /// @return const reference to the stacked IMU gyro bias estimates
+  /// (size() x 3).
+  ///
+  const MatrixXdRowMajor& getIMUGyroBiasEstimate() const;
+
+  ///
+  /// @return const reference to the stacked IMU linear acceleration bias
+  /// estimates (size() x 3).
+  ///
+  const MatrixXdRowMajor& getIMULinearAccelerationBiasEstimate() const;
+
+  ///
+  /// @return const reference to the stacked contact probabilities
+  /// (size() x numContacts()).
+  ///
+  const MatrixXdRowMajor& getContactProbability() const;
+
+private:
+  void startThreads(const int num_threads);
+  void workerLoop(const int thread_id);
+  void updateChunk(const int thread_id);
+  void updateEstimator(const int i);
+  void copyEstimates(const int i);
+
+  std::vector<LeggedStateEstimator, Eigen::aligned_allocator<LeggedStateEstimator>> estimators_;
+  std::vector<Eigen::VectorXd> qJ_, dqJ_, tauJ_;
+  int nJ_, num_contacts_;
+  MatrixXdRowMajor base_pos_estimate_, base_quat_estimate_,
+                   base_lin_vel_world_estimate_, base_lin_vel_local_estimate_,
+                   base_ang_vel_world_estimate_, base_ang_vel_local_estimate_,
+                   imu_gyro_bias_estimate_, imu_lin_acc_bias_estimate_,
+                   contact_probability_;
+  // Inputs of the on-going update(). Only valid while the workers are running.
+  const Eigen::MatrixXd *imu_gyro_raw_, *imu_lin_accel_raw_, *qJ_raw_,
+                        *dqJ_raw_, *tauJ_raw_;
+  // Worker threads. The caller's thread works on the chunk 0.
+  std::vector<std::thread> workers_;
+  std::vector<std::exception_ptr> exceptions_;
+  std::mutex mtx_;
+  std::condition_variable start_cv_, done_cv_;
+  unsigned long long generation_;
+  int num_threads_, num_running_;
+  bool shutdown_;
+
+};
+
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_LEGGED_STATE_ESTIMATOR_POOL_HPP_
@@ -6,10 +6,23 @@
 
 #include "legged_state_estimator/inekf/noise_params.hpp"
 #include "legged_state_estimator/contact_estimator.hpp"
+#include "legged_state_estimator/allocation_audit.hpp"
+#include "legged_state_estimator/checkpoint.hpp"
 
 
 namespace legged_state_estimator {
 
+///
+/// @brief Measurement model of the leg kinematics in the state estimator.
+/// ContactPosition: the positions of the stance feet relative to the IMU are 
+/// measured and the contact positions are augmented to the state of InEKF 
+/// (InEKF::CorrectKinematics()).
+/// BaseVelocity: the velocity of the IMU is measured from the joint 
+/// velocities of the stance legs (leg odometry) and the state of InEKF is 
+/// kept at the fixed dimension of the core states (InEKF::CorrectVelocity()).
+///
+enum LegOdometryMode {ContactPosition, BaseVelocity};
+
 ///
 /// @class LeggedStateEstimatorSettings
 /// @brief Settings of the legged state estimator.
@@ -47,6 +60,57 @@ public:
   ///
   bool dynamic_contact_estimation = false;
 
+  /// 
+  /// @brief Keep a fixed slot for each contact in the state of InEKF instead 
+  /// of removing and augmenting the contact position at every lift-off and 
+  /// touchdown. The estimates are unchanged. Default is false.
+  ///
+  bool contact_slot_mode = false;
+
+  /// 
+  /// @brief Backend of the leg kinematics of the robot model. Default is 
+  /// KinematicsBackend::Pinocchio.
+  ///
+  KinematicsBackend kinematics_backend = KinematicsBackend::Pinocchio;
+
+  /// 
+  /// @brief Measurement model of the leg kinematics. Default is 
+  /// LegOdometryMode::ContactPosition.
+  ///
+  LegOdometryMode leg_odometry_mode = LegOdometryMode::ContactPosition;
+
+  /// 
+  /// @brief Record the latency of each stage of LeggedStateEstimator::update()
+  /// with a monotonic clock (LeggedStateEstimator::getTimingStats()). Default 
+  /// is false.
+  ///
+  bool enable_timing_stats = false;
+
+  /// 
+  /// @brief Audit the heap allocations of LeggedStateEstimator::update() 
+  /// (LeggedStateEstimator::getNumUpdateAllocations()). The update does not 
+  /// allocate after warm-up, i.e., once the contacts have been augmented. 
+  /// Requires the allocation hooks (allocation_audit_hooks.hpp). Default is 
+  /// AllocationAuditMode::NoAllocationAudit.
+  ///
+  AllocationAuditMode allocation_audit_mode = NoAllocationAudit;
+
+  /// 
+  /// @brief Name of the shared-memory segment to which the estimates are 
+  /// published after every update (EstimatePublisher). The estimates are not 
+  /// published if empty. The segment has a single writer: copies of the 
+  /// estimator do not publish, and constructing a second estimator with the 
+  /// same name throws. Default is empty.
+  ///
+  std::string estimate_publisher_name = "";
+
+  /// 
+  /// @brief Directory of the binary cache of the robot models built from 
+  /// URDF (RobotModel::buildFloatingBaseModel()). The URDF is parsed at every
+  /// construction if empty. Default is empty.
+  ///
+  std::string robot_model_cache_dir = "";
+
   /// 
   /// @brief Noise (covariance) on contact position. (Possibly is not used in 
   /// InEKF. Contact covariance in noise_params are more important).
@@ -59,6 +123,13 @@ public:
   ///
   double contact_rotation_noise;
 
+  /// 
+  /// @brief Noise (standard deviation) on the base velocity measured by each 
+  /// stance leg. Only used with LegOdometryMode::BaseVelocity. The contact 
+  /// force covariance of the contact estimator is added to the covariance.
+  ///
+  double leg_odometry_velocity_noise;
+
   /// 
   /// @brief Time step of estimation. 
   ///
@@ -105,6 +176,20 @@ public:
   static LeggedStateEstimatorSettings UnitreeA1(const std::string& urdf_path, 
                                                 const double sampling_time);
 
+  /// 
+  /// @brief Writes the settings into a checkpoint. estimate_publisher_name is
+  /// not written, because the shared-memory segment belongs to the process.
+  /// @param[in] writer Checkpoint writer.
+  ///
+  void saveCheckpoint(CheckpointWriter& writer) const;
+
+  /// 
+  /// @brief Reads the settings from a checkpoint. estimate_publisher_name is
+  /// unchanged.
+  /// @param[in] reader Checkpoint reader.
+  ///
+  void loadCheckpoint(CheckpointReader& reader);
+
 };
 
 } // namespace legged_state_estimator
@@ -7,6 +7,8 @@
 
 #include "Eigen/Core"
 
+#include "legged_state_estimator/checkpoint.hpp"
+
 
 namespace legged_state_estimator {
 
@@ -29,7 +31,8 @@ public:
   LowPassFilter(const Scalar sampling_time, const Scalar cutoff_frequency,
                 const int dynamic_size=0)
     : estimate_(),
-      alpha_(0.0) {
+      alpha_(0.0),
+      tau_(0.0) {
     if (sampling_time <= 0) {
       throw std::invalid_argument(
           "[LowPassFilter] invalid argment: sampling_time must be positive");
@@ -42,8 +45,8 @@ public:
       throw std::invalid_argument(
           "[LowPassFilter] invalid argment: dynamic_size must be positive");
     }
-    const Scalar tau = 1.0 / (2.0*M_PI*cutoff_frequency);
-    alpha_ = tau / (tau + sampling_time);
+    tau_ = 1.0 / (2.0*M_PI*cutoff_frequency);
+    alpha_ = tau_ / (tau_ + sampling_time);
     if (dim == Eigen::Dynamic) {
       estimate_.resize(dynamic_size);
     }
@@ -55,7 +58,8 @@ public:
   ///
   LowPassFilter()
     : estimate_(),
-      alpha_(0.0) {
+      alpha_(0.0),
+      tau_(0.0) {
   }
 
   ///
@@ -92,6 +96,18 @@ public:
     estimate_.noalias() += (1.0-alpha_) * observation;
   }
 
+  ///
+  /// @brief Updates the estimate with a variable sampling time.
+  /// @param[in] observation Observation. 
+  /// @param[in] sampling_time Time since the previous observation. Must be 
+  /// non-negative.
+  ///
+  void update(const Vector& observation, const Scalar sampling_time) {
+    const Scalar alpha = tau_ / (tau_ + sampling_time);
+    estimate_.array() *= alpha;
+    estimate_.noalias() += (1.0-alpha) * observation;
+  }
+
   ///
   /// @brief Gets the estimate.
   /// @return const reference to the estimate.
@@ -100,11 +116,31 @@ public:
     return estimate_;
   }
 
+  ///
+  /// @brief Writes the estimate and the coefficients into a checkpoint.
+  /// @param[in] writer Checkpoint writer.
+  ///
+  void saveCheckpoint(CheckpointWriter& writer) const {
+    writer.write(estimate_);
+    writer.write(alpha_);
+    writer.write(tau_);
+  }
+
+  ///
+  /// @brief Restores the estimate and the coefficients from a checkpoint.
+  /// @param[in] reader Checkpoint reader.
+  ///
+  void loadCheckpoint(CheckpointReader& reader) {
+    reader.read(estimate_);
+    reader.read(alpha_);
+    reader.read(tau_);
+  }
+
   EIGEN_MAKE_ALIGNED_OPERATOR_NEW
 
 private:
   Vector estimate_;
-  Scalar alpha_;
+  Scalar alpha_, tau_;
 };
 
 } // namespace legged_state_estimator 
@@ -19,10 +19,24 @@
 
 namespace legged_state_estimator {
 
+///
+/// @brief Backend of the leg kinematics (RobotModel::updateLegKinematics()).
+/// Pinocchio: forward kinematics and Jacobians of the full model by Pinocchio.
+/// LegChain: closed-form kinematic chains of the legs, which are extracted 
+/// from the model at construction. Only computes the contact and IMU frames 
+/// and the contact Jacobians. Requires that all the joints between the 
+/// floating base and the contact frames are revolute joints and that the IMU
+/// frame is attached to the floating base.
+///
+enum KinematicsBackend {Pinocchio, LegChain};
+
 ///
 /// @class RobotModel
 /// @brief Dynamics and kinematics model of robots. Wraps pinocchio::Model and 
 /// pinocchio::Data. Includes contacts.
+/// @note Thread safety: the update functions write into the owned 
+/// pinocchio::Data, so an instance must not be updated from multiple threads 
+/// at the same time. Distinct instances can be updated concurrently.
 ///
 class RobotModel {
 public:
@@ -83,6 +97,22 @@ public:
   RobotModel(RobotModel&&) noexcept = default;
   RobotModel& operator=(RobotModel&&) noexcept = default;
 
+  ///
+  /// @brief Sets the backend of the leg kinematics. 
+  /// @param[in] backend Backend of the leg kinematics. Default is 
+  /// KinematicsBackend::Pinocchio.
+  /// @note With KinematicsBackend::LegChain, updateLegKinematics() only 
+  /// updates the quantities returned by the getters of this class, i.e., the 
+  /// base and contact placements and the contact Jacobians. The rf 
+  /// pinocchio::WORLD falls back to Pinocchio.
+  ///
+  void setKinematicsBackend(const KinematicsBackend backend);
+
+  ///
+  /// @return The backend of the leg kinematics. 
+  ///
+  KinematicsBackend getKinematicsBackend() const;
+
   ///
   /// @brief Updates leg kinemarics.
   /// @param[in] qJ Joint positions. Size must be RobotModel::nJ().
@@ -136,12 +166,57 @@ public:
                         const pinocchio::ReferenceFrame rf=pinocchio::LOCAL_WORLD_ALIGNED);
 
   ///
-  /// @brief Updates leg dynamics.
+  /// @brief Updates leg dynamics, i.e., the nonlinear effects (Coriolis, 
+  /// centrifugal, and gravity terms) with the base at rest.
   /// @param[in] qJ Joint positions. Size must be RobotModel::nJ().
   /// @param[in] dqJ Joint velocities. Size must be RobotModel::nJ().
   ///
   void updateLegDynamics(const Eigen::VectorXd& qJ, const Eigen::VectorXd& dqJ);
 
+  ///
+  /// @brief Updates leg kinematics and leg dynamics in a single pass over the
+  /// model. Equivalent to updateLegKinematics(qJ, rf) followed by 
+  /// updateLegDynamics(qJ, dqJ). Skips the computation if the inputs are 
+  /// the same as the previous call.
+  /// @param[in] qJ Joint positions. Size must be RobotModel::nJ().
+  /// @param[in] dqJ Joint velocities. Size must be RobotModel::nJ().
+  /// @param[in] rf Reference frame of the kinematics. Default is 
+  /// pinocchio::LOCAL_WORLD_ALIGNED.
+  ///
+  void updateLegKinematicsAndDynamics(const Eigen::VectorXd& qJ, const Eigen::VectorXd& dqJ,
+                                      const pinocchio::ReferenceFrame rf=pinocchio::LOCAL_WORLD_ALIGNED);
+
+  ///
+  /// @brief Updates leg kinematics and dynamics in a single pass over the 
+  /// model. The kinematics are the same as updateLegKinematics(qJ, rf). The 
+  /// inverse dynamics are the same as updateDynamics() with the base 
+  /// orientation base_quat, which are computed with the gravity expressed in
+  /// the base frame. Skips the computation if the inputs are the same as the
+  /// previous call.
+  /// @param[in] base_quat Base orientation expressed by quaternion (x, y, z, w). 
+  /// @param[in] base_linear_vel Base linear velocity expressed in the body 
+  /// local coordinate. 
+  /// @param[in] base_angular_vel Base angular velocity expressed in the body 
+  /// local coordinate. 
+  /// @param[in] base_linear_acc Base linear acceleration expressed in the body 
+  /// local coordinate. 
+  /// @param[in] base_angular_acc Base angular acceleration expressed in the body 
+  /// local coordinate. 
+  /// @param[in] qJ Joint positions. Size must be RobotModel::nJ().
+  /// @param[in] dqJ Joint velocities. Size must be RobotModel::nJ().
+  /// @param[in] ddqJ Joint accelerations. Size must be RobotModel::nJ().
+  /// @param[in] rf Reference frame of the kinematics. Default is 
+  /// pinocchio::LOCAL_WORLD_ALIGNED.
+  ///
+  void updateLegKinematicsAndDynamics(const Eigen::Vector4d& base_quat, 
+                                      const Eigen::Vector3d& base_linear_vel, 
+                                      const Eigen::Vector3d& base_angular_vel, 
+                                      const Eigen::Vector3d& base_linear_acc, 
+                                      const Eigen::Vector3d& base_angular_acc,
+                                      const Eigen::VectorXd& qJ, const Eigen::VectorXd& dqJ,
+                                      const Eigen::VectorXd& ddqJ,
+                                      const pinocchio::ReferenceFrame rf=pinocchio::LOCAL_WORLD_ALIGNED);
+
   ///
   /// @brief Updates dynamics.
   /// @param[in] base_pos Base position. 
@@ -240,8 +315,29 @@ public:
 
   EIGEN_MAKE_ALIGNED_OPERATOR_NEW
 
+  ///
+  /// @brief Builds the Pinocchio model of a floating base robot from URDF.
+  /// @param[in] urdf_path Path to the URDF file.
+  /// @return Pinocchio robot model.
+  ///
   static pinocchio::Model buildFloatingBaseModel(const std::string& urdf_path);
 
+  ///
+  /// @brief Builds the Pinocchio model of a floating base robot from URDF 
+  /// through a binary cache of the built models. The cache is keyed by the 
+  /// hash of the URDF content and the Pinocchio version, so that an edited 
+  /// URDF is parsed again. The models are also kept in memory, i.e., they are
+  /// built once per process and inherited by forked processes. Writing the 
+  /// cache is best effort: the model is returned even if the cache directory
+  /// is not writable.
+  /// @param[in] urdf_path Path to the URDF file.
+  /// @param[in] cache_dir Directory of the cache, which is created if it 
+  /// does not exist. The URDF is parsed without the cache if empty.
+  /// @return Pinocchio robot model.
+  ///
+  static pinocchio::Model buildFloatingBaseModel(const std::string& urdf_path,
+                                                 const std::string& cache_dir);
+
 private:
   pinocchio::Model model_;
   pinocchio::Data data_;
@@ -249,6 +345,41 @@ private:
   std::vector<Eigen::MatrixXd, Eigen::aligned_allocator<Eigen::MatrixXd>> jac_6d_;
   int imu_frame_;
   std::vector<int> contact_frames_;
+  KinematicsBackend kinematics_backend_;
+
+  ///
+  /// @brief Kinematic chain of revolute joints from the floating base to a 
+  /// contact frame.
+  ///
+  struct LegChain {
+    std::vector<int> idx_q; // Indices of the joints in the joint positions
+    std::vector<int> idx_v; // Indices of the joints in the generalized velocity
+    std::vector<Eigen::Matrix3d, Eigen::aligned_allocator<Eigen::Matrix3d>> joint_rotations;
+    std::vector<Eigen::Vector3d, Eigen::aligned_allocator<Eigen::Vector3d>> joint_translations;
+    std::vector<Eigen::Vector3d, Eigen::aligned_allocator<Eigen::Vector3d>> joint_axes;
+    Eigen::Matrix3d frame_rotation;
+    Eigen::Vector3d frame_translation;
+    Eigen::Matrix3Xd joint_positions_world, joint_axes_world; // Workspace
+    EIGEN_MAKE_ALIGNED_OPERATOR_NEW
+  };
+  std::vector<LegChain, Eigen::aligned_allocator<LegChain>> leg_chains_;
+
+  void buildLegChains();
+  void updateLegChainKinematics(const Eigen::VectorXd& qJ, 
+                                const pinocchio::ReferenceFrame rf);
+
+  // Inputs of the previous updateLegKinematicsAndDynamics() (q_, v_, a_, and 
+  // the following), which are invalidated by the other update functions
+  bool fused_update_valid_;
+  bool fused_update_nle_;
+  pinocchio::ReferenceFrame fused_update_rf_;
+  Eigen::Vector3d fused_update_gravity_;
+
+  bool isSameFusedUpdate(const bool nle, const pinocchio::ReferenceFrame rf,
+                         const Eigen::Vector3d& gravity,
+                         const Eigen::VectorXd& qJ, const Eigen::VectorXd& dqJ) const;
+  void updateFramesFromJoints(const Eigen::VectorXd& qJ, 
+                              const pinocchio::ReferenceFrame rf);
 
 };
 
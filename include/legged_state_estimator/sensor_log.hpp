@@ -0,0 +1,208 @@
+#ifndef LEGGED_STATE_ESTIMATOR_SENSOR_LOG_HPP_
+#define LEGGED_STATE_ESTIMATOR_SENSOR_LOG_HPP_
+
+#include <string>
+#include <vector>
+#include <fstream>
+#include <cstdint>
+#include <cstddef>
+
+#include "Eigen/Core"
+
+
+namespace legged_state_estimator {
+
+///
+/// @enum SensorLogStreamType
+/// @brief Types of the streams of a sensor log. The layout of each record
+/// (excluding the timestamp, which is stored separately) is
+/// - IMUStream: gyro (3), linear acceleration (3).
+/// - JointStream: qJ (nJ), dqJ (nJ), tauJ (nJ).
+/// - ContactStream: pairs of contact id and contact state (0 or 1).
+/// - KinematicStream: contact id, quaternion (w, x, y, z), position (3),
+/// covariance (36, row-major). One record per contact.
+/// - LandmarkStream: landmark id, position (3). One record per landmark.
+/// - GroundTruthStream: base position (3), base quaternion (x, y, z, w), base
+/// linear velocity expressed in the world frame (3).
+/// Records of KinematicStream and LandmarkStream with the same timestamp
+/// belong to the same measurement.
+///
+enum SensorLogStreamType {
+  IMUStream,
+  JointStream,
+  ContactStream,
+  KinematicStream,
+  LandmarkStream,
+  GroundTruthStream
+};
+
+
+///
+/// @class SensorLogWriter
+/// @brief Writes a binary sensor log. The file consists of a header, the
+/// streams, and a stream table at the end. Each stream is stored as a
+/// contiguous array of the timestamps followed by a contiguous row-major
+/// array of the records (little-endian doubles aligned to 64 bytes), so that
+/// SensorLog can map the records without parsing or copies.
+///
+class SensorLogWriter {
+public:
+  using MatrixXdRowMajor = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor>;
+
+  ///
+  /// @brief Opens a binary sensor log for writing.
+  /// @param[in] path Path to the binary sensor log.
+  ///
+  SensorLogWriter(const std::string& path);
+
+  ///
+  /// @brief Destructor. Closes the log if not closed yet.
+  ///
+  ~SensorLogWriter();
+
+  SensorLogWriter(const SensorLogWriter&) = delete;
+  SensorLogWriter& operator=(const SensorLogWriter&) = delete;
+  SensorLogWriter(SensorLogWriter&&) = delete;
+  SensorLogWriter& operator=(SensorLogWriter&&) = delete;
+
+  ///
+  /// @brief Writes a stream. Each type of stream can be written only once.
+  /// @param[in] type Type of the stream.
+  /// @param[in] time Timestamps of the records.
+  /// @param[in] values Records. The number of rows must be time.size().
+  ///
+  void write(const SensorLogStreamType type, const Eigen::VectorXd& time,
+             const MatrixXdRowMajor& values);
+
+  ///
+  /// @brief Writes a stream. Each type of stream can be written only once.
+  /// @param[in] type Type of the stream.
+  /// @param[in] time Timestamps of the records.
+  /// @param[in] values Records stored contiguously. The size must be a
+  /// multiple of time.size().
+  ///
+  void write(const SensorLogStreamType type, const std::vector<double>& time,
+             const std::vector<double>& values);
+
+  ///
+  /// @brief Writes the stream table and closes the log.
+  ///
+  void close();
+
+private:
+  struct StreamEntry {
+    std::uint32_t type;
+    std::uint32_t width;
+    std::uint64_t num_records;
+    std::uint64_t time_offset;
+    std::uint64_t value_offset;
+  };
+
+  std::string path_;
+  std::ofstream file_;
+  std::vector<StreamEntry> streams_;
+
+  void write(const SensorLogStreamType type, const double* time,
+             const double* values, const std::size_t num_records,
+             const std::size_t width);
+  std::uint64_t writeAligned(const double* data, const std::size_t size);
+};
+
+
+///
+/// @class SensorLog
+/// @brief Read-only memory-mapped binary sensor log written by
+/// SensorLogWriter. The timestamps and records are accessed in place.
+///
+class SensorLog {
+public:
+  using MatrixXdRowMajor = Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor>;
+  using ConstTimeMap = Eigen::Map<const Eigen::VectorXd>;
+  using ConstValueMap = Eigen::Map<const MatrixXdRowMajor>;
+
+  ///
+  /// @brief Memory-maps a binary sensor log.
+  /// @param[in] path Path to the binary sensor log.
+  ///
+  SensorLog(const std::string& path);
+
+  ///
+  /// @brief Default constructor. The log has no streams.
+  ///
+  SensorLog();
+
+  ///
+  /// @brief Destructor. Unmaps the log.
+  ///
+  ~SensorLog();
+
+  SensorLog(const SensorLog&) = delete;
+  SensorLog& operator=(const SensorLog&) = delete;
+  SensorLog(SensorLog&& other) noexcept;
+  SensorLog& operator=(SensorLog&& other) noexcept;
+
+  ///
+  /// @param[in] type Type of the stream.
+  /// @return true if the log has the stream and false if not.
+  ///
+  bool hasStream(const SensorLogStreamType type) const;
+
+  ///
+  /// @param[in] type Type of the stream.
+  /// @return Number of records of the stream. Zero if the log does not have
+  /// the stream.
+  ///
+  int numRecords(const SensorLogStreamType type) const;
+
+  ///
+  /// @param[in] type Type of the stream.
+  /// @return Number of doubles of each record of the stream. Zero if the log
+  /// does not have the stream.
+  ///
+  int width(const SensorLogStreamType type) const;
+
+  ///
+  /// @param[in] type Type of the stream.
+  /// @return Timestamps of the stream mapped in place.
+  ///
+  ConstTimeMap getTime(const SensorLogStreamType type) const;
+
+  ///
+  /// @param[in] type Type of the stream.
+  /// @return Records of the stream mapped in place. Size is
+  /// numRecords(type) x width(type).
+  ///
+  ConstValueMap getValues(const SensorLogStreamType type) const;
+
+private:
+  struct Stream {
+    int num_records;
+    int width;
+    const double* time;
+    const double* values;
+  };
+
+  void* data_;
+  std::size_t size_;
+  std::vector<Stream> streams_;
+
+  void unmap();
+};
+
+
+///
+/// @brief Converts a text sensor log of the format of data/*.txt, i.e., lines
+/// of "IMU t wx wy wz ax ay az", "LANDMARK t id x y z [id x y z ...]",
+/// "CONTACT t id state [id state ...]", "KINEMATIC t id qw qx qy qz x y z
+/// cov(36) [...]", "JOINT t qJ dqJ tauJ", and "GROUND_TRUTH t x y z qx qy qz
+/// qw vx vy vz", into a binary sensor log. Lines of the other types are
+/// ignored.
+/// @param[in] text_path Path to the text sensor log.
+/// @param[in] binary_path Path to the binary sensor log.
+///
+void convertTextSensorLog(const std::string& text_path,
+                          const std::string& binary_path);
+
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_SENSOR_LOG_HPP_
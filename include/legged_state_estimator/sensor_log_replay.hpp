@@ -0,0 +1,49 @@
+#ifndef LEGGED_STATE_ESTIMATOR_SENSOR_LOG_REPLAY_HPP_
+#define LEGGED_STATE_ESTIMATOR_SENSOR_LOG_REPLAY_HPP_
+
+#include "Eigen/Core"
+
+#include "legged_state_estimator/sensor_log.hpp"
+#include "legged_state_estimator/inekf/inekf.hpp"
+#include "legged_state_estimator/legged_state_estimator.hpp"
+
+
+namespace legged_state_estimator {
+
+///
+/// @brief Replays a sensor log in InEKF. The IMU, contact, kinematic, and
+/// landmark streams are processed in the order of the timestamps (IMU,
+/// contact, kinematic, and then landmark for the same timestamp). The filter
+/// is propagated with the previous IMU measurement by the time interval
+/// between the IMU records if it is in (1e-6, 1).
+/// @param[in] log Sensor log.
+/// @param[in, out] filter InEKF.
+/// @param[in] landmark_covariance Covariance of the landmark measurements.
+/// Default is 0.01 * Identity.
+///
+template <int MaxAugmented>
+void replaySensorLog(const SensorLog& log, InEKFTpl<MaxAugmented>& filter,
+                     const Eigen::Matrix3d& landmark_covariance=0.01*Eigen::Matrix3d::Identity());
+
+///
+/// @brief Replays a sensor log in LeggedStateEstimator at the timestamps of
+/// the log. The IMU and joint records are passed to
+/// LeggedStateEstimator::pushIMU() and LeggedStateEstimator::pushJoints() in
+/// the order of the timestamps (IMU first for the same timestamp), so the
+/// streams may have different rates and need not be uniformly sampled. The
+/// timestamps of each stream must be increasing. The estimator must be
+/// initialized beforehand.
+/// @param[in] log Sensor log.
+/// @param[in, out] estimator State estimator.
+/// @param[in] record_decimation The estimate record
+/// (LeggedStateEstimator::getEstimateRecord()) is stored after every
+/// record_decimation joint records. Must be positive. Default is 1.
+/// @return The stored estimate records. Each row is an estimate record.
+///
+Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor>
+replaySensorLog(const SensorLog& log, LeggedStateEstimator& estimator,
+                const int record_decimation=1);
+
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_SENSOR_LOG_REPLAY_HPP_
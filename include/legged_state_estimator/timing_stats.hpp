@@ -0,0 +1,161 @@
+#ifndef LEGGED_STATE_ESTIMATOR_TIMING_STATS_HPP_
+#define LEGGED_STATE_ESTIMATOR_TIMING_STATS_HPP_
+
+#include <array>
+#include <string>
+#include <chrono>
+
+
+namespace legged_state_estimator {
+
+///
+/// @enum UpdateStage
+/// @brief Stages of LeggedStateEstimator::update().
+/// - PropagationStage: propagation of InEKF by the IMU measurements.
+/// - LowPassFilterStage: LPFs of the IMU and joint measurements.
+/// - RobotModelStage: kinematics and dynamics of RobotModel.
+/// - ContactEstimationStage: ContactEstimator::update().
+/// - KinematicsCorrectionStage: correction of InEKF by the leg kinematics at
+/// the updates without contact augmentations and removals.
+/// - ContactSwitchCorrectionStage: correction of InEKF by the leg kinematics
+/// at the updates with contact augmentations or removals.
+/// - EstimateOutputStage: copies of the estimates and the estimate record.
+/// - TotalStage: the whole update().
+///
+enum UpdateStage {
+  PropagationStage,
+  LowPassFilterStage,
+  RobotModelStage,
+  ContactEstimationStage,
+  KinematicsCorrectionStage,
+  ContactSwitchCorrectionStage,
+  EstimateOutputStage,
+  TotalStage
+};
+
+
+///
+/// @class LatencyHistogram
+/// @brief Histogram of latencies with logarithmically spaced bins from 0.1 us
+/// to about 100 ms (4 bins per octave). Recording is O(1) and does not
+/// allocate memory. The count, mean, and max are exact and the percentiles
+/// are the upper edges of the bins (clipped by the max).
+///
+class LatencyHistogram {
+public:
+  static constexpr int kNumBins = 81;
+
+  ///
+  /// @brief Constructs an empty histogram.
+  ///
+  LatencyHistogram();
+
+  ///
+  /// @brief Records a latency.
+  /// @param[in] latency_us Latency in microseconds.
+  ///
+  void record(const double latency_us);
+
+  ///
+  /// @brief Clears the recorded latencies.
+  ///
+  void reset();
+
+  ///
+  /// @return Number of the recorded latencies.
+  ///
+  long count() const;
+
+  ///
+  /// @return Mean latency in microseconds. Zero if empty.
+  ///
+  double mean() const;
+
+  ///
+  /// @return Max latency in microseconds. Zero if empty.
+  ///
+  double max() const;
+
+  ///
+  /// @param[in] p Percentile in [0, 100].
+  /// @return Latency percentile in microseconds. Zero if empty.
+  ///
+  double percentile(const double p) const;
+
+  ///
+  /// @return Upper edge of the bin in microseconds.
+  ///
+  static double binUpperEdge(const int bin);
+
+private:
+  std::array<long, kNumBins> bins_;
+  long count_;
+  double sum_, max_;
+};
+
+
+///
+/// @class TimingStats
+/// @brief Latency histograms of the stages of LeggedStateEstimator::update()
+/// and counters of the contact augmentations and removals of InEKF.
+///
+class TimingStats {
+public:
+  static constexpr int kNumStages = TotalStage + 1;
+
+  ///
+  /// @brief Constructs empty stats.
+  ///
+  TimingStats();
+
+  ///
+  /// @brief Records the latency of a stage.
+  /// @param[in] stage Stage.
+  /// @param[in] latency Latency.
+  ///
+  void record(const UpdateStage stage, const std::chrono::steady_clock::duration& latency);
+
+  ///
+  /// @brief Adds the contact augmentations and removals.
+  /// @param[in] num_augmentations Number of the contact augmentations.
+  /// @param[in] num_removals Number of the contact removals.
+  ///
+  void addContactSwitches(const long num_augmentations, const long num_removals);
+
+  ///
+  /// @brief Clears the histograms and counters.
+  ///
+  void reset();
+
+  ///
+  /// @param[in] stage Stage.
+  /// @return const reference to the latency histogram of the stage.
+  ///
+  const LatencyHistogram& getStageLatency(const UpdateStage stage) const;
+
+  ///
+  /// @return Number of the contact augmentations (or reactivations of the
+  /// contact slots).
+  ///
+  long numContactAugmentations() const;
+
+  ///
+  /// @return Number of the contact removals (or deactivations of the contact
+  /// slots).
+  ///
+  long numContactRemovals() const;
+
+  ///
+  /// @param[in] stage Stage.
+  /// @return Name of the stage, e.g., "propagation".
+  ///
+  static std::string stageName(const UpdateStage stage);
+
+private:
+  std::array<LatencyHistogram, kNumStages> stage_latency_;
+  long num_contact_augmentations_, num_contact_removals_;
+};
+
+} // namespace legged_state_estimator
+
+#endif // LEGGED_STATE_ESTIMATOR_TIMING_STATS_HPP_
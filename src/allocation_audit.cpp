@@ -0,0 +1,78 @@
+#include "legged_state_estimator/allocation_audit.hpp"
+
+#include <cstdlib>
+#include <cstring>
+
+#include <execinfo.h>
+#include <unistd.h>
+
+
+namespace legged_state_estimator {
+
+namespace {
+
+bool hooks_installed = false;
+thread_local AllocationAudit* active_audit = nullptr;
+
+void writeMessage(const char* message) {
+  const ssize_t written = ::write(STDERR_FILENO, message, std::strlen(message));
+  (void)written;
+}
+
+} // namespace
+
+
+AllocationAudit::AllocationAudit(const AllocationAuditMode mode)
+  : mode_(mode),
+    enclosing_audit_(active_audit),
+    num_allocations_(0),
+    num_allocated_bytes_(0) {
+  active_audit = this;
+}
+
+
+AllocationAudit::~AllocationAudit() {
+  active_audit = enclosing_audit_;
+}
+
+
+long AllocationAudit::numAllocations() const {
+  return num_allocations_;
+}
+
+
+std::size_t AllocationAudit::numAllocatedBytes() const {
+  return num_allocated_bytes_;
+}
+
+
+bool AllocationAudit::hooksInstalled() {
+  return hooks_installed;
+}
+
+
+bool AllocationAudit::installHooks() {
+  hooks_installed = true;
+  return hooks_installed;
+}
+
+
+void AllocationAudit::onAllocation(const std::size_t size) {
+  AllocationAudit* audit = active_audit;
+  if (audit == nullptr || audit->mode_ == NoAllocationAudit) {
+    return;
+  }
+  ++audit->num_allocations_;
+  audit->num_allocated_bytes_ += size;
+  if (audit->mode_ == TrapAllocations) {
+    // The backtrace may allocate, so the audit is deactivated beforehand.
+    active_audit = nullptr;
+    writeMessage("[AllocationAudit] heap allocation trapped:\n");
+    void* frames[64];
+    const int num_frames = ::backtrace(frames, 64);
+    ::backtrace_symbols_fd(frames, num_frames, STDERR_FILENO);
+    std::abort();
+  }
+}
+
+} // namespace legged_state_estimator
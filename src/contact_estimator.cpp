@@ -87,11 +87,10 @@ void ContactEstimator::update(const RobotModel& robot_model,
     contact_force_estimate_prev_[i] = contact_force_estimate_[i];
     normal_contact_force_estimate_prev_[i] = normal_contact_force_estimate_[i];
   }
-  // Deterministic contact state
-  contact_state_.clear();
+  // Deterministic contact state (overwritten in place, which does not allocate)
   for (int i=0; i<num_contacts_; ++i) {
-    contact_state_.push_back(
-        std::pair<int, bool>(i, (contact_probability_[i] >= settings_.contact_probability_threshold)));
+    contact_state_[i].first = i;
+    contact_state_[i].second = (contact_probability_[i] >= settings_.contact_probability_threshold);
   }
 }
 
@@ -161,6 +160,50 @@ void ContactEstimator::setContactSurfaceNormal(
 }
 
 
+void ContactEstimatorSettings::saveCheckpoint(CheckpointWriter& writer) const {
+  writer.write(beta0);
+  writer.write(beta1);
+  writer.write(contact_force_covariance_alpha);
+  writer.write(contact_probability_threshold);
+}
+
+
+void ContactEstimatorSettings::loadCheckpoint(CheckpointReader& reader) {
+  reader.read(beta0);
+  reader.read(beta1);
+  reader.read(contact_force_covariance_alpha);
+  reader.read(contact_probability_threshold);
+}
+
+
+void ContactEstimator::saveCheckpoint(CheckpointWriter& writer) const {
+  settings_.saveCheckpoint(writer);
+  writer.write(contact_force_estimate_);
+  writer.write(contact_force_estimate_prev_);
+  writer.write(contact_surface_normal_);
+  writer.write(normal_contact_force_estimate_);
+  writer.write(normal_contact_force_estimate_prev_);
+  writer.write(contact_probability_);
+  writer.write(contact_force_covariance_);
+  writer.write(contact_state_);
+  writer.write(num_contacts_);
+}
+
+
+void ContactEstimator::loadCheckpoint(CheckpointReader& reader) {
+  settings_.loadCheckpoint(reader);
+  reader.read(contact_force_estimate_);
+  reader.read(contact_force_estimate_prev_);
+  reader.read(contact_surface_normal_);
+  reader.read(normal_contact_force_estimate_);
+  reader.read(normal_contact_force_estimate_prev_);
+  reader.read(contact_probability_);
+  reader.read(contact_force_covariance_);
+  reader.read(contact_state_);
+  reader.read(num_contacts_);
+}
+
+
 void ContactEstimator::disp(std::ostream& os) const {
   os << "Contact estimation:" << std::endl;
   os << "  contact state: [";
@@ -0,0 +1,216 @@
+#include "legged_state_estimator/contact_estimator_calibration.hpp"
+
+#include <thread>
+#include <algorithm>
+#include <stdexcept>
+#include <string>
+
+
+namespace legged_state_estimator {
+
+ContactEstimatorCalibration::ContactEstimatorCalibration(
+    const LeggedStateEstimatorSettings& settings)
+  : robot_model_(settings.urdf_path, settings.imu_frame, settings.contact_frames),
+    contact_estimator_(robot_model_, settings.contact_estimator_settings),
+    lpf_tauJ_(settings.sampling_time, settings.lpf_tauJ_cutoff_frequency, robot_model_.nJ()),
+    normal_contact_force_estimate_(),
+    contact_labels_(),
+    mean_squared_force_difference_(Eigen::VectorXd::Zero(robot_model_.numContacts())) {
+  if (settings.dynamic_contact_estimation) {
+    throw std::invalid_argument(
+        "[ContactEstimatorCalibration] invalid argument: settings.dynamic_contact_estimation must be false");
+  }
+  robot_model_.setKinematicsBackend(settings.kinematics_backend);
+}
+
+
+ContactEstimatorCalibration::ContactEstimatorCalibration()
+  : robot_model_(),
+    contact_estimator_(),
+    lpf_tauJ_(),
+    normal_contact_force_estimate_(),
+    contact_labels_(),
+    mean_squared_force_difference_() {
+}
+
+
+void ContactEstimatorCalibration::setLog(const Eigen::MatrixXd& qJ,
+                                         const Eigen::MatrixXd& dqJ,
+                                         const Eigen::MatrixXd& tauJ,
+                                         const ContactLabels& contact_labels) {
+  const int num_samples = qJ.rows();
+  const int nJ = robot_model_.nJ();
+  const int num_contacts = robot_model_.numContacts();
+  if (qJ.cols() != nJ || dqJ.cols() != nJ || tauJ.cols() != nJ) {
+    throw std::invalid_argument(
+        "[ContactEstimatorCalibration] invalid argument: qJ.cols(), dqJ.cols(), and tauJ.cols() must be "
+        + std::to_string(nJ));
+  }
+  if (dqJ.rows() != num_samples || tauJ.rows() != num_samples
+      || contact_labels.rows() != num_samples) {
+    throw std::invalid_argument(
+        "[ContactEstimatorCalibration] invalid argument: qJ, dqJ, tauJ, and contact_labels must have the same number of rows");
+  }
+  if (contact_labels.cols() != num_contacts) {
+    throw std::invalid_argument(
+        "[ContactEstimatorCalibration] invalid argument: contact_labels.cols() must be "
+        + std::to_string(num_contacts));
+  }
+  // Normal contact force estimates in the same way as LeggedStateEstimator
+  normal_contact_force_estimate_.resize(num_samples, num_contacts);
+  lpf_tauJ_.reset();
+  Eigen::VectorXd qJ_k(nJ), dqJ_k(nJ);
+  for (int k=0; k<num_samples; ++k) {
+    qJ_k = qJ.row(k).transpose();
+    dqJ_k = dqJ.row(k).transpose();
+    lpf_tauJ_.update(tauJ.row(k).transpose());
+    robot_model_.updateLegKinematicsAndDynamics(qJ_k, dqJ_k);
+    contact_estimator_.update(robot_model_, lpf_tauJ_.getEstimate());
+    for (int i=0; i<num_contacts; ++i) {
+      normal_contact_force_estimate_.coeffRef(k, i)
+          = contact_estimator_.getNormalContactForceEstimate()[i];
+    }
+  }
+  contact_labels_ = contact_labels;
+  // The contact force covariance is proportional to the squared difference
+  // of the normal contact force estimates
+  mean_squared_force_difference_.setZero(num_contacts);
+  for (int i=0; i<num_contacts; ++i) {
+    int num_labeled = 0;
+    for (int k=0; k<num_samples; ++k) {
+      if (contact_labels_.coeff(k, i)) {
+        const double f_prev = (k > 0) ? normal_contact_force_estimate_.coeff(k-1, i) : 0.0;
+        const double df = normal_contact_force_estimate_.coeff(k, i) - f_prev;
+        mean_squared_force_difference_.coeffRef(i) += df * df;
+        ++num_labeled;
+      }
+    }
+    if (num_labeled > 0) {
+      mean_squared_force_difference_.coeffRef(i) /= num_labeled;
+    }
+  }
+}
+
+
+ContactCalibrationMetrics ContactEstimatorCalibration::evaluate(
+    const Eigen::MatrixXd& beta0, const Eigen::MatrixXd& beta1,
+    const Eigen::VectorXd& contact_force_covariance_alpha,
+    const Eigen::VectorXd& contact_probability_threshold,
+    const int num_threads) const {
+  const int num_combinations = beta0.rows();
+  const int num_contacts = numContacts();
+  if (beta0.cols() != num_contacts || beta1.cols() != num_contacts) {
+    throw std::invalid_argument(
+        "[ContactEstimatorCalibration] invalid argument: beta0.cols() and beta1.cols() must be "
+        + std::to_string(num_contacts));
+  }
+  if (beta1.rows() != num_combinations
+      || contact_force_covariance_alpha.size() != num_combinations
+      || contact_probability_threshold.size() != num_combinations) {
+    throw std::invalid_argument(
+        "[ContactEstimatorCalibration] invalid argument: beta0, beta1, contact_force_covariance_alpha, and contact_probability_threshold must have the same number of combinations");
+  }
+  if ((contact_probability_threshold.array() <= 0.0).any()
+      || (contact_probability_threshold.array() >= 1.0).any()) {
+    throw std::invalid_argument(
+        "[ContactEstimatorCalibration] invalid argument: contact_probability_threshold must be in (0, 1)");
+  }
+  ContactCalibrationMetrics metrics;
+  metrics.true_positives.resize(num_combinations, num_contacts);
+  metrics.false_positives.resize(num_combinations, num_contacts);
+  metrics.true_negatives.resize(num_combinations, num_contacts);
+  metrics.false_negatives.resize(num_combinations, num_contacts);
+  metrics.num_switches.resize(num_combinations, num_contacts);
+  metrics.accuracy.resize(num_combinations, num_contacts);
+  metrics.precision.resize(num_combinations, num_contacts);
+  metrics.recall.resize(num_combinations, num_contacts);
+  metrics.f1_score.resize(num_combinations, num_contacts);
+  metrics.log_loss.resize(num_combinations, num_contacts);
+  metrics.mean_contact_force_covariance.resize(num_combinations, num_contacts);
+  // Each thread evaluates a contiguous range of the combinations
+  int n = num_threads;
+  if (n <= 0) {
+    n = static_cast<int>(std::thread::hardware_concurrency());
+  }
+  n = std::max(std::min(n, num_combinations), 1);
+  auto evaluateRange = [&](const int begin, const int end) {
+    Workspace workspace;
+    for (int c=begin; c<end; ++c) {
+      for (int i=0; i<num_contacts; ++i) {
+        evaluateCombination(c, i, beta0.coeff(c, i), beta1.coeff(c, i),
+                            contact_force_covariance_alpha.coeff(c),
+                            contact_probability_threshold.coeff(c),
+                            workspace, metrics);
+      }
+    }
+  };
+  std::vector<std::thread> workers;
+  workers.reserve(n-1);
+  for (int t=1; t<n; ++t) {
+    workers.emplace_back(evaluateRange, (t*num_combinations)/n, ((t+1)*num_combinations)/n);
+  }
+  evaluateRange(0, num_combinations/n);
+  for (auto& e : workers) {
+    e.join();
+  }
+  return metrics;
+}
+
+
+void ContactEstimatorCalibration::evaluateCombination(
+    const int n, const int i, const double beta0, const double beta1,
+    const double alpha, const double threshold, Workspace& workspace,
+    ContactCalibrationMetrics& metrics) const {
+  const int num_samples = numSamples();
+  const auto f = normal_contact_force_estimate_.col(i).array();
+  const auto label = contact_labels_.col(i).array();
+  // Contact probability and contact state as in ContactEstimator::update()
+  workspace.z = beta1 * f + beta0;
+  workspace.p = (1.0 + (-workspace.z).exp()).inverse();
+  workspace.p = workspace.p.isNaN().select(0.0, workspace.p);
+  workspace.contact = (workspace.p >= threshold);
+  const int tp = (workspace.contact && label).count();
+  const int fp = (workspace.contact && !label).count();
+  const int fn = (!workspace.contact && label).count();
+  const int tn = num_samples - tp - fp - fn;
+  metrics.true_positives.coeffRef(n, i) = tp;
+  metrics.false_positives.coeffRef(n, i) = fp;
+  metrics.true_negatives.coeffRef(n, i) = tn;
+  metrics.false_negatives.coeffRef(n, i) = fn;
+  metrics.num_switches.coeffRef(n, i) = (num_samples > 1) ?
+      (workspace.contact.tail(num_samples-1) != workspace.contact.head(num_samples-1)).count() : 0;
+  metrics.accuracy.coeffRef(n, i) = (num_samples > 0) ?
+      static_cast<double>(tp+tn) / num_samples : 0.0;
+  metrics.precision.coeffRef(n, i) = (tp+fp > 0) ? static_cast<double>(tp) / (tp+fp) : 0.0;
+  metrics.recall.coeffRef(n, i) = (tp+fn > 0) ? static_cast<double>(tp) / (tp+fn) : 0.0;
+  metrics.f1_score.coeffRef(n, i) = (tp > 0) ? 2.0 * tp / (2*tp+fp+fn) : 0.0;
+  // Binary cross entropy, i.e., softplus(-z) if labeled in contact and
+  // softplus(z) otherwise, which is evaluated without overflow
+  workspace.x = label.select(-workspace.z, workspace.z);
+  workspace.x = workspace.x.max(0.0) + (-workspace.x.abs()).exp().log1p();
+  metrics.log_loss.coeffRef(n, i) = (num_samples > 0) ? workspace.x.mean() : 0.0;
+  metrics.mean_contact_force_covariance.coeffRef(n, i)
+      = alpha * mean_squared_force_difference_.coeff(i);
+}
+
+
+const Eigen::MatrixXd& ContactEstimatorCalibration::getNormalContactForceEstimate() const {
+  return normal_contact_force_estimate_;
+}
+
+
+const ContactEstimatorCalibration::ContactLabels& ContactEstimatorCalibration::getContactLabels() const {
+  return contact_labels_;
+}
+
+
+int ContactEstimatorCalibration::numSamples() const {
+  return normal_contact_force_estimate_.rows();
+}
+
+
+int ContactEstimatorCalibration::numContacts() const {
+  return robot_model_.numContacts();
+}
+
+} // namespace legged_state_estimator
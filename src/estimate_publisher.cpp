@@ -0,0 +1,206 @@
+#include "legged_state_estimator/estimate_publisher.hpp"
+
+#include <cerrno>
+#include <cstring>
+#include <stdexcept>
+#include <type_traits>
+#include <new>
+
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <fcntl.h>
+#include <unistd.h>
+
+
+namespace legged_state_estimator {
+
+namespace {
+
+const char kMagic[8] = {'L', 'S', 'E', 'P', 'U', 'B', '\0', '\0'};
+const std::uint32_t kVersion = 1;
+
+// Layout of the segment: the header, the seqlock sequence (odd while the
+// publisher writes the snapshot), and the snapshot, each on its own cache
+// line.
+struct Header {
+  char magic[8];
+  std::uint32_t version;
+  std::uint32_t snapshot_size;
+};
+
+const std::size_t kSequenceOffset = 64;
+const std::size_t kSnapshotOffset = 128;
+const std::size_t kSegmentSize = kSnapshotOffset + sizeof(EstimateSnapshot);
+
+static_assert(sizeof(EstimateSnapshot) == 296, "EstimateSnapshot must have a fixed binary layout");
+static_assert(std::is_standard_layout<EstimateSnapshot>::value, "EstimateSnapshot must have a fixed binary layout");
+static_assert(sizeof(std::atomic<std::uint64_t>) == sizeof(std::uint64_t),
+              "std::atomic<std::uint64_t> must have the layout of std::uint64_t");
+
+std::string segmentName(const std::string& name) {
+  if (name.empty()) {
+    throw std::invalid_argument("[EstimatePublisher] invalid argment: name must not be empty");
+  }
+  return (name[0] == '/') ? name : "/" + name;
+}
+
+// Whether the name refers to the segment of the device and inode.
+bool isSegment(const std::string& name, const std::uint64_t device, const std::uint64_t inode) {
+  const int fd = ::shm_open(name.c_str(), O_RDONLY, 0);
+  if (fd < 0) {
+    return false;
+  }
+  struct stat st;
+  const bool is_segment = (::fstat(fd, &st) == 0)
+                            && (static_cast<std::uint64_t>(st.st_dev) == device)
+                            && (static_cast<std::uint64_t>(st.st_ino) == inode);
+  ::close(fd);
+  return is_segment;
+}
+
+} // namespace
+
+
+EstimatePublisher::EstimatePublisher(const std::string& name)
+  : name_(segmentName(name)),
+    data_(nullptr),
+    size_(kSegmentSize),
+    sequence_(nullptr),
+    snapshot_(nullptr),
+    num_published_(0),
+    device_(0),
+    inode_(0) {
+  // O_EXCL: a second publisher of the segment would break the seqlock, which
+  // assumes a single writer.
+  const int fd = ::shm_open(name_.c_str(), O_CREAT | O_EXCL | O_RDWR, 0644);
+  if (fd < 0) {
+    if (errno == EEXIST) {
+      throw std::runtime_error("[EstimatePublisher] '" + name_ + "' already exists. "
+                               "It is used by another publisher or was left by a crashed process.");
+    }
+    throw std::runtime_error("[EstimatePublisher] failed to open '" + name_ + "'");
+  }
+  struct stat st;
+  if (::fstat(fd, &st) != 0 || ::ftruncate(fd, size_) != 0) {
+    ::close(fd);
+    ::shm_unlink(name_.c_str());
+    throw std::runtime_error("[EstimatePublisher] failed to resize '" + name_ + "'");
+  }
+  device_ = static_cast<std::uint64_t>(st.st_dev);
+  inode_ = static_cast<std::uint64_t>(st.st_ino);
+  data_ = ::mmap(nullptr, size_, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+  ::close(fd);
+  if (data_ == MAP_FAILED) {
+    data_ = nullptr;
+    ::shm_unlink(name_.c_str());
+    throw std::runtime_error("[EstimatePublisher] failed to map '" + name_ + "'");
+  }
+  char* bytes = static_cast<char*>(data_);
+  sequence_ = new (bytes+kSequenceOffset) std::atomic<std::uint64_t>(0);
+  snapshot_ = reinterpret_cast<EstimateSnapshot*>(bytes+kSnapshotOffset);
+  std::memset(snapshot_, 0, sizeof(EstimateSnapshot));
+  Header header;
+  std::memcpy(header.magic, kMagic, sizeof(kMagic));
+  header.version = kVersion;
+  header.snapshot_size = sizeof(EstimateSnapshot);
+  std::memcpy(bytes, &header, sizeof(Header));
+}
+
+
+EstimatePublisher::~EstimatePublisher() {
+  if (data_ != nullptr) {
+    ::munmap(data_, size_);
+    // The segment may have been unlinked and the name taken by another
+    // publisher in the meantime.
+    if (isSegment(name_, device_, inode_)) {
+      ::shm_unlink(name_.c_str());
+    }
+  }
+}
+
+
+void EstimatePublisher::publish(const EstimateSnapshot& snapshot) {
+  const std::uint64_t sequence = sequence_->load(std::memory_order_relaxed);
+  sequence_->store(sequence+1, std::memory_order_relaxed);
+  std::atomic_thread_fence(std::memory_order_release);
+  std::memcpy(snapshot_, &snapshot, sizeof(EstimateSnapshot));
+  ++num_published_;
+  snapshot_->sequence_number = num_published_;
+  sequence_->store(sequence+2, std::memory_order_release);
+}
+
+
+std::uint64_t EstimatePublisher::numPublished() const {
+  return num_published_;
+}
+
+
+const std::string& EstimatePublisher::name() const {
+  return name_;
+}
+
+
+EstimateSubscriber::EstimateSubscriber(const std::string& name)
+  : data_(nullptr),
+    size_(kSegmentSize),
+    sequence_(nullptr),
+    snapshot_(nullptr) {
+  const std::string segment_name = segmentName(name);
+  const int fd = ::shm_open(segment_name.c_str(), O_RDONLY, 0);
+  if (fd < 0) {
+    throw std::runtime_error("[EstimateSubscriber] failed to open '" + segment_name + "'");
+  }
+  struct stat st;
+  if (::fstat(fd, &st) != 0 || static_cast<std::size_t>(st.st_size) < size_) {
+    ::close(fd);
+    throw std::runtime_error("[EstimateSubscriber] '" + segment_name + "' is not an estimate segment");
+  }
+  data_ = ::mmap(nullptr, size_, PROT_READ, MAP_SHARED, fd, 0);
+  ::close(fd);
+  if (data_ == MAP_FAILED) {
+    data_ = nullptr;
+    throw std::runtime_error("[EstimateSubscriber] failed to map '" + segment_name + "'");
+  }
+  const char* bytes = static_cast<const char*>(data_);
+  Header header;
+  std::memcpy(&header, bytes, sizeof(Header));
+  if (std::memcmp(header.magic, kMagic, sizeof(kMagic)) != 0
+      || header.version != kVersion
+      || header.snapshot_size != sizeof(EstimateSnapshot)) {
+    ::munmap(data_, size_);
+    data_ = nullptr;
+    throw std::runtime_error("[EstimateSubscriber] '" + segment_name + "' is not an estimate segment");
+  }
+  sequence_ = reinterpret_cast<const std::atomic<std::uint64_t>*>(bytes+kSequenceOffset);
+  snapshot_ = reinterpret_cast<const EstimateSnapshot*>(bytes+kSnapshotOffset);
+}
+
+
+EstimateSubscriber::~EstimateSubscriber() {
+  if (data_ != nullptr) {
+    ::munmap(data_, size_);
+  }
+}
+
+
+void EstimateSubscriber::read(EstimateSnapshot& snapshot) const {
+  while (!tryRead(snapshot)) {}
+}
+
+
+bool EstimateSubscriber::tryRead(EstimateSnapshot& snapshot) const {
+  const std::uint64_t sequence = sequence_->load(std::memory_order_acquire);
+  if (sequence & 1) {
+    return false;
+  }
+  std::memcpy(&snapshot, snapshot_, sizeof(EstimateSnapshot));
+  std::atomic_thread_fence(std::memory_order_acquire);
+  return (sequence_->load(std::memory_order_relaxed) == sequence);
+}
+
+
+std::uint64_t EstimateSubscriber::sequenceNumber() const {
+  return sequence_->load(std::memory_order_acquire) / 2;
+}
+
+} // namespace legged_state_estimator
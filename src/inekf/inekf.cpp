@@ -13,39 +13,89 @@
 
 #include "legged_state_estimator/inekf/inekf.hpp"
 
+#include <functional>
+#include <chrono>
+#include <iterator>
+#include <set>
+
 
 namespace legged_state_estimator {
 
 using namespace std;
 
-void removeRowAndColumn(Eigen::MatrixXd& M, int index);
+// Returns true if size exceeds the capacity max_size of fixed-capacity storage
+inline bool exceedsCapacity(const int size, const int max_size) {
+  return (max_size != Eigen::Dynamic) && (size > max_size);
+}
+
+// Write and read the observations stored in the state history of checkpoints
+inline void writeObservations(CheckpointWriter& writer, const vectorKinematics& kinematics) {
+  writer.write(static_cast<std::uint64_t>(kinematics.size()));
+  for (const auto& e : kinematics) {
+    writer.write(e.id);
+    writer.write(e.pose);
+    writer.write(e.covariance);
+  }
+}
+
+inline void readObservations(CheckpointReader& reader, vectorKinematics& kinematics) {
+  kinematics.resize(reader.readSize(sizeof(int)));
+  for (auto& e : kinematics) {
+    reader.read(e.id);
+    reader.read(e.pose);
+    reader.read(e.covariance);
+  }
+}
+
+inline void writeObservations(CheckpointWriter& writer, const vectorLandmarks& landmarks) {
+  writer.write(static_cast<std::uint64_t>(landmarks.size()));
+  for (const auto& e : landmarks) {
+    writer.write(e.id);
+    writer.write(e.position);
+    writer.write(e.covariance);
+  }
+}
+
+inline void readObservations(CheckpointReader& reader, vectorLandmarks& landmarks) {
+  landmarks.resize(reader.readSize(sizeof(int)));
+  for (auto& e : landmarks) {
+    reader.read(e.id);
+    reader.read(e.position);
+    reader.read(e.covariance);
+  }
+}
 
 // Default constructor
-InEKF::InEKF() 
+template <int MaxAugmented>
+InEKFTpl<MaxAugmented>::InEKFTpl() 
   : g_((Eigen::VectorXd(3) << 0,0,-9.81).finished()), 
     magnetic_field_((Eigen::VectorXd(3) << 0,0,0).finished()) {}
 
 // Constructor with noise params
-InEKF::InEKF(const NoiseParams& params) 
+template <int MaxAugmented>
+InEKFTpl<MaxAugmented>::InEKFTpl(const NoiseParams& params) 
   : g_((Eigen::VectorXd(3) << 0,0,-9.81).finished()), 
     magnetic_field_((Eigen::VectorXd(3) << std::cos(1.2049),0,std::sin(1.2049)).finished()), 
     noise_params_(params) {}
 
 // Constructor with initial state
-InEKF::InEKF(const InEKFState& state) 
+template <int MaxAugmented>
+InEKFTpl<MaxAugmented>::InEKFTpl(const State& state) 
   : g_((Eigen::VectorXd(3) << 0,0,-9.81).finished()), 
     magnetic_field_((Eigen::VectorXd(3) << std::cos(1.2049),0,std::sin(1.2049)).finished()), 
     state_(state) {}
 
 // Constructor with initial state and noise params
-InEKF::InEKF(const InEKFState& state, const NoiseParams& params) 
+template <int MaxAugmented>
+InEKFTpl<MaxAugmented>::InEKFTpl(const State& state, const NoiseParams& params) 
   : g_((Eigen::VectorXd(3) << 0,0,-9.81).finished()), 
     magnetic_field_((Eigen::VectorXd(3) << std::cos(1.2049),0,std::sin(1.2049)).finished()), 
     state_(state), 
     noise_params_(params) {}
 
 // Constructor with initial state, noise params, and error type
-InEKF::InEKF(const InEKFState& state, const NoiseParams& params, const ErrorType error_type) 
+template <int MaxAugmented>
+InEKFTpl<MaxAugmented>::InEKFTpl(const State& state, const NoiseParams& params, const ErrorType error_type) 
   : g_((Eigen::VectorXd(3) << 0,0,-9.81).finished()), 
     magnetic_field_((Eigen::VectorXd(3) << std::cos(1.2049),0,std::sin(1.2049)).finished()), 
     state_(state), 
@@ -53,76 +103,381 @@ InEKF::InEKF(const InEKFState& state, const NoiseParams& params, const ErrorType
     error_type_(error_type) {}
 
 // Clear all data in the filter
-void InEKF::clear() {
-  state_ = InEKFState();
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::clear() {
+  state_ = State();
   noise_params_ = NoiseParams();
   prior_landmarks_.clear();
   estimated_landmarks_.clear();
+  landmark_step_ = 0;
+  landmark_last_observed_.clear();
   contacts_.clear();
   estimated_contact_positions_.clear();
+  spare_contact_positions_.clear();
+  contact_slots_.clear();
+  num_contact_augmentations_ = 0;
+  num_contact_removals_ = 0;
+  num_dropped_measurements_ = 0;
+  num_dropped_augmentations_ = 0;
+  num_dropped_landmarks_ = 0;
+  time_ = 0;
+  history_begin_ = 0;
+  history_size_ = 0;
+  last_replay_latency_ = 0;
+  last_replay_steps_ = 0;
 }
 
 // Returns the robot's current error type
-ErrorType InEKF::getErrorType() const { return error_type_; }
+template <int MaxAugmented>
+ErrorType InEKFTpl<MaxAugmented>::getErrorType() const { return error_type_; }
 
 // Return robot's current state
-const InEKFState& InEKF::getState() const { return state_; }
+template <int MaxAugmented>
+const typename InEKFTpl<MaxAugmented>::State& InEKFTpl<MaxAugmented>::getState() const { return state_; }
 
 // Sets the robot's current state
-void InEKF::setState(const InEKFState& state) { state_ = state; }
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setState(const State& state) { 
+  state_ = state; 
+  history_begin_ = 0;
+  history_size_ = 0;
+}
 
 // Return noise params
-const NoiseParams& InEKF::getNoiseParams() const { return noise_params_; }
+template <int MaxAugmented>
+const NoiseParams& InEKFTpl<MaxAugmented>::getNoiseParams() const { return noise_params_; }
 
 // Sets the filter's noise parameters
-void InEKF::setNoiseParams(const NoiseParams& params) { noise_params_ = params; }
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setNoiseParams(const NoiseParams& params) { noise_params_ = params; }
 
 // Return filter's prior (static) landmarks
-const mapIntVector3d& InEKF::getPriorLandmarks() const { return prior_landmarks_; }
+template <int MaxAugmented>
+const mapIntVector3d& InEKFTpl<MaxAugmented>::getPriorLandmarks() const { return prior_landmarks_; }
 
 // Set the filter's prior (static) landmarks
-void InEKF::setPriorLandmarks(const mapIntVector3d& prior_landmarks) { prior_landmarks_ = prior_landmarks; }
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setPriorLandmarks(const mapIntVector3d& prior_landmarks) { prior_landmarks_ = prior_landmarks; }
 
 // Return filter's estimated landmarks
-const std::map<int,int>& InEKF::getEstimatedLandmarks() const { return estimated_landmarks_; }
+template <int MaxAugmented>
+const std::map<int,int>& InEKFTpl<MaxAugmented>::getEstimatedLandmarks() const { return estimated_landmarks_; }
+
+// Return the maximum number of estimated landmarks
+template <int MaxAugmented>
+int InEKFTpl<MaxAugmented>::getLandmarkBudget() const { return max_landmarks_; }
+
+// Return the number of the new landmarks dropped due to the landmark budget
+template <int MaxAugmented>
+long InEKFTpl<MaxAugmented>::getNumDroppedLandmarks() const { return num_dropped_landmarks_; }
+
+// Set the maximum number of estimated landmarks and the eviction policy
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setLandmarkBudget(const int max_landmarks, 
+                                               const LandmarkEvictionPolicy policy, 
+                                               const bool keep_evicted_landmarks) { 
+  max_landmarks_ = max_landmarks;
+  landmark_eviction_policy_ = policy;
+  keep_evicted_landmarks_ = keep_evicted_landmarks;
+}
 
 // Return filter's estimated landmarks
-const std::map<int,int>& InEKF::getEstimatedContactPositions() const { return estimated_contact_positions_; }
+template <int MaxAugmented>
+const std::map<int,int>& InEKFTpl<MaxAugmented>::getEstimatedContactPositions() const { return estimated_contact_positions_; }
+
+// Return the number of augmented contacts
+template <int MaxAugmented>
+long InEKFTpl<MaxAugmented>::getNumContactAugmentations() const { return num_contact_augmentations_; }
+
+// Return the number of removed contacts
+template <int MaxAugmented>
+long InEKFTpl<MaxAugmented>::getNumContactRemovals() const { return num_contact_removals_; }
+
+// Return the number of the measurements dropped due to the capacity
+template <int MaxAugmented>
+long InEKFTpl<MaxAugmented>::getNumDroppedMeasurements() const { return num_dropped_measurements_; }
+
+// Return the number of the augmentations dropped due to the capacity
+template <int MaxAugmented>
+long InEKFTpl<MaxAugmented>::getNumDroppedAugmentations() const { return num_dropped_augmentations_; }
+
+// Return whether the contact slot mode is enabled
+template <int MaxAugmented>
+bool InEKFTpl<MaxAugmented>::getContactSlotMode() const { return contact_slot_mode_; }
+
+// Return filter's active and inactive contact slots
+template <int MaxAugmented>
+const std::map<int,int>& InEKFTpl<MaxAugmented>::getContactSlots() const { return contact_slots_; }
+
+// Enable or disable the contact slot mode
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setContactSlotMode(const bool enabled) {
+  if (enabled == contact_slot_mode_) return;
+  contact_slot_mode_ = enabled;
+  if (enabled) {
+    // The currently estimated contact positions become the active slots
+    contact_slots_ = estimated_contact_positions_;
+    return;
+  }
+  // Remove the inactive slots from the state at once
+  vector<int> remove_indices;
+  for (const auto& e : contact_slots_) {
+    if (estimated_contact_positions_.find(e.first) == estimated_contact_positions_.end()) {
+      remove_indices.push_back(e.second);
+    }
+  }
+  contact_slots_.clear();
+  this->RemoveAugmentedStates(remove_indices);
+}
 
 // Set the filter's contact state
-void InEKF::setContacts(const vector<std::pair<int,bool>>& contacts) {
-  // Insert new measured contact states
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setContacts(const vector<std::pair<int,bool>>& contacts) {
+  // Insert new measured contact states. A known contact is found and assigned,
+  // because insert() may allocate a node even if the contact is in the map.
   for (const auto& e : contacts) {
-    std::pair<map<int,bool>::iterator,bool> ret = contacts_.insert(e);
-    // If contact is already in the map, replace with new value
-    if (ret.second==false) {
-      ret.first->second = e.second;
+    map<int,bool>::iterator it = contacts_.find(e.first);
+    if (it != contacts_.end()) {
+      it->second = e.second;
+    }
+    else {
+      contacts_.insert(e);
     }
   }
   return;
 }
 
 // Return the filter's contact state
-const std::map<int,bool>& InEKF::getContacts() const { return contacts_; }
+template <int MaxAugmented>
+const std::map<int,bool>& InEKFTpl<MaxAugmented>::getContacts() const { return contacts_; }
 
 // Set the true magnetic field
-void InEKF::setMagneticField(const Eigen::Vector3d& true_magnetic_field) { magnetic_field_ = true_magnetic_field; }
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setMagneticField(const Eigen::Vector3d& true_magnetic_field) { magnetic_field_ = true_magnetic_field; }
 
 // Get the true magnetic field
-const Eigen::Vector3d& InEKF::getMagneticField() const { return magnetic_field_; }
+template <int MaxAugmented>
+const Eigen::Vector3d& InEKFTpl<MaxAugmented>::getMagneticField() const { return magnetic_field_; }
+
+// Get the time of the state estimate
+template <int MaxAugmented>
+double InEKFTpl<MaxAugmented>::getTime() const { return time_; }
+
+// Set the time of the state estimate
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setTime(const double time) { time_ = time; }
+
+// Get the length of the state history
+template <int MaxAugmented>
+int InEKFTpl<MaxAugmented>::getStateHistoryLength() const { return history_.size(); }
+
+// Get the number of the propagation steps in the state history
+template <int MaxAugmented>
+int InEKFTpl<MaxAugmented>::getStateHistorySize() const { return history_size_; }
+
+// Get the latency of the last replay
+template <int MaxAugmented>
+double InEKFTpl<MaxAugmented>::getLastReplayLatency() const { return last_replay_latency_; }
+
+// Get the number of the propagation steps of the last replay
+template <int MaxAugmented>
+int InEKFTpl<MaxAugmented>::getLastReplaySteps() const { return last_replay_steps_; }
+
+// Set the length of the state history and allocate the buffer
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::setStateHistoryLength(const int length) {
+  history_.clear();
+  history_.resize(std::max(length, 0));
+  history_begin_ = 0;
+  history_size_ = 0;
+}
+
+// Get the i-th oldest entry of the state history
+template <int MaxAugmented>
+typename InEKFTpl<MaxAugmented>::HistoryEntry& InEKFTpl<MaxAugmented>::HistoryAt(const int i) {
+  return history_[(history_begin_ + i) % history_.size()];
+}
+
+// Append an entry for a propagation step to the state history, overwriting 
+// the oldest one if the history is full
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::RecordPropagation(const Eigen::Vector3d& imu_w, const Eigen::Vector3d& imu_a, const double dt) {
+  const int length = history_.size();
+  int index = history_begin_;
+  if (history_size_ < length) {
+    index = (history_begin_ + history_size_) % length;
+    ++history_size_;
+  }
+  else {
+    history_begin_ = (history_begin_ + 1) % length;
+  }
+  HistoryEntry& entry = history_[index];
+  this->SaveHistoryEntry(entry);
+  entry.dt = dt;
+  entry.imu.template head<3>() = imu_w;
+  entry.imu.template tail<3>() = imu_a;
+  entry.has_kinematics = false;
+  entry.kinematics.clear();
+  entry.has_velocity = false;
+  entry.landmarks.clear();
+}
+
+// Save the state, the time, and the index maps to an entry of the state 
+// history (the assignments of the maps reuse the nodes of the entry)
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::SaveHistoryEntry(HistoryEntry& entry) const {
+  entry.time = time_;
+  entry.state = state_;
+  entry.estimated_contact_positions = estimated_contact_positions_;
+  entry.contact_slots = contact_slots_;
+  entry.estimated_landmarks = estimated_landmarks_;
+  entry.landmark_last_observed = landmark_last_observed_;
+  entry.landmark_step = landmark_step_;
+  entry.num_contact_augmentations = num_contact_augmentations_;
+  entry.num_contact_removals = num_contact_removals_;
+}
+
+// Restore the state, the time, and the index maps from an entry of the state 
+// history
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::RestoreHistoryEntry(const HistoryEntry& entry) {
+  time_ = entry.time;
+  state_ = entry.state;
+  estimated_contact_positions_ = entry.estimated_contact_positions;
+  contact_slots_ = entry.contact_slots;
+  estimated_landmarks_ = entry.estimated_landmarks;
+  landmark_last_observed_ = entry.landmark_last_observed;
+  landmark_step_ = entry.landmark_step;
+  num_contact_augmentations_ = entry.num_contact_augmentations;
+  num_contact_removals_ = entry.num_contact_removals;
+}
+
+// Write the filter into a checkpoint. The entries of the state history are 
+// written from the oldest one.
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::saveCheckpoint(CheckpointWriter& writer) const {
+  writer.write(error_type_);
+  writer.write(estimate_bias_);
+  state_.saveCheckpoint(writer);
+  noise_params_.saveCheckpoint(writer);
+  writer.write(g_);
+  writer.write(contacts_);
+  writer.write(estimated_contact_positions_);
+  writer.write(contact_slot_mode_);
+  writer.write(contact_slots_);
+  writer.write(num_contact_augmentations_);
+  writer.write(num_contact_removals_);
+  writer.write(num_dropped_measurements_);
+  writer.write(num_dropped_augmentations_);
+  writer.write(prior_landmarks_);
+  writer.write(estimated_landmarks_);
+  writer.write(max_landmarks_);
+  writer.write(landmark_eviction_policy_);
+  writer.write(keep_evicted_landmarks_);
+  writer.write(landmark_step_);
+  writer.write(num_dropped_landmarks_);
+  writer.write(landmark_last_observed_);
+  writer.write(magnetic_field_);
+  writer.write(time_);
+  writer.write(static_cast<std::int64_t>(history_.size()));
+  writer.write(static_cast<std::int64_t>(history_size_));
+  for (int i=0; i<history_size_; ++i) {
+    const HistoryEntry& entry = history_[(history_begin_ + i) % history_.size()];
+    writer.write(entry.time);
+    writer.write(entry.dt);
+    writer.write(entry.imu);
+    entry.state.saveCheckpoint(writer);
+    writer.write(entry.estimated_contact_positions);
+    writer.write(entry.contact_slots);
+    writer.write(entry.estimated_landmarks);
+    writer.write(entry.landmark_last_observed);
+    writer.write(entry.landmark_step);
+    writer.write(entry.num_contact_augmentations);
+    writer.write(entry.num_contact_removals);
+    writer.write(entry.has_kinematics);
+    writer.write(entry.contacts);
+    writeObservations(writer, entry.kinematics);
+    writer.write(entry.has_velocity);
+    writer.write(entry.velocity);
+    writer.write(entry.velocity_covariance);
+    writeObservations(writer, entry.landmarks);
+  }
+}
+
+// Restore the filter from a checkpoint
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::loadCheckpoint(CheckpointReader& reader) {
+  reader.read(error_type_);
+  reader.read(estimate_bias_);
+  state_.loadCheckpoint(reader);
+  noise_params_.loadCheckpoint(reader);
+  reader.read(g_);
+  reader.read(contacts_);
+  reader.read(estimated_contact_positions_);
+  spare_contact_positions_.clear();
+  reader.read(contact_slot_mode_);
+  reader.read(contact_slots_);
+  reader.read(num_contact_augmentations_);
+  reader.read(num_contact_removals_);
+  reader.read(num_dropped_measurements_);
+  reader.read(num_dropped_augmentations_);
+  reader.read(prior_landmarks_);
+  reader.read(estimated_landmarks_);
+  reader.read(max_landmarks_);
+  reader.read(landmark_eviction_policy_);
+  reader.read(keep_evicted_landmarks_);
+  reader.read(landmark_step_);
+  reader.read(num_dropped_landmarks_);
+  reader.read(landmark_last_observed_);
+  reader.read(magnetic_field_);
+  reader.read(time_);
+  const std::int64_t history_length = reader.read<std::int64_t>();
+  const std::int64_t history_size = reader.read<std::int64_t>();
+  if (history_length < 0 || history_size < 0 || history_size > history_length) {
+    throw std::runtime_error("[InEKF] checkpoint has an invalid state history");
+  }
+  setStateHistoryLength(history_length);
+  for (int i=0; i<history_size; ++i) {
+    HistoryEntry& entry = history_[i];
+    reader.read(entry.time);
+    reader.read(entry.dt);
+    reader.read(entry.imu);
+    entry.state.loadCheckpoint(reader);
+    reader.read(entry.estimated_contact_positions);
+    reader.read(entry.contact_slots);
+    reader.read(entry.estimated_landmarks);
+    reader.read(entry.landmark_last_observed);
+    reader.read(entry.landmark_step);
+    reader.read(entry.num_contact_augmentations);
+    reader.read(entry.num_contact_removals);
+    reader.read(entry.has_kinematics);
+    reader.read(entry.contacts);
+    readObservations(reader, entry.kinematics);
+    reader.read(entry.has_velocity);
+    reader.read(entry.velocity);
+    reader.read(entry.velocity_covariance);
+    readObservations(reader, entry.landmarks);
+    ++history_size_;
+  }
+  replaying_ = false;
+  last_replay_latency_ = 0;
+  last_replay_steps_ = 0;
+}
 
 // Compute Analytical state transition matrix
-Eigen::MatrixXd InEKF::StateTransitionMatrix(const Eigen::Vector3d& w, 
-                                             const Eigen::Vector3d& a, 
-                                             const double dt) {
-  const Eigen::Vector3d phi = w*dt;
-  const Eigen::Matrix3d G0 = Gamma_SO3(phi,0); // Computation can be sped up by computing G0,G1,G2 all at once
-  const Eigen::Matrix3d G1 = Gamma_SO3(phi,1); // TODO: These are also needed for the mean propagation, we should not compute twice
-  const Eigen::Matrix3d G2 = Gamma_SO3(phi,2);
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::StateTransitionMatrix(const Eigen::Vector3d& w, 
+                                                   const Eigen::Vector3d& a, 
+                                                   const double dt, 
+                                                   const Eigen::Matrix3d& G0, 
+                                                   const Eigen::Matrix3d& G1, 
+                                                   const Eigen::Matrix3d& G2, 
+                                                   const Eigen::Matrix3d& G3, 
+                                                   StateTransition& Phi) const {
   const Eigen::Matrix3d G0t = G0.transpose();
   const Eigen::Matrix3d G1t = G1.transpose();
   const Eigen::Matrix3d G2t = G2.transpose();
-  const Eigen::Matrix3d G3t = Gamma_SO3(-phi,3);
+  const Eigen::Matrix3d G3t = G3.transpose(); // = Gamma_SO3(-w*dt,3)
 
   // Compute the complicated bias terms (derived for the left invariant case)
   const Eigen::Matrix3d ax = skew(a);
@@ -170,28 +525,27 @@ Eigen::MatrixXd InEKF::StateTransitionMatrix(const Eigen::Vector3d& w,
     Phi35L = (1.0/6.0)*ax*dt3;
   }
 
-  // Fill out analytical state transition matrices
+  // Fill out the non-trivial blocks of the analytical state transition matrices
   const int dimX = state_.dimX();
   const int dimTheta = state_.dimTheta();
   const int dimP = state_.dimP();
-  Eigen::MatrixXd Phi = Eigen::MatrixXd::Identity(dimP, dimP);
+  Phi.X.setIdentity();
+  Phi.Theta.setZero(dimP-dimTheta, dimTheta);
   if  ((state_.getStateType() == StateType::WorldCentric && error_type_ == ErrorType::LeftInvariant) || 
         (state_.getStateType() == StateType::BodyCentric && error_type_ == ErrorType::RightInvariant)) {
     // Compute left-invariant state transisition matrix
-    Phi.template block<3,3>(0,0) = G0t; // Phi_11
-    Phi.template block<3,3>(3,0).noalias() = -G0t * skew(G1*a) * dt; // Phi_21
-    Phi.template block<3,3>(6,0).noalias() = -G0t * skew(G2*a) * dt2; // Phi_31
-    Phi.template block<3,3>(3,3) = G0t; // Phi_22
-    Phi.template block<3,3>(6,3) = G0t*dt; // Phi_32
-    Phi.template block<3,3>(6,6) = G0t; // Phi_33
-    for (int i=5; i<dimX; ++i) {
-      Phi.template block<3,3>((i-2)*3,(i-2)*3) = G0t; // Phi_(3+i)(3+i)
-    }
-    Phi.template block<3,3>(0,dimP-dimTheta) = -G1t * dt; // Phi_15
-    Phi.template block<3,3>(3,dimP-dimTheta) = Phi25L; // Phi_25
-    Phi.template block<3,3>(6,dimP-dimTheta) = Phi35L; // Phi_35
-    Phi.template block<3,3>(3,dimP-dimTheta+3) = -G1t * dt; // Phi_26
-    Phi.template block<3,3>(6,dimP-dimTheta+3).noalias() = -G0t * G2 * dt2; // Phi_36
+    Phi.X.template block<3,3>(0,0) = G0t; // Phi_11
+    Phi.X.template block<3,3>(3,0).noalias() = -G0t * skew(G1*a) * dt; // Phi_21
+    Phi.X.template block<3,3>(6,0).noalias() = -G0t * skew(G2*a) * dt2; // Phi_31
+    Phi.X.template block<3,3>(3,3) = G0t; // Phi_22
+    Phi.X.template block<3,3>(6,3) = G0t*dt; // Phi_32
+    Phi.X.template block<3,3>(6,6) = G0t; // Phi_33
+    Phi.Aug = G0t; // Phi_(3+i)(3+i)
+    Phi.Theta.template block<3,3>(0,0) = -G1t * dt; // Phi_15
+    Phi.Theta.template block<3,3>(3,0) = Phi25L; // Phi_25
+    Phi.Theta.template block<3,3>(6,0) = Phi35L; // Phi_35
+    Phi.Theta.template block<3,3>(3,3) = -G1t * dt; // Phi_26
+    Phi.Theta.template block<3,3>(6,3).noalias() = -G0t * G2 * dt2; // Phi_36
   } 
   else {
     // Compute right-invariant state transition matrix (Assumes unpropagated state)
@@ -202,71 +556,215 @@ Eigen::MatrixXd InEKF::StateTransitionMatrix(const Eigen::Vector3d& w,
     const Eigen::Matrix3d RG0 = R*G0;
     const Eigen::Matrix3d RG1dt = R*G1*dt;
     const Eigen::Matrix3d RG2dt2 = R*G2*dt2;
-    Phi.template block<3,3>(3,0) = gx*dt; // Phi_21
-    Phi.template block<3,3>(6,0) = 0.5*gx*dt2; // Phi_31
-    Phi.template block<3,3>(6,3) = Eigen::Matrix3d::Identity()*dt; // Phi_32
-    Phi.template block<3,3>(0,dimP-dimTheta) = -RG1dt; // Phi_15
-    Phi.template block<3,3>(3,dimP-dimTheta).noalias() = -skew(v+RG1dt*a+g_*dt)*RG1dt + RG0*Phi25L; // Phi_25
-    Phi.template block<3,3>(6,dimP-dimTheta).noalias() = -skew(p+v*dt+RG2dt2*a+0.5*g_*dt2)*RG1dt + RG0*Phi35L; // Phi_35
+    Phi.X.template block<3,3>(3,0) = gx*dt; // Phi_21
+    Phi.X.template block<3,3>(6,0) = 0.5*gx*dt2; // Phi_31
+    Phi.X.template block<3,3>(6,3) = Eigen::Matrix3d::Identity()*dt; // Phi_32
+    Phi.Aug.setIdentity(); // Phi_(3+i)(3+i)
+    Phi.Theta.template block<3,3>(0,0) = -RG1dt; // Phi_15
+    Phi.Theta.template block<3,3>(3,0).noalias() = -skew(v+RG1dt*a+g_*dt)*RG1dt + RG0*Phi25L; // Phi_25
+    Phi.Theta.template block<3,3>(6,0).noalias() = -skew(p+v*dt+RG2dt2*a+0.5*g_*dt2)*RG1dt + RG0*Phi35L; // Phi_35
     for (int i=5; i<dimX; ++i) {
-      Phi.template block<3,3>((i-2)*3,dimP-dimTheta).noalias() = -skew(state_.getVector(i))*RG1dt; // Phi_(3+i)5
+      Phi.Theta.template block<3,3>((i-2)*3,0).noalias() = -skew(state_.getVector(i))*RG1dt; // Phi_(3+i)5
     }
-    Phi.template block<3,3>(3,dimP-dimTheta+3) = -RG1dt; // Phi_26
-    Phi.template block<3,3>(6,dimP-dimTheta+3) = -RG2dt2; // Phi_36
+    Phi.Theta.template block<3,3>(3,3) = -RG1dt; // Phi_26
+    Phi.Theta.template block<3,3>(6,3) = -RG2dt2; // Phi_36
   }
-  return Phi;
 }
 
 
-// Compute Discrete noise matrix
-Eigen::MatrixXd InEKF::DiscreteNoiseMatrix(const Eigen::MatrixXd& Phi, 
-                                           const double dt){
-  const int dimX = state_.dimX();
+// Propagate the covariance, P_pred = Phi * P * Phi^T + Qd, block by block. 
+// Only the 9x9 block X, the diagonal blocks Aug, and the bias columns Theta 
+// of Phi are multiplied. The identity and zero blocks are skipped.
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::PropagateCovariance(const StateTransition& Phi, 
+                                                 const Eigen::Vector3d& w, 
+                                                 const Eigen::Vector3d& a, 
+                                                 const double dt, 
+                                                 MatrixP& P_pred) const {
+  const auto& P = state_.getP();
   const int dimTheta = state_.dimTheta();
-  const int dimP = state_.dimP();    
-  Eigen::MatrixXd G = Eigen::MatrixXd::Identity(dimP,dimP);
+  const int dimP = state_.dimP();
+  const int n = dimP - dimTheta; // dimension of the error of X
+
+  // M = Phi * P (row blocks)
+  MatrixP M(dimP, dimP);
+  M.template topRows<9>().noalias() = Phi.X * P.template topRows<9>();
+  M.template topRows<9>().noalias() += Phi.Theta.template topRows<9>() * P.bottomRows(dimTheta);
+  for (int i=9; i<n; i+=3) {
+    M.template middleRows<3>(i).noalias() = Phi.Aug * P.template middleRows<3>(i);
+    M.template middleRows<3>(i).noalias() += Phi.Theta.template middleRows<3>(i) * P.bottomRows(dimTheta);
+  }
+  M.bottomRows(dimTheta) = P.bottomRows(dimTheta);
+
+  // P_pred = M * Phi^T (column blocks)
+  P_pred.resize(dimP, dimP);
+  P_pred.template leftCols<9>().noalias() = M.template leftCols<9>() * Phi.X.transpose();
+  P_pred.template leftCols<9>().noalias() += M.rightCols(dimTheta) * Phi.Theta.template topRows<9>().transpose();
+  for (int i=9; i<n; i+=3) {
+    P_pred.template middleCols<3>(i).noalias() = M.template middleCols<3>(i) * Phi.Aug.transpose();
+    P_pred.template middleCols<3>(i).noalias() += M.rightCols(dimTheta) * Phi.Theta.template middleRows<3>(i).transpose();
+  }
+  P_pred.rightCols(dimTheta) = M.rightCols(dimTheta);
+
+  // Discretized noise in closed form, Qd = int_0^dt Phi(s)*G*Qc*G^T*Phi(s)^T ds,
+  // added per noise source. Phi(s)*G_j (G_j: columns of G) is expanded as 
+  // L0 + L1*s + L2*s^2 with L0 = G_j, L1 = A*G_j, and L2 = A*A*G_j/2 (A: the 
+  // error dynamics without the bias columns) and integrated exactly, i.e., 
+  // Qd = sum_ij Li * Qc_j * Lj^T * H_ij with H_ij = dt^(i+j+1)/(i+j+1). This 
+  // is exact for the IMU and contact noise of the right-invariant dynamics, 
+  // whose A is nilpotent. The bias columns of A are -G_gyro and -G_accel.
+  double dt_pow[6] = {1.0};
+  for (int k=1; k<6; ++k) {
+    dt_pow[k] = dt_pow[k-1] * dt;
+  }
+  double H[3][3];
+  for (int i=0; i<3; ++i) {
+    for (int j=0; j<3; ++j) {
+      H[i][j] = dt_pow[i+j+1] / (i+j+1);
+    }
+  }
+
   // Compute G using Adjoint of Xk if needed, otherwise identity (Assumes unpropagated state)
+  typedef Eigen::Matrix<double, Eigen::Dynamic, 3, Eigen::ColMajor, MaxDimP, 3> MatrixN3;
+  MatrixN3 G_gyro = MatrixN3::Zero(n, 3);
+  Eigen::Matrix3d R = Eigen::Matrix3d::Identity();
+  // Diagonal blocks A_ii of A and the blocks A_21 (A_32 is the identity)
+  Eigen::Matrix3d A_diag, A_21;
   if ((state_.getStateType() == StateType::WorldCentric && error_type_ == ErrorType::RightInvariant) || 
       (state_.getStateType() == StateType::BodyCentric && error_type_ == ErrorType::LeftInvariant)) {
-    G.block(0,0,dimP-dimTheta,dimP-dimTheta) = Adjoint_SEK3(state_.getWorldX()); 
+    const MatrixX X = state_.getWorldX();
+    R = X.template block<3,3>(0,0);
+    for (int i=3; i<X.cols(); ++i) {
+      G_gyro.template middleRows<3>(3*i-6).noalias() = skew(X.template block<3,1>(0,i)) * R;
+    }
+    A_diag.setZero();
+    A_21 = skew(g_);
   }
-
-  // Continuous noise covariance 
-  Eigen::MatrixXd Qc = Eigen::MatrixXd::Zero(dimP,dimP); // Landmark noise terms will remain zero
-  Qc.template block<3,3>(0,0) = noise_params_.getGyroscopeCov(); 
-  Qc.template block<3,3>(3,3) = noise_params_.getAccelerometerCov();
-  for (auto& e : estimated_contact_positions_) {
-    Qc.template block<3,3>(3+3*(e.second-3),3+3*(e.second-3)) = noise_params_.getContactCov(); // Contact noise terms
+  else {
+    A_diag = -skew(w);
+    A_21 = -skew(a);
   }
+  G_gyro.template topRows<3>() = R;
+  // A times the first 9 rows of B. A*B is zero in the rows of the augmented 
+  // states for the noise inputs: they are zero for the left-invariant 
+  // dynamics, and A_ii is zero for the right-invariant ones.
+  auto applyA = [&](const Eigen::Matrix<double,9,3>& B, Eigen::Matrix<double,9,3>& AB) {
+    AB.template topRows<3>().noalias() = A_diag * B.template topRows<3>();
+    AB.template middleRows<3>(3).noalias() = A_21 * B.template topRows<3>();
+    AB.template middleRows<3>(3).noalias() += A_diag * B.template middleRows<3>(3);
+    AB.template bottomRows<3>() = B.template middleRows<3>(3);
+    AB.template bottomRows<3>().noalias() += A_diag * B.template bottomRows<3>();
+  };
+
+  // Gyroscope noise. L1 and L2 are nonzero only in the first 9 rows.
+  const Eigen::Matrix3d& Q_gyro = noise_params_.getGyroscopeCov();
+  Eigen::Matrix<double,9,3> L1_gyro, L2_gyro;
+  applyA(G_gyro.template topRows<9>(), L1_gyro);
+  applyA(L1_gyro, L2_gyro);
+  L2_gyro *= 0.5;
+  MatrixN3 LQ(n, 3);
+  LQ.noalias() = G_gyro * (H[0][0] * Q_gyro);
+  P_pred.topLeftCorner(n, n).noalias() += LQ * G_gyro.transpose();
+  Eigen::Matrix<double, Eigen::Dynamic, 9, Eigen::ColMajor, MaxDimP, 9> C(n, 9);
+  C.noalias() = G_gyro * Q_gyro * (H[0][1] * L1_gyro + H[0][2] * L2_gyro).transpose();
+  P_pred.topLeftCorner(n, 9) += C;
+  P_pred.topLeftCorner(9, n) += C.transpose();
+  Eigen::Matrix<double,9,3> L12Q = (H[1][1] * L1_gyro + H[1][2] * L2_gyro) * Q_gyro;
+  P_pred.template topLeftCorner<9,9>().noalias() += L12Q * L1_gyro.transpose();
+  L12Q.noalias() = (H[2][1] * L1_gyro + H[2][2] * L2_gyro) * Q_gyro;
+  P_pred.template topLeftCorner<9,9>().noalias() += L12Q * L2_gyro.transpose();
+
+  // Accelerometer noise
+  const Eigen::Matrix3d& Q_accel = noise_params_.getAccelerometerCov();
+  Eigen::Matrix<double,9,3> L_accel[3];
+  L_accel[0].setZero();
+  L_accel[0].template middleRows<3>(3) = R;
+  applyA(L_accel[0], L_accel[1]);
+  applyA(L_accel[1], L_accel[2]);
+  L_accel[2] *= 0.5;
+  for (int i=0; i<3; ++i) {
+    Eigen::Matrix<double,9,3> LQ_accel = Eigen::Matrix<double,9,3>::Zero();
+    for (int j=0; j<3; ++j) {
+      LQ_accel.noalias() += H[i][j] * L_accel[j] * Q_accel;
+    }
+    P_pred.template topLeftCorner<9,9>().noalias() += LQ_accel * L_accel[i].transpose();
+  }
+
+  // Contact noise terms (landmark noise terms remain zero)
   // TODO: Use kinematic orientation to map noise from contact frame to body frame (not needed if noise is isotropic)
-  Qc.template block<3,3>(dimP-dimTheta,dimP-dimTheta) = noise_params_.getGyroscopeBiasCov();
-  Qc.template block<3,3>(dimP-dimTheta+3,dimP-dimTheta+3) = noise_params_.getAccelerometerBiasCov();
+  const Eigen::Matrix3d& Q_contact = noise_params_.getContactCov();
+  Eigen::Matrix3d L_contact[3];
+  L_contact[0] = R;
+  L_contact[1].noalias() = A_diag * R;
+  L_contact[2].noalias() = 0.5 * A_diag * L_contact[1];
+  Eigen::Matrix3d Qd_contact = Eigen::Matrix3d::Zero();
+  for (int i=0; i<3; ++i) {
+    for (int j=0; j<3; ++j) {
+      Qd_contact.noalias() += H[i][j] * L_contact[i] * Q_contact * L_contact[j].transpose();
+    }
+  }
+  for (const auto& e : estimated_contact_positions_) {
+    P_pred.template block<3,3>(3*e.second-6,3*e.second-6) += Qd_contact;
+  }
 
-  // Noise Covariance Discretization
-  const Eigen::MatrixXd PhiG = Phi * G;
-  Eigen::MatrixXd Qd = PhiG * Qc * PhiG.transpose() * dt; // Approximated discretized noise matrix (TODO: compute analytical)
-  return Qd;
+  // Gyroscope and accelerometer bias noise, L0 = [0; I], L1 = [-G_j; 0], and 
+  // L2 = [-A*G_j/2; 0]
+  for (int j=0; j<dimTheta; j+=3) {
+    const Eigen::Matrix3d& Q_bias = (j == 0) ? noise_params_.getGyroscopeBiasCov() 
+                                             : noise_params_.getAccelerometerBiasCov();
+    MatrixN3 L1 = MatrixN3::Zero(n, 3);
+    Eigen::Matrix<double,9,3> L2;
+    if (j == 0) {
+      L1 = -G_gyro;
+      L2 = -0.5 * L1_gyro;
+    }
+    else {
+      L1.template topRows<9>() = -L_accel[0];
+      L2 = -0.5 * L_accel[1];
+    }
+    LQ.noalias() = H[1][1] * L1 * Q_bias;
+    LQ.template topRows<9>().noalias() += H[2][1] * L2 * Q_bias;
+    P_pred.topLeftCorner(n, n).noalias() += LQ * L1.transpose();
+    LQ.noalias() = H[1][2] * L1 * Q_bias;
+    LQ.template topRows<9>().noalias() += H[2][2] * L2 * Q_bias;
+    P_pred.topLeftCorner(n, 9).noalias() += LQ * L2.transpose();
+    LQ.noalias() = H[1][0] * L1 * Q_bias;
+    LQ.template topRows<9>().noalias() += H[2][0] * L2 * Q_bias;
+    P_pred.block(0, n+j, n, 3) += LQ;
+    P_pred.block(n+j, 0, 3, n) += LQ.transpose();
+    P_pred.template block<3,3>(n+j, n+j) += H[0][0] * Q_bias;
+  }
 }
 
 
 // InEKF Propagation - Inertial Data
-void InEKF::Propagate(const Eigen::Vector3d& imu_w, const Eigen::Vector3d& imu_a, double dt) {
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::Propagate(const Eigen::Vector3d& imu_w, const Eigen::Vector3d& imu_a, double dt) {
+  // Record the state before the propagation for delayed measurements
+  if (!history_.empty() && !replaying_) {
+    this->RecordPropagation(imu_w, imu_a, dt);
+  }
+
   // Bias corrected IMU measurements
   const Eigen::Vector3d w = imu_w - state_.getGyroscopeBias();    // Angular Velocity
   const Eigen::Vector3d a = imu_a - state_.getAccelerometerBias(); // Linear Acceleration
 
   // Get current state estimate and dimensions
   const auto& X = state_.getX();
-  const Eigen::MatrixXd Xinv = state_.calcXinv();
-  const auto& P = state_.getP();
   int dimX = state_.dimX();
   int dimP = state_.dimP();
   int dimTheta = state_.dimTheta();
 
+  // Gamma functions shared by the covariance and mean propagation
+  const Eigen::Vector3d phi = w*dt;
+  Eigen::Matrix3d G0, G1, G2, G3;
+  Gamma_SO3(phi, G0, G1, G2, G3);
+
   //  ------------ Propagate Covariance --------------- //
-  const Eigen::MatrixXd Phi = this->StateTransitionMatrix(w,a,dt);
-  const Eigen::MatrixXd Qd = this->DiscreteNoiseMatrix(Phi, dt);
-  Eigen::MatrixXd P_pred = Phi * P * Phi.transpose() + Qd;
+  StateTransition Phi;
+  this->StateTransitionMatrix(w,a,dt,G0,G1,G2,G3,Phi);
+  MatrixP P_pred;
+  this->PropagateCovariance(Phi, w, a, dt, P_pred);
 
   // If we don't want to estimate bias, remove correlation
   if (!estimate_bias_) {
@@ -279,12 +777,8 @@ void InEKF::Propagate(const Eigen::Vector3d& imu_w, const Eigen::Vector3d& imu_a
   const auto& R = state_.getRotation();
   const auto& v = state_.getVelocity();
   const auto& p = state_.getPosition();
-  const Eigen::Vector3d phi = w*dt;
-  const Eigen::Matrix3d G0 = Gamma_SO3(phi,0); // Computation can be sped up by computing G0,G1,G2 all at once
-  const Eigen::Matrix3d G1 = Gamma_SO3(phi,1);
-  const Eigen::Matrix3d G2 = Gamma_SO3(phi,2);
 
-  Eigen::MatrixXd X_pred = X;
+  MatrixX X_pred = X;
   if (state_.getStateType() == StateType::WorldCentric) {
     // Propagate world-centric state estimate
     X_pred.template block<3,3>(0,0).noalias() = R * G0;
@@ -297,35 +791,38 @@ void InEKF::Propagate(const Eigen::Vector3d& imu_w, const Eigen::Vector3d& imu_a
     X_pred.template block<3,1>(0,3).noalias() = G0t * (v - (G1*a + R*g_)*dt);
     X_pred.template block<3,1>(0,4).noalias() = G0t * (p + v*dt - (G2*a + 0.5*R*g_)*dt*dt);
     for (int i=5; i<dimX; ++i) {
-      X_pred.template block<3,1>(0,i).noalias() = G0t * X.block<3,1>(0,i);
+      X_pred.template block<3,1>(0,i).noalias() = G0t * X.template block<3,1>(0,i);
     }
   } 
   //  ------------ Update State --------------- // 
   state_.setX(X_pred);
   state_.setP(P_pred);      
+  time_ += dt;
 }
 
 
-void InEKF::Propagate(const Eigen::Matrix<double,6,1>& imu, double dt) {
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::Propagate(const Eigen::Matrix<double,6,1>& imu, double dt) {
   Propagate(imu.template head<3>(), imu.template tail<3>(), dt);
 }
 
 
 // Correct State: Right-Invariant Observation
-void InEKF::CorrectRightInvariant(const Eigen::MatrixXd& Z, 
-                                  const Eigen::MatrixXd& H, 
-                                  const Eigen::MatrixXd& N) {
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectRightInvariant(const VectorZ& Z, 
+                                                   const MatrixH& H, 
+                                                   const MatrixS& N) {
   // Get current state estimate
   const auto& X = state_.getX();
-  Eigen::VectorXd Theta = state_.getTheta();
-  Eigen::MatrixXd P = state_.getP();
+  VectorTheta Theta = state_.getTheta();
+  MatrixP P = state_.getP();
   const int dimX = state_.dimX();
   const int dimTheta = state_.dimTheta();
   const int dimP = state_.dimP();
 
   // Remove bias
   Theta = Eigen::Matrix<double,6,1>::Zero();
-  P.block<6,6>(dimP-dimTheta,dimP-dimTheta) = 0.0001*Eigen::Matrix<double,6,6>::Identity();
+  P.template block<6,6>(dimP-dimTheta,dimP-dimTheta) = 0.0001*Eigen::Matrix<double,6,6>::Identity();
   P.block(0,dimP-dimTheta,dimP-dimTheta,dimTheta).setZero();
   P.block(dimP-dimTheta,0,dimTheta,dimP-dimTheta).setZero();
   // std::cout << "P:\n" << P << std::endl;
@@ -333,46 +830,51 @@ void InEKF::CorrectRightInvariant(const Eigen::MatrixXd& Z,
 
   // Map from left invariant to right invariant error temporarily
   if (error_type_==ErrorType::LeftInvariant) {
-    Eigen::MatrixXd Adj = Eigen::MatrixXd::Identity(dimP,dimP);
-    Adj.block(0,0,dimP-dimTheta,dimP-dimTheta) = Adjoint_SEK3(X); 
+    MatrixP Adj = MatrixP::Identity(dimP,dimP);
+    MatrixP AdjX;
+    Adjoint_SEK3(X, AdjX);
+    Adj.block(0,0,dimP-dimTheta,dimP-dimTheta) = AdjX; 
     P.noalias() = (Adj * P * Adj.transpose()).eval(); 
   }
 
   // Compute Kalman Gain
-  const Eigen::MatrixXd PHT = P * H.transpose();
-  const Eigen::MatrixXd S = H * PHT + N;
-  Eigen::MatrixXd Sinv;
+  const MatrixK PHT = P * H.transpose();
+  const MatrixS S = H * PHT + N;
+  MatrixS Sinv;
   if (S.rows() <= 3) {
     Sinv = S.inverse();
   }
   else {
     ldlt_.compute(S);
     const int dimS = S.rows();
-    Sinv = ldlt_.solve(Eigen::MatrixXd::Identity(dimS, dimS));
+    Sinv = ldlt_.solve(MatrixS::Identity(dimS, dimS));
   }
-  const Eigen::MatrixXd K = PHT * Sinv;
+  const MatrixK K = PHT * Sinv;
 
   // Compute state correction vector
-  const Eigen::VectorXd delta = K*Z;
-  const Eigen::MatrixXd dX = Exp_SEK3(delta.segment(0,delta.rows()-dimTheta));
-  const Eigen::VectorXd dTheta = delta.segment(delta.rows()-dimTheta, dimTheta);
+  const VectorP delta = K*Z;
+  MatrixX dX;
+  Exp_SEK3(delta.segment(0,delta.rows()-dimTheta), dX);
+  const VectorTheta dTheta = delta.segment(delta.rows()-dimTheta, dimTheta);
 
   // Update state
-  const Eigen::MatrixXd X_new = dX*X; // Right-Invariant Update
-  const Eigen::VectorXd Theta_new = Theta + dTheta;
+  const MatrixX X_new = dX*X; // Right-Invariant Update
+  const VectorTheta Theta_new = Theta + dTheta;
 
   // Set new state  
   state_.setX(X_new); 
   state_.setTheta(Theta_new);
 
   // Update Covariance
-  const Eigen::MatrixXd IKH = Eigen::MatrixXd::Identity(dimP,dimP) - K*H;
-  Eigen::MatrixXd P_new = IKH * P * IKH.transpose() + K*N*K.transpose(); // Joseph update form
+  const MatrixP IKH = MatrixP::Identity(dimP,dimP) - K*H;
+  MatrixP P_new = IKH * P * IKH.transpose() + K*N*K.transpose(); // Joseph update form
 
   // Map from right invariant back to left invariant error
   if (error_type_==ErrorType::LeftInvariant) {
-    Eigen::MatrixXd AdjInv = Eigen::MatrixXd::Identity(dimP,dimP);
-    AdjInv.block(0,0,dimP-dimTheta,dimP-dimTheta) = Adjoint_SEK3(state_.calcXinv()); 
+    MatrixP AdjInv = MatrixP::Identity(dimP,dimP);
+    MatrixP AdjXinv;
+    Adjoint_SEK3(state_.calcXinv(), AdjXinv);
+    AdjInv.block(0,0,dimP-dimTheta,dimP-dimTheta) = AdjXinv; 
     P_new = (AdjInv * P_new * AdjInv.transpose()).eval();
   }
   // Set new covariance
@@ -381,59 +883,65 @@ void InEKF::CorrectRightInvariant(const Eigen::MatrixXd& Z,
 
 
 // Correct State: Left-Invariant Observation
-void InEKF::CorrectLeftInvariant(const Eigen::MatrixXd& Z, 
-                                 const Eigen::MatrixXd& H, 
-                                 const Eigen::MatrixXd& N) {
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectLeftInvariant(const VectorZ& Z, 
+                                                  const MatrixH& H, 
+                                                  const MatrixS& N) {
   // Get current state estimate
   const auto& X = state_.getX();
   const auto& Theta = state_.getTheta();
-  Eigen::MatrixXd P = state_.getP();
+  MatrixP P = state_.getP();
   int dimX = state_.dimX();
   int dimTheta = state_.dimTheta();
   int dimP = state_.dimP();
 
   // Map from right invariant to left invariant error temporarily
   if (error_type_==ErrorType::RightInvariant) {
-    Eigen::MatrixXd AdjInv = Eigen::MatrixXd::Identity(dimP,dimP);
-    AdjInv.block(0,0,dimP-dimTheta,dimP-dimTheta) = Adjoint_SEK3(state_.calcXinv()); 
+    MatrixP AdjInv = MatrixP::Identity(dimP,dimP);
+    MatrixP AdjXinv;
+    Adjoint_SEK3(state_.calcXinv(), AdjXinv);
+    AdjInv.block(0,0,dimP-dimTheta,dimP-dimTheta) = AdjXinv; 
     P = (AdjInv * P * AdjInv.transpose()).eval();
   }
 
   // Compute Kalman Gain
-  const Eigen::MatrixXd PHT = P * H.transpose();
-  const Eigen::MatrixXd S = H * PHT + N;
-  Eigen::MatrixXd Sinv;
+  const MatrixK PHT = P * H.transpose();
+  const MatrixS S = H * PHT + N;
+  MatrixS Sinv;
   if (S.rows() <= 3) {
     Sinv = S.inverse();
   }
   else {
     ldlt_.compute(S);
     const int dimS = S.rows();
-    Sinv = ldlt_.solve(Eigen::MatrixXd::Identity(dimS, dimS));
+    Sinv = ldlt_.solve(MatrixS::Identity(dimS, dimS));
   }
-  const Eigen::MatrixXd K = PHT * Sinv;
+  const MatrixK K = PHT * Sinv;
 
   // Compute state correction vector
-  const Eigen::VectorXd delta = K*Z;
-  const Eigen::MatrixXd dX = Exp_SEK3(delta.segment(0,delta.rows()-dimTheta));
-  const Eigen::VectorXd dTheta = delta.segment(delta.rows()-dimTheta, dimTheta);
+  const VectorP delta = K*Z;
+  MatrixX dX;
+  Exp_SEK3(delta.segment(0,delta.rows()-dimTheta), dX);
+  const VectorTheta dTheta = delta.segment(delta.rows()-dimTheta, dimTheta);
 
   // Update state
-  const Eigen::MatrixXd X_new = X*dX; // Left-Invariant Update
-  const Eigen::VectorXd Theta_new = Theta + dTheta;
+  const MatrixX X_new = X*dX; // Left-Invariant Update
+  const VectorTheta Theta_new = Theta + dTheta;
 
   // Set new state
   state_.setX(X_new); 
   state_.setTheta(Theta_new);
 
   // Update Covariance
-  const Eigen::MatrixXd IKH = Eigen::MatrixXd::Identity(dimP,dimP) - K*H;
-  Eigen::MatrixXd P_new = IKH * P * IKH.transpose() + K*N*K.transpose(); // Joseph update form
+  const MatrixP IKH = MatrixP::Identity(dimP,dimP) - K*H;
+  MatrixP P_new = IKH * P * IKH.transpose() + K*N*K.transpose(); // Joseph update form
 
   // Map from left invariant back to right invariant error
   if (error_type_==ErrorType::RightInvariant) {
-    Eigen::MatrixXd Adj = Eigen::MatrixXd::Identity(dimP,dimP);
-    Adj.block(0,0,dimP-dimTheta,dimP-dimTheta) = Adjoint_SEK3(X_new); 
+    MatrixP Adj = MatrixP::Identity(dimP,dimP);
+    MatrixP AdjX;
+    Adjoint_SEK3(X_new, AdjX);
+    Adj.block(0,0,dimP-dimTheta,dimP-dimTheta) = AdjX; 
     P_new = (Adj * P_new * Adj.transpose()).eval(); 
   }
 
@@ -441,14 +949,188 @@ void InEKF::CorrectLeftInvariant(const Eigen::MatrixXd& Z,
   state_.setP(P_new); 
 }   
 
+// Correct State: Right-Invariant Observation stored in the measurement workspace
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectRightInvariant() {
+  // Get current state estimate
+  const auto& X = state_.getX();
+  VectorTheta Theta = state_.getTheta();
+  MatrixP P = state_.getP();
+  const int dimTheta = state_.dimTheta();
+  const int dimP = state_.dimP();
+
+  // Remove bias
+  Theta = Eigen::Matrix<double,6,1>::Zero();
+  P.template block<6,6>(dimP-dimTheta,dimP-dimTheta) = 0.0001*Eigen::Matrix<double,6,6>::Identity();
+  P.block(0,dimP-dimTheta,dimP-dimTheta,dimTheta).setZero();
+  P.block(dimP-dimTheta,0,dimTheta,dimP-dimTheta).setZero();
+
+  // Map from left invariant to right invariant error temporarily
+  if (error_type_==ErrorType::LeftInvariant) {
+    MatrixP Adj = MatrixP::Identity(dimP,dimP);
+    MatrixP AdjX;
+    Adjoint_SEK3(X, AdjX);
+    Adj.block(0,0,dimP-dimTheta,dimP-dimTheta) = AdjX; 
+    P = (Adj * P * Adj.transpose()).eval(); 
+  }
+
+  // Compute Kalman Gain, state correction vector, and covariance
+  this->SparseKalmanUpdate(P);
+  const auto& delta = workspace_.delta;
+  MatrixX dX;
+  Exp_SEK3(delta.segment(0,delta.rows()-dimTheta), dX);
+
+  // Update state
+  const MatrixX X_new = dX*X; // Right-Invariant Update
+  const VectorTheta Theta_new = Theta + delta.segment(delta.rows()-dimTheta, dimTheta);
+
+  // Set new state  
+  state_.setX(X_new); 
+  state_.setTheta(Theta_new);
+
+  // Map from right invariant back to left invariant error
+  if (error_type_==ErrorType::LeftInvariant) {
+    MatrixP AdjInv = MatrixP::Identity(dimP,dimP);
+    MatrixP AdjXinv;
+    Adjoint_SEK3(state_.calcXinv(), AdjXinv);
+    AdjInv.block(0,0,dimP-dimTheta,dimP-dimTheta) = AdjXinv; 
+    P = (AdjInv * P * AdjInv.transpose()).eval();
+  }
+  // Set new covariance
+  state_.setP(P); 
+}   
+
+
+// Correct State: Left-Invariant Observation stored in the measurement workspace
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectLeftInvariant() {
+  // Get current state estimate
+  const auto& X = state_.getX();
+  const auto& Theta = state_.getTheta();
+  MatrixP P = state_.getP();
+  const int dimTheta = state_.dimTheta();
+  const int dimP = state_.dimP();
+
+  // Map from right invariant to left invariant error temporarily
+  if (error_type_==ErrorType::RightInvariant) {
+    MatrixP AdjInv = MatrixP::Identity(dimP,dimP);
+    MatrixP AdjXinv;
+    Adjoint_SEK3(state_.calcXinv(), AdjXinv);
+    AdjInv.block(0,0,dimP-dimTheta,dimP-dimTheta) = AdjXinv; 
+    P = (AdjInv * P * AdjInv.transpose()).eval();
+  }
+
+  // Compute Kalman Gain, state correction vector, and covariance
+  this->SparseKalmanUpdate(P);
+  const auto& delta = workspace_.delta;
+  MatrixX dX;
+  Exp_SEK3(delta.segment(0,delta.rows()-dimTheta), dX);
+
+  // Update state
+  const MatrixX X_new = X*dX; // Left-Invariant Update
+  const VectorTheta Theta_new = Theta + delta.segment(delta.rows()-dimTheta, dimTheta);
+
+  // Set new state
+  state_.setX(X_new); 
+  state_.setTheta(Theta_new);
+
+  // Map from left invariant back to right invariant error
+  if (error_type_==ErrorType::RightInvariant) {
+    MatrixP Adj = MatrixP::Identity(dimP,dimP);
+    MatrixP AdjX;
+    Adjoint_SEK3(X_new, AdjX);
+    Adj.block(0,0,dimP-dimTheta,dimP-dimTheta) = AdjX; 
+    P = (Adj * P * Adj.transpose()).eval(); 
+  }
+
+  // Set new covariance
+  state_.setP(P); 
+}   
+
+
+// Kalman update with the sparse H stored in the measurement workspace
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::SparseKalmanUpdate(MatrixP& P) {
+  auto& ws = workspace_;
+  const int dimP = P.rows();
+  const int dimZ = ws.Z.rows();
+
+  // PHT = P * H^T and HP = H * P touch only the columns and rows of P 
+  // selected by the blocks of H
+  ws.PHT.setZero(dimP, dimZ);
+  ws.HP.setZero(dimZ, dimP);
+  for (const auto& e : ws.H_blocks) {
+    ws.PHT.middleCols(e.row, 3).noalias() += P.middleCols(e.col, 3) * e.value.transpose();
+    ws.HP.middleRows(e.row, 3).noalias() += e.value * P.middleRows(e.col, 3);
+  }
+  // S = H * P * H^T + N
+  ws.S = ws.N;
+  for (const auto& e : ws.H_blocks) {
+    ws.S.middleRows(e.row, 3).noalias() += e.value * ws.PHT.middleRows(e.col, 3);
+  }
+
+  // Compute Kalman Gain
+  if (dimZ <= 3) {
+    ws.K.noalias() = ws.PHT * ws.S.inverse();
+  }
+  else {
+    ldlt_.compute(ws.S);
+    ws.K.resize(dimP, dimZ);
+    ws.K.transpose() = ldlt_.solve(ws.PHT.transpose());
+  }
+
+  // Compute state correction vector
+  ws.delta.noalias() = ws.K * ws.Z;
+
+  // Update Covariance (Joseph update form (I-KH)P(I-KH)^T + KNK^T, which is 
+  // expanded as P - K*HP - PHT*K^T + K*S*K^T). HP is not replaced by PHT^T 
+  // so that the rounding errors in the asymmetric part of P are not amplified.
+  ws.KS.noalias() = ws.K * ws.S;
+  P.noalias() -= ws.K * ws.HP;
+  P.noalias() -= ws.PHT * ws.K.transpose();
+  P.noalias() += ws.KS * ws.K.transpose();
+}
+
+
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::MeasurementWorkspace::reset(const int dimZ) {
+  H_blocks.clear();
+  Z.resize(dimZ);
+  N.setZero(dimZ, dimZ);
+}
+
+
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::MeasurementWorkspace::addHBlock(const int row, const int col, 
+                                                             const Eigen::Matrix3d& value) {
+  HBlock block;
+  block.row = row;
+  block.col = col;
+  block.value = value;
+  H_blocks.push_back(block);
+}
+
+
 // Correct state using kinematics measured between imu and contact point
-void InEKF::CorrectKinematics(const vectorKinematics& measured_kinematics) {
-  Eigen::VectorXd Z, Y, b;
-  Eigen::MatrixXd H, N, PI;
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectKinematics(const vectorKinematics& measured_kinematics) {
+  // Record the correction for the replay of the state history
+  if (history_size_ > 0 && !replaying_) {
+    HistoryEntry& entry = this->HistoryAt(history_size_-1);
+    entry.has_kinematics = true;
+    entry.contacts = contacts_;
+    entry.kinematics = measured_kinematics;
+  }
 
-  vector<pair<int,int> > remove_contacts;
-  vectorKinematics new_contacts;
-  vector<int> used_contact_ids;
+  // The buffers are reused across the calls to avoid heap allocations
+  vector<pair<int,int> >& remove_contacts = index_workspace_.remove_contacts;
+  vectorKinematics& new_contacts = index_workspace_.new_contacts;
+  vector<int>& used_contact_ids = index_workspace_.used_contact_ids;
+  vector<pair<vectorKinematicsIterator,int> >& correct_contacts = index_workspace_.correct_contacts;
+  remove_contacts.clear();
+  new_contacts.clear();
+  used_contact_ids.clear();
+  correct_contacts.clear();
 
   for (vectorKinematicsIterator it=measured_kinematics.begin(); it!=measured_kinematics.end(); ++it) {
     // Detect and skip if an ID is not unique (this would cause singularity issues in InEKF::Correct)
@@ -480,41 +1162,11 @@ void InEKF::CorrectKinematics(const vectorKinematics& measured_kinematics) {
     } 
     else if (contact_indicated && found) {
       // If contact is indicated and id is found in estimated_contacts_, then correct using kinematics
-      const int dimX = state_.dimX();
-      const int dimTheta = state_.dimTheta();
-      const int dimP = state_.dimP();
-      int startIndex;
-      // Fill out H
-      startIndex = H.rows();
-      H.conservativeResize(startIndex+3, dimP);
-      H.block(startIndex,0,3,dimP).setZero();
-      if (state_.getStateType() == StateType::WorldCentric) {
-        H.template block<3,3>(startIndex,6) = -Eigen::Matrix3d::Identity(); // -I
-        H.template block<3,3>(startIndex,3*it_estimated->second-dimTheta) = Eigen::Matrix3d::Identity(); // I
-      } 
-      else {
-        H.template block<3,3>(startIndex,6) = Eigen::Matrix3d::Identity(); // I
-        H.template block<3,3>(startIndex,3*it_estimated->second-dimTheta) = -Eigen::Matrix3d::Identity(); // -I
-      }
-      // Fill out N
-      startIndex = N.rows();
-      N.conservativeResize(startIndex+3, startIndex+3);
-      N.block(startIndex,0,3,startIndex).setZero();
-      N.block(0,startIndex,startIndex,3).setZero();
-      N.template block<3,3>(startIndex,startIndex).noalias() = state_.getWorldRotation() * it->covariance.block<3,3>(3,3) 
-                                                                                          * state_.getWorldRotation().transpose();
-      // Fill out Z
-      startIndex = Z.rows();
-      Z.conservativeResize(startIndex+3, Eigen::NoChange);
-      const auto& R = state_.getRotation();
-      const auto& p = state_.getPosition();
-      const auto& d = state_.getVector(it_estimated->second);  
-      if (state_.getStateType() == StateType::WorldCentric) {
-        Z.template segment<3>(startIndex).noalias() = R * it->pose.block<3,1>(0,3) - (d - p); 
-      } 
-      else {
-        Z.template segment<3>(startIndex).noalias() = R.transpose() * (it->pose.block<3,1>(0,3) - (p - d)); 
+      if (exceedsCapacity(3*correct_contacts.size()+3, MaxDimZ)) {
+        if (!replaying_) ++num_dropped_measurements_;
+        continue;
       }
+      correct_contacts.push_back(pair<vectorKinematicsIterator,int> (it, it_estimated->second));
     } 
     else {
       // If contact is not indicated and id is found in estimated_contacts_, then skip
@@ -523,56 +1175,126 @@ void InEKF::CorrectKinematics(const vectorKinematics& measured_kinematics) {
   }
 
   // Correct state using stacked observation
-  if (Z.rows()>0) {
+  if (correct_contacts.size() > 0) {
+    const int dimTheta = state_.dimTheta();
+    workspace_.reset(3*correct_contacts.size());
+    const Eigen::Matrix3d R_world = state_.getWorldRotation();
+    const auto& R = state_.getRotation();
+    const auto& p = state_.getPosition();
+    for (int i=0; i<correct_contacts.size(); ++i) {
+      const auto& it = correct_contacts[i].first;
+      const int index = correct_contacts[i].second;
+      const int startIndex = 3*i;
+      const auto& d = state_.getVector(index);  
+      // Fill out H and Z
+      if (state_.getStateType() == StateType::WorldCentric) {
+        workspace_.addHBlock(startIndex, 6, -Eigen::Matrix3d::Identity()); // -I
+        workspace_.addHBlock(startIndex, 3*index-dimTheta, Eigen::Matrix3d::Identity()); // I
+        workspace_.Z.template segment<3>(startIndex).noalias() = R * it->pose.block<3,1>(0,3) - (d - p); 
+      } 
+      else {
+        workspace_.addHBlock(startIndex, 6, Eigen::Matrix3d::Identity()); // I
+        workspace_.addHBlock(startIndex, 3*index-dimTheta, -Eigen::Matrix3d::Identity()); // -I
+        workspace_.Z.template segment<3>(startIndex).noalias() = R.transpose() * (it->pose.block<3,1>(0,3) - (p - d)); 
+      }
+      // Fill out N
+      workspace_.N.template block<3,3>(startIndex,startIndex).noalias() 
+          = R_world * it->covariance.block<3,3>(3,3) * R_world.transpose();
+    }
     if (state_.getStateType() == StateType::WorldCentric) {
-      this->CorrectRightInvariant(Z,H,N);
-      // this->CorrectRightInvariant(obs);
+      this->CorrectRightInvariant();
     } 
     else {
-      // this->CorrectLeftInvariant(obs);
-      this->CorrectLeftInvariant(Z,H,N);
+      this->CorrectLeftInvariant();
     }
   }
 
-  // Remove contacts from state
+  num_contact_removals_ += remove_contacts.size();
+
+  // Deactivate the slots of the contacts (the covariance of an inactive slot 
+  // is reset and decoupled from the rest of the state. The covariance is edited 
+  // in place, i.e., in O(dimP) per slot)
+  if (contact_slot_mode_ && remove_contacts.size() > 0) {
+    MatrixP& P = state_.P_;
+    for (const auto& e : remove_contacts) {
+      const int startIndex = 3 + 3*(e.second-3);
+      P.template middleRows<3>(startIndex).setZero();
+      P.template middleCols<3>(startIndex).setZero();
+      P.template block<3,3>(startIndex,startIndex).setIdentity();
+      this->EraseContactPosition(estimated_contact_positions_.find(e.first));
+    }
+    remove_contacts.clear();
+  }
+
+  // Remove contacts from state at once
   if (remove_contacts.size() > 0) {
-    Eigen::MatrixXd X_rem = state_.getX(); 
-    Eigen::MatrixXd P_rem = state_.getP();
-    for (vector<pair<int,int> >::iterator it=remove_contacts.begin(); it!=remove_contacts.end(); ++it) {
-      // Remove row and column from X
-      removeRowAndColumn(X_rem, it->second);
-      // Remove 3 rows and columns from P
-      int startIndex = 3 + 3*(it->second-3);
-      removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-      removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-      removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-      // Update all indices for estimated_landmarks and estimated_contact_positions
-      for (map<int,int>::iterator it2=estimated_landmarks_.begin(); it2!=estimated_landmarks_.end(); ++it2) {
-        if (it2->second > it->second) it2->second -= 1;
+    vector<int>& remove_indices = index_workspace_.remove_indices;
+    remove_indices.clear();
+    for (const auto& e : remove_contacts) {
+      remove_indices.push_back(e.second);
+    }
+    this->RemoveAugmentedStates(remove_indices);
+  }
+
+
+  // Reactivate the slots of the contacts that have one. X and P are edited in 
+  // place, i.e., in O(dimP) per slot. The contacts without a slot are kept in 
+  // new_contacts to be augmented below.
+  if (contact_slot_mode_ && new_contacts.size() > 0) {
+    MatrixX& X = state_.X_;
+    MatrixP& P = state_.P_;
+    int num_new_contacts = 0;
+    for (vectorKinematicsIterator it=new_contacts.begin(); it!=new_contacts.end(); ++it) {
+      map<int,int>::iterator it_slot = contact_slots_.find(it->id);
+      if (it_slot == contact_slots_.end()) {
+        new_contacts[num_new_contacts++] = *it;
+        continue;
       }
-      for (map<int,int>::iterator it2=estimated_contact_positions_.begin(); it2!=estimated_contact_positions_.end(); ++it2) {
-        if (it2->second > it->second) it2->second -= 1;
+      const int index = it_slot->second;
+      if (state_.getStateType() == StateType::WorldCentric) {
+        X.block(0,index,3,1).noalias() = state_.getPosition() + state_.getRotation() * it->pose.block<3,1>(0,3);
+      } 
+      else {
+        X.block(0,index,3,1).noalias() = state_.getPosition() - it->pose.block<3,1>(0,3);
       }
-      // We also need to update the indices of remove_contacts in the case where multiple contacts are being removed at once
-      for (vector<pair<int,int> >::iterator it2=it; it2!=remove_contacts.end(); ++it2) {
-        if (it2->second > it->second) it2->second -= 1;
+      // Initialize the slot covariance as F*P*F^T + G*Qc*G^T of the 
+      // augmentation below, i.e., with the rows F_c of F for the contact
+      const int startIndex = 3 + 3*(index-3);
+      Eigen::Matrix<double, 3, Eigen::Dynamic, Eigen::RowMajor, 3, MaxDimP> FP 
+          = P.template middleRows<3>(6); // F_c * P
+      Eigen::Matrix3d P_contact;
+      if ((state_.getStateType() == StateType::WorldCentric && error_type_ == ErrorType::RightInvariant) || 
+          (state_.getStateType() == StateType::BodyCentric && error_type_ == ErrorType::LeftInvariant)) {
+        const Eigen::Matrix3d R_world = state_.getWorldRotation();
+        P_contact.noalias() = FP.template middleCols<3>(6) 
+                              + R_world * it->covariance.block<3,3>(3,3) * R_world.transpose();
+      } 
+      else {
+        const Eigen::Matrix3d F_rot = skew(-it->pose.block<3,1>(0,3));
+        FP.noalias() += F_rot * P.template topRows<3>();
+        P_contact.noalias() = FP.template middleCols<3>(6) + FP.template leftCols<3>() * F_rot.transpose()
+                              + it->covariance.block<3,3>(3,3);
       }
-      // Remove from list of estimated contact positions 
-      estimated_contact_positions_.erase(it->first);
+      P.template middleRows<3>(startIndex) = FP;
+      P.template middleCols<3>(startIndex) = FP.transpose();
+      P.template block<3,3>(startIndex,startIndex) = P_contact;
+      this->InsertContactPosition(it->id, index);
+      ++num_contact_augmentations_;
     }
-    // Update state and covariance
-    state_.setX(X_rem);
-    state_.setP(P_rem);
+    new_contacts.resize(num_new_contacts);
   }
 
-
   // Augment state with newly detected contacts
   if (new_contacts.size() > 0) {
-    Eigen::MatrixXd X_aug = state_.getX(); 
-    Eigen::MatrixXd P_aug = state_.getP();
+    MatrixX X_aug = state_.getX(); 
+    MatrixP P_aug = state_.getP();
     for (vectorKinematicsIterator it=new_contacts.begin(); it!=new_contacts.end(); ++it) {
       // Initialize new landmark mean
       int startIndex = X_aug.rows();
+      if (exceedsCapacity(startIndex+1, State::MaxDimX)) {
+        if (!replaying_) ++num_dropped_augmentations_;
+        continue;
+      }
       X_aug.conservativeResize(startIndex+1, startIndex+1);
       X_aug.block(startIndex,0,1,startIndex).setZero();
       X_aug.block(0,startIndex,startIndex,1).setZero();
@@ -585,10 +1307,11 @@ void InEKF::CorrectKinematics(const vectorKinematics& measured_kinematics) {
       }
 
       // Initialize new landmark covariance - TODO:speed up
-      Eigen::MatrixXd F = Eigen::MatrixXd::Zero(state_.dimP()+3,state_.dimP()); 
+      MatrixP F = MatrixP::Zero(state_.dimP()+3,state_.dimP()); 
       F.block(0,0,state_.dimP()-state_.dimTheta(),state_.dimP()-state_.dimTheta()).setIdentity(); // for old X
       F.block(state_.dimP()-state_.dimTheta()+3,state_.dimP()-state_.dimTheta(),state_.dimTheta(),state_.dimTheta()).setIdentity(); // for theta
-      Eigen::MatrixXd G = Eigen::MatrixXd::Zero(F.rows(),3);
+      Eigen::Matrix<double, Eigen::Dynamic, 3, Eigen::ColMajor, MaxDimP, 3> G 
+          = Eigen::Matrix<double, Eigen::Dynamic, 3, Eigen::ColMajor, MaxDimP, 3>::Zero(F.rows(),3);
       // Blocks for new contact
       if ((state_.getStateType() == StateType::WorldCentric && error_type_ == ErrorType::RightInvariant) || 
           (state_.getStateType() == StateType::BodyCentric && error_type_ == ErrorType::LeftInvariant)) {
@@ -607,18 +1330,66 @@ void InEKF::CorrectKinematics(const vectorKinematics& measured_kinematics) {
       state_.setP(P_aug);
 
       // Add to list of estimated contact positions
-      estimated_contact_positions_.insert(pair<int,int> (it->id, startIndex));
+      this->InsertContactPosition(it->id, startIndex);
+      ++num_contact_augmentations_;
+      if (contact_slot_mode_) {
+        contact_slots_.insert(pair<int,int> (it->id, startIndex));
+      }
     }
   }
 }
 
 
+// Correct state using the base velocity measured in the imu frame
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectVelocity(const Eigen::Vector3d& measured_velocity, const Eigen::Matrix3d& covariance) {
+  // Record the correction for the replay of the state history
+  if (history_size_ > 0 && !replaying_) {
+    HistoryEntry& entry = this->HistoryAt(history_size_-1);
+    entry.has_velocity = true;
+    entry.velocity = measured_velocity;
+    entry.velocity_covariance = covariance;
+  }
+  workspace_.reset(3);
+  const Eigen::Matrix3d R_world = state_.getWorldRotation();
+  const auto& R = state_.getRotation();
+  const auto& v = state_.getVelocity();
+  // Fill out H and Z
+  workspace_.addHBlock(0, 3, Eigen::Matrix3d::Identity()); // I
+  if (state_.getStateType() == StateType::WorldCentric) {
+    workspace_.Z.template head<3>().noalias() = R * measured_velocity - v; 
+  } 
+  else {
+    workspace_.Z.template head<3>().noalias() = - R.transpose() * (measured_velocity + v); 
+  }
+  // Fill out N
+  workspace_.N.template topLeftCorner<3,3>().noalias() = R_world * covariance * R_world.transpose();
+  if (state_.getStateType() == StateType::WorldCentric) {
+    this->CorrectRightInvariant();
+  } 
+  else {
+    this->CorrectLeftInvariant();
+  }
+}
+
+
 // Create Observation from vector of landmark measurements
-void InEKF::CorrectLandmarks(const vectorLandmarks& measured_landmarks) {
-  Eigen::VectorXd Z, Y, b;
-  Eigen::MatrixXd H, N, PI;
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectLandmarks(const vectorLandmarks& measured_landmarks) {
+  // Record the correction for the replay of the state history
+  if (history_size_ > 0 && !replaying_) {
+    vectorLandmarks& landmarks = this->HistoryAt(history_size_-1).landmarks;
+    landmarks.insert(landmarks.end(), measured_landmarks.begin(), measured_landmarks.end());
+  }
   vectorLandmarks new_landmarks;
   vector<int> used_landmark_ids;
+  vector<pair<vectorLandmarksIterator,int> > correct_landmarks;
+  ++landmark_step_;
+  // The measurements processed for the first time are at the end and their
+  // drops have not been counted yet
+  const vectorLandmarksIterator first_counted = measured_landmarks.begin() 
+      + std::min(first_counted_landmark_, static_cast<int>(measured_landmarks.size()));
+  int num_counted_new_landmarks = 0;
 
   for (vectorLandmarksIterator it=measured_landmarks.begin(); it!=measured_landmarks.end(); ++it) {
     // Detect and skip if an ID is not unique (this would cause singularity issues in InEKF::Correct)
@@ -632,109 +1403,112 @@ void InEKF::CorrectLandmarks(const vectorLandmarks& measured_landmarks) {
     // See if we can find id in prior_landmarks or estimated_landmarks
     mapIntVector3dIterator it_prior = prior_landmarks_.find(it->id);
     map<int,int>::iterator it_estimated = estimated_landmarks_.find(it->id);
-    if (it_prior!=prior_landmarks_.end()) {
-      // Found in prior landmark set
-      const int dimX = state_.dimX();
-      const int dimTheta = state_.dimTheta();
-      const int dimP = state_.dimP();
-      int startIndex;
-
-      // Fill out H
-      startIndex = H.rows();
-      H.conservativeResize(startIndex+3, dimP);
-      H.block(startIndex,0,3,dimP).setZero();
-      if (state_.getStateType() == StateType::WorldCentric) {
-          H.block(startIndex,0,3,3) = skew(it_prior->second); // skew(p_wl)
-          H.block(startIndex,6,3,3) = -Eigen::Matrix3d::Identity(); // -I    
-      } 
-      else {
-          H.block(startIndex,0,3,3) = skew(-it_prior->second); // -skew(p_wl)
-          H.block(startIndex,6,3,3) = Eigen::Matrix3d::Identity(); // I    
-      }
-
-      // Fill out N
-      startIndex = N.rows();
-      N.conservativeResize(startIndex+3, startIndex+3);
-      N.block(startIndex,0,3,startIndex).setZero();
-      N.block(0,startIndex,startIndex,3).setZero();
-      N.block(startIndex,startIndex,3,3) = state_.getWorldRotation() * it->covariance * state_.getWorldRotation().transpose();
-
-      // Fill out Z
-      startIndex = Z.rows();
-      Z.conservativeResize(startIndex+3, Eigen::NoChange);
-      const auto& R = state_.getRotation();
-      const auto& p = state_.getPosition();
-      const auto& l = state_.getVector(it_estimated->second);  
-      if (state_.getStateType() == StateType::WorldCentric) {
-          Z.segment(startIndex,3) = R*it->position - (l - it_prior->second); 
-      } 
-      else {
-          Z.segment(startIndex,3) = R.transpose()*(it->position - (p - it_prior->second)); 
-      }
-    } 
-    else if (it_estimated!=estimated_landmarks_.end()) {;
-      // Found in estimated landmark set
-      const int dimX = state_.dimX();
-      const int dimTheta = state_.dimTheta();
-      const int dimP = state_.dimP();
-      int startIndex;
-
-      // Fill out H
-      startIndex = H.rows();
-      H.conservativeResize(startIndex+3, dimP);
-      H.block(startIndex,0,3,dimP).setZero();
-      if (state_.getStateType() == StateType::WorldCentric) {
-          H.block(startIndex,6,3,3) = -Eigen::Matrix3d::Identity(); // -I
-          H.block(startIndex,3*it_estimated->second-dimTheta,3,3) = Eigen::Matrix3d::Identity(); // I
-      } 
-      else {
-          H.block(startIndex,6,3,3) = Eigen::Matrix3d::Identity(); // I
-          H.block(startIndex,3*it_estimated->second-dimTheta,3,3) = -Eigen::Matrix3d::Identity(); // -I
+    if (it_prior!=prior_landmarks_.end() || it_estimated!=estimated_landmarks_.end()) {
+      // Found in prior or estimated landmark set (-1 indicates a prior landmark)
+      if (exceedsCapacity(3*correct_landmarks.size()+3, MaxDimZ)) {
+        if (it >= first_counted) ++num_dropped_measurements_;
+        continue;
       }
-
-      // Fill out N
-      startIndex = N.rows();
-      N.conservativeResize(startIndex+3, startIndex+3);
-      N.block(startIndex,0,3,startIndex).setZero();
-      N.block(0,startIndex,startIndex,3).setZero();
-      N.block(startIndex,startIndex,3,3).noalias() = state_.getWorldRotation() * it->covariance * state_.getWorldRotation().transpose();
-
-      // Fill out Z
-      startIndex = Z.rows();
-      Z.conservativeResize(startIndex+3, Eigen::NoChange);
-      const auto& R = state_.getRotation();
-      const auto& p = state_.getPosition();
-      const auto& l = state_.getVector(it_estimated->second);  
-      if (state_.getStateType() == StateType::WorldCentric) {
-          Z.segment(startIndex,3).noalias() = R*it->position - (l - p); 
-      } 
-      else {
-          Z.segment(startIndex,3).noalias() = R.transpose()*(it->position - (p - l)); 
+      const int index = (it_prior!=prior_landmarks_.end()) ? -1 : it_estimated->second;
+      correct_landmarks.push_back(pair<vectorLandmarksIterator,int> (it, index));
+      if (index >= 0) {
+        landmark_last_observed_[it->id] = landmark_step_;
       }
     } 
     else {
       // First time landmark as been detected (add to list for later state augmentation)
       new_landmarks.push_back(*it);
+      if (it >= first_counted) ++num_counted_new_landmarks;
+    }
+  }
+
+  // Evict landmarks (not measured in this step) if the new landmarks exceed 
+  // the landmark budget
+  if (max_landmarks_ >= 0 && new_landmarks.size() > 0) {
+    const int num_excess = estimated_landmarks_.size() + new_landmarks.size() - max_landmarks_;
+    if (num_excess > 0) {
+      this->EvictLandmarks(num_excess, used_landmark_ids);
+      // Update the indices of the measured landmarks
+      for (auto& e : correct_landmarks) {
+        if (e.second >= 0) {
+          e.second = estimated_landmarks_.find(e.first->id)->second;
+        }
+      }
+      const int num_free = std::max(max_landmarks_ - static_cast<int>(estimated_landmarks_.size()), 0);
+      if (new_landmarks.size() > num_free) {
+        const int num_dropped = new_landmarks.size() - num_free;
+        num_dropped_landmarks_ += std::min(num_dropped, num_counted_new_landmarks);
+        num_counted_new_landmarks = std::max(num_counted_new_landmarks - num_dropped, 0);
+        new_landmarks.resize(num_free);
+      }
     }
   }
 
   // Correct state using stacked observation
-  if (Z.rows()>0) {
+  if (correct_landmarks.size() > 0) {
+    const int dimTheta = state_.dimTheta();
+    workspace_.reset(3*correct_landmarks.size());
+    const Eigen::Matrix3d R_world = state_.getWorldRotation();
+    const auto& R = state_.getRotation();
+    const auto& p = state_.getPosition();
+    for (int i=0; i<correct_landmarks.size(); ++i) {
+      const auto& it = correct_landmarks[i].first;
+      const int index = correct_landmarks[i].second;
+      const int startIndex = 3*i;
+      if (index < 0) {
+        // Prior landmark 
+        const Eigen::Vector3d& l = prior_landmarks_.find(it->id)->second;
+        // Fill out H and Z
+        if (state_.getStateType() == StateType::WorldCentric) {
+          workspace_.addHBlock(startIndex, 0, skew(l)); // skew(p_wl)
+          workspace_.addHBlock(startIndex, 6, -Eigen::Matrix3d::Identity()); // -I
+          workspace_.Z.template segment<3>(startIndex).noalias() = R*it->position - (l - p); 
+        } 
+        else {
+          workspace_.addHBlock(startIndex, 0, skew(-l)); // -skew(p_wl)
+          workspace_.addHBlock(startIndex, 6, Eigen::Matrix3d::Identity()); // I
+          workspace_.Z.template segment<3>(startIndex).noalias() = R.transpose()*(it->position - (p - l)); 
+        }
+      }
+      else {
+        // Estimated landmark
+        const auto& l = state_.getVector(index);  
+        // Fill out H and Z
+        if (state_.getStateType() == StateType::WorldCentric) {
+          workspace_.addHBlock(startIndex, 6, -Eigen::Matrix3d::Identity()); // -I
+          workspace_.addHBlock(startIndex, 3*index-dimTheta, Eigen::Matrix3d::Identity()); // I
+          workspace_.Z.template segment<3>(startIndex).noalias() = R*it->position - (l - p); 
+        } 
+        else {
+          workspace_.addHBlock(startIndex, 6, Eigen::Matrix3d::Identity()); // I
+          workspace_.addHBlock(startIndex, 3*index-dimTheta, -Eigen::Matrix3d::Identity()); // -I
+          workspace_.Z.template segment<3>(startIndex).noalias() = R.transpose()*(it->position - (p - l)); 
+        }
+      }
+      // Fill out N
+      workspace_.N.template block<3,3>(startIndex,startIndex).noalias() 
+          = R_world * it->covariance * R_world.transpose();
+    }
     if (state_.getStateType() == StateType::WorldCentric) {
-      this->CorrectRightInvariant(Z,H,N);
+      this->CorrectRightInvariant();
     } 
     else {
-      this->CorrectLeftInvariant(Z,H,N);
+      this->CorrectLeftInvariant();
     }
   }
 
     // Augment state with newly detected landmarks
   if (new_landmarks.size() > 0) {
-    Eigen::MatrixXd X_aug = state_.getX(); 
-    Eigen::MatrixXd P_aug = state_.getP();
+    MatrixX X_aug = state_.getX(); 
+    MatrixP P_aug = state_.getP();
+    const vectorLandmarksIterator first_counted_new = new_landmarks.end() - num_counted_new_landmarks;
     for (vectorLandmarksIterator it=new_landmarks.begin(); it!=new_landmarks.end(); ++it) {
       // Initialize new landmark mean
       const int startIndex = X_aug.rows();
+      if (exceedsCapacity(startIndex+1, State::MaxDimX)) {
+        if (it >= first_counted_new) ++num_dropped_augmentations_;
+        continue;
+      }
       X_aug.conservativeResize(startIndex+1, startIndex+1);
       X_aug.block(startIndex,0,1,startIndex).setZero();
       X_aug.block(0,startIndex,startIndex,1).setZero();
@@ -742,10 +1516,11 @@ void InEKF::CorrectLandmarks(const vectorLandmarks& measured_landmarks) {
       X_aug.block(0,startIndex,3,1) = state_.getPosition() + state_.getRotation()*it->position;
 
       // Initialize new landmark covariance - TODO:speed up
-      Eigen::MatrixXd F = Eigen::MatrixXd::Zero(state_.dimP()+3,state_.dimP()); 
+      MatrixP F = MatrixP::Zero(state_.dimP()+3,state_.dimP()); 
       F.block(0,0,state_.dimP()-state_.dimTheta(),state_.dimP()-state_.dimTheta()).setIdentity(); // for old X
       F.block(state_.dimP()-state_.dimTheta()+3,state_.dimP()-state_.dimTheta(),state_.dimTheta(),state_.dimTheta()).setIdentity(); // for theta
-      Eigen::MatrixXd G = Eigen::MatrixXd::Zero(F.rows(),3);
+      Eigen::Matrix<double, Eigen::Dynamic, 3, Eigen::ColMajor, MaxDimP, 3> G 
+          = Eigen::Matrix<double, Eigen::Dynamic, 3, Eigen::ColMajor, MaxDimP, 3>::Zero(F.rows(),3);
       // Blocks for new landmark
       if (error_type_==ErrorType::RightInvariant) {
         F.block(state_.dimP()-state_.dimTheta(),6,3,3) = Eigen::Matrix3d::Identity(); 
@@ -763,92 +1538,244 @@ void InEKF::CorrectLandmarks(const vectorLandmarks& measured_landmarks) {
 
       // Add to list of estimated landmarks
       estimated_landmarks_.insert(pair<int,int> (it->id, startIndex));
+      landmark_last_observed_[it->id] = landmark_step_;
     }
   }
 }
 
 
 // Remove landmarks by IDs
-void InEKF::RemoveLandmarks(const int landmark_id) {
-    // Search for landmark in state
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::RemoveLandmarks(const int landmark_id) {
+  // Search for landmark in state
   map<int,int>::iterator it = estimated_landmarks_.find(landmark_id);
   if (it!=estimated_landmarks_.end()) {
-    // Get current X and P
-    Eigen::MatrixXd X_rem = state_.getX(); 
-    Eigen::MatrixXd P_rem = state_.getP();
-    // Remove row and column from X
-    removeRowAndColumn(X_rem, it->second);
-    // Remove 3 rows and columns from P
-    int startIndex = 3 + 3*(it->second-3);
-    removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-    removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-    removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-    // Update all indices for estimated_landmarks and estimated_contact_positions (TODO: speed this up)
-    for (map<int,int>::iterator it2=estimated_landmarks_.begin(); it2!=estimated_landmarks_.end(); ++it2) {
-      if (it2->second > it->second) it2->second -= 1;
-    }
-    for (map<int,int>::iterator it2=estimated_contact_positions_.begin(); it2!=estimated_contact_positions_.end(); ++it2) {
-      if (it2->second > it->second) it2->second -= 1;
-    }
-    // Remove from list of estimated landmark positions (after we are done with iterator)
-    estimated_landmarks_.erase(it->first);
-    // Update state and covariance
-    state_.setX(X_rem);
-    state_.setP(P_rem);   
+    this->RemoveAugmentedStates(vector<int>(1, it->second));
   }
 }
 
 
 // Remove landmarks by IDs
-void InEKF::RemoveLandmarks(const std::vector<int>& landmark_ids) {
-  // Loop over landmark_ids and remove
-  for (int i=0; i<landmark_ids.size(); ++i) {
-    this->RemoveLandmarks(landmark_ids[i]);
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::RemoveLandmarks(const std::vector<int>& landmark_ids) {
+  // Collect the indices of the landmarks in state and remove them at once
+  vector<int> remove_indices;
+  for (const int id : landmark_ids) {
+    map<int,int>::iterator it = estimated_landmarks_.find(id);
+    if (it!=estimated_landmarks_.end()) {
+      remove_indices.push_back(it->second);
+    }
   }
+  this->RemoveAugmentedStates(remove_indices);
 }
 
 
 // Keep landmarks by IDs
-void InEKF::KeepLandmarks(const std::vector<int>& landmark_ids) {
-  std::cout << std::endl;
-  // Loop through estimated landmarks removing ones not found in the list
-  std::vector<int> ids_to_erase;
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::KeepLandmarks(const std::vector<int>& landmark_ids) {
+  // Collect the indices of the landmarks not found in the list and remove them at once
+  const std::set<int> keep_ids(landmark_ids.begin(), landmark_ids.end());
+  vector<int> remove_indices;
   for (map<int,int>::iterator it=estimated_landmarks_.begin(); it!=estimated_landmarks_.end(); ++it) {
-    std::vector<int>::const_iterator it_found = find(landmark_ids.begin(), landmark_ids.end(), it->first);
-    if (it_found==landmark_ids.end()) {
-      // Get current X and P
-      Eigen::MatrixXd X_rem = state_.getX(); 
-      Eigen::MatrixXd P_rem = state_.getP();
-      // Remove row and column from X
-      removeRowAndColumn(X_rem, it->second);
-      // Remove 3 rows and columns from P
-      int startIndex = 3 + 3*(it->second-3);
-      removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-      removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-      removeRowAndColumn(P_rem, startIndex); // TODO: Make more efficient
-      // Update all indices for estimated_landmarks and estimated_contact_positions (TODO: speed this up)
-      for (map<int,int>::iterator it2=estimated_landmarks_.begin(); it2!=estimated_landmarks_.end(); ++it2) {
-        if (it2->second > it->second) it2->second -= 1;
+    if (keep_ids.find(it->first) == keep_ids.end()) {
+      remove_indices.push_back(it->second);
+    }
+  }
+  this->RemoveAugmentedStates(remove_indices);
+}
+
+
+// Evict landmarks from the state according to the eviction policy
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::EvictLandmarks(const int num_evict, const std::vector<int>& excluded_ids) {
+  // Score the candidates (the landmark with the largest score is evicted first)
+  vector<pair<double,int> > candidates;
+  for (const auto& e : estimated_landmarks_) {
+    if (find(excluded_ids.begin(), excluded_ids.end(), e.first) != excluded_ids.end()) continue;
+    double score;
+    if (landmark_eviction_policy_ == LandmarkEvictionPolicy::LeastRecentlyObserved) {
+      score = - static_cast<double>(landmark_last_observed_[e.first]);
+    }
+    else {
+      score = state_.getP().template block<3,3>(3*e.second-6,3*e.second-6).trace();
+    }
+    candidates.push_back(pair<double,int> (score, e.first));
+  }
+  const int num_candidates = std::min(num_evict, static_cast<int>(candidates.size()));
+  std::partial_sort(candidates.begin(), candidates.begin()+num_candidates, candidates.end(), 
+                    std::greater<pair<double,int> >());
+
+  // Marginalize the evicted landmarks out of the state at once
+  vector<int> remove_indices;
+  for (int i=0; i<num_candidates; ++i) {
+    const int index = estimated_landmarks_.find(candidates[i].second)->second;
+    if (keep_evicted_landmarks_) {
+      prior_landmarks_[candidates[i].second] = state_.getVector(index);
+    }
+    remove_indices.push_back(index);
+  }
+  this->RemoveAugmentedStates(remove_indices);
+}
+
+
+// Correct state using landmark measurements taken at a past time
+template <int MaxAugmented>
+bool InEKFTpl<MaxAugmented>::CorrectLandmarksAt(const double time, const vectorLandmarks& measured_landmarks) {
+  last_replay_latency_ = 0;
+  last_replay_steps_ = 0;
+  if (history_size_ == 0 || time >= time_) {
+    this->CorrectLandmarks(measured_landmarks);
+    return true;
+  }
+  // Find the latest propagation step that ends at or before the measurement
+  int first = history_size_-1;
+  while (first >= 0 && this->HistoryAt(first).time + this->HistoryAt(first).dt > time) {
+    --first;
+  }
+  if (first < 0) {
+    // The measurement is older than the state history
+    return false;
+  }
+  const auto start_time = std::chrono::steady_clock::now();
+  vectorLandmarks& landmarks = this->HistoryAt(first).landmarks;
+  const int num_stored_landmarks = landmarks.size();
+  landmarks.insert(landmarks.end(), measured_landmarks.begin(), measured_landmarks.end());
+
+  // Re-propagate from the state before the step with the stored measurements
+  // and overwrite the states of the following steps
+  const double current_time = time_;
+  replay_contacts_ = contacts_;
+  replaying_ = true;
+  for (int i=first; i<history_size_; ++i) {
+    HistoryEntry& entry = this->HistoryAt(i);
+    if (i == first) {
+      this->RestoreHistoryEntry(entry);
+    }
+    else {
+      this->SaveHistoryEntry(entry);
+    }
+    this->Propagate(entry.imu, entry.dt);
+    if (entry.has_kinematics) {
+      contacts_ = entry.contacts;
+      this->CorrectKinematics(entry.kinematics);
+    }
+    if (entry.has_velocity) {
+      this->CorrectVelocity(entry.velocity, entry.velocity_covariance);
+    }
+    if (!entry.landmarks.empty()) {
+      // Only the drops of the new measurements are counted: those of the
+      // stored ones were counted when they were processed first
+      first_counted_landmark_ = (i == first) ? num_stored_landmarks : entry.landmarks.size();
+      this->CorrectLandmarks(entry.landmarks);
+      first_counted_landmark_ = 0;
+    }
+  }
+  replaying_ = false;
+  contacts_ = replay_contacts_;
+  time_ = current_time;
+  last_replay_steps_ = history_size_ - first;
+  last_replay_latency_ = 1.0e-3 * std::chrono::duration_cast<std::chrono::nanoseconds>(
+      std::chrono::steady_clock::now() - start_time).count();
+  return true;
+}
+
+
+// Remove augmented states by indices in X
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::RemoveAugmentedStates(const std::vector<int>& indices) {
+  if (indices.empty()) return;
+  const auto& X = state_.getX();
+  const auto& P = state_.getP();
+  const int dimX = state_.dimX();
+  const int dimTheta = state_.dimTheta();
+  const int dimP = state_.dimP();
+
+  // New index of each column of X (-1 if removed) and the kept indices of P
+  vector<int>& new_index = index_workspace_.new_index;
+  new_index.assign(dimX, 0);
+  for (const int index : indices) {
+    new_index[index] = -1;
+  }
+  int dimX_new = 0;
+  for (int i=0; i<dimX; ++i) {
+    if (new_index[i] >= 0) new_index[i] = dimX_new++;
+  }
+  vector<int>& keep_indices_P = index_workspace_.keep_indices_P;
+  keep_indices_P.clear();
+  for (int i=0; i<dimP-dimTheta; ++i) {
+    if (i < 9 || new_index[i/3+2] >= 0) keep_indices_P.push_back(i);
+  }
+  for (int i=dimP-dimTheta; i<dimP; ++i) {
+    keep_indices_P.push_back(i);
+  }
+  const int dimP_new = keep_indices_P.size();
+
+  // Compact X and P 
+  MatrixX X_new(dimX_new, dimX_new);
+  for (int j=0; j<dimX; ++j) {
+    if (new_index[j] < 0) continue;
+    for (int i=0; i<dimX; ++i) {
+      if (new_index[i] < 0) continue;
+      X_new(new_index[i], new_index[j]) = X(i, j);
+    }
+  }
+  MatrixP P_new(dimP_new, dimP_new);
+  for (int j=0; j<dimP_new; ++j) {
+    for (int i=0; i<dimP_new; ++i) {
+      P_new(i, j) = P(keep_indices_P[i], keep_indices_P[j]);
+    }
+  }
+
+  // Update all indices for estimated_landmarks, estimated_contact_positions, 
+  // and contact_slots, and erase the removed ones
+  std::map<int,int>* index_maps[3] = {&estimated_landmarks_, &estimated_contact_positions_, &contact_slots_};
+  for (int k=0; k<3; ++k) {
+    for (map<int,int>::iterator it=index_maps[k]->begin(); it!=index_maps[k]->end(); ) {
+      if (new_index[it->second] < 0) {
+        if (k == 0) landmark_last_observed_.erase(it->first);
+        it = (k == 1) ? this->EraseContactPosition(it) : index_maps[k]->erase(it);
       }
-      for (map<int,int>::iterator it2=estimated_contact_positions_.begin(); it2!=estimated_contact_positions_.end(); ++it2) {
-        if (it2->second > it->second) it2->second -= 1;
+      else {
+        it->second = new_index[it->second];
+        ++it;
       }
-      // Add to list of ids to erase
-      ids_to_erase.push_back(it->first);
-      // Update state and covariance
-      state_.setX(X_rem);
-      state_.setP(P_rem);   
     }
   }
-  // Remove from list of estimated landmark positions (after we are done with iterator)
-  for (int i=0; i<ids_to_erase.size(); ++i) {
-    estimated_landmarks_.erase(ids_to_erase[i]);
+  state_.setX(X_new);
+  state_.setP(P_new);
+}
+
+
+// Insert an estimated contact position
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::InsertContactPosition(const int id, const int index) {
+  // Reuse the node of the same contact if possible, otherwise any spare node
+  auto node = spare_contact_positions_.extract(id);
+  if (node.empty() && !spare_contact_positions_.empty()) {
+    node = spare_contact_positions_.extract(spare_contact_positions_.begin());
+  }
+  if (!node.empty()) {
+    node.key() = id;
+    node.mapped() = index;
+    estimated_contact_positions_.insert(std::move(node));
+    return;
   }
+  estimated_contact_positions_.insert(pair<int,int> (id, index));
+}
+
+
+// Erase an estimated contact position
+template <int MaxAugmented>
+std::map<int,int>::iterator InEKFTpl<MaxAugmented>::EraseContactPosition(std::map<int,int>::iterator it) {
+  auto next = std::next(it);
+  spare_contact_positions_.insert(estimated_contact_positions_.extract(it));
+  return next;
 }
 
 
 // Remove prior landmarks by IDs
-void InEKF::RemovePriorLandmarks(const int landmark_id) {
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::RemovePriorLandmarks(const int landmark_id) {
   // Search for landmark in state
   mapIntVector3dIterator it = prior_landmarks_.find(landmark_id);
   if (it!=prior_landmarks_.end()) { 
@@ -859,7 +1786,8 @@ void InEKF::RemovePriorLandmarks(const int landmark_id) {
 
 
 // Remove prior landmarks by IDs
-void InEKF::RemovePriorLandmarks(const std::vector<int>& landmark_ids) {
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::RemovePriorLandmarks(const std::vector<int>& landmark_ids) {
   // Loop over landmark_ids and remove
   for (int i=0; i<landmark_ids.size(); ++i) {
     this->RemovePriorLandmarks(landmark_ids[i]);
@@ -868,7 +1796,8 @@ void InEKF::RemovePriorLandmarks(const std::vector<int>& landmark_ids) {
 
 
 // Corrects state using magnetometer measurements (Right Invariant)
-void InEKF::CorrectMagnetometer(const Eigen::Vector3d& measured_magnetic_field, const Eigen::Matrix3d& covariance) {
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectMagnetometer(const Eigen::Vector3d& measured_magnetic_field, const Eigen::Matrix3d& covariance) {
     // Eigen::VectorXd Y, b;
     // Eigen::MatrixXd H, N, PI;
 
@@ -915,7 +1844,8 @@ void InEKF::CorrectMagnetometer(const Eigen::Vector3d& measured_magnetic_field,
 
 
 // Observation of absolute position - GPS (Left-Invariant Measurement)
-void InEKF::CorrectPosition(const Eigen::Vector3d& measured_position, 
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectPosition(const Eigen::Vector3d& measured_position, 
                             const Eigen::Matrix3d& covariance, 
                             const Eigen::Vector3d& indices) {
   // Eigen::VectorXd Y, b;
@@ -989,7 +1919,8 @@ void InEKF::CorrectPosition(const Eigen::Vector3d& measured_position,
 
 
 // Observation of absolute z-position of contact points (Left-Invariant Measurement)
-void InEKF::CorrectContactPosition(const int id, 
+template <int MaxAugmented>
+void InEKFTpl<MaxAugmented>::CorrectContactPosition(const int id, 
                                    const Eigen::Vector3d& measured_contact_position, 
                                    const Eigen::Matrix3d& covariance, 
                                    const Eigen::Vector3d& indices) {
@@ -1042,12 +1973,7 @@ void InEKF::CorrectContactPosition(const int id,
 }
 
 
-void removeRowAndColumn(Eigen::MatrixXd& M, int index) {
-  const unsigned int dimX = M.cols();
-  // cout << "Removing index: " << index<< endl;
-  M.block(index,0,dimX-index-1,dimX) = M.bottomRows(dimX-index-1).eval();
-  M.block(0,index,dimX,dimX-index-1) = M.rightCols(dimX-index-1).eval();
-  M.conservativeResize(dimX-1,dimX-1);
-}
+template class InEKFTpl<Eigen::Dynamic>;
+template class InEKFTpl<4>;
 
 } // end inekf namespace
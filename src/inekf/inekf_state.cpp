@@ -1,6 +1,6 @@
 /* ----------------------------------------------------------------------------
  * Copyright 2018, Ross Hartley <m.ross.hartley@gmail.com>
- * All Rights Reserved 
+ * All Rights Reserved
  * See LICENSE for the license information
  * -------------------------------------------------------------------------- */
 
@@ -18,155 +18,199 @@
 namespace legged_state_estimator {
 
 // Default constructor
-InEKFState::InEKFState() : 
-  X_(Eigen::MatrixXd::Identity(5,5)), 
-  Theta_(Eigen::MatrixXd::Zero(6,1)), 
-  P_(Eigen::MatrixXd::Identity(15,15)) {}
+template <int MaxAugmented>
+InEKFStateTpl<MaxAugmented>::InEKFStateTpl() :
+  X_(MatrixX::Identity(5,5)),
+  Theta_(VectorTheta::Zero(6)),
+  P_(MatrixP::Identity(15,15)) {}
 
 
 // Initialize with X
-InEKFState::InEKFState(const Eigen::MatrixXd& X) : 
-    X_(X), Theta_(Eigen::MatrixXd::Zero(6,1)) {
-    P_ = Eigen::MatrixXd::Identity(3*this->dimX()+this->dimTheta()-6, 3*this->dimX()+this->dimTheta()-6);
+template <int MaxAugmented>
+InEKFStateTpl<MaxAugmented>::InEKFStateTpl(const MatrixX& X) :
+    X_(X), Theta_(VectorTheta::Zero(6)) {
+    P_ = MatrixP::Identity(3*this->dimX()+this->dimTheta()-6, 3*this->dimX()+this->dimTheta()-6);
 }
 
 
 // Initialize with X and Theta
-InEKFState::InEKFState(const Eigen::MatrixXd& X, const Eigen::VectorXd& Theta) : 
+template <int MaxAugmented>
+InEKFStateTpl<MaxAugmented>::InEKFStateTpl(const MatrixX& X, const VectorTheta& Theta) :
     X_(X), Theta_(Theta) {
-    P_ = Eigen::MatrixXd::Identity(3*this->dimX()+this->dimTheta()-6, 3*this->dimX()+this->dimTheta()-6);
+    P_ = MatrixP::Identity(3*this->dimX()+this->dimTheta()-6, 3*this->dimX()+this->dimTheta()-6);
 }
 
 
 // Initialize with X, Theta and P
-InEKFState::InEKFState(const Eigen::MatrixXd& X, const Eigen::VectorXd& Theta, const Eigen::MatrixXd& P) : 
+template <int MaxAugmented>
+InEKFStateTpl<MaxAugmented>::InEKFStateTpl(const MatrixX& X, const VectorTheta& Theta, const MatrixP& P) :
     X_(X), Theta_(Theta), P_(P) {}
 // TODO: error checking to make sure dimensions are correct and supported
 
 
-const Eigen::MatrixXd& InEKFState::getX() const { return X_; }
-const Eigen::VectorXd& InEKFState::getTheta() const { return Theta_; }
-const Eigen::MatrixXd& InEKFState::getP() const { return P_; }
-const Eigen::Block<const Eigen::MatrixXd, 3, 3> InEKFState::getRotation() const { return X_.template block<3,3>(0,0); }
-const Eigen::Block<const Eigen::MatrixXd, 3, 1> InEKFState::getVelocity() const { return X_.template block<3,1>(0,3); }
-const Eigen::Block<const Eigen::MatrixXd, 3, 1> InEKFState::getPosition() const { return X_.template block<3,1>(0,4); }
-const Eigen::Block<const Eigen::MatrixXd, 3, 1> InEKFState::getVector(int index) const { return X_.template block<3,1>(0,index); }
-
-const Eigen::VectorBlock<const Eigen::VectorXd, 3> InEKFState::getGyroscopeBias() const { return Theta_.template head<3>(); }
-const Eigen::VectorBlock<const Eigen::VectorXd, 3> InEKFState::getAccelerometerBias() const { return Theta_.template tail<3>(3); }
-
-const Eigen::Block<const Eigen::MatrixXd, 3, 3> InEKFState::getRotationCovariance() const { return P_.template block<3,3>(0,0); }
-const Eigen::Block<const Eigen::MatrixXd, 3, 3> InEKFState::getVelocityCovariance() const { return P_.template block<3,3>(3,3); }
-const Eigen::Block<const Eigen::MatrixXd, 3, 3> InEKFState::getPositionCovariance() const { return P_.template block<3,3>(6,6); }
-const Eigen::Block<const Eigen::MatrixXd, 3, 3> InEKFState::getGyroscopeBiasCovariance() const { return P_.template block<3,3>(P_.rows()-6,P_.rows()-6); }
-const Eigen::Block<const Eigen::MatrixXd, 3, 3> InEKFState::getAccelerometerBiasCovariance() const { return P_.template block<3,3>(P_.rows()-3,P_.rows()-3); }
-
-int InEKFState::dimX() const { return X_.cols(); }
-int InEKFState::dimTheta() const {return Theta_.rows();}
-int InEKFState::dimP() const { return P_.cols(); }
-
-
-const StateType InEKFState::getStateType() const { return state_type_; }
-
-
-const Eigen::MatrixXd InEKFState::getWorldX() const {
+template <int MaxAugmented>
+const typename InEKFStateTpl<MaxAugmented>::MatrixX& InEKFStateTpl<MaxAugmented>::getX() const { return X_; }
+template <int MaxAugmented>
+const typename InEKFStateTpl<MaxAugmented>::VectorTheta& InEKFStateTpl<MaxAugmented>::getTheta() const { return Theta_; }
+template <int MaxAugmented>
+const typename InEKFStateTpl<MaxAugmented>::MatrixP& InEKFStateTpl<MaxAugmented>::getP() const { return P_; }
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixX, 3, 3> InEKFStateTpl<MaxAugmented>::getRotation() const { return X_.template block<3,3>(0,0); }
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixX, 3, 1> InEKFStateTpl<MaxAugmented>::getVelocity() const { return X_.template block<3,1>(0,3); }
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixX, 3, 1> InEKFStateTpl<MaxAugmented>::getPosition() const { return X_.template block<3,1>(0,4); }
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixX, 3, 1> InEKFStateTpl<MaxAugmented>::getVector(int index) const { return X_.template block<3,1>(0,index); }
+
+template <int MaxAugmented>
+const Eigen::VectorBlock<const typename InEKFStateTpl<MaxAugmented>::VectorTheta, 3> InEKFStateTpl<MaxAugmented>::getGyroscopeBias() const { return Theta_.template head<3>(); }
+template <int MaxAugmented>
+const Eigen::VectorBlock<const typename InEKFStateTpl<MaxAugmented>::VectorTheta, 3> InEKFStateTpl<MaxAugmented>::getAccelerometerBias() const { return Theta_.template tail<3>(3); }
+
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixP, 3, 3> InEKFStateTpl<MaxAugmented>::getRotationCovariance() const { return P_.template block<3,3>(0,0); }
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixP, 3, 3> InEKFStateTpl<MaxAugmented>::getVelocityCovariance() const { return P_.template block<3,3>(3,3); }
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixP, 3, 3> InEKFStateTpl<MaxAugmented>::getPositionCovariance() const { return P_.template block<3,3>(6,6); }
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixP, 3, 3> InEKFStateTpl<MaxAugmented>::getGyroscopeBiasCovariance() const { return P_.template block<3,3>(P_.rows()-6,P_.rows()-6); }
+template <int MaxAugmented>
+const Eigen::Block<const typename InEKFStateTpl<MaxAugmented>::MatrixP, 3, 3> InEKFStateTpl<MaxAugmented>::getAccelerometerBiasCovariance() const { return P_.template block<3,3>(P_.rows()-3,P_.rows()-3); }
+
+template <int MaxAugmented>
+int InEKFStateTpl<MaxAugmented>::dimX() const { return X_.cols(); }
+template <int MaxAugmented>
+int InEKFStateTpl<MaxAugmented>::dimTheta() const {return Theta_.rows();}
+template <int MaxAugmented>
+int InEKFStateTpl<MaxAugmented>::dimP() const { return P_.cols(); }
+
+
+template <int MaxAugmented>
+const StateType InEKFStateTpl<MaxAugmented>::getStateType() const { return state_type_; }
+
+
+template <int MaxAugmented>
+const typename InEKFStateTpl<MaxAugmented>::MatrixX InEKFStateTpl<MaxAugmented>::getWorldX() const {
   if (state_type_ == StateType::WorldCentric) {
     return this->getX();
-  } 
+  }
   else {
     return this->calcXinv();
   }
 }
 
 
-const Eigen::Matrix3d InEKFState::getWorldRotation() const {
+template <int MaxAugmented>
+const Eigen::Matrix3d InEKFStateTpl<MaxAugmented>::getWorldRotation() const {
   if (state_type_ == StateType::WorldCentric) {
     return this->getRotation();
-  } 
+  }
   else {
     return this->getRotation().transpose();
   }
 }
 
 
-const Eigen::Vector3d InEKFState::getWorldVelocity() const {
+template <int MaxAugmented>
+const Eigen::Vector3d InEKFStateTpl<MaxAugmented>::getWorldVelocity() const {
   if (state_type_ == StateType::WorldCentric) {
     return this->getVelocity();
-  } 
+  }
   else {
     return -this->getRotation().transpose()*this->getVelocity();
   }
 }
 
 
-const Eigen::Vector3d InEKFState::getWorldPosition() const {
+template <int MaxAugmented>
+const Eigen::Vector3d InEKFStateTpl<MaxAugmented>::getWorldPosition() const {
   if (state_type_ == StateType::WorldCentric) {
     return this->getPosition();
-  } 
+  }
   else {
     return -this->getRotation().transpose()*this->getPosition();
   }
 }
 
 
-const Eigen::MatrixXd InEKFState::getBodyX() const {
+template <int MaxAugmented>
+const typename InEKFStateTpl<MaxAugmented>::MatrixX InEKFStateTpl<MaxAugmented>::getBodyX() const {
   if (state_type_ == StateType::BodyCentric) {
     return this->getX();
-  } 
+  }
   else {
     return this->calcXinv();
   }
 }
 
 
-const Eigen::Matrix3d InEKFState::getBodyRotation() const {
+template <int MaxAugmented>
+const Eigen::Matrix3d InEKFStateTpl<MaxAugmented>::getBodyRotation() const {
   if (state_type_ == StateType::BodyCentric) {
     return this->getRotation();
-  } 
+  }
   else {
     return this->getRotation().transpose();
   }
 }
 
 
-const Eigen::Vector3d InEKFState::getBodyVelocity() const {
+template <int MaxAugmented>
+const Eigen::Vector3d InEKFStateTpl<MaxAugmented>::getBodyVelocity() const {
   if (state_type_ == StateType::BodyCentric) {
     return this->getVelocity();
-  } 
+  }
   else {
     return -this->getRotation().transpose()*this->getVelocity();
   }
 }
 
 
-const Eigen::Vector3d InEKFState::getBodyPosition() const {
+template <int MaxAugmented>
+const Eigen::Vector3d InEKFStateTpl<MaxAugmented>::getBodyPosition() const {
   if (state_type_ == StateType::BodyCentric) {
     return this->getPosition();
-  } 
+  }
   else {
     return -this->getRotation().transpose()*this->getPosition();
   }
 }
 
 
-void InEKFState::setX(const Eigen::MatrixXd& X) { X_ = X; }
-void InEKFState::setTheta(const Eigen::VectorXd& Theta) { Theta_ = Theta; }
-void InEKFState::setP(const Eigen::MatrixXd& P) { P_ = P; }
-void InEKFState::setRotation(const Eigen::Matrix3d& R) { X_.block<3,3>(0,0) = R; }
-void InEKFState::setVelocity(const Eigen::Vector3d& v) { X_.block<3,1>(0,3) = v; }
-void InEKFState::setPosition(const Eigen::Vector3d& p) { X_.block<3,1>(0,4) = p; }
-
-void InEKFState::setGyroscopeBias(const Eigen::Vector3d& bg) { Theta_.head(3) = bg; }
-void InEKFState::setAccelerometerBias(const Eigen::Vector3d& ba) { Theta_.tail(3) = ba; }
-
-void InEKFState::setRotationCovariance(const Eigen::Matrix3d& cov) { P_.block<3,3>(0,0) = cov; }
-void InEKFState::setVelocityCovariance(const Eigen::Matrix3d& cov) { P_.block<3,3>(3,3) = cov; }
-void InEKFState::setPositionCovariance(const Eigen::Matrix3d& cov) { P_.block<3,3>(6,6) = cov; }
-void InEKFState::setGyroscopeBiasCovariance(const Eigen::Matrix3d& cov) { P_.block<3,3>(P_.rows()-6,P_.rows()-6) = cov; }
-void InEKFState::setAccelerometerBiasCovariance(const Eigen::Matrix3d& cov) { P_.block<3,3>(P_.rows()-3,P_.rows()-3) = cov; }
-
-
-void InEKFState::copyDiagX(const int n, Eigen::MatrixXd& BigX) const {
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setX(const MatrixX& X) { X_ = X; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setTheta(const VectorTheta& Theta) { Theta_ = Theta; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setP(const MatrixP& P) { P_ = P; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setRotation(const Eigen::Matrix3d& R) { X_.template block<3,3>(0,0) = R; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setVelocity(const Eigen::Vector3d& v) { X_.template block<3,1>(0,3) = v; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setPosition(const Eigen::Vector3d& p) { X_.template block<3,1>(0,4) = p; }
+
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setGyroscopeBias(const Eigen::Vector3d& bg) { Theta_.head(3) = bg; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setAccelerometerBias(const Eigen::Vector3d& ba) { Theta_.tail(3) = ba; }
+
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setRotationCovariance(const Eigen::Matrix3d& cov) { P_.template block<3,3>(0,0) = cov; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setVelocityCovariance(const Eigen::Matrix3d& cov) { P_.template block<3,3>(3,3) = cov; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setPositionCovariance(const Eigen::Matrix3d& cov) { P_.template block<3,3>(6,6) = cov; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setGyroscopeBiasCovariance(const Eigen::Matrix3d& cov) { P_.template block<3,3>(P_.rows()-6,P_.rows()-6) = cov; }
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::setAccelerometerBiasCovariance(const Eigen::Matrix3d& cov) { P_.template block<3,3>(P_.rows()-3,P_.rows()-3) = cov; }
+
+
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::copyDiagX(const int n, Eigen::MatrixXd& BigX) const {
   const int dimX = this->dimX();
   for(int i=0; i<n; ++i) {
     const int startIndex = BigX.rows();
@@ -179,9 +223,10 @@ void InEKFState::copyDiagX(const int n, Eigen::MatrixXd& BigX) const {
 }
 
 
-void InEKFState::copyDiagXinv(const int n, Eigen::MatrixXd& BigXinv) const {
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::copyDiagXinv(const int n, Eigen::MatrixXd& BigXinv) const {
   const int dimX = this->dimX();
-  Eigen::MatrixXd Xinv = this->calcXinv();
+  const MatrixX Xinv = this->calcXinv();
   for(int i=0; i<n; ++i) {
     int startIndex = BigXinv.rows();
     BigXinv.conservativeResize(startIndex + dimX, startIndex + dimX);
@@ -193,25 +238,51 @@ void InEKFState::copyDiagXinv(const int n, Eigen::MatrixXd& BigXinv) const {
 }
 
 
-Eigen::MatrixXd InEKFState::calcXinv() const {
+template <int MaxAugmented>
+typename InEKFStateTpl<MaxAugmented>::MatrixX InEKFStateTpl<MaxAugmented>::calcXinv() const {
   const int dimX = this->dimX();
-  Eigen::MatrixXd Xinv = Eigen::MatrixXd::Identity(dimX,dimX);
-  const auto& RT = X_.block<3,3>(0,0).transpose();
-  Xinv.block<3,3>(0,0) = RT;
+  MatrixX Xinv = MatrixX::Identity(dimX,dimX);
+  const auto& RT = X_.template block<3,3>(0,0).transpose();
+  Xinv.template block<3,3>(0,0) = RT;
   for(int i=3; i<dimX; ++i) {
-    Xinv.block<3,1>(0,i).noalias() = -RT * X_.block<3,1>(0,i);
+    Xinv.template block<3,1>(0,i).noalias() = -RT * X_.template block<3,1>(0,i);
   }
   return Xinv;
 }
 
 
-std::ostream& operator<<(std::ostream& os, const InEKFState& s) {  
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::saveCheckpoint(CheckpointWriter& writer) const {
+  writer.write(state_type_);
+  writer.write(X_);
+  writer.write(Theta_);
+  writer.write(P_);
+}
+
+
+template <int MaxAugmented>
+void InEKFStateTpl<MaxAugmented>::loadCheckpoint(CheckpointReader& reader) {
+  reader.read(state_type_);
+  reader.read(X_);
+  reader.read(Theta_);
+  reader.read(P_);
+}
+
+
+template <int MaxAugmented>
+std::ostream& operator<<(std::ostream& os, const InEKFStateTpl<MaxAugmented>& s) {
   os << "--------- Robot State -------------" << std::endl;
-  os << "X:\n" << s.X_ << std::endl << std::endl;
-  os << "Theta:\n" << s.Theta_ << std::endl << std::endl;
-  // os << "P:\n" << s.P_ << endl;
+  os << "X:\n" << s.getX() << std::endl << std::endl;
+  os << "Theta:\n" << s.getTheta() << std::endl << std::endl;
+  // os << "P:\n" << s.getP() << endl;
   os << "-----------------------------------";
-  return os;  
-} 
+  return os;
+}
+
+
+template class InEKFStateTpl<Eigen::Dynamic>;
+template class InEKFStateTpl<4>;
+template std::ostream& operator<<(std::ostream& os, const InEKFStateTpl<Eigen::Dynamic>& s);
+template std::ostream& operator<<(std::ostream& os, const InEKFStateTpl<4>& s);
 
-} // namespace legged_state_estimator 
+} // namespace legged_state_estimator
@@ -79,6 +79,44 @@ Eigen::Matrix3d Gamma_SO3(const Eigen::Vector3d& w, const int m,
   }
 }
 
+void Gamma_SO3(const Eigen::Vector3d& w, Eigen::Matrix3d& G0, Eigen::Matrix3d& G1,
+               Eigen::Matrix3d& G2, Eigen::Matrix3d& G3) {
+  // Gamma_m = I/m! + d_{m+1} A + d_{m+2} A^2, where A = w^\wedge and 
+  // d_n = \sum_{k=0}^{\infty} (-theta^2)^k / (2k+n)!, shares the coefficients 
+  // among m = 0, 1, 2, 3. 
+  const double theta = w.norm();
+  const double theta2 = theta*theta;
+  double d[6];
+  if (theta < 1.0) {
+    // Taylor series (the closed form suffers from cancellation for small theta)
+    double nfactorial = 1.0;
+    for (int n=1; n<=5; ++n) {
+      nfactorial *= n;
+      double term = 1.0/nfactorial;
+      d[n] = term;
+      for (int k=1; k<=10; ++k) {
+        term *= - theta2 / ((2*k+n-1)*(2*k+n));
+        d[n] += term;
+      }
+    }
+  } 
+  else {
+    const double stheta = sin(theta);
+    const double ctheta = cos(theta);
+    d[1] = stheta / theta;
+    d[2] = (1-ctheta) / theta2;
+    d[3] = (theta-stheta) / (theta2*theta);
+    d[4] = (0.5*theta2-1+ctheta) / (theta2*theta2);
+    d[5] = (theta2*theta/6.0-theta+stheta) / (theta2*theta2*theta);
+  }
+  const Eigen::Matrix3d A = skew(w);
+  const Eigen::Matrix3d A2 = A*A;
+  G0.noalias() = Eigen::Matrix3d::Identity() + d[1]*A + d[2]*A2;
+  G1.noalias() = Eigen::Matrix3d::Identity() + d[2]*A + d[3]*A2;
+  G2.noalias() = 0.5*Eigen::Matrix3d::Identity() + d[3]*A + d[4]*A2;
+  G3.noalias() = (1.0/6.0)*Eigen::Matrix3d::Identity() + d[4]*A + d[5]*A2;
+}
+
 Eigen::Matrix3d Exp_SO3(const Eigen::Vector3d& w) {
   // Computes the vectorized exponential map for SO(3)
   return Gamma_SO3(w, 0);
@@ -95,45 +133,14 @@ Eigen::Matrix3d RightJacobian_SO3(const Eigen::Vector3d& w) {
 }
 
 Eigen::MatrixXd Exp_SEK3(const Eigen::VectorXd& v,  const double exp_map_tol) {
-  // Computes the vectorized exponential map for SE_K(3)
-  const int K = (v.size()-3)/3;
-  Eigen::MatrixXd X = Eigen::MatrixXd::Identity(3+K,3+K);
-  Eigen::Matrix3d R;
-  Eigen::Matrix3d Jl;
-  const auto& w = v.head(3);
-  double theta = w.norm();
-  if (theta < exp_map_tol) {
-    R = Eigen::Matrix3d::Identity();
-    Jl = Eigen::Matrix3d::Identity();
-  } else {
-    const Eigen::Matrix3d A = skew(w);
-    const double theta2 = theta*theta;
-    const double stheta = sin(theta);
-    const double ctheta = cos(theta);
-    const double oneMinusCosTheta2 = (1-ctheta)/(theta2);
-    const Eigen::Matrix3d A2 = A*A;
-    R.noalias() = Eigen::Matrix3d::Identity() 
-                   + (stheta/theta) * A + oneMinusCosTheta2 * A2;
-    Jl.noalias() = Eigen::Matrix3d::Identity() 
-                   + oneMinusCosTheta2*A + ((theta-stheta)/(theta2*theta)) * A2;
-  }
-  X.block<3,3>(0,0) = R;
-  for (int i=0; i<K; ++i) {
-      X.block<3,1>(0,3+i).noalias() = Jl * v.segment<3>(3+3*i);
-  }
+  Eigen::MatrixXd X;
+  Exp_SEK3(v, X, exp_map_tol);
   return X;
 }
 
 Eigen::MatrixXd Adjoint_SEK3(const Eigen::MatrixXd& X) {
-  // Compute Adjoint(X) for X in SE_K(3)
-  const int K = X.cols()-3;
-  Eigen::MatrixXd Adj = Eigen::MatrixXd::Zero(3+3*K, 3+3*K);
-  const auto& R = X.block<3,3>(0,0);
-  Adj.block<3,3>(0,0) = R;
-  for (int i=0; i<K; ++i) {
-    Adj.block<3,3>(3+3*i,3+3*i) = R;
-    Adj.block<3,3>(3+3*i,0).noalias() = skew(X.block<3,1>(0,3+i)) * R;
-  }
+  Eigen::MatrixXd Adj;
+  Adjoint_SEK3(X, Adj);
   return Adj;
 }
 
@@ -52,6 +52,24 @@ const Eigen::Matrix3d& NoiseParams::getGyroscopeBiasCov() const { return Qbg_; }
 const Eigen::Matrix3d& NoiseParams::getAccelerometerBiasCov() const { return Qba_; }
 const Eigen::Matrix3d& NoiseParams::getContactCov() const { return Qc_; }
 
+void NoiseParams::saveCheckpoint(CheckpointWriter& writer) const {
+  writer.write(Qg_);
+  writer.write(Qa_);
+  writer.write(Qbg_);
+  writer.write(Qba_);
+  writer.write(Ql_);
+  writer.write(Qc_);
+}
+
+void NoiseParams::loadCheckpoint(CheckpointReader& reader) {
+  reader.read(Qg_);
+  reader.read(Qa_);
+  reader.read(Qbg_);
+  reader.read(Qba_);
+  reader.read(Ql_);
+  reader.read(Qc_);
+}
+
 std::ostream& operator<<(std::ostream& os, const NoiseParams& p) {
   os << "--------- Noise Params -------------" << std::endl;
   os << "Gyroscope Covariance:\n" << p.Qg_ << std::endl;
@@ -2,21 +2,57 @@
 
 #include <stdexcept>
 #include <string>
+#include <cstring>
+#include <algorithm>
+#include <optional>
 
 
 namespace legged_state_estimator {
 
+namespace {
+
+const char kCheckpointMagic[8] = {'L', 'S', 'E', 'C', 'K', 'P', 'T', '\0'};
+const std::uint32_t kCheckpointVersion = 1;
+
+// Indices of the fields in the layout of the estimate record
+enum EstimateRecordFieldIndex {
+  BasePositionField,
+  BaseQuaternionField,
+  BaseRotationField,
+  BaseLinearVelocityWorldField,
+  BaseLinearVelocityLocalField,
+  BaseAngularVelocityWorldField,
+  BaseAngularVelocityLocalField,
+  IMUGyroBiasField,
+  IMULinearAccelerationBiasField,
+  JointVelocityField,
+  JointAccelerationField,
+  JointTorqueField,
+  ContactProbabilityField
+};
+
+std::string settingsCheckpoint(const LeggedStateEstimatorSettings& settings) {
+  CheckpointWriter writer;
+  settings.saveCheckpoint(writer);
+  return writer.data();
+}
+
+} // namespace
+
+
 LeggedStateEstimator::LeggedStateEstimator(const LeggedStateEstimatorSettings& settings)
   : settings_(settings),
     inekf_(settings.inekf_noise_params),
     leg_kinematics_(),
-    robot_model_(settings.urdf_path, settings.imu_frame, settings.contact_frames),
+    robot_model_(RobotModel::buildFloatingBaseModel(settings.urdf_path, settings.robot_model_cache_dir),
+                 settings.imu_frame, settings.contact_frames),
     contact_estimator_(robot_model_, settings.contact_estimator_settings),
     lpf_gyro_accel_world_(settings.sampling_time, settings.lpf_gyro_accel_cutoff_frequency),
     lpf_lin_accel_world_(settings.sampling_time, settings.lpf_lin_accel_cutoff_frequency),
     lpf_dqJ_(settings.sampling_time, settings.lpf_dqJ_cutoff_frequency, robot_model_.nJ()),
     lpf_ddqJ_(settings.sampling_time, settings.lpf_ddqJ_cutoff_frequency, robot_model_.nJ()),
     lpf_tauJ_(settings.sampling_time, settings.lpf_tauJ_cutoff_frequency, robot_model_.nJ()),
+    ddqJ_raw_(Eigen::VectorXd::Zero(robot_model_.nJ())),
     imu_gyro_raw_world_(Vector3d::Zero()), 
     imu_gyro_raw_world_prev_(Vector3d::Zero()), 
     imu_gyro_accel_world_(Vector3d::Zero()), 
@@ -30,9 +66,23 @@ LeggedStateEstimator::LeggedStateEstimator(const LeggedStateEstimatorSettings& s
     base_ang_vel_local_estimate_(Vector3d::Zero()),
     imu_gyro_bias_estimate_(Vector3d::Zero()), 
     imu_lin_acc_bias_estimate_(Vector3d::Zero()),
+    base_lin_vel_leg_odometry_(Vector3d::Zero()),
+    base_ang_vel_leg_odometry_(Vector3d::Zero()),
+    leg_velocity_(Vector3d::Zero()),
     base_rot_estimate_(Matrix3d::Identity()),
     imu_raw_(Vector6d::Zero()),
-    base_quat_estimate_(Eigen::Quaterniond::Identity().coeffs()) {
+    base_quat_estimate_(Eigen::Quaterniond::Identity().coeffs()),
+    estimate_record_(),
+    estimate_record_layout_(),
+    timing_stats_(),
+    num_update_allocations_(0),
+    imu_time_(0),
+    joint_time_(0),
+    estimate_time_(0),
+    imu_received_(false),
+    joints_received_(false),
+    estimate_publisher_(),
+    estimate_snapshot_() {
   if (settings.sampling_time <= 0.0) {
     throw std::invalid_argument(
         "[LeggedStateEstimator] invalid argment: sampling_time must be positive");
@@ -45,7 +95,18 @@ LeggedStateEstimator::LeggedStateEstimator(const LeggedStateEstimatorSettings& s
   for (int i=0; i<settings.contact_frames.size(); ++i) {
     leg_kinematics_.emplace_back(i, Eigen::Matrix4d::Identity(), cov_leg);
   }
+  inekf_.setContactSlotMode(settings.contact_slot_mode);
+  robot_model_.setKinematicsBackend(settings.kinematics_backend);
   imu_raw_.setZero();
+  initEstimateRecord();
+  if (!settings.estimate_publisher_name.empty()) {
+    if (robot_model_.numContacts() > EstimateSnapshot::kMaxContacts) {
+      throw std::invalid_argument(
+          "[LeggedStateEstimator] invalid argment: the number of contacts must not exceed " 
+          + std::to_string(EstimateSnapshot::kMaxContacts) + " to publish the estimates");
+    }
+    estimate_publisher_ = std::make_shared<EstimatePublisher>(settings.estimate_publisher_name);
+  }
 }
 
 
@@ -60,6 +121,7 @@ LeggedStateEstimator::LeggedStateEstimator()
     lpf_dqJ_(),
     lpf_ddqJ_(),
     lpf_tauJ_(),
+    ddqJ_raw_(),
     imu_gyro_raw_world_(Vector3d::Zero()), 
     imu_gyro_raw_world_prev_(Vector3d::Zero()), 
     imu_gyro_accel_world_(Vector3d::Zero()), 
@@ -73,9 +135,124 @@ LeggedStateEstimator::LeggedStateEstimator()
     base_ang_vel_local_estimate_(Vector3d::Zero()),
     imu_gyro_bias_estimate_(Vector3d::Zero()), 
     imu_lin_acc_bias_estimate_(Vector3d::Zero()),
+    base_lin_vel_leg_odometry_(Vector3d::Zero()),
+    base_ang_vel_leg_odometry_(Vector3d::Zero()),
+    leg_velocity_(Vector3d::Zero()),
     base_rot_estimate_(Matrix3d::Identity()),
     imu_raw_(Vector6d::Zero()),
-    base_quat_estimate_(Eigen::Quaterniond::Identity().coeffs()) {
+    base_quat_estimate_(Eigen::Quaterniond::Identity().coeffs()),
+    estimate_record_(),
+    estimate_record_layout_(),
+    timing_stats_(),
+    num_update_allocations_(0),
+    imu_time_(0),
+    joint_time_(0),
+    estimate_time_(0),
+    imu_received_(false),
+    joints_received_(false),
+    estimate_publisher_(),
+    estimate_snapshot_() {
+  initEstimateRecord();
+}
+
+
+LeggedStateEstimator::LeggedStateEstimator(const LeggedStateEstimator& other)
+  : settings_(other.settings_),
+    inekf_(other.inekf_),
+    leg_kinematics_(other.leg_kinematics_),
+    robot_model_(other.robot_model_),
+    contact_estimator_(other.contact_estimator_),
+    lpf_gyro_accel_world_(other.lpf_gyro_accel_world_),
+    lpf_lin_accel_world_(other.lpf_lin_accel_world_),
+    lpf_dqJ_(other.lpf_dqJ_),
+    lpf_ddqJ_(other.lpf_ddqJ_),
+    lpf_tauJ_(other.lpf_tauJ_),
+    ddqJ_raw_(other.ddqJ_raw_),
+    imu_gyro_raw_world_(other.imu_gyro_raw_world_),
+    imu_gyro_raw_world_prev_(other.imu_gyro_raw_world_prev_),
+    imu_gyro_accel_world_(other.imu_gyro_accel_world_),
+    imu_gyro_accel_local_(other.imu_gyro_accel_local_),
+    imu_lin_accel_raw_world_(other.imu_lin_accel_raw_world_),
+    imu_lin_accel_local_(other.imu_lin_accel_local_),
+    base_pos_estimate_(other.base_pos_estimate_),
+    base_lin_vel_world_estimate_(other.base_lin_vel_world_estimate_),
+    base_lin_vel_local_estimate_(other.base_lin_vel_local_estimate_),
+    base_ang_vel_world_estimate_(other.base_ang_vel_world_estimate_),
+    base_ang_vel_local_estimate_(other.base_ang_vel_local_estimate_),
+    imu_gyro_bias_estimate_(other.imu_gyro_bias_estimate_),
+    imu_lin_acc_bias_estimate_(other.imu_lin_acc_bias_estimate_),
+    base_lin_vel_leg_odometry_(other.base_lin_vel_leg_odometry_),
+    base_ang_vel_leg_odometry_(other.base_ang_vel_leg_odometry_),
+    leg_velocity_(other.leg_velocity_),
+    base_rot_estimate_(other.base_rot_estimate_),
+    imu_raw_(other.imu_raw_),
+    base_quat_estimate_(other.base_quat_estimate_),
+    estimate_record_(other.estimate_record_),
+    estimate_record_layout_(other.estimate_record_layout_),
+    timing_stats_(other.timing_stats_),
+    num_update_allocations_(other.num_update_allocations_),
+    imu_time_(other.imu_time_),
+    joint_time_(other.joint_time_),
+    estimate_time_(other.estimate_time_),
+    imu_received_(other.imu_received_),
+    joints_received_(other.joints_received_),
+    estimate_publisher_(),
+    estimate_snapshot_() {
+  // A copy does not publish: the segment has a single writer.
+  settings_.estimate_publisher_name.clear();
+}
+
+
+LeggedStateEstimator& LeggedStateEstimator::operator=(const LeggedStateEstimator& other) {
+  if (this == &other) {
+    return *this;
+  }
+  // The estimate publisher of this estimator is kept.
+  const std::string estimate_publisher_name = settings_.estimate_publisher_name;
+  settings_ = other.settings_;
+  settings_.estimate_publisher_name = estimate_publisher_name;
+  inekf_ = other.inekf_;
+  leg_kinematics_ = other.leg_kinematics_;
+  robot_model_ = other.robot_model_;
+  contact_estimator_ = other.contact_estimator_;
+  lpf_gyro_accel_world_ = other.lpf_gyro_accel_world_;
+  lpf_lin_accel_world_ = other.lpf_lin_accel_world_;
+  lpf_dqJ_ = other.lpf_dqJ_;
+  lpf_ddqJ_ = other.lpf_ddqJ_;
+  lpf_tauJ_ = other.lpf_tauJ_;
+  ddqJ_raw_ = other.ddqJ_raw_;
+  imu_gyro_raw_world_ = other.imu_gyro_raw_world_;
+  imu_gyro_raw_world_prev_ = other.imu_gyro_raw_world_prev_;
+  imu_gyro_accel_world_ = other.imu_gyro_accel_world_;
+  imu_gyro_accel_local_ = other.imu_gyro_accel_local_;
+  imu_lin_accel_raw_world_ = other.imu_lin_accel_raw_world_;
+  imu_lin_accel_local_ = other.imu_lin_accel_local_;
+  base_pos_estimate_ = other.base_pos_estimate_;
+  base_lin_vel_world_estimate_ = other.base_lin_vel_world_estimate_;
+  base_lin_vel_local_estimate_ = other.base_lin_vel_local_estimate_;
+  base_ang_vel_world_estimate_ = other.base_ang_vel_world_estimate_;
+  base_ang_vel_local_estimate_ = other.base_ang_vel_local_estimate_;
+  imu_gyro_bias_estimate_ = other.imu_gyro_bias_estimate_;
+  imu_lin_acc_bias_estimate_ = other.imu_lin_acc_bias_estimate_;
+  base_lin_vel_leg_odometry_ = other.base_lin_vel_leg_odometry_;
+  base_ang_vel_leg_odometry_ = other.base_ang_vel_leg_odometry_;
+  leg_velocity_ = other.leg_velocity_;
+  base_rot_estimate_ = other.base_rot_estimate_;
+  imu_raw_ = other.imu_raw_;
+  base_quat_estimate_ = other.base_quat_estimate_;
+  estimate_record_ = other.estimate_record_;
+  estimate_record_layout_ = other.estimate_record_layout_;
+  timing_stats_ = other.timing_stats_;
+  num_update_allocations_ = other.num_update_allocations_;
+  imu_time_ = other.imu_time_;
+  joint_time_ = other.joint_time_;
+  estimate_time_ = other.estimate_time_;
+  imu_received_ = other.imu_received_;
+  joints_received_ = other.joints_received_;
+  if (estimate_publisher_) {
+    publishEstimates();
+  }
+  return *this;
 }
 
 
@@ -87,7 +264,7 @@ void LeggedStateEstimator::init(const Eigen::Vector3d& base_pos,
                                 const Eigen::Vector3d& base_lin_vel_world,
                                 const Eigen::Vector3d& imu_gyro_bias,
                                 const Eigen::Vector3d& imu_lin_accel_bias) {
-  InEKFState initial_state;
+  InEKFType::State initial_state;
   initial_state.setPosition(base_pos);
   initial_state.setRotation(Eigen::Quaterniond(base_quat).toRotationMatrix());
   initial_state.setVelocity(base_lin_vel_world);
@@ -100,6 +277,17 @@ void LeggedStateEstimator::init(const Eigen::Vector3d& base_pos,
   lpf_dqJ_.reset();
   lpf_ddqJ_.reset();
   lpf_tauJ_.reset();
+  imu_time_ = 0;
+  joint_time_ = 0;
+  estimate_time_ = 0;
+  imu_received_ = false;
+  joints_received_ = false;
+  // No IMU measurement has been received since the initialization
+  imu_raw_.setZero();
+  imu_gyro_raw_world_.setZero();
+  imu_gyro_bias_estimate_ = imu_gyro_bias;
+  updateEstimates();
+  updateEstimateRecord();
 }
 
 
@@ -138,6 +326,118 @@ void LeggedStateEstimator::update(const Eigen::Vector3d& imu_gyro_raw,
                                   const Eigen::VectorXd& qJ, 
                                   const Eigen::VectorXd& dqJ, 
                                   const Eigen::VectorXd& tauJ) {
+  checkJointMeasurements(qJ, dqJ, tauJ);
+  // An inactive audit would become the innermost one and hide the allocations
+  // from an audit of the caller
+  std::optional<AllocationAudit> allocation_audit;
+  if (settings_.allocation_audit_mode != NoAllocationAudit) {
+    allocation_audit.emplace(settings_.allocation_audit_mode);
+  }
+  std::chrono::steady_clock::time_point start_time, stage_start_time;
+  if (settings_.enable_timing_stats) {
+    start_time = std::chrono::steady_clock::now();
+    stage_start_time = start_time;
+  }
+  propagate(imu_gyro_raw, imu_lin_accel_raw, settings_.sampling_time, stage_start_time);
+  correct(qJ, dqJ, tauJ, settings_.sampling_time, stage_start_time);
+  estimate_time_ += settings_.sampling_time;
+  restoreEstimates();
+  if (settings_.enable_timing_stats) {
+    recordStage(EstimateOutputStage, stage_start_time);
+    timing_stats_.record(TotalStage, stage_start_time - start_time);
+  }
+  if (allocation_audit) {
+    num_update_allocations_ += allocation_audit->numAllocations();
+  }
+}
+
+
+void LeggedStateEstimator::pushIMU(const double t, 
+                                   const Eigen::Vector3d& imu_gyro_raw, 
+                                   const Eigen::Vector3d& imu_lin_accel_raw) {
+  if (imu_received_ && t <= imu_time_) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimator] invalid argment: t must be greater than the time of the previous IMU measurement");
+  }
+  std::optional<AllocationAudit> allocation_audit;
+  if (settings_.allocation_audit_mode != NoAllocationAudit) {
+    allocation_audit.emplace(settings_.allocation_audit_mode);
+  }
+  std::chrono::steady_clock::time_point start_time, stage_start_time;
+  if (settings_.enable_timing_stats) {
+    start_time = std::chrono::steady_clock::now();
+    stage_start_time = start_time;
+  }
+  if (!imu_received_ && !joints_received_) {
+    estimate_time_ = t;
+  }
+  // The state may have been propagated beyond t by pushJoints() 
+  if (t > estimate_time_) {
+    propagate(imu_gyro_raw, imu_lin_accel_raw, t-estimate_time_, stage_start_time);
+    estimate_time_ = t;
+  }
+  else {
+    imu_raw_.template head<3>() = imu_gyro_raw;
+    imu_raw_.template tail<3>() = imu_lin_accel_raw;
+  }
+  imu_time_ = t;
+  imu_received_ = true;
+  restoreEstimates();
+  if (settings_.enable_timing_stats) {
+    recordStage(EstimateOutputStage, stage_start_time);
+    timing_stats_.record(TotalStage, stage_start_time - start_time);
+  }
+  if (allocation_audit) {
+    num_update_allocations_ += allocation_audit->numAllocations();
+  }
+}
+
+
+void LeggedStateEstimator::pushJoints(const double t, const Eigen::VectorXd& qJ, 
+                                      const Eigen::VectorXd& dqJ, 
+                                      const Eigen::VectorXd& tauJ) {
+  checkJointMeasurements(qJ, dqJ, tauJ);
+  if (joints_received_ && t <= joint_time_) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimator] invalid argment: t must be greater than the time of the previous joint measurement");
+  }
+  std::optional<AllocationAudit> allocation_audit;
+  if (settings_.allocation_audit_mode != NoAllocationAudit) {
+    allocation_audit.emplace(settings_.allocation_audit_mode);
+  }
+  std::chrono::steady_clock::time_point start_time, stage_start_time;
+  if (settings_.enable_timing_stats) {
+    start_time = std::chrono::steady_clock::now();
+    stage_start_time = start_time;
+  }
+  if (!imu_received_ && !joints_received_) {
+    estimate_time_ = t;
+  }
+  // Propagate to t with the latest IMU measurement (zero-order hold)
+  if (imu_received_ && t > estimate_time_) {
+    const Eigen::Vector3d imu_gyro_raw = imu_raw_.template head<3>();
+    const Eigen::Vector3d imu_lin_accel_raw = imu_raw_.template tail<3>();
+    propagate(imu_gyro_raw, imu_lin_accel_raw, t-estimate_time_, stage_start_time);
+    estimate_time_ = t;
+  }
+  const double dt = joints_received_ ? (t - joint_time_) : settings_.sampling_time;
+  correct(qJ, dqJ, tauJ, dt, stage_start_time);
+  joint_time_ = t;
+  joints_received_ = true;
+  restoreEstimates();
+  if (settings_.enable_timing_stats) {
+    recordStage(EstimateOutputStage, stage_start_time);
+    timing_stats_.record(TotalStage, stage_start_time - start_time);
+  }
+  if (allocation_audit) {
+    num_update_allocations_ += allocation_audit->numAllocations();
+  }
+}
+
+
+void LeggedStateEstimator::checkJointMeasurements(const Eigen::VectorXd& qJ, 
+                                                  const Eigen::VectorXd& dqJ, 
+                                                  const Eigen::VectorXd& tauJ) const {
   if (qJ.size() != robot_model_.nJ()) {
     throw std::invalid_argument(
         "[LeggedStateEstimator] invalid argment: qJ.size() must be " + std::to_string(robot_model_.nJ()));
@@ -150,51 +450,119 @@ void LeggedStateEstimator::update(const Eigen::Vector3d& imu_gyro_raw,
     throw std::invalid_argument(
         "[LeggedStateEstimator] invalid argment: tauJ.size() must be " + std::to_string(robot_model_.nJ()));
   }
+}
+
+
+void LeggedStateEstimator::propagate(const Eigen::Vector3d& imu_gyro_raw, 
+                                     const Eigen::Vector3d& imu_lin_accel_raw, 
+                                     const double dt,
+                                     std::chrono::steady_clock::time_point& stage_start_time) {
   // Process IMU measurements in InEKF
   imu_raw_.template head<3>() = imu_gyro_raw;
   imu_raw_.template tail<3>() = imu_lin_accel_raw;
-  inekf_.Propagate(imu_raw_, settings_.sampling_time);
+  inekf_.Propagate(imu_raw_, dt);
+  recordStage(PropagationStage, stage_start_time);
   // Process IMU measurements in LPFs (linear acceleration)
   imu_lin_accel_raw_world_.noalias() = getBaseRotationEstimate() * (imu_lin_accel_raw - getIMULinearAccelerationBiasEstimate());
-  lpf_lin_accel_world_.update(imu_lin_accel_raw_world_);
+  lpf_lin_accel_world_.update(imu_lin_accel_raw_world_, dt);
   imu_lin_accel_local_.noalias() = getBaseRotationEstimate().transpose() * lpf_lin_accel_world_.getEstimate();
   // Process IMU measurements in LPFs (angular acceleration via a finite difference)
   if (settings_.dynamic_contact_estimation) {
     imu_gyro_raw_world_.noalias() = getBaseRotationEstimate() * (imu_gyro_raw - getIMUGyroBiasEstimate());
-    imu_gyro_accel_world_.noalias() = (imu_gyro_raw_world_ - imu_gyro_raw_world_prev_) / settings_.sampling_time;
-    lpf_gyro_accel_world_.update(imu_gyro_accel_world_);
+    imu_gyro_accel_world_.noalias() = (imu_gyro_raw_world_ - imu_gyro_raw_world_prev_) / dt;
+    lpf_gyro_accel_world_.update(imu_gyro_accel_world_, dt);
     imu_gyro_accel_local_.noalias() = getBaseRotationEstimate().transpose() * lpf_gyro_accel_world_.getEstimate();
     imu_gyro_raw_world_prev_ = imu_gyro_raw_world_;
   }
+}
+
+
+void LeggedStateEstimator::correct(const Eigen::VectorXd& qJ, 
+                                   const Eigen::VectorXd& dqJ, 
+                                   const Eigen::VectorXd& tauJ, 
+                                   const double dt,
+                                   std::chrono::steady_clock::time_point& stage_start_time) {
+  const Eigen::Vector3d imu_gyro_raw = imu_raw_.template head<3>();
   // Process joint measurements in LPFs 
   if (settings_.dynamic_contact_estimation) {
-    lpf_ddqJ_.update((dqJ-lpf_dqJ_.getEstimate())/settings_.sampling_time);
+    ddqJ_raw_.noalias() = (dqJ-lpf_dqJ_.getEstimate()) / dt;
+    lpf_ddqJ_.update(ddqJ_raw_, dt);
   }
-  lpf_dqJ_.update(dqJ);
-  lpf_tauJ_.update(tauJ);
+  lpf_dqJ_.update(dqJ, dt);
+  lpf_tauJ_.update(tauJ, dt);
+  recordStage(LowPassFilterStage, stage_start_time);
   // Update contact info
-  robot_model_.updateLegKinematics(qJ);
   if (settings_.dynamic_contact_estimation) {
-    robot_model_.updateDynamics(getBasePositionEstimate(), getBaseQuaternionEstimate(),
-                                getBaseLinearVelocityEstimateLocal(), imu_gyro_raw,
-                                imu_lin_accel_local_, imu_gyro_accel_local_,
-                                qJ, dqJ, lpf_ddqJ_.getEstimate());
+    robot_model_.updateLegKinematicsAndDynamics(getBaseQuaternionEstimate(),
+                                                getBaseLinearVelocityEstimateLocal(), imu_gyro_raw,
+                                                imu_lin_accel_local_, imu_gyro_accel_local_,
+                                                qJ, dqJ, lpf_ddqJ_.getEstimate());
   }
   else {
-    robot_model_.updateLegDynamics(qJ, dqJ);
+    robot_model_.updateLegKinematicsAndDynamics(qJ, dqJ);
   }
+  recordStage(RobotModelStage, stage_start_time);
   contact_estimator_.update(robot_model_, lpf_tauJ_.getEstimate());
-  inekf_.setContacts(contact_estimator_.getContactState());
-  for (int i=0; i<robot_model_.numContacts(); ++i) {
-    leg_kinematics_[i].setContactPosition(
-        robot_model_.getContactPosition(i)-robot_model_.getBasePosition());
-    const double contact_force_cov = contact_estimator_.getContactForceCovariance()[i];
-    leg_kinematics_[i].setContactPositionCovariance(
-        contact_force_cov*Eigen::Matrix3d::Identity());
-  }
-  // Process kinematics measurements in InEKF
-  inekf_.CorrectKinematics(leg_kinematics_);
-  // Restore estimates
+  recordStage(ContactEstimationStage, stage_start_time);
+  const long num_contact_augmentations = inekf_.getNumContactAugmentations();
+  const long num_contact_removals = inekf_.getNumContactRemovals();
+  if (settings_.leg_odometry_mode == LegOdometryMode::BaseVelocity) {
+    // Process leg odometry in InEKF. The base velocities measured by the 
+    // stance legs are fused by the inverse-variance weighting.
+    const double leg_velocity_cov = settings_.leg_odometry_velocity_noise * settings_.leg_odometry_velocity_noise;
+    base_ang_vel_leg_odometry_ = imu_gyro_raw - inekf_.getState().getGyroscopeBias();
+    base_lin_vel_leg_odometry_.setZero();
+    double information = 0.0;
+    for (const auto& e : contact_estimator_.getContactState()) {
+      if (!e.second) continue;
+      const int i = e.first;
+      const double cov = leg_velocity_cov + contact_estimator_.getContactForceCovariance()[i];
+      leg_velocity_.noalias() = robot_model_.getJointContactJacobian(i) * dqJ;
+      leg_velocity_.noalias() += base_ang_vel_leg_odometry_.cross(
+          robot_model_.getContactPosition(i)-robot_model_.getBasePosition());
+      base_lin_vel_leg_odometry_.noalias() -= leg_velocity_ / cov;
+      information += 1.0 / cov;
+    }
+    if (information > 0.0) {
+      base_lin_vel_leg_odometry_ /= information;
+      inekf_.CorrectVelocity(base_lin_vel_leg_odometry_, 
+                             Eigen::Matrix3d::Identity()/information);
+    }
+  }
+  else {
+    inekf_.setContacts(contact_estimator_.getContactState());
+    for (int i=0; i<robot_model_.numContacts(); ++i) {
+      leg_kinematics_[i].setContactPosition(
+          robot_model_.getContactPosition(i)-robot_model_.getBasePosition());
+      const double contact_force_cov = contact_estimator_.getContactForceCovariance()[i];
+      leg_kinematics_[i].setContactPositionCovariance(
+          contact_force_cov*Eigen::Matrix3d::Identity());
+    }
+    // Process kinematics measurements in InEKF
+    inekf_.CorrectKinematics(leg_kinematics_);
+  }
+  if (settings_.enable_timing_stats) {
+    const long num_augmentations = inekf_.getNumContactAugmentations() - num_contact_augmentations;
+    const long num_removals = inekf_.getNumContactRemovals() - num_contact_removals;
+    timing_stats_.addContactSwitches(num_augmentations, num_removals);
+    recordStage((num_augmentations > 0 || num_removals > 0) ? ContactSwitchCorrectionStage 
+                                                            : KinematicsCorrectionStage, 
+                stage_start_time);
+  }
+}
+
+
+void LeggedStateEstimator::restoreEstimates() {
+  updateEstimates();
+  updateEstimateRecord();
+  if (estimate_publisher_) {
+    publishEstimates();
+  }
+}
+
+
+void LeggedStateEstimator::updateEstimates() {
+  const Eigen::Vector3d imu_gyro_raw = imu_raw_.template head<3>();
   base_pos_estimate_ = inekf_.getState().getPosition();
   base_rot_estimate_ = inekf_.getState().getRotation();
   base_quat_estimate_ = Eigen::Quaterniond(inekf_.getState().getRotation()).coeffs();
@@ -207,6 +575,33 @@ void LeggedStateEstimator::update(const Eigen::Vector3d& imu_gyro_raw,
 }
 
 
+void LeggedStateEstimator::publishEstimates() {
+  EstimateSnapshot& snapshot = estimate_snapshot_;
+  snapshot.time = estimate_time_;
+  Eigen::Map<Vector3d>(snapshot.base_position) = base_pos_estimate_;
+  Eigen::Map<Eigen::Vector4d>(snapshot.base_quaternion) = base_quat_estimate_;
+  Eigen::Map<Vector3d>(snapshot.base_linear_velocity_world) = base_lin_vel_world_estimate_;
+  Eigen::Map<Vector3d>(snapshot.base_linear_velocity_local) = base_lin_vel_local_estimate_;
+  Eigen::Map<Vector3d>(snapshot.base_angular_velocity_world) = base_ang_vel_world_estimate_;
+  Eigen::Map<Vector3d>(snapshot.base_angular_velocity_local) = base_ang_vel_local_estimate_;
+  Eigen::Map<Vector3d>(snapshot.imu_gyro_bias) = imu_gyro_bias_estimate_;
+  Eigen::Map<Vector3d>(snapshot.imu_linear_acceleration_bias) = imu_lin_acc_bias_estimate_;
+  const auto& contact_state = contact_estimator_.getContactState();
+  const auto& contact_probability = contact_estimator_.getContactProbability();
+  snapshot.num_contacts = contact_probability.size();
+  for (int i=0; i<contact_probability.size(); ++i) {
+    snapshot.contact_state[i] = contact_state[i].second ? 1 : 0;
+    snapshot.contact_probability[i] = contact_probability[i];
+  }
+  estimate_publisher_->publish(snapshot);
+}
+
+
+double LeggedStateEstimator::getEstimateTime() const {
+  return estimate_time_;
+}
+
+
 const Eigen::Vector3d& LeggedStateEstimator::getBasePositionEstimate() const {
   return base_pos_estimate_;
 }
@@ -227,7 +622,7 @@ const Eigen::Vector3d& LeggedStateEstimator::getBaseLinearVelocityEstimateWorld(
 }
 
 
-const Eigen::Vector3d LeggedStateEstimator::getBaseLinearVelocityEstimateLocal() const {
+const Eigen::Vector3d& LeggedStateEstimator::getBaseLinearVelocityEstimateLocal() const {
   return base_lin_vel_local_estimate_;
 }
 
@@ -267,13 +662,267 @@ const Eigen::VectorXd& LeggedStateEstimator::getJointTorqueEstimate() const {
 }
 
 
+const Eigen::VectorXd& LeggedStateEstimator::getEstimateRecord() const {
+  return estimate_record_;
+}
+
+
+const std::vector<EstimateRecordField>& LeggedStateEstimator::getEstimateRecordLayout() const {
+  return estimate_record_layout_;
+}
+
+
+const LeggedStateEstimator::InEKFType::State& LeggedStateEstimator::getInEKFState() const {
+  return inekf_.getState();
+}
+
+
 const ContactEstimator& LeggedStateEstimator::getContactEstimator() const {
   return contact_estimator_;
 }
 
 
+const RobotModel& LeggedStateEstimator::getRobotModel() const {
+  return robot_model_;
+}
+
+
 const LeggedStateEstimatorSettings& LeggedStateEstimator::getSettings() const {
   return settings_;
 }
 
+
+const TimingStats& LeggedStateEstimator::getTimingStats() const {
+  return timing_stats_;
+}
+
+
+void LeggedStateEstimator::resetTimingStats() {
+  timing_stats_.reset();
+}
+
+
+std::string LeggedStateEstimator::saveCheckpoint() const {
+  CheckpointWriter writer;
+  for (const char c : kCheckpointMagic) {
+    writer.write(c);
+  }
+  writer.write(kCheckpointVersion);
+  writer.write(settingsCheckpoint(settings_));
+  inekf_.saveCheckpoint(writer);
+  contact_estimator_.saveCheckpoint(writer);
+  lpf_gyro_accel_world_.saveCheckpoint(writer);
+  lpf_lin_accel_world_.saveCheckpoint(writer);
+  lpf_dqJ_.saveCheckpoint(writer);
+  lpf_ddqJ_.saveCheckpoint(writer);
+  lpf_tauJ_.saveCheckpoint(writer);
+  writer.write(ddqJ_raw_);
+  writer.write(imu_gyro_raw_world_);
+  writer.write(imu_gyro_raw_world_prev_);
+  writer.write(imu_gyro_accel_world_);
+  writer.write(imu_gyro_accel_local_);
+  writer.write(imu_lin_accel_raw_world_);
+  writer.write(imu_lin_accel_local_);
+  writer.write(base_pos_estimate_);
+  writer.write(base_lin_vel_world_estimate_);
+  writer.write(base_lin_vel_local_estimate_);
+  writer.write(base_ang_vel_world_estimate_);
+  writer.write(base_ang_vel_local_estimate_);
+  writer.write(imu_gyro_bias_estimate_);
+  writer.write(imu_lin_acc_bias_estimate_);
+  writer.write(base_lin_vel_leg_odometry_);
+  writer.write(base_ang_vel_leg_odometry_);
+  writer.write(base_rot_estimate_);
+  writer.write(imu_raw_);
+  writer.write(base_quat_estimate_);
+  writer.write(imu_time_);
+  writer.write(joint_time_);
+  writer.write(estimate_time_);
+  writer.write(imu_received_);
+  writer.write(joints_received_);
+  return writer.data();
+}
+
+
+void LeggedStateEstimator::loadCheckpoint(const std::string& checkpoint) {
+  CheckpointReader reader(checkpoint);
+  char magic[sizeof(kCheckpointMagic)];
+  for (char& c : magic) {
+    reader.read(c);
+  }
+  if (std::memcmp(magic, kCheckpointMagic, sizeof(kCheckpointMagic)) != 0
+      || reader.read<std::uint32_t>() != kCheckpointVersion) {
+    throw std::runtime_error("[LeggedStateEstimator] invalid checkpoint");
+  }
+  std::string settings_checkpoint;
+  reader.read(settings_checkpoint);
+  // Reuses the robot model of this estimator if the settings are the same.
+  // The state is restored into a copy, so that this estimator is unchanged 
+  // if the checkpoint is invalid.
+  std::unique_ptr<LeggedStateEstimator> estimator;
+  if (settings_checkpoint == settingsCheckpoint(settings_)) {
+    estimator.reset(new LeggedStateEstimator(*this));
+  }
+  else {
+    LeggedStateEstimatorSettings settings;
+    CheckpointReader settings_reader(settings_checkpoint);
+    settings.loadCheckpoint(settings_reader);
+    estimator.reset(new LeggedStateEstimator(settings));
+  }
+  estimator->inekf_.loadCheckpoint(reader);
+  estimator->contact_estimator_.loadCheckpoint(reader);
+  estimator->lpf_gyro_accel_world_.loadCheckpoint(reader);
+  estimator->lpf_lin_accel_world_.loadCheckpoint(reader);
+  estimator->lpf_dqJ_.loadCheckpoint(reader);
+  estimator->lpf_ddqJ_.loadCheckpoint(reader);
+  estimator->lpf_tauJ_.loadCheckpoint(reader);
+  reader.read(estimator->ddqJ_raw_);
+  reader.read(estimator->imu_gyro_raw_world_);
+  reader.read(estimator->imu_gyro_raw_world_prev_);
+  reader.read(estimator->imu_gyro_accel_world_);
+  reader.read(estimator->imu_gyro_accel_local_);
+  reader.read(estimator->imu_lin_accel_raw_world_);
+  reader.read(estimator->imu_lin_accel_local_);
+  reader.read(estimator->base_pos_estimate_);
+  reader.read(estimator->base_lin_vel_world_estimate_);
+  reader.read(estimator->base_lin_vel_local_estimate_);
+  reader.read(estimator->base_ang_vel_world_estimate_);
+  reader.read(estimator->base_ang_vel_local_estimate_);
+  reader.read(estimator->imu_gyro_bias_estimate_);
+  reader.read(estimator->imu_lin_acc_bias_estimate_);
+  reader.read(estimator->base_lin_vel_leg_odometry_);
+  reader.read(estimator->base_ang_vel_leg_odometry_);
+  reader.read(estimator->base_rot_estimate_);
+  reader.read(estimator->imu_raw_);
+  reader.read(estimator->base_quat_estimate_);
+  reader.read(estimator->imu_time_);
+  reader.read(estimator->joint_time_);
+  reader.read(estimator->estimate_time_);
+  reader.read(estimator->imu_received_);
+  reader.read(estimator->joints_received_);
+  const int nJ = estimator->robot_model_.nJ();
+  if (reader.remaining() != 0 || estimator->lpf_dqJ_.getEstimate().size() != nJ
+      || estimator->lpf_ddqJ_.getEstimate().size() != nJ || estimator->lpf_tauJ_.getEstimate().size() != nJ
+      || estimator->ddqJ_raw_.size() != nJ
+      || estimator->contact_estimator_.getContactProbability().size() != estimator->robot_model_.numContacts()) {
+    throw std::runtime_error("[LeggedStateEstimator] invalid checkpoint");
+  }
+  estimator->updateEstimateRecord();
+  // Restored member-wise. The estimate record is copied so that its buffer, 
+  // which the Python views of the record share, is kept if the layout is 
+  // unchanged. The estimate publisher, the timing stats, and the allocation
+  // count of this estimator are kept.
+  const std::string estimate_publisher_name = settings_.estimate_publisher_name;
+  settings_ = std::move(estimator->settings_);
+  settings_.estimate_publisher_name = estimate_publisher_name;
+  inekf_ = std::move(estimator->inekf_);
+  leg_kinematics_ = std::move(estimator->leg_kinematics_);
+  robot_model_ = std::move(estimator->robot_model_);
+  contact_estimator_ = std::move(estimator->contact_estimator_);
+  lpf_gyro_accel_world_ = std::move(estimator->lpf_gyro_accel_world_);
+  lpf_lin_accel_world_ = std::move(estimator->lpf_lin_accel_world_);
+  lpf_dqJ_ = std::move(estimator->lpf_dqJ_);
+  lpf_ddqJ_ = std::move(estimator->lpf_ddqJ_);
+  lpf_tauJ_ = std::move(estimator->lpf_tauJ_);
+  ddqJ_raw_ = std::move(estimator->ddqJ_raw_);
+  imu_gyro_raw_world_ = estimator->imu_gyro_raw_world_;
+  imu_gyro_raw_world_prev_ = estimator->imu_gyro_raw_world_prev_;
+  imu_gyro_accel_world_ = estimator->imu_gyro_accel_world_;
+  imu_gyro_accel_local_ = estimator->imu_gyro_accel_local_;
+  imu_lin_accel_raw_world_ = estimator->imu_lin_accel_raw_world_;
+  imu_lin_accel_local_ = estimator->imu_lin_accel_local_;
+  base_pos_estimate_ = estimator->base_pos_estimate_;
+  base_lin_vel_world_estimate_ = estimator->base_lin_vel_world_estimate_;
+  base_lin_vel_local_estimate_ = estimator->base_lin_vel_local_estimate_;
+  base_ang_vel_world_estimate_ = estimator->base_ang_vel_world_estimate_;
+  base_ang_vel_local_estimate_ = estimator->base_ang_vel_local_estimate_;
+  imu_gyro_bias_estimate_ = estimator->imu_gyro_bias_estimate_;
+  imu_lin_acc_bias_estimate_ = estimator->imu_lin_acc_bias_estimate_;
+  base_lin_vel_leg_odometry_ = estimator->base_lin_vel_leg_odometry_;
+  base_ang_vel_leg_odometry_ = estimator->base_ang_vel_leg_odometry_;
+  leg_velocity_ = estimator->leg_velocity_;
+  base_rot_estimate_ = estimator->base_rot_estimate_;
+  imu_raw_ = estimator->imu_raw_;
+  base_quat_estimate_ = estimator->base_quat_estimate_;
+  estimate_record_ = estimator->estimate_record_;
+  estimate_record_layout_ = std::move(estimator->estimate_record_layout_);
+  imu_time_ = estimator->imu_time_;
+  joint_time_ = estimator->joint_time_;
+  estimate_time_ = estimator->estimate_time_;
+  imu_received_ = estimator->imu_received_;
+  joints_received_ = estimator->joints_received_;
+  if (estimate_publisher_) {
+    publishEstimates();
+  }
+}
+
+
+long LeggedStateEstimator::getNumUpdateAllocations() const {
+  return num_update_allocations_;
+}
+
+
+void LeggedStateEstimator::recordStage(
+    const UpdateStage stage, std::chrono::steady_clock::time_point& stage_start_time) {
+  if (settings_.enable_timing_stats) {
+    const auto now = std::chrono::steady_clock::now();
+    timing_stats_.record(stage, now - stage_start_time);
+    stage_start_time = now;
+  }
+}
+
+
+void LeggedStateEstimator::initEstimateRecord() {
+  const int nJ = lpf_dqJ_.getEstimate().size();
+  const int num_contacts = contact_estimator_.getContactProbability().size();
+  // The order must be consistent with EstimateRecordFieldIndex.
+  const std::vector<EstimateRecordField> fields = {
+      {"base_position", 0, 3, 1}, 
+      {"base_quaternion", 0, 4, 1},
+      {"base_rotation", 0, 3, 3},
+      {"base_linear_velocity_world", 0, 3, 1},
+      {"base_linear_velocity_local", 0, 3, 1},
+      {"base_angular_velocity_world", 0, 3, 1},
+      {"base_angular_velocity_local", 0, 3, 1},
+      {"imu_gyro_bias", 0, 3, 1},
+      {"imu_linear_acceleration_bias", 0, 3, 1},
+      {"joint_velocity", 0, nJ, 1},
+      {"joint_acceleration", 0, nJ, 1},
+      {"joint_torque", 0, nJ, 1},
+      {"contact_probability", 0, num_contacts, 1}};
+  estimate_record_layout_.clear();
+  int offset = 0;
+  for (auto field : fields) {
+    field.offset = offset;
+    offset += field.rows * field.cols;
+    estimate_record_layout_.push_back(field);
+  }
+  estimate_record_.setZero(offset);
+  updateEstimateRecord();
+}
+
+
+void LeggedStateEstimator::updateEstimateRecord() {
+  using Matrix3dRowMajor = Eigen::Matrix<double, 3, 3, Eigen::RowMajor>;
+  const std::vector<double>& contact_probability = contact_estimator_.getContactProbability();
+  auto record_field = [this](const EstimateRecordFieldIndex index) {
+    const EstimateRecordField& field = estimate_record_layout_[index];
+    return Eigen::Map<Eigen::VectorXd>(estimate_record_.data()+field.offset, field.rows*field.cols);
+  };
+  record_field(BasePositionField)              = base_pos_estimate_;
+  record_field(BaseQuaternionField)            = base_quat_estimate_;
+  Eigen::Map<Matrix3dRowMajor>(record_field(BaseRotationField).data()) = base_rot_estimate_;
+  record_field(BaseLinearVelocityWorldField)   = base_lin_vel_world_estimate_;
+  record_field(BaseLinearVelocityLocalField)   = base_lin_vel_local_estimate_;
+  record_field(BaseAngularVelocityWorldField)  = base_ang_vel_world_estimate_;
+  record_field(BaseAngularVelocityLocalField)  = base_ang_vel_local_estimate_;
+  record_field(IMUGyroBiasField)               = imu_gyro_bias_estimate_;
+  record_field(IMULinearAccelerationBiasField) = imu_lin_acc_bias_estimate_;
+  record_field(JointVelocityField)             = lpf_dqJ_.getEstimate();
+  record_field(JointAccelerationField)         = lpf_ddqJ_.getEstimate();
+  record_field(JointTorqueField)               = lpf_tauJ_.getEstimate();
+  std::copy(contact_probability.begin(), contact_probability.end(), 
+            record_field(ContactProbabilityField).data());
+}
+
 } // namespace legged_state_estimator
@@ -0,0 +1,359 @@
+#include "legged_state_estimator/legged_state_estimator_pool.hpp"
+
+#include <stdexcept>
+#include <string>
+#include <algorithm>
+
+
+namespace legged_state_estimator {
+
+LeggedStateEstimatorPool::LeggedStateEstimatorPool(
+    const std::vector<LeggedStateEstimatorSettings>& settings,
+    const int num_threads)
+  : estimators_(),
+    qJ_(),
+    dqJ_(),
+    tauJ_(),
+    nJ_(0),
+    num_contacts_(0),
+    imu_gyro_raw_(nullptr),
+    imu_lin_accel_raw_(nullptr),
+    qJ_raw_(nullptr),
+    dqJ_raw_(nullptr),
+    tauJ_raw_(nullptr),
+    workers_(),
+    exceptions_(),
+    mtx_(),
+    start_cv_(),
+    done_cv_(),
+    generation_(0),
+    num_threads_(1),
+    num_running_(0),
+    shutdown_(false) {
+  if (settings.empty()) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: number of estimators must be positive");
+  }
+  estimators_.reserve(settings.size());
+  for (const auto& e : settings) {
+    estimators_.emplace_back(e);
+  }
+  nJ_ = estimators_[0].getRobotModel().nJ();
+  num_contacts_ = estimators_[0].getRobotModel().numContacts();
+  for (const auto& e : estimators_) {
+    if (e.getRobotModel().nJ() != nJ_) {
+      throw std::invalid_argument(
+          "[LeggedStateEstimatorPool] invalid argment: all robots must have " + std::to_string(nJ_) + " joints");
+    }
+    if (e.getRobotModel().numContacts() != num_contacts_) {
+      throw std::invalid_argument(
+          "[LeggedStateEstimatorPool] invalid argment: all robots must have " + std::to_string(num_contacts_) + " contacts");
+    }
+  }
+  const int N = size();
+  qJ_.assign(N, Eigen::VectorXd::Zero(nJ_));
+  dqJ_.assign(N, Eigen::VectorXd::Zero(nJ_));
+  tauJ_.assign(N, Eigen::VectorXd::Zero(nJ_));
+  base_pos_estimate_.setZero(N, 3);
+  base_quat_estimate_.setZero(N, 4);
+  base_quat_estimate_.col(3).setOnes();
+  base_lin_vel_world_estimate_.setZero(N, 3);
+  base_lin_vel_local_estimate_.setZero(N, 3);
+  base_ang_vel_world_estimate_.setZero(N, 3);
+  base_ang_vel_local_estimate_.setZero(N, 3);
+  imu_gyro_bias_estimate_.setZero(N, 3);
+  imu_lin_acc_bias_estimate_.setZero(N, 3);
+  contact_probability_.setZero(N, num_contacts_);
+  startThreads(num_threads);
+}
+
+
+LeggedStateEstimatorPool::LeggedStateEstimatorPool(
+    const LeggedStateEstimatorSettings& settings, const int num_estimators,
+    const int num_threads)
+  : LeggedStateEstimatorPool(
+        std::vector<LeggedStateEstimatorSettings>(std::max(num_estimators, 0), settings),
+        num_threads) {
+}
+
+
+LeggedStateEstimatorPool::~LeggedStateEstimatorPool() {
+  {
+    std::lock_guard<std::mutex> lock(mtx_);
+    shutdown_ = true;
+  }
+  start_cv_.notify_all();
+  for (auto& e : workers_) {
+    e.join();
+  }
+}
+
+
+void LeggedStateEstimatorPool::init(const Eigen::MatrixXd& base_pos,
+                                    const Eigen::MatrixXd& base_quat) {
+  const Eigen::MatrixXd zero = Eigen::MatrixXd::Zero(size(), 3);
+  init(base_pos, base_quat, zero, zero, zero);
+}
+
+
+void LeggedStateEstimatorPool::init(const Eigen::MatrixXd& base_pos,
+                                    const Eigen::MatrixXd& base_quat,
+                                    const Eigen::MatrixXd& base_lin_vel_world,
+                                    const Eigen::MatrixXd& imu_gyro_bias,
+                                    const Eigen::MatrixXd& imu_lin_accel_bias) {
+  if (base_pos.rows() != size() || base_pos.cols() != 3) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: base_pos must be " + std::to_string(size()) + "x3");
+  }
+  if (base_quat.rows() != size() || base_quat.cols() != 4) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: base_quat must be " + std::to_string(size()) + "x4");
+  }
+  if (base_lin_vel_world.rows() != size() || base_lin_vel_world.cols() != 3) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: base_lin_vel_world must be " + std::to_string(size()) + "x3");
+  }
+  if (imu_gyro_bias.rows() != size() || imu_gyro_bias.cols() != 3) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: imu_gyro_bias must be " + std::to_string(size()) + "x3");
+  }
+  if (imu_lin_accel_bias.rows() != size() || imu_lin_accel_bias.cols() != 3) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: imu_lin_accel_bias must be " + std::to_string(size()) + "x3");
+  }
+  for (int i=0; i<size(); ++i) {
+    estimators_[i].init(base_pos.row(i).transpose(), base_quat.row(i).transpose(),
+                        base_lin_vel_world.row(i).transpose(),
+                        imu_gyro_bias.row(i).transpose(),
+                        imu_lin_accel_bias.row(i).transpose());
+    copyEstimates(i);
+  }
+}
+
+
+void LeggedStateEstimatorPool::update(const Eigen::MatrixXd& imu_gyro_raw,
+                                      const Eigen::MatrixXd& imu_lin_accel_raw,
+                                      const Eigen::MatrixXd& qJ,
+                                      const Eigen::MatrixXd& dqJ,
+                                      const Eigen::MatrixXd& tauJ) {
+  if (imu_gyro_raw.rows() != size() || imu_gyro_raw.cols() != 3) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: imu_gyro_raw must be " + std::to_string(size()) + "x3");
+  }
+  if (imu_lin_accel_raw.rows() != size() || imu_lin_accel_raw.cols() != 3) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: imu_lin_accel_raw must be " + std::to_string(size()) + "x3");
+  }
+  if (qJ.rows() != size() || qJ.cols() != nJ_) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: qJ must be " + std::to_string(size()) + "x" + std::to_string(nJ_));
+  }
+  if (dqJ.rows() != size() || dqJ.cols() != nJ_) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: dqJ must be " + std::to_string(size()) + "x" + std::to_string(nJ_));
+  }
+  if (tauJ.rows() != size() || tauJ.cols() != nJ_) {
+    throw std::invalid_argument(
+        "[LeggedStateEstimatorPool] invalid argment: tauJ must be " + std::to_string(size()) + "x" + std::to_string(nJ_));
+  }
+  imu_gyro_raw_ = &imu_gyro_raw;
+  imu_lin_accel_raw_ = &imu_lin_accel_raw;
+  qJ_raw_ = &qJ;
+  dqJ_raw_ = &dqJ;
+  tauJ_raw_ = &tauJ;
+  std::fill(exceptions_.begin(), exceptions_.end(), nullptr);
+  if (num_threads_ > 1) {
+    {
+      std::lock_guard<std::mutex> lock(mtx_);
+      num_running_ = num_threads_ - 1;
+      ++generation_;
+    }
+    start_cv_.notify_all();
+  }
+  updateChunk(0);
+  if (num_threads_ > 1) {
+    std::unique_lock<std::mutex> lock(mtx_);
+    done_cv_.wait(lock, [this] { return num_running_ == 0; });
+  }
+  imu_gyro_raw_ = imu_lin_accel_raw_ = qJ_raw_ = dqJ_raw_ = tauJ_raw_ = nullptr;
+  for (const auto& e : exceptions_) {
+    if (e) {
+      std::rethrow_exception(e);
+    }
+  }
+}
+
+
+int LeggedStateEstimatorPool::size() const {
+  return static_cast<int>(estimators_.size());
+}
+
+
+int LeggedStateEstimatorPool::numThreads() const {
+  return num_threads_;
+}
+
+
+int LeggedStateEstimatorPool::nJ() const {
+  return nJ_;
+}
+
+
+int LeggedStateEstimatorPool::numContacts() const {
+  return num_contacts_;
+}
+
+
+LeggedStateEstimator& LeggedStateEstimatorPool::getEstimator(const int i) {
+  if (i < 0 || i >= size()) {
+    throw std::out_of_range(
+        "[LeggedStateEstimatorPool] invalid argment: i must be in [0, " + std::to_string(size()) + ")");
+  }
+  return estimators_[i];
+}
+
+
+const LeggedStateEstimator& LeggedStateEstimatorPool::getEstimator(const int i) const {
+  if (i < 0 || i >= size()) {
+    throw std::out_of_range(
+        "[LeggedStateEstimatorPool] invalid argment: i must be in [0, " + std::to_string(size()) + ")");
+  }
+  return estimators_[i];
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getBasePositionEstimate() const {
+  return base_pos_estimate_;
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getBaseQuaternionEstimate() const {
+  return base_quat_estimate_;
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getBaseLinearVelocityEstimateWorld() const {
+  return base_lin_vel_world_estimate_;
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getBaseLinearVelocityEstimateLocal() const {
+  return base_lin_vel_local_estimate_;
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getBaseAngularVelocityEstimateWorld() const {
+  return base_ang_vel_world_estimate_;
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getBaseAngularVelocityEstimateLocal() const {
+  return base_ang_vel_local_estimate_;
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getIMUGyroBiasEstimate() const {
+  return imu_gyro_bias_estimate_;
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getIMULinearAccelerationBiasEstimate() const {
+  return imu_lin_acc_bias_estimate_;
+}
+
+
+const LeggedStateEstimatorPool::MatrixXdRowMajor&
+LeggedStateEstimatorPool::getContactProbability() const {
+  return contact_probability_;
+}
+
+
+void LeggedStateEstimatorPool::startThreads(const int num_threads) {
+  int n = num_threads;
+  if (n <= 0) {
+    n = static_cast<int>(std::thread::hardware_concurrency());
+  }
+  num_threads_ = std::max(std::min(n, size()), 1);
+  exceptions_.assign(num_threads_, nullptr);
+  workers_.reserve(num_threads_-1);
+  for (int i=1; i<num_threads_; ++i) {
+    workers_.emplace_back(&LeggedStateEstimatorPool::workerLoop, this, i);
+  }
+}
+
+
+void LeggedStateEstimatorPool::workerLoop(const int thread_id) {
+  unsigned long long generation = 0;
+  while (true) {
+    {
+      std::unique_lock<std::mutex> lock(mtx_);
+      start_cv_.wait(lock, [&] { return shutdown_ || generation_ != generation; });
+      if (shutdown_) {
+        return;
+      }
+      generation = generation_;
+    }
+    updateChunk(thread_id);
+    bool done = false;
+    {
+      std::lock_guard<std::mutex> lock(mtx_);
+      done = (--num_running_ == 0);
+    }
+    if (done) {
+      done_cv_.notify_one();
+    }
+  }
+}
+
+
+void LeggedStateEstimatorPool::updateChunk(const int thread_id) {
+  // Static partition: the estimators are equally expensive.
+  const int begin = (thread_id * size()) / num_threads_;
+  const int end = ((thread_id+1) * size()) / num_threads_;
+  try {
+    for (int i=begin; i<end; ++i) {
+      updateEstimator(i);
+    }
+  }
+  catch (...) {
+    exceptions_[thread_id] = std::current_exception();
+  }
+}
+
+
+void LeggedStateEstimatorPool::updateEstimator(const int i) {
+  qJ_[i] = qJ_raw_->row(i).transpose();
+  dqJ_[i] = dqJ_raw_->row(i).transpose();
+  tauJ_[i] = tauJ_raw_->row(i).transpose();
+  LeggedStateEstimator& estimator = estimators_[i];
+  estimator.update(imu_gyro_raw_->row(i).transpose(),
+                   imu_lin_accel_raw_->row(i).transpose(),
+                   qJ_[i], dqJ_[i], tauJ_[i]);
+  copyEstimates(i);
+}
+
+
+void LeggedStateEstimatorPool::copyEstimates(const int i) {
+  const LeggedStateEstimator& estimator = estimators_[i];
+  base_pos_estimate_.row(i) = estimator.getBasePositionEstimate().transpose();
+  base_quat_estimate_.row(i) = estimator.getBaseQuaternionEstimate().transpose();
+  base_lin_vel_world_estimate_.row(i) = estimator.getBaseLinearVelocityEstimateWorld().transpose();
+  base_lin_vel_local_estimate_.row(i) = estimator.getBaseLinearVelocityEstimateLocal().transpose();
+  base_ang_vel_world_estimate_.row(i) = estimator.getBaseAngularVelocityEstimateWorld().transpose();
+  base_ang_vel_local_estimate_.row(i) = estimator.getBaseAngularVelocityEstimateLocal().transpose();
+  imu_gyro_bias_estimate_.row(i) = estimator.getIMUGyroBiasEstimate().transpose();
+  imu_lin_acc_bias_estimate_.row(i) = estimator.getIMULinearAccelerationBiasEstimate().transpose();
+  for (int j=0; j<num_contacts_; ++j) {
+    contact_probability_.coeffRef(i, j) = estimator.getContactEstimator().getContactProbability()[j];
+  }
+}
+
+} // namespace legged_state_estimator
@@ -22,9 +22,11 @@ LeggedStateEstimatorSettings LeggedStateEstimatorSettings::UnitreeA1(
   settings.inekf_noise_params.setContactNoise(0.1);
 
   settings.dynamic_contact_estimation = false;
+  settings.contact_slot_mode = true;
 
   settings.contact_position_noise = 0.01;
   settings.contact_rotation_noise = 0.01;
+  settings.leg_odometry_velocity_noise = 0.1;
 
   settings.sampling_time = sampling_time;
 
@@ -37,4 +39,56 @@ LeggedStateEstimatorSettings LeggedStateEstimatorSettings::UnitreeA1(
   return settings;
 }
 
+
+void LeggedStateEstimatorSettings::saveCheckpoint(CheckpointWriter& writer) const {
+  writer.write(urdf_path);
+  writer.write(imu_frame);
+  writer.write(contact_frames);
+  contact_estimator_settings.saveCheckpoint(writer);
+  inekf_noise_params.saveCheckpoint(writer);
+  writer.write(dynamic_contact_estimation);
+  writer.write(contact_slot_mode);
+  writer.write(kinematics_backend);
+  writer.write(leg_odometry_mode);
+  writer.write(enable_timing_stats);
+  writer.write(allocation_audit_mode);
+  writer.write(robot_model_cache_dir);
+  writer.write(contact_position_noise);
+  writer.write(contact_rotation_noise);
+  writer.write(leg_odometry_velocity_noise);
+  writer.write(sampling_time);
+  writer.write(lpf_gyro_cutoff_frequency);
+  writer.write(lpf_gyro_accel_cutoff_frequency);
+  writer.write(lpf_lin_accel_cutoff_frequency);
+  writer.write(lpf_dqJ_cutoff_frequency);
+  writer.write(lpf_ddqJ_cutoff_frequency);
+  writer.write(lpf_tauJ_cutoff_frequency);
+}
+
+
+void LeggedStateEstimatorSettings::loadCheckpoint(CheckpointReader& reader) {
+  reader.read(urdf_path);
+  reader.read(imu_frame);
+  reader.read(contact_frames);
+  contact_estimator_settings.loadCheckpoint(reader);
+  inekf_noise_params.loadCheckpoint(reader);
+  reader.read(dynamic_contact_estimation);
+  reader.read(contact_slot_mode);
+  reader.read(kinematics_backend);
+  reader.read(leg_odometry_mode);
+  reader.read(enable_timing_stats);
+  reader.read(allocation_audit_mode);
+  reader.read(robot_model_cache_dir);
+  reader.read(contact_position_noise);
+  reader.read(contact_rotation_noise);
+  reader.read(leg_odometry_velocity_noise);
+  reader.read(sampling_time);
+  reader.read(lpf_gyro_cutoff_frequency);
+  reader.read(lpf_gyro_accel_cutoff_frequency);
+  reader.read(lpf_lin_accel_cutoff_frequency);
+  reader.read(lpf_dqJ_cutoff_frequency);
+  reader.read(lpf_ddqJ_cutoff_frequency);
+  reader.read(lpf_tauJ_cutoff_frequency);
+}
+
 } // namespace legged_state_estimator
@@ -1,5 +1,10 @@
 #include "legged_state_estimator/robot_model.hpp"
 
+#include <algorithm>
+#include <cmath>
+
+#include "pinocchio/spatial/skew.hpp"
+
 
 namespace legged_state_estimator {
 
@@ -35,7 +40,13 @@ RobotModel::RobotModel(const pinocchio::Model& pin_model, const int imu_frame,
     v_(),
     a_(),
     tau_(),
-    jac_6d_() {
+    jac_6d_(),
+    kinematics_backend_(KinematicsBackend::Pinocchio),
+    leg_chains_(),
+    fused_update_valid_(false),
+    fused_update_nle_(false),
+    fused_update_rf_(pinocchio::LOCAL_WORLD_ALIGNED),
+    fused_update_gravity_(Eigen::Vector3d::Zero()) {
   data_ = pinocchio::Data(model_);
   q_   = Eigen::VectorXd(model_.nq);
   v_   = Eigen::VectorXd(model_.nv);
@@ -58,7 +69,13 @@ RobotModel::RobotModel(const pinocchio::Model& pin_model,
     v_(),
     a_(),
     tau_(),
-    jac_6d_() {
+    jac_6d_(),
+    kinematics_backend_(KinematicsBackend::Pinocchio),
+    leg_chains_(),
+    fused_update_valid_(false),
+    fused_update_nle_(false),
+    fused_update_rf_(pinocchio::LOCAL_WORLD_ALIGNED),
+    fused_update_gravity_(Eigen::Vector3d::Zero()) {
   data_ = pinocchio::Data(model_);
   q_   = Eigen::VectorXd(model_.nq);
   v_   = Eigen::VectorXd(model_.nv);
@@ -97,12 +114,122 @@ RobotModel::RobotModel()
     v_(),
     a_(),
     tau_(),
-    jac_6d_() {
+    jac_6d_(),
+    kinematics_backend_(KinematicsBackend::Pinocchio),
+    leg_chains_(),
+    fused_update_valid_(false),
+    fused_update_nle_(false),
+    fused_update_rf_(pinocchio::LOCAL_WORLD_ALIGNED),
+    fused_update_gravity_(Eigen::Vector3d::Zero()) {
+}
+
+
+void RobotModel::setKinematicsBackend(const KinematicsBackend backend) {
+  if (backend == KinematicsBackend::LegChain) {
+    buildLegChains();
+  }
+  kinematics_backend_ = backend;
+}
+
+
+KinematicsBackend RobotModel::getKinematicsBackend() const {
+  return kinematics_backend_;
+}
+
+
+void RobotModel::buildLegChains() {
+  const int root_joint = 1; // floating base
+  if (model_.frames[imu_frame_].parent != root_joint) {
+    throw std::invalid_argument(
+        "[RobotModel] invalid argument: IMU frame must be attached to the floating base to use KinematicsBackend::LegChain");
+  }
+  const Eigen::VectorXd q0 = pinocchio::neutral(model_);
+  leg_chains_.clear();
+  for (const auto frame : contact_frames_) {
+    // Joints from the floating base to the contact frame
+    std::vector<int> joints;
+    int joint = model_.frames[frame].parent;
+    while (joint > root_joint) {
+      joints.push_back(joint);
+      joint = model_.parents[joint];
+    }
+    if (joint != root_joint) {
+      throw std::invalid_argument(
+          "[RobotModel] invalid argument: contact frame '" + model_.frames[frame].name 
+          + "' is not attached to the floating base!");
+    }
+    std::reverse(joints.begin(), joints.end());
+    LegChain chain;
+    for (const auto e : joints) {
+      const auto& joint_model = model_.joints[e];
+      pinocchio::Data::JointData joint_data = joint_model.createData();
+      joint_model.calc(joint_data, q0);
+      const Eigen::Matrix<double, 6, 1> S = joint_data.S().matrix(); // [linear; angular]
+      if (joint_model.nq() != 1 || joint_model.nv() != 1 
+          || !S.template head<3>().isZero() || std::abs(S.template tail<3>().norm()-1.0) > 1.0e-12) {
+        throw std::invalid_argument(
+            "[RobotModel] invalid argument: joint '" + model_.names[e] 
+            + "' is not a revolute joint, which is required by KinematicsBackend::LegChain");
+      }
+      chain.idx_q.push_back(joint_model.idx_q()-7);
+      chain.idx_v.push_back(joint_model.idx_v());
+      chain.joint_rotations.push_back(model_.jointPlacements[e].rotation());
+      chain.joint_translations.push_back(model_.jointPlacements[e].translation());
+      chain.joint_axes.push_back(S.template tail<3>());
+    }
+    chain.frame_rotation = model_.frames[frame].placement.rotation();
+    chain.frame_translation = model_.frames[frame].placement.translation();
+    chain.joint_positions_world.resize(3, joints.size());
+    chain.joint_axes_world.resize(3, joints.size());
+    leg_chains_.push_back(chain);
+  }
+}
+
+
+void RobotModel::updateLegChainKinematics(const Eigen::VectorXd& qJ, 
+                                          const pinocchio::ReferenceFrame rf) {
+  fused_update_valid_ = false;
+  // The floating base is at the origin of the world frame
+  data_.oMf[imu_frame_] = model_.frames[imu_frame_].placement;
+  for (int i=0; i<contact_frames_.size(); ++i) {
+    LegChain& chain = leg_chains_[i];
+    Eigen::Matrix3d R = Eigen::Matrix3d::Identity();
+    Eigen::Vector3d p = Eigen::Vector3d::Zero();
+    for (int k=0; k<chain.idx_q.size(); ++k) {
+      p.noalias() += R * chain.joint_translations[k];
+      R = R * chain.joint_rotations[k] 
+            * Eigen::AngleAxisd(qJ.coeff(chain.idx_q[k]), chain.joint_axes[k]).toRotationMatrix();
+      chain.joint_positions_world.col(k) = p;
+      chain.joint_axes_world.col(k).noalias() = R * chain.joint_axes[k];
+    }
+    auto& oMf = data_.oMf[contact_frames_[i]];
+    oMf.translation().noalias() = p + R * chain.frame_translation;
+    oMf.rotation().noalias() = R * chain.frame_rotation;
+    // Frame Jacobian expressed in LOCAL_WORLD_ALIGNED
+    Eigen::MatrixXd& J = jac_6d_[i];
+    J.setZero();
+    J.template topLeftCorner<3, 3>().setIdentity();
+    J.template block<3, 3>(0, 3) = - pinocchio::skew(oMf.translation());
+    J.template block<3, 3>(3, 3).setIdentity();
+    for (int k=0; k<chain.idx_v.size(); ++k) {
+      J.template block<3, 1>(0, chain.idx_v[k]) 
+          = chain.joint_axes_world.col(k).cross(oMf.translation()-chain.joint_positions_world.col(k));
+      J.template block<3, 1>(3, chain.idx_v[k]) = chain.joint_axes_world.col(k);
+    }
+    if (rf == pinocchio::LOCAL) {
+      J.template topRows<3>() = oMf.rotation().transpose() * J.template topRows<3>();
+      J.template bottomRows<3>() = oMf.rotation().transpose() * J.template bottomRows<3>();
+    }
+  }
 }
 
 
 void RobotModel::updateLegKinematics(const Eigen::VectorXd& qJ, 
                                      const pinocchio::ReferenceFrame rf) {
+  if (kinematics_backend_ == KinematicsBackend::LegChain && rf != pinocchio::WORLD) {
+    updateLegChainKinematics(qJ, rf);
+    return;
+  }
   updateKinematics(Eigen::Vector3d::Zero(), 
                    Eigen::Quaterniond::Identity().coeffs(), qJ, rf);
 }
@@ -111,6 +238,10 @@ void RobotModel::updateLegKinematics(const Eigen::VectorXd& qJ,
 void RobotModel::updateLegKinematics(const Eigen::VectorXd& qJ, 
                                 const Eigen::VectorXd& dqJ,
                                 const pinocchio::ReferenceFrame rf) {
+  if (kinematics_backend_ == KinematicsBackend::LegChain && rf != pinocchio::WORLD) {
+    updateLegChainKinematics(qJ, rf);
+    return;
+  }
   updateKinematics(Eigen::Vector3d::Zero(), 
                    Eigen::Quaterniond::Identity().coeffs(), 
                    Eigen::Vector3d::Zero(), Eigen::Vector3d::Zero(), 
@@ -126,6 +257,7 @@ void RobotModel::updateKinematics(const Eigen::Vector3d& base_pos,
   q_.template segment<4>(3) = base_quat;
   q_.tail(model_.nq-7) = qJ;
   pinocchio::normalize(model_, q_);
+  fused_update_valid_ = false;
   pinocchio::forwardKinematics(model_, data_, q_);
   pinocchio::updateFramePlacements(model_, data_);
   pinocchio::computeJointJacobians(model_, data_, q_);
@@ -149,6 +281,7 @@ void RobotModel::updateKinematics(const Eigen::Vector3d& base_pos,
   q_.tail(model_.nq-7) = qJ;
   v_.tail(model_.nv-6) = dqJ;
   pinocchio::normalize(model_, q_);
+  fused_update_valid_ = false;
   pinocchio::forwardKinematics(model_, data_, q_, v_);
   pinocchio::updateFramePlacements(model_, data_);
   pinocchio::computeJointJacobians(model_, data_, q_);
@@ -160,11 +293,111 @@ void RobotModel::updateKinematics(const Eigen::Vector3d& base_pos,
 
 void RobotModel::updateLegDynamics(const Eigen::VectorXd& qJ, 
                                    const Eigen::VectorXd& dqJ) {
-  updateDynamics(Eigen::Vector3d::Zero(), 
-                 Eigen::Quaterniond::Identity().coeffs(), 
-                 Eigen::Vector3d::Zero(), Eigen::Vector3d::Zero(), 
-                 Eigen::Vector3d::Zero(), Eigen::Vector3d::Zero(), 
-                 qJ, dqJ, Eigen::VectorXd::Zero(nJ()));
+  q_.template head<3>().setZero();
+  q_.template segment<4>(3) = Eigen::Quaterniond::Identity().coeffs();
+  v_.template head<6>().setZero();
+  q_.tail(model_.nq-7) = qJ;
+  v_.tail(model_.nv-6) = dqJ;
+  fused_update_valid_ = false;
+  // rnea with zero accelerations
+  tau_ = pinocchio::nonLinearEffects(model_, data_, q_, v_);
+}
+
+
+bool RobotModel::isSameFusedUpdate(const bool nle, 
+                                   const pinocchio::ReferenceFrame rf,
+                                   const Eigen::Vector3d& gravity,
+                                   const Eigen::VectorXd& qJ, 
+                                   const Eigen::VectorXd& dqJ) const {
+  return (fused_update_valid_ && fused_update_nle_ == nle 
+          && fused_update_rf_ == rf && fused_update_gravity_ == gravity
+          && q_.tail(model_.nq-7) == qJ && v_.tail(model_.nv-6) == dqJ);
+}
+
+
+void RobotModel::updateFramesFromJoints(const Eigen::VectorXd& qJ, 
+                                        const pinocchio::ReferenceFrame rf) {
+  if (kinematics_backend_ == KinematicsBackend::LegChain && rf != pinocchio::WORLD) {
+    updateLegChainKinematics(qJ, rf);
+    return;
+  }
+  // The relative joint placements (data_.liMi) and the joint motion subspaces
+  // have been computed in the forward pass of rnea
+  for (pinocchio::JointIndex i=1; i<static_cast<pinocchio::JointIndex>(model_.njoints); ++i) {
+    const pinocchio::JointIndex parent = model_.parents[i];
+    if (parent > 0) {
+      data_.oMi[i] = data_.oMi[parent] * data_.liMi[i];
+    }
+    else {
+      data_.oMi[i] = data_.liMi[i];
+    }
+  }
+  pinocchio::updateFramePlacement(model_, data_, imu_frame_);
+  for (const auto e : contact_frames_) {
+    pinocchio::updateFramePlacement(model_, data_, e);
+  }
+  pinocchio::computeJointJacobians(model_, data_);
+  for (int i=0; i<contact_frames_.size(); ++i) {
+    pinocchio::getFrameJacobian(model_, data_, contact_frames_[i], rf, jac_6d_[i]);
+  }
+}
+
+
+void RobotModel::updateLegKinematicsAndDynamics(const Eigen::VectorXd& qJ, 
+                                                const Eigen::VectorXd& dqJ,
+                                                const pinocchio::ReferenceFrame rf) {
+  if (isSameFusedUpdate(true, rf, model_.gravity.linear(), qJ, dqJ)) {
+    return;
+  }
+  updateLegDynamics(qJ, dqJ);
+  updateFramesFromJoints(qJ, rf);
+  fused_update_valid_ = true;
+  fused_update_nle_ = true;
+  fused_update_rf_ = rf;
+  fused_update_gravity_ = model_.gravity.linear();
+}
+
+
+void RobotModel::updateLegKinematicsAndDynamics(const Eigen::Vector4d& base_quat, 
+                                                const Eigen::Vector3d& base_linear_vel, 
+                                                const Eigen::Vector3d& base_angular_vel, 
+                                                const Eigen::Vector3d& base_linear_acc, 
+                                                const Eigen::Vector3d& base_angular_acc,
+                                                const Eigen::VectorXd& qJ, 
+                                                const Eigen::VectorXd& dqJ,
+                                                const Eigen::VectorXd& ddqJ,
+                                                const pinocchio::ReferenceFrame rf) {
+  // The inverse dynamics do not depend on the base pose if the gravity is 
+  // expressed in the base frame. The base is therefore placed at the origin 
+  // of the world frame as in the leg kinematics.
+  const Eigen::Vector3d gravity = model_.gravity.linear();
+  const Eigen::Vector3d gravity_local 
+      = Eigen::Quaterniond(base_quat).normalized().toRotationMatrix().transpose() * gravity;
+  if (isSameFusedUpdate(false, rf, gravity_local, qJ, dqJ)
+      && v_.template head<3>() == base_linear_vel 
+      && v_.template segment<3>(3) == base_angular_vel
+      && a_.template head<3>() == base_linear_acc 
+      && a_.template segment<3>(3) == base_angular_acc
+      && a_.tail(model_.nv-6) == ddqJ) {
+    return;
+  }
+  q_.template head<3>().setZero();
+  q_.template segment<4>(3) = Eigen::Quaterniond::Identity().coeffs();
+  v_.template head<3>()     = base_linear_vel;
+  v_.template segment<3>(3) = base_angular_vel;
+  a_.template head<3>()     = base_linear_acc;
+  a_.template segment<3>(3) = base_angular_acc;
+  q_.tail(model_.nq-7) = qJ;
+  v_.tail(model_.nv-6) = dqJ;
+  a_.tail(model_.nv-6) = ddqJ;
+  model_.gravity.linear() = gravity_local;
+  tau_ = pinocchio::rnea(model_, data_, q_, v_, a_);
+  model_.gravity.linear() = gravity;
+  updateFramesFromJoints(qJ, rf);
+  fused_update_valid_ = true;
+  fused_update_nle_ = false;
+  fused_update_rf_ = rf;
+  fused_update_gravity_ = gravity_local;
 }
 
 
@@ -186,6 +419,7 @@ void RobotModel::updateDynamics(const Eigen::Vector3d& base_pos,
   q_.tail(model_.nq-7) = qJ;
   v_.tail(model_.nv-6) = dqJ;
   a_.tail(model_.nv-6) = ddqJ;
+  fused_update_valid_ = false;
   tau_ = pinocchio::rnea(model_, data_, q_, v_, a_);
 }
 
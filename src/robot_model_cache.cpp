@@ -0,0 +1,115 @@
+#include "legged_state_estimator/robot_model.hpp"
+
+#include <fstream>
+#include <sstream>
+#include <iomanip>
+#include <map>
+#include <mutex>
+#include <cstdint>
+#include <cstdio>
+#include <stdexcept>
+
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include "pinocchio/serialization/model.hpp"
+
+
+namespace legged_state_estimator {
+
+namespace {
+
+// Bumped when the content of the cache files changes
+const char kCacheVersion[] = "legged_state_estimator_robot_model_cache_1";
+
+// 64-bit FNV-1a hash
+std::uint64_t hashBytes(const std::string& bytes,
+                        std::uint64_t hash=14695981039346656037ULL) {
+  for (const char c : bytes) {
+    hash ^= static_cast<unsigned char>(c);
+    hash *= 1099511628211ULL;
+  }
+  return hash;
+}
+
+std::string readFile(const std::string& path) {
+  std::ifstream file(path, std::ios::binary);
+  if (!file) {
+    throw std::runtime_error("[RobotModel] failed to open '" + path + "'");
+  }
+  std::ostringstream content;
+  content << file.rdbuf();
+  return content.str();
+}
+
+// Models built in this process, which are inherited by forked processes
+std::mutex& memoryCacheMutex() {
+  static std::mutex mutex;
+  return mutex;
+}
+
+std::map<std::string, pinocchio::Model>& memoryCache() {
+  static std::map<std::string, pinocchio::Model> cache;
+  return cache;
+}
+
+// Writes the cache file through a temporary file, so that concurrent
+// processes never read a partially written file
+void writeCacheFile(const pinocchio::Model& pin_model, const std::string& cache_dir,
+                    const std::string& cache_path) {
+  ::mkdir(cache_dir.c_str(), 0755);
+  const std::string tmp_path = cache_path + ".tmp" + std::to_string(::getpid());
+  try {
+    pin_model.saveToBinary(tmp_path);
+    if (std::rename(tmp_path.c_str(), cache_path.c_str()) != 0) {
+      std::remove(tmp_path.c_str());
+    }
+  }
+  catch (const std::exception&) {
+    std::remove(tmp_path.c_str());
+  }
+}
+
+} // namespace
+
+
+pinocchio::Model RobotModel::buildFloatingBaseModel(
+    const std::string& urdf_path, const std::string& cache_dir) {
+  if (cache_dir.empty()) {
+    return buildFloatingBaseModel(urdf_path);
+  }
+  const std::string urdf = readFile(urdf_path);
+  const std::uint64_t hash = hashBytes(PINOCCHIO_VERSION, hashBytes(kCacheVersion, hashBytes(urdf)));
+  std::ostringstream key;
+  key << "robot_model_" << std::hex << std::setw(16) << std::setfill('0') << hash << ".bin";
+  {
+    std::lock_guard<std::mutex> lock(memoryCacheMutex());
+    const auto it = memoryCache().find(key.str());
+    if (it != memoryCache().end()) {
+      return it->second;
+    }
+  }
+  const std::string cache_path = cache_dir + "/" + key.str();
+  pinocchio::Model pin_model;
+  bool loaded = false;
+  if (::access(cache_path.c_str(), R_OK) == 0) {
+    try {
+      pin_model.loadFromBinary(cache_path);
+      loaded = true;
+    }
+    catch (const std::exception&) {
+      // A stale or corrupted file is rebuilt and overwritten
+      pin_model = pinocchio::Model();
+    }
+  }
+  if (!loaded) {
+    pinocchio::urdf::buildModelFromXML(urdf, pinocchio::JointModelFreeFlyer(),
+                                       pin_model);
+    writeCacheFile(pin_model, cache_dir, cache_path);
+  }
+  std::lock_guard<std::mutex> lock(memoryCacheMutex());
+  memoryCache()[key.str()] = pin_model;
+  return pin_model;
+}
+
+} // namespace legged_state_estimator
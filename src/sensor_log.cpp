@@ -0,0 +1,336 @@
+#include "legged_state_estimator/sensor_log.hpp"
+
+#include <cstring>
+#include <cstdlib>
+#include <stdexcept>
+#include <utility>
+
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <fcntl.h>
+#include <unistd.h>
+
+
+namespace legged_state_estimator {
+
+namespace {
+
+const char kMagic[8] = {'L', 'S', 'E', 'L', 'O', 'G', '\0', '\0'};
+const std::uint32_t kVersion = 1;
+const std::size_t kAlignment = 64;
+const int kNumStreamTypes = 6;
+
+struct Header {
+  char magic[8];
+  std::uint32_t version;
+  std::uint32_t num_streams;
+  std::uint64_t table_offset;
+  std::uint64_t reserved;
+};
+
+struct TableEntry {
+  std::uint32_t type;
+  std::uint32_t width;
+  std::uint64_t num_records;
+  std::uint64_t time_offset;
+  std::uint64_t value_offset;
+};
+
+} // namespace
+
+
+SensorLogWriter::SensorLogWriter(const std::string& path)
+  : path_(path),
+    file_(path, std::ios::binary | std::ios::trunc),
+    streams_() {
+  if (!file_) {
+    throw std::runtime_error("[SensorLogWriter] failed to open '" + path + "'");
+  }
+  // The header is completed in close()
+  Header header;
+  std::memset(&header, 0, sizeof(Header));
+  file_.write(reinterpret_cast<const char*>(&header), sizeof(Header));
+}
+
+
+SensorLogWriter::~SensorLogWriter() {
+  if (file_.is_open()) {
+    try {
+      close();
+    }
+    catch (...) {
+    }
+  }
+}
+
+
+void SensorLogWriter::write(const SensorLogStreamType type,
+                            const Eigen::VectorXd& time,
+                            const MatrixXdRowMajor& values) {
+  if (values.rows() != time.size()) {
+    throw std::invalid_argument(
+        "[SensorLogWriter] invalid argument: values.rows() must be time.size()");
+  }
+  write(type, time.data(), values.data(), time.size(), values.cols());
+}
+
+
+void SensorLogWriter::write(const SensorLogStreamType type,
+                            const std::vector<double>& time,
+                            const std::vector<double>& values) {
+  if (time.empty() ? !values.empty() : (values.size()%time.size() != 0)) {
+    throw std::invalid_argument(
+        "[SensorLogWriter] invalid argument: values.size() must be a multiple of time.size()");
+  }
+  write(type, time.data(), values.data(), time.size(),
+        time.empty() ? 0 : values.size()/time.size());
+}
+
+
+void SensorLogWriter::write(const SensorLogStreamType type, const double* time,
+                            const double* values, const std::size_t num_records,
+                            const std::size_t width) {
+  if (!file_.is_open()) {
+    throw std::runtime_error("[SensorLogWriter] '" + path_ + "' is already closed");
+  }
+  for (const auto& e : streams_) {
+    if (e.type == static_cast<std::uint32_t>(type)) {
+      throw std::invalid_argument(
+          "[SensorLogWriter] invalid argument: the stream is already written");
+    }
+  }
+  StreamEntry entry;
+  entry.type = static_cast<std::uint32_t>(type);
+  entry.width = width;
+  entry.num_records = num_records;
+  entry.time_offset = writeAligned(time, num_records);
+  entry.value_offset = writeAligned(values, num_records*width);
+  streams_.push_back(entry);
+}
+
+
+std::uint64_t SensorLogWriter::writeAligned(const double* data,
+                                            const std::size_t size) {
+  const std::size_t pos = static_cast<std::size_t>(file_.tellp());
+  const std::size_t offset = ((pos + kAlignment - 1) / kAlignment) * kAlignment;
+  const char padding[kAlignment] = {0};
+  file_.write(padding, offset-pos);
+  file_.write(reinterpret_cast<const char*>(data), size*sizeof(double));
+  if (!file_) {
+    throw std::runtime_error("[SensorLogWriter] failed to write '" + path_ + "'");
+  }
+  return offset;
+}
+
+
+void SensorLogWriter::close() {
+  if (!file_.is_open()) {
+    return;
+  }
+  Header header;
+  std::memset(&header, 0, sizeof(Header));
+  std::memcpy(header.magic, kMagic, sizeof(kMagic));
+  header.version = kVersion;
+  header.num_streams = streams_.size();
+  header.table_offset = static_cast<std::uint64_t>(file_.tellp());
+  for (const auto& e : streams_) {
+    TableEntry entry = {e.type, e.width, e.num_records, e.time_offset, e.value_offset};
+    file_.write(reinterpret_cast<const char*>(&entry), sizeof(TableEntry));
+  }
+  file_.seekp(0);
+  file_.write(reinterpret_cast<const char*>(&header), sizeof(Header));
+  file_.close();
+  if (!file_) {
+    throw std::runtime_error("[SensorLogWriter] failed to write '" + path_ + "'");
+  }
+}
+
+
+SensorLog::SensorLog(const std::string& path)
+  : data_(nullptr),
+    size_(0),
+    streams_(kNumStreamTypes, Stream{0, 0, nullptr, nullptr}) {
+  const int fd = ::open(path.c_str(), O_RDONLY);
+  if (fd < 0) {
+    throw std::runtime_error("[SensorLog] failed to open '" + path + "'");
+  }
+  struct stat st;
+  if (::fstat(fd, &st) != 0 || static_cast<std::size_t>(st.st_size) < sizeof(Header)) {
+    ::close(fd);
+    throw std::runtime_error("[SensorLog] '" + path + "' is not a sensor log");
+  }
+  size_ = st.st_size;
+  data_ = ::mmap(nullptr, size_, PROT_READ, MAP_PRIVATE, fd, 0);
+  ::close(fd);
+  if (data_ == MAP_FAILED) {
+    data_ = nullptr;
+    throw std::runtime_error("[SensorLog] failed to map '" + path + "'");
+  }
+  const char* bytes = static_cast<const char*>(data_);
+  Header header;
+  std::memcpy(&header, bytes, sizeof(Header));
+  if (std::memcmp(header.magic, kMagic, sizeof(kMagic)) != 0
+      || header.version != kVersion
+      || header.table_offset + header.num_streams*sizeof(TableEntry) > size_) {
+    unmap();
+    throw std::runtime_error("[SensorLog] '" + path + "' is not a sensor log");
+  }
+  for (int i=0; i<header.num_streams; ++i) {
+    TableEntry entry;
+    std::memcpy(&entry, bytes+header.table_offset+i*sizeof(TableEntry), sizeof(TableEntry));
+    if (entry.type >= kNumStreamTypes
+        || entry.time_offset%sizeof(double) != 0 || entry.value_offset%sizeof(double) != 0
+        || entry.time_offset + entry.num_records*sizeof(double) > size_
+        || entry.value_offset + entry.num_records*entry.width*sizeof(double) > size_) {
+      unmap();
+      throw std::runtime_error("[SensorLog] '" + path + "' is broken");
+    }
+    Stream& stream = streams_[entry.type];
+    stream.num_records = entry.num_records;
+    stream.width = entry.width;
+    stream.time = reinterpret_cast<const double*>(bytes + entry.time_offset);
+    stream.values = reinterpret_cast<const double*>(bytes + entry.value_offset);
+  }
+  ::madvise(data_, size_, MADV_SEQUENTIAL);
+}
+
+
+SensorLog::SensorLog()
+  : data_(nullptr),
+    size_(0),
+    streams_(kNumStreamTypes, Stream{0, 0, nullptr, nullptr}) {
+}
+
+
+SensorLog::~SensorLog() {
+  unmap();
+}
+
+
+SensorLog::SensorLog(SensorLog&& other) noexcept
+  : data_(other.data_),
+    size_(other.size_),
+    streams_(std::move(other.streams_)) {
+  other.data_ = nullptr;
+  other.size_ = 0;
+  other.streams_.assign(kNumStreamTypes, Stream{0, 0, nullptr, nullptr});
+}
+
+
+SensorLog& SensorLog::operator=(SensorLog&& other) noexcept {
+  if (this != &other) {
+    unmap();
+    data_ = other.data_;
+    size_ = other.size_;
+    streams_ = std::move(other.streams_);
+    other.data_ = nullptr;
+    other.size_ = 0;
+    other.streams_.assign(kNumStreamTypes, Stream{0, 0, nullptr, nullptr});
+  }
+  return *this;
+}
+
+
+void SensorLog::unmap() {
+  if (data_ != nullptr) {
+    ::munmap(data_, size_);
+    data_ = nullptr;
+    size_ = 0;
+  }
+  streams_.assign(kNumStreamTypes, Stream{0, 0, nullptr, nullptr});
+}
+
+
+bool SensorLog::hasStream(const SensorLogStreamType type) const {
+  return (streams_[type].time != nullptr);
+}
+
+
+int SensorLog::numRecords(const SensorLogStreamType type) const {
+  return streams_[type].num_records;
+}
+
+
+int SensorLog::width(const SensorLogStreamType type) const {
+  return streams_[type].width;
+}
+
+
+SensorLog::ConstTimeMap SensorLog::getTime(const SensorLogStreamType type) const {
+  return ConstTimeMap(streams_[type].time, streams_[type].num_records);
+}
+
+
+SensorLog::ConstValueMap SensorLog::getValues(const SensorLogStreamType type) const {
+  return ConstValueMap(streams_[type].values, streams_[type].num_records,
+                       streams_[type].width);
+}
+
+
+void convertTextSensorLog(const std::string& text_path,
+                          const std::string& binary_path) {
+  std::ifstream infile(text_path);
+  if (!infile) {
+    throw std::runtime_error("[convertTextSensorLog] failed to open '" + text_path + "'");
+  }
+  struct Buffer {
+    std::vector<double> time, values;
+    int width = -1;
+  };
+  std::vector<Buffer> buffers(kNumStreamTypes);
+  const std::vector<std::pair<std::string, SensorLogStreamType>> tags = {
+      {"IMU", IMUStream}, {"JOINT", JointStream}, {"CONTACT", ContactStream},
+      {"KINEMATIC", KinematicStream}, {"LANDMARK", LandmarkStream},
+      {"GROUND_TRUTH", GroundTruthStream}};
+  // Fixed record widths. The records of KinematicStream and LandmarkStream
+  // are split per contact and per landmark.
+  const int fixed_widths[kNumStreamTypes] = {6, -1, -1, 44, 4, 10};
+  std::string line;
+  std::vector<double> numbers;
+  int line_number = 0;
+  while (std::getline(infile, line)) {
+    ++line_number;
+    const std::size_t tag_end = line.find(' ');
+    const std::string tag = line.substr(0, tag_end);
+    int type = -1;
+    for (const auto& e : tags) {
+      if (tag == e.first) type = e.second;
+    }
+    if (type < 0 || tag_end == std::string::npos) continue;
+    numbers.clear();
+    const char* str = line.c_str() + tag_end;
+    char* end = nullptr;
+    while (true) {
+      const double value = std::strtod(str, &end);
+      if (end == str) break;
+      numbers.push_back(value);
+      str = end;
+    }
+    if (numbers.empty()) continue;
+    const double t = numbers[0];
+    const int num_values = numbers.size() - 1;
+    Buffer& buffer = buffers[type];
+    const bool split = (type == KinematicStream || type == LandmarkStream);
+    const int width = (fixed_widths[type] > 0) ? fixed_widths[type] : num_values;
+    if ((split && num_values%width != 0) || (!split && num_values != width)
+        || (buffer.width >= 0 && buffer.width != width)) {
+      throw std::invalid_argument(
+          "[convertTextSensorLog] invalid argument: unexpected number of values at line "
+          + std::to_string(line_number) + " of '" + text_path + "'");
+    }
+    buffer.width = width;
+    for (int i=0; i<num_values/std::max(width, 1); ++i) {
+      buffer.time.push_back(t);
+    }
+    buffer.values.insert(buffer.values.end(), numbers.begin()+1, numbers.end());
+  }
+  SensorLogWriter writer(binary_path);
+  for (int i=0; i<kNumStreamTypes; ++i) {
+    if (!buffers[i].time.empty()) {
+      writer.write(static_cast<SensorLogStreamType>(i), buffers[i].time, buffers[i].values);
+    }
+  }
+  writer.close();
+}
+
+} // namespace legged_state_estimator
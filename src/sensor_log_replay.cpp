@@ -0,0 +1,164 @@
+#include "legged_state_estimator/sensor_log_replay.hpp"
+
+#include <vector>
+#include <utility>
+#include <stdexcept>
+#include <limits>
+
+
+namespace legged_state_estimator {
+
+namespace {
+
+const double kDtMin = 1.0e-6;
+const double kDtMax = 1.0;
+
+double nextTime(const SensorLog& log, const SensorLogStreamType type,
+                const int k) {
+  return (k < log.numRecords(type)) ? log.getTime(type).coeff(k)
+                                    : std::numeric_limits<double>::infinity();
+}
+
+} // namespace
+
+
+template <int MaxAugmented>
+void replaySensorLog(const SensorLog& log, InEKFTpl<MaxAugmented>& filter,
+                     const Eigen::Matrix3d& landmark_covariance) {
+  if (log.hasStream(IMUStream) && log.width(IMUStream) != 6) {
+    throw std::invalid_argument(
+        "[replaySensorLog] invalid argument: width of the IMU stream must be 6");
+  }
+  if (log.hasStream(ContactStream) && log.width(ContactStream)%2 != 0) {
+    throw std::invalid_argument(
+        "[replaySensorLog] invalid argument: width of the contact stream must be even");
+  }
+  if (log.hasStream(KinematicStream) && log.width(KinematicStream) != 44) {
+    throw std::invalid_argument(
+        "[replaySensorLog] invalid argument: width of the kinematic stream must be 44");
+  }
+  if (log.hasStream(LandmarkStream) && log.width(LandmarkStream) != 4) {
+    throw std::invalid_argument(
+        "[replaySensorLog] invalid argument: width of the landmark stream must be 4");
+  }
+  const SensorLogStreamType types[4] = {IMUStream, ContactStream, KinematicStream, LandmarkStream};
+  int k[4] = {0, 0, 0, 0};
+  Eigen::Matrix<double, 6, 1> imu_prev = Eigen::Matrix<double, 6, 1>::Zero();
+  double t_prev = 0;
+  std::vector<std::pair<int, bool>> contacts;
+  vectorKinematics kinematics;
+  vectorLandmarks landmarks;
+  while (true) {
+    // Stream with the earliest next record
+    int s = -1;
+    double t = std::numeric_limits<double>::infinity();
+    for (int i=0; i<4; ++i) {
+      const double ti = nextTime(log, types[i], k[i]);
+      if (ti < t) {
+        s = i;
+        t = ti;
+      }
+    }
+    if (s < 0) break;
+    const auto values = log.getValues(types[s]);
+    if (types[s] == IMUStream) {
+      const double dt = t - t_prev;
+      if (dt > kDtMin && dt < kDtMax) {
+        filter.Propagate(imu_prev, dt);
+      }
+      t_prev = t;
+      imu_prev = values.row(k[s]).transpose();
+      ++k[s];
+    }
+    else if (types[s] == ContactStream) {
+      contacts.clear();
+      for (int i=0; i<values.cols(); i+=2) {
+        contacts.push_back(std::pair<int, bool>(static_cast<int>(values.coeff(k[s], i)),
+                                                static_cast<bool>(values.coeff(k[s], i+1))));
+      }
+      filter.setContacts(contacts);
+      ++k[s];
+    }
+    else if (types[s] == KinematicStream) {
+      kinematics.clear();
+      for (; nextTime(log, KinematicStream, k[s]) == t; ++k[s]) {
+        const auto record = values.row(k[s]);
+        Eigen::Quaterniond q(record.coeff(1), record.coeff(2), record.coeff(3), record.coeff(4));
+        q.normalize();
+        Eigen::Matrix4d pose = Eigen::Matrix4d::Identity();
+        pose.template topLeftCorner<3, 3>() = q.toRotationMatrix();
+        pose.template topRightCorner<3, 1>() = record.template segment<3>(5).transpose();
+        const Eigen::Matrix<double, 6, 6> covariance
+            = Eigen::Map<const Eigen::Matrix<double, 6, 6, Eigen::RowMajor>>(record.data()+8);
+        kinematics.push_back(Kinematics(static_cast<int>(record.coeff(0)), pose, covariance));
+      }
+      filter.CorrectKinematics(kinematics);
+    }
+    else {
+      landmarks.clear();
+      for (; nextTime(log, LandmarkStream, k[s]) == t; ++k[s]) {
+        const auto record = values.row(k[s]);
+        landmarks.push_back(Landmark(static_cast<int>(record.coeff(0)),
+                                     record.template tail<3>().transpose(),
+                                     landmark_covariance));
+      }
+      filter.CorrectLandmarks(landmarks);
+    }
+  }
+}
+
+
+Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor>
+replaySensorLog(const SensorLog& log, LeggedStateEstimator& estimator,
+                const int record_decimation) {
+  const int nJ = estimator.getRobotModel().nJ();
+  if (!log.hasStream(IMUStream) || log.width(IMUStream) != 6) {
+    throw std::invalid_argument(
+        "[replaySensorLog] invalid argument: the log must have the IMU stream of width 6");
+  }
+  if (!log.hasStream(JointStream) || log.width(JointStream) != 3*nJ) {
+    throw std::invalid_argument(
+        "[replaySensorLog] invalid argument: the log must have the joint stream of width "
+        + std::to_string(3*nJ));
+  }
+  if (record_decimation <= 0) {
+    throw std::invalid_argument(
+        "[replaySensorLog] invalid argument: record_decimation must be positive");
+  }
+  const int num_joint_records = log.numRecords(JointStream);
+  const auto imu = log.getValues(IMUStream);
+  const auto joint = log.getValues(JointStream);
+  Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor> records(
+      (num_joint_records + record_decimation - 1) / record_decimation,
+      estimator.getEstimateRecord().size());
+  Eigen::VectorXd qJ(nJ), dqJ(nJ), tauJ(nJ);
+  int k_imu = 0, k_joint = 0;
+  while (k_imu < log.numRecords(IMUStream) || k_joint < num_joint_records) {
+    const double t_imu = nextTime(log, IMUStream, k_imu);
+    const double t_joint = nextTime(log, JointStream, k_joint);
+    // The IMU measurement comes first for the same timestamp
+    if (t_imu <= t_joint) {
+      estimator.pushIMU(t_imu, imu.row(k_imu).template head<3>().transpose(),
+                        imu.row(k_imu).template tail<3>().transpose());
+      ++k_imu;
+    }
+    else {
+      qJ = joint.row(k_joint).segment(0, nJ).transpose();
+      dqJ = joint.row(k_joint).segment(nJ, nJ).transpose();
+      tauJ = joint.row(k_joint).segment(2*nJ, nJ).transpose();
+      estimator.pushJoints(t_joint, qJ, dqJ, tauJ);
+      if (k_joint%record_decimation == 0) {
+        records.row(k_joint/record_decimation) = estimator.getEstimateRecord().transpose();
+      }
+      ++k_joint;
+    }
+  }
+  return records;
+}
+
+
+template void replaySensorLog<Eigen::Dynamic>(const SensorLog&, InEKFTpl<Eigen::Dynamic>&,
+                                              const Eigen::Matrix3d&);
+template void replaySensorLog<4>(const SensorLog&, InEKFTpl<4>&, const Eigen::Matrix3d&);
+
+} // namespace legged_state_estimator
@@ -0,0 +1,149 @@
+#include "legged_state_estimator/timing_stats.hpp"
+
+#include <cmath>
+#include <algorithm>
+
+
+namespace legged_state_estimator {
+
+namespace {
+
+const double kMinLatency = 0.1; // [us]
+const double kBinsPerOctave = 4.0;
+
+} // namespace
+
+
+LatencyHistogram::LatencyHistogram()
+  : bins_(),
+    count_(0),
+    sum_(0),
+    max_(0) {
+  bins_.fill(0);
+}
+
+
+void LatencyHistogram::record(const double latency_us) {
+  int bin = 0;
+  if (latency_us > kMinLatency) {
+    bin = static_cast<int>(std::ceil(kBinsPerOctave * std::log2(latency_us / kMinLatency)));
+    bin = std::min(bin, kNumBins-1);
+  }
+  ++bins_[bin];
+  ++count_;
+  sum_ += latency_us;
+  max_ = std::max(max_, latency_us);
+}
+
+
+void LatencyHistogram::reset() {
+  bins_.fill(0);
+  count_ = 0;
+  sum_ = 0;
+  max_ = 0;
+}
+
+
+long LatencyHistogram::count() const {
+  return count_;
+}
+
+
+double LatencyHistogram::mean() const {
+  return (count_ > 0) ? sum_ / count_ : 0.0;
+}
+
+
+double LatencyHistogram::max() const {
+  return max_;
+}
+
+
+double LatencyHistogram::percentile(const double p) const {
+  if (count_ == 0) {
+    return 0.0;
+  }
+  const double rank = std::ceil(0.01 * std::min(std::max(p, 0.0), 100.0) * count_);
+  long cumulative = 0;
+  for (int i=0; i<kNumBins; ++i) {
+    cumulative += bins_[i];
+    if (cumulative >= rank && cumulative > 0) {
+      return std::min(binUpperEdge(i), max_);
+    }
+  }
+  return max_;
+}
+
+
+double LatencyHistogram::binUpperEdge(const int bin) {
+  return kMinLatency * std::exp2(bin / kBinsPerOctave);
+}
+
+
+TimingStats::TimingStats()
+  : stage_latency_(),
+    num_contact_augmentations_(0),
+    num_contact_removals_(0) {
+}
+
+
+void TimingStats::record(const UpdateStage stage,
+                         const std::chrono::steady_clock::duration& latency) {
+  stage_latency_[stage].record(
+      1.0e-3 * std::chrono::duration_cast<std::chrono::nanoseconds>(latency).count());
+}
+
+
+void TimingStats::addContactSwitches(const long num_augmentations,
+                                     const long num_removals) {
+  num_contact_augmentations_ += num_augmentations;
+  num_contact_removals_ += num_removals;
+}
+
+
+void TimingStats::reset() {
+  for (auto& e : stage_latency_) {
+    e.reset();
+  }
+  num_contact_augmentations_ = 0;
+  num_contact_removals_ = 0;
+}
+
+
+const LatencyHistogram& TimingStats::getStageLatency(const UpdateStage stage) const {
+  return stage_latency_[stage];
+}
+
+
+long TimingStats::numContactAugmentations() const {
+  return num_contact_augmentations_;
+}
+
+
+long TimingStats::numContactRemovals() const {
+  return num_contact_removals_;
+}
+
+
+std::string TimingStats::stageName(const UpdateStage stage) {
+  switch (stage) {
+    case PropagationStage:
+      return "propagation";
+    case LowPassFilterStage:
+      return "low_pass_filter";
+    case RobotModelStage:
+      return "robot_model";
+    case ContactEstimationStage:
+      return "contact_estimation";
+    case KinematicsCorrectionStage:
+      return "kinematics_correction";
+    case ContactSwitchCorrectionStage:
+      return "contact_switch_correction";
+    case EstimateOutputStage:
+      return "estimate_output";
+    default:
+      return "total";
+  }
+}
+
+} // namespace legged_state_estimator
@@ -0,0 +1,108 @@
+#include <iostream>
+#include <string>
+#include <cstdlib>
+#include <Eigen/Core>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/allocation_audit.hpp"
+#include "legged_state_estimator/allocation_audit_hooks.hpp"
+
+using namespace legged_state_estimator;
+
+// Checks that LeggedStateEstimator::update() does not allocate on the heap
+// after warm-up, with the contact augmentations and removals caused by a
+// periodic lift-off of the first leg.
+
+const int NUM_WARM_UP_STEPS = 400;
+const int NUM_STEPS = 2000;
+const double TIME_STEP = 0.0025;
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  bool success = AllocationAudit::hooksInstalled();
+  std::cout << "Allocation hooks installed: " << AllocationAudit::hooksInstalled() << std::endl;
+
+  // The audit counts the allocations of the innermost audit only
+  {
+    AllocationAudit audit;
+    Eigen::VectorXd v = Eigen::VectorXd::Zero(100);
+    {
+      AllocationAudit nested_audit(NoAllocationAudit);
+      Eigen::VectorXd w = Eigen::VectorXd::Zero(100);
+    }
+    std::cout << "Allocations of a VectorXd: " << audit.numAllocations() << " ("
+              << audit.numAllocatedBytes() << " bytes)" << std::endl;
+    success = success && (audit.numAllocations() == 1) && (audit.numAllocatedBytes() >= 800);
+  }
+
+  // Synthetic stance with a periodic lift-off of the first leg
+  auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, TIME_STEP);
+  RobotModel robot_model(urdf_path, settings.imu_frame, settings.contact_frames);
+  const int nJ = robot_model.nJ();
+  Eigen::VectorXd qJ0(nJ);
+  for (int i=0; i<nJ/3; ++i) {
+    qJ0.segment<3>(3*i) << 0.0, 0.67, -1.3;
+  }
+  robot_model.updateLegKinematicsAndDynamics(qJ0, Eigen::VectorXd::Zero(nJ));
+  Eigen::VectorXd tauJ_stance = robot_model.getJointInverseDynamics();
+  Eigen::VectorXd tauJ_swing = tauJ_stance;
+  for (int i=0; i<robot_model.numContacts(); ++i) {
+    const Eigen::VectorXd tau_contact
+        = robot_model.getJointContactJacobian(i).transpose() * Eigen::Vector3d(0, 0, 30.0);
+    tauJ_stance -= tau_contact;
+    if (i > 0) {
+      tauJ_swing -= tau_contact;
+    }
+  }
+
+  const std::string names[5] = {"contact position", "base velocity", "dynamic contact estimation",
+                                "without contact slots", "timing stats"};
+  for (int config=0; config<5; ++config) {
+    auto config_settings = settings;
+    config_settings.allocation_audit_mode = CountAllocations;
+    if (config == 1) config_settings.leg_odometry_mode = BaseVelocity;
+    if (config == 2) config_settings.dynamic_contact_estimation = true;
+    if (config == 3) config_settings.contact_slot_mode = false;
+    if (config == 4) config_settings.enable_timing_stats = true;
+    LeggedStateEstimator estimator(config_settings);
+    estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+    std::srand(0);
+    Eigen::Vector3d imu_gyro, imu_lin_accel;
+    Eigen::VectorXd qJ(nJ), dqJ(nJ), tauJ(nJ);
+    long num_warm_up_allocations = 0;
+    for (int k=0; k<NUM_WARM_UP_STEPS+NUM_STEPS; ++k) {
+      if (k == NUM_WARM_UP_STEPS) {
+        num_warm_up_allocations = estimator.getNumUpdateAllocations();
+      }
+      imu_gyro = 0.01 * Eigen::Vector3d::Random();
+      imu_lin_accel = 0.1 * Eigen::Vector3d::Random() + Eigen::Vector3d(0, 0, 9.81);
+      qJ = qJ0 + 0.001 * Eigen::VectorXd::Random(nJ);
+      dqJ = 0.1 * Eigen::VectorXd::Random(nJ);
+      tauJ = ((k%200 < 100) ? tauJ_stance : tauJ_swing) + 0.1 * Eigen::VectorXd::Random(nJ);
+      estimator.update(imu_gyro, imu_lin_accel, qJ, dqJ, tauJ);
+    }
+    const long num_allocations = estimator.getNumUpdateAllocations() - num_warm_up_allocations;
+    std::cout << names[config] << ": allocations in warm-up: " << num_warm_up_allocations
+              << ", after warm-up: " << num_allocations << std::endl;
+    success = success && (num_warm_up_allocations > 0) && (num_allocations == 0);
+  }
+
+  // Without the audit of the estimator, an audit of the caller counts the
+  // allocations of update() (the first update augments the contacts)
+  {
+    LeggedStateEstimator estimator(settings);
+    estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+    AllocationAudit audit;
+    estimator.update(Eigen::Vector3d::Zero(), Eigen::Vector3d(0, 0, 9.81), qJ0,
+                     Eigen::VectorXd::Zero(nJ), tauJ_stance);
+    std::cout << "Allocations of the first update counted by the caller: "
+              << audit.numAllocations() << std::endl;
+    success = success && (audit.numAllocations() > 0);
+  }
+
+  if (!success) {
+    std::cout << "update() allocates after warm-up!" << std::endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,227 @@
+#include <iostream>
+#include <fstream>
+#include <iomanip>
+#include <string>
+#include <vector>
+#include <chrono>
+#include <algorithm>
+#include <numeric>
+#include <functional>
+#include <cstdlib>
+#include <unistd.h>
+#include <Eigen/Core>
+#include "legged_state_estimator/inekf/inekf.hpp"
+#include "legged_state_estimator/robot_model.hpp"
+#include "legged_state_estimator/contact_estimator.hpp"
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/estimate_publisher.hpp"
+
+using namespace legged_state_estimator;
+
+// Benchmarks the hot paths of the estimator (propagation, kinematic
+// correction, landmark correction at growing state sizes, RobotModel,
+// ContactEstimator, the full LeggedStateEstimator::update(), and publishing
+// and reading the estimates through shared memory) and writes
+// the mean, p50, p99, and max latencies in JSON.
+// tests/benchmark_suite.py runs this benchmark together with the Python
+// benchmarks and compares the results against a stored baseline.
+//
+// Usage: benchmark_suite [urdf_path] [output_json]
+
+const int NUM_WARMUP = 100;
+const int NUM_SAMPLES = 5000;
+const double TIME_STEP = 0.0025;
+
+
+struct LatencyStats {
+  std::string name;
+  int num_samples;
+  double mean_us, p50_us, p99_us, max_us;
+};
+
+
+LatencyStats computeStats(const std::string& name, std::vector<double>& latency_us) {
+  std::sort(latency_us.begin(), latency_us.end());
+  const int n = latency_us.size();
+  LatencyStats stats;
+  stats.name = name;
+  stats.num_samples = n;
+  stats.mean_us = std::accumulate(latency_us.begin(), latency_us.end(), 0.0) / n;
+  stats.p50_us = latency_us[(n-1)/2];
+  stats.p99_us = latency_us[std::min(n-1, static_cast<int>(0.99*n))];
+  stats.max_us = latency_us.back();
+  return stats;
+}
+
+
+// Times run() num_samples times. prepare() is called before each run() and
+// is not timed.
+LatencyStats benchmark(const std::string& name, const std::function<void()>& prepare,
+                       const std::function<void()>& run, const int num_samples=NUM_SAMPLES) {
+  for (int i=0; i<NUM_WARMUP; ++i) {
+    prepare();
+    run();
+  }
+  std::vector<double> latency_us(num_samples);
+  for (int i=0; i<num_samples; ++i) {
+    prepare();
+    const auto start_time = std::chrono::steady_clock::now();
+    run();
+    const auto end_time = std::chrono::steady_clock::now();
+    latency_us[i] = 1.0e-3 * std::chrono::duration_cast<std::chrono::nanoseconds>(end_time - start_time).count();
+  }
+  return computeStats(name, latency_us);
+}
+
+
+void writeJSON(const std::string& path, const std::vector<LatencyStats>& results) {
+  std::ofstream file(path);
+  file << std::setprecision(6) << "{\n  \"unit\": \"us\",\n  \"benchmarks\": {\n";
+  for (int i=0; i<results.size(); ++i) {
+    const auto& e = results[i];
+    file << "    \"" << e.name << "\": {\"num_samples\": " << e.num_samples
+         << ", \"mean\": " << e.mean_us << ", \"p50\": " << e.p50_us
+         << ", \"p99\": " << e.p99_us << ", \"max\": " << e.max_us << "}"
+         << ((i+1 < results.size()) ? ",\n" : "\n");
+  }
+  file << "  }\n}\n";
+}
+
+
+vectorKinematics makeKinematics(const int num_contacts) {
+  vectorKinematics kinematics;
+  for (int i=0; i<num_contacts; ++i) {
+    Eigen::Matrix4d pose = Eigen::Matrix4d::Identity();
+    pose.topRightCorner<3, 1>() << ((i%2 == 0) ? 0.2 : -0.2), ((i/2 == 0) ? 0.15 : -0.15), -0.3;
+    kinematics.emplace_back(i, pose, 0.01*Eigen::Matrix<double, 6, 6>::Identity());
+  }
+  return kinematics;
+}
+
+
+vectorLandmarks makeLandmarks(const int num_landmarks) {
+  vectorLandmarks landmarks;
+  for (int i=0; i<num_landmarks; ++i) {
+    landmarks.emplace_back(i, Eigen::Vector3d(1.0+0.1*i, 0.5-0.05*i, 0.2+0.01*i),
+                           0.01*Eigen::Matrix3d::Identity());
+  }
+  return landmarks;
+}
+
+
+template <int MaxAugmented>
+void benchmarkInEKF(const std::string& prefix, std::vector<LatencyStats>& results) {
+  using Filter = InEKFTpl<MaxAugmented>;
+  Eigen::Matrix<double, 6, 1> imu;
+  imu << 0.01, -0.02, 0.03, 0.1, -0.1, 9.81;
+  const vectorKinematics kinematics = makeKinematics(4);
+  const std::vector<std::pair<int, bool>> contacts
+      = {{0, true}, {1, true}, {2, true}, {3, true}};
+  Filter filter0;
+  Filter filter;
+  results.push_back(benchmark(prefix+"_propagate_0_contacts",
+                              [&]() { filter = filter0; },
+                              [&]() { filter.Propagate(imu, TIME_STEP); }));
+  filter0.setContacts(contacts);
+  filter0.CorrectKinematics(kinematics);
+  results.push_back(benchmark(prefix+"_propagate_4_contacts",
+                              [&]() { filter = filter0; },
+                              [&]() { filter.Propagate(imu, TIME_STEP); }));
+  results.push_back(benchmark(prefix+"_correct_kinematics_4_contacts",
+                              [&]() { filter = filter0; },
+                              [&]() { filter.CorrectKinematics(kinematics); }));
+}
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  const std::string output_path = (argc > 2) ? argv[2] : "benchmark_results.json";
+  std::vector<LatencyStats> results;
+  std::srand(0);
+
+  // InEKF
+  benchmarkInEKF<Eigen::Dynamic>("inekf", results);
+  benchmarkInEKF<4>("inekf_fixed_4", results);
+  for (const int num_landmarks : {4, 8, 16, 32, 64}) {
+    const vectorLandmarks landmarks = makeLandmarks(num_landmarks);
+    InEKF filter0, filter;
+    filter0.CorrectLandmarks(landmarks);
+    results.push_back(benchmark("inekf_correct_landmarks_"+std::to_string(num_landmarks),
+                                [&]() { filter = filter0; },
+                                [&]() { filter.CorrectLandmarks(landmarks); },
+                                (num_landmarks <= 16) ? NUM_SAMPLES : NUM_SAMPLES/50));
+  }
+
+  // RobotModel and ContactEstimator
+  const auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, TIME_STEP);
+  RobotModel robot_model(urdf_path, settings.imu_frame, settings.contact_frames);
+  const int nJ = robot_model.nJ();
+  Eigen::VectorXd qJ0(nJ);
+  for (int i=0; i<nJ/3; ++i) {
+    qJ0.segment<3>(3*i) << 0.0, 0.67, -1.3;
+  }
+  // Joint torques that balance the contact forces, i.e., all the legs are in 
+  // stance.
+  robot_model.updateLegKinematicsAndDynamics(qJ0, Eigen::VectorXd::Zero(nJ));
+  Eigen::VectorXd tauJ0 = robot_model.getJointInverseDynamics();
+  for (int i=0; i<robot_model.numContacts(); ++i) {
+    tauJ0.noalias() -= robot_model.getJointContactJacobian(i).transpose() * Eigen::Vector3d(0, 0, 30.0);
+  }
+  Eigen::VectorXd qJ = qJ0, dqJ = Eigen::VectorXd::Zero(nJ), tauJ = tauJ0;
+  const auto sampleJointState = [&]() {
+    qJ = qJ0 + 0.01 * Eigen::VectorXd::Random(nJ);
+    dqJ = 0.1 * Eigen::VectorXd::Random(nJ);
+    tauJ = tauJ0 + 0.1 * Eigen::VectorXd::Random(nJ);
+  };
+  results.push_back(benchmark("robot_model_update_leg_kinematics", sampleJointState,
+                              [&]() { robot_model.updateLegKinematics(qJ); }));
+  results.push_back(benchmark("robot_model_update_leg_kinematics_and_dynamics", sampleJointState,
+                              [&]() { robot_model.updateLegKinematicsAndDynamics(qJ, dqJ); }));
+  ContactEstimator contact_estimator(robot_model, settings.contact_estimator_settings);
+  results.push_back(benchmark("contact_estimator_update",
+                              [&]() { sampleJointState(); robot_model.updateLegKinematicsAndDynamics(qJ, dqJ); },
+                              [&]() { contact_estimator.update(robot_model, tauJ); }));
+
+  // LeggedStateEstimator
+  for (const auto mode : {LegOdometryMode::ContactPosition, LegOdometryMode::BaseVelocity}) {
+    auto mode_settings = settings;
+    mode_settings.leg_odometry_mode = mode;
+    LeggedStateEstimator estimator(mode_settings);
+    estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+    Eigen::Vector3d imu_gyro, imu_lin_accel;
+    results.push_back(benchmark((mode == LegOdometryMode::ContactPosition)
+                                  ? "legged_state_estimator_update"
+                                  : "legged_state_estimator_update_base_velocity",
+                                [&]() {
+                                  sampleJointState();
+                                  imu_gyro = 0.01 * Eigen::Vector3d::Random();
+                                  imu_lin_accel = 0.1 * Eigen::Vector3d::Random();
+                                  imu_lin_accel.coeffRef(2) += 9.81;
+                                },
+                                [&]() { estimator.update(imu_gyro, imu_lin_accel, qJ, dqJ, tauJ); }));
+  }
+
+  // EstimatePublisher and EstimateSubscriber
+  {
+    const std::string name = "legged_state_estimator_benchmark_" + std::to_string(::getpid());
+    EstimatePublisher publisher(name);
+    EstimateSubscriber subscriber(name);
+    EstimateSnapshot snapshot = EstimateSnapshot();
+    results.push_back(benchmark("estimate_publisher_publish", []() {},
+                                [&]() { publisher.publish(snapshot); }));
+    results.push_back(benchmark("estimate_subscriber_read", []() {},
+                                [&]() { subscriber.read(snapshot); }));
+  }
+
+  std::cout << std::left << std::setw(52) << "benchmark [us]" << std::right
+            << std::setw(10) << "mean" << std::setw(10) << "p50"
+            << std::setw(10) << "p99" << std::setw(10) << "max" << std::endl;
+  std::cout << std::fixed << std::setprecision(2);
+  for (const auto& e : results) {
+    std::cout << std::left << std::setw(52) << e.name << std::right
+              << std::setw(10) << e.mean_us << std::setw(10) << e.p50_us
+              << std::setw(10) << e.p99_us << std::setw(10) << e.max_us << std::endl;
+  }
+  writeJSON(output_path, results);
+  return 0;
+}
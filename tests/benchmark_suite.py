@@ -0,0 +1,229 @@
+"""Regression benchmark suite of the estimator hot paths.
+
+Runs the C++ benchmarks (tests/benchmark_suite.cpp) and the Python binding
+benchmarks, writes the mean, p50, p99, and max latencies in JSON, and compares
+them against a stored baseline with relative tolerances. Also checks that the
+p99 latencies of the full update stay within the control budget. Exits with a
+nonzero status if any benchmark regressed.
+
+Usage (e.g., from the build directory):
+    python3 ../tests/benchmark_suite.py --cpp ./benchmark_suite \\
+        --urdf ../examples_python/a1_description/urdf/a1_friction.urdf \\
+        --baseline ../tests/benchmark_baseline.json
+
+The baseline depends on the machine and on the commit. Run with
+--update-baseline on the target machine, with the Python bindings built, to
+store the current results as the baseline. The benchmarks without a baseline
+entry are reported but not compared, and the budget benchmarks are checked
+against the budget only.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+BUDGET_BENCHMARKS = ['legged_state_estimator_update',
+                     'legged_state_estimator_update_base_velocity',
+                     'python_legged_state_estimator_update']
+NUM_WARMUP = 100
+NUM_SAMPLES = 5000
+TIME_STEP = 0.0025
+METRICS = ['mean', 'p50', 'p99', 'max']
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latency_stats(latency_us):
+    latency_us = np.sort(np.asarray(latency_us))
+    n = latency_us.size
+    return {'num_samples': int(n),
+            'mean': float(np.mean(latency_us)),
+            'p50': float(latency_us[(n-1)//2]),
+            'p99': float(latency_us[min(n-1, int(0.99*n))]),
+            'max': float(latency_us[-1])}
+
+
+def benchmark(prepare, run, num_samples=NUM_SAMPLES):
+    for _ in range(NUM_WARMUP):
+        run(*prepare())
+    latency_us = np.zeros(num_samples)
+    for i in range(num_samples):
+        args = prepare()
+        start_time = time.perf_counter()
+        run(*args)
+        latency_us[i] = 1.0e6 * (time.perf_counter() - start_time)
+    return latency_stats(latency_us)
+
+
+def run_cpp_benchmarks(cpp, urdf_path):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'benchmark_results.json')
+        subprocess.run([cpp, urdf_path, output_path], check=True)
+        with open(output_path) as f:
+            return json.load(f)['benchmarks']
+
+
+def run_python_benchmarks(urdf_path):
+    try:
+        import legged_state_estimator
+    except ImportError as e:
+        print('Skipping the Python benchmarks: ' + str(e))
+        return {}
+    settings = legged_state_estimator.LeggedStateEstimatorSettings.UnitreeA1(urdf_path, TIME_STEP)
+    robot_model = legged_state_estimator.RobotModel(urdf_path, settings.imu_frame, settings.contact_frames)
+    nJ = 3 * len(settings.contact_frames)
+    qJ0 = np.tile([0.0, 0.67, -1.3], nJ//3)
+    # Joint torques that balance the contact forces, i.e., all the legs are in stance.
+    robot_model.update_leg_kinematics_and_dynamics(qJ0, np.zeros(nJ))
+    tauJ0 = robot_model.get_joint_inverse_dynamics().copy()
+    for i in range(len(settings.contact_frames)):
+        tauJ0 -= robot_model.get_joint_contact_jacobian(i).T @ np.array([0., 0., 30.])
+    rng = np.random.default_rng(0)
+
+    def sample():
+        imu_gyro = 0.01 * rng.uniform(-1, 1, 3)
+        imu_lin_accel = 0.1 * rng.uniform(-1, 1, 3) + np.array([0., 0., 9.81])
+        qJ = qJ0 + 0.01 * rng.uniform(-1, 1, nJ)
+        dqJ = 0.1 * rng.uniform(-1, 1, nJ)
+        tauJ = tauJ0 + 0.1 * rng.uniform(-1, 1, nJ)
+        return imu_gyro, imu_lin_accel, qJ, dqJ, tauJ
+
+    estimator = legged_state_estimator.LeggedStateEstimator(settings)
+    estimator.init(base_pos=np.array([0., 0., 0.3]), base_quat=np.array([0., 0., 0., 1.]))
+    results = {}
+    results['python_legged_state_estimator_update'] = benchmark(
+        sample, lambda *args: estimator.update(*args))
+    results['python_base_position_estimate'] = benchmark(
+        lambda: (), lambda: estimator.base_position_estimate)
+    batch_size = 100
+    batch = [np.array(e) for e in zip(*[sample() for _ in range(batch_size)])]
+    stats = benchmark(lambda: batch, lambda *args: estimator.update_batch(*args),
+                      num_samples=NUM_SAMPLES//batch_size)
+    results['python_legged_state_estimator_update_batch_per_step'] = {
+        'num_samples': stats['num_samples'],
+        **{metric: stats[metric] / batch_size for metric in METRICS}}
+    publisher = legged_state_estimator.EstimatePublisher('legged_state_estimator_benchmark_py_' + str(os.getpid()))
+    subscriber = legged_state_estimator.EstimateSubscriber(publisher.name)
+    snapshot = legged_state_estimator.EstimateSnapshot()
+    publisher.publish(snapshot)
+    results['python_estimate_subscriber_read'] = benchmark(
+        lambda: (), lambda: subscriber.read(snapshot))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    absolute_tolerance = baseline.get('absolute_tolerance_us', 0.0)
+    for name, base in baseline['benchmarks'].items():
+        if name not in results:
+            print('Benchmark ' + name + ' is not in the results')
+            continue
+        for metric, tol in tolerance.items():
+            if tol is None or metric not in base or metric not in results[name]:
+                continue
+            limit = base[metric] * (1.0 + tol) + absolute_tolerance
+            if results[name][metric] > limit:
+                regressions.append('{}: {} {:.2f} us > {:.2f} us (baseline {:.2f} us)'.format(
+                                   name, metric, results[name][metric], limit, base[metric]))
+    for name in results:
+        if name not in baseline['benchmarks']:
+            print('Benchmark ' + name + ' is not in the baseline and is not compared')
+    budget = baseline.get('budget_us')
+    for name in baseline.get('budget_benchmarks', []):
+        if budget is None:
+            continue
+        if name not in results:
+            print('Warning: budget benchmark ' + name + ' is not in the results')
+            continue
+        if results[name]['p99'] > budget:
+            regressions.append('{}: p99 {:.2f} us exceeds the budget {:.2f} us'.format(
+                               name, results[name]['p99'], budget))
+        elif results[name]['max'] > budget:
+            print('Warning: {}: max {:.2f} us exceeds the budget {:.2f} us'.format(
+                  name, results[name]['max'], budget))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regression benchmark suite of the estimator hot paths.')
+    parser.add_argument('--cpp', default='./benchmark_suite', help='path to the C++ benchmark executable')
+    parser.add_argument('--urdf', default='a1_description/urdf/a1_friction.urdf', help='path to the A1 URDF')
+    parser.add_argument('--baseline', default=None, help='path to the baseline JSON')
+    parser.add_argument('--output', default='benchmark_results.json', help='path to the output JSON')
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help='overrides the relative tolerances of mean, p50, and p99 of the baseline')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='stores the results as the baseline instead of comparing')
+    parser.add_argument('--no-python', action='store_true', help='skips the Python benchmarks')
+    args = parser.parse_args()
+
+    results = run_cpp_benchmarks(args.cpp, args.urdf)
+    if not args.no_python:
+        results.update(run_python_benchmarks(args.urdf))
+        if 'python_legged_state_estimator_update' in results and 'legged_state_estimator_update' in results:
+            results['python_update_overhead'] = {
+                metric: results['python_legged_state_estimator_update'][metric]
+                          - results['legged_state_estimator_update'][metric] for metric in ['mean', 'p50']}
+    with open(args.output, 'w') as f:
+        json.dump({'unit': 'us', 'benchmarks': results}, f, indent=2)
+    print('{:<56}{:>10}{:>10}{:>10}{:>10}'.format('benchmark [us]', *METRICS))
+    for name, stats in results.items():
+        print('{:<56}'.format(name) + ''.join(
+              '{:>10.2f}'.format(stats[metric]) if metric in stats else '{:>10}'.format('-')
+              for metric in METRICS))
+
+    if args.baseline is None:
+        return 0
+    if args.update_baseline:
+        if not args.no_python and 'python_legged_state_estimator_update' not in results:
+            print('The Python benchmarks did not run. Build the bindings, or pass --no-python '
+                  'to store a baseline without them.')
+            return 1
+        baseline = {'tolerance': {'mean': 0.25, 'p50': 0.25, 'p99': 0.5, 'max': None},
+                    'absolute_tolerance_us': 1.0,
+                    'budget_us': 2500.0}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline.update({k: v for k, v in json.load(f).items()
+                                 if k not in ['recorded_commit', 'budget_benchmarks', 'benchmarks']})
+        baseline['recorded_commit'] = current_commit()
+        baseline['budget_benchmarks'] = [name for name in BUDGET_BENCHMARKS if name in results]
+        baseline['benchmarks'] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print('Stored the baseline to ' + args.baseline)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    commit = current_commit()
+    if commit is not None and baseline.get('recorded_commit') != commit:
+        print('Warning: the baseline was recorded at {}, not at {}'.format(
+              baseline.get('recorded_commit'), commit))
+    tolerance = dict(baseline['tolerance'])
+    if args.tolerance is not None:
+        for metric in ['mean', 'p50', 'p99']:
+            tolerance[metric] = args.tolerance
+    regressions = compare(results, baseline, tolerance)
+    if regressions:
+        print('Regressions:')
+        for e in regressions:
+            print('  ' + e)
+        return 1
+    print('No regressions against ' + args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#include <iostream>
+#include <string>
+#include <cstdlib>
+#include <stdexcept>
+#include <chrono>
+#include <algorithm>
+#include <filesystem>
+#include <unistd.h>
+#include <Eigen/Core>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+
+using namespace legged_state_estimator;
+
+// Checks the robot model cache and the checkpoints of LeggedStateEstimator.
+// An estimator restored from a checkpoint must reproduce the updates of the
+// checkpointed one, also when it is default-constructed. An invalid
+// checkpoint must be rejected without changing the estimator.
+
+const int NUM_STEPS = 1000;
+const double TIME_STEP = 0.002;
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  // The robot model is cached in a temporary directory, which is removed at
+  // the end, unless a cache directory is given
+  char tmp_dir_template[] = "/tmp/legged_state_estimator_checkpoint_XXXXXX";
+  if (argc <= 2 && mkdtemp(tmp_dir_template) == nullptr) {
+    std::cout << "Failed to create a temporary directory!" << std::endl;
+    return 1;
+  }
+  const std::string cache_dir = (argc > 2) ? argv[2] : tmp_dir_template;
+  bool success = true;
+
+  // Robot model cache
+  {
+    const auto start_parse = std::chrono::high_resolution_clock::now();
+    const pinocchio::Model parsed_model = RobotModel::buildFloatingBaseModel(urdf_path);
+    const auto end_parse = std::chrono::high_resolution_clock::now();
+    const pinocchio::Model cached_model = RobotModel::buildFloatingBaseModel(urdf_path, cache_dir);
+    const auto start_cached = std::chrono::high_resolution_clock::now();
+    const pinocchio::Model cached_model_again = RobotModel::buildFloatingBaseModel(urdf_path, cache_dir);
+    const auto end_cached = std::chrono::high_resolution_clock::now();
+    std::cout << "URDF parse: "
+              << std::chrono::duration_cast<std::chrono::microseconds>(end_parse-start_parse).count()
+              << " [us], cached: "
+              << std::chrono::duration_cast<std::chrono::microseconds>(end_cached-start_cached).count()
+              << " [us]" << std::endl;
+    success = success && (cached_model == parsed_model) && (cached_model_again == parsed_model);
+  }
+
+  // Synthetic stance of all legs
+  auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, TIME_STEP);
+  settings.robot_model_cache_dir = cache_dir;
+  RobotModel robot_model(urdf_path, settings.imu_frame, settings.contact_frames);
+  const int nJ = robot_model.nJ();
+  Eigen::VectorXd qJ0(nJ);
+  for (int i=0; i<nJ/3; ++i) {
+    qJ0.segment<3>(3*i) << 0.0, 0.67, -1.3;
+  }
+  robot_model.updateLegKinematicsAndDynamics(qJ0, Eigen::VectorXd::Zero(nJ));
+  Eigen::VectorXd tauJ_stance = robot_model.getJointInverseDynamics();
+  for (int i=0; i<robot_model.numContacts(); ++i) {
+    tauJ_stance -= robot_model.getJointContactJacobian(i).transpose() * Eigen::Vector3d(0, 0, 30.0);
+  }
+  const Eigen::Vector4d base_quat(0, 0, 0, 1);
+
+  LeggedStateEstimator estimator(settings);
+  estimator.init(Eigen::Vector3d::Zero(), base_quat, qJ0);
+  std::srand(0);
+  auto step = [&](LeggedStateEstimator& e, const int k) {
+    const Eigen::Vector3d imu_gyro = 0.01 * Eigen::Vector3d::Random();
+    const Eigen::Vector3d imu_lin_accel = 0.1 * Eigen::Vector3d::Random() + Eigen::Vector3d(0, 0, 9.81);
+    const Eigen::VectorXd qJ = qJ0 + 0.001 * Eigen::VectorXd::Random(nJ);
+    const Eigen::VectorXd dqJ = 0.1 * Eigen::VectorXd::Random(nJ);
+    // Swing of the first leg in the second half of every 0.2 s
+    Eigen::VectorXd tauJ = tauJ_stance + 0.1 * Eigen::VectorXd::Random(nJ);
+    if ((k/50)%2 == 1) {
+      tauJ.head<3>() = robot_model.getJointInverseDynamics().head<3>();
+    }
+    e.update(imu_gyro, imu_lin_accel, qJ, dqJ, tauJ);
+  };
+  for (int k=0; k<NUM_STEPS; ++k) {
+    step(estimator, k);
+  }
+
+  const auto start_save = std::chrono::high_resolution_clock::now();
+  const std::string checkpoint = estimator.saveCheckpoint();
+  const auto end_save = std::chrono::high_resolution_clock::now();
+  std::cout << "Checkpoint: " << checkpoint.size() << " [bytes], save: "
+            << std::chrono::duration_cast<std::chrono::microseconds>(end_save-start_save).count()
+            << " [us]" << std::endl;
+
+  // Restored into an estimator with the same settings and into a
+  // default-constructed one
+  LeggedStateEstimator restored_estimator(settings), default_estimator;
+  const auto start_load = std::chrono::high_resolution_clock::now();
+  restored_estimator.loadCheckpoint(checkpoint);
+  const auto end_load = std::chrono::high_resolution_clock::now();
+  default_estimator.loadCheckpoint(checkpoint);
+  std::cout << "Load: "
+            << std::chrono::duration_cast<std::chrono::microseconds>(end_load-start_load).count()
+            << " [us]" << std::endl;
+  success = success && (restored_estimator.saveCheckpoint() == checkpoint)
+                    && (default_estimator.saveCheckpoint() == checkpoint);
+
+  double diff = (estimator.getEstimateRecord() - restored_estimator.getEstimateRecord()).lpNorm<Eigen::Infinity>();
+  for (int k=NUM_STEPS; k<2*NUM_STEPS; ++k) {
+    const unsigned int seed = std::rand();
+    std::srand(seed);
+    step(estimator, k);
+    std::srand(seed);
+    step(restored_estimator, k);
+    std::srand(seed);
+    step(default_estimator, k);
+    diff = std::max(diff, (estimator.getEstimateRecord() - restored_estimator.getEstimateRecord()).lpNorm<Eigen::Infinity>());
+    diff = std::max(diff, (estimator.getEstimateRecord() - default_estimator.getEstimateRecord()).lpNorm<Eigen::Infinity>());
+  }
+  std::cout << "Difference of the checkpointed and restored estimators: " << diff << std::endl;
+  success = success && (diff == 0.0);
+
+  // An invalid checkpoint is rejected and the estimator is unchanged
+  {
+    const std::string before = restored_estimator.saveCheckpoint();
+    bool thrown_truncated = false, thrown_corrupted = false;
+    try {
+      restored_estimator.loadCheckpoint(checkpoint.substr(0, checkpoint.size()/2));
+    }
+    catch (const std::runtime_error& e) {
+      thrown_truncated = true;
+    }
+    try {
+      restored_estimator.loadCheckpoint("not a checkpoint");
+    }
+    catch (const std::runtime_error& e) {
+      thrown_corrupted = true;
+    }
+    std::cout << "Invalid checkpoints rejected: " << (thrown_truncated && thrown_corrupted) << std::endl;
+    success = success && thrown_truncated && thrown_corrupted
+                      && (restored_estimator.saveCheckpoint() == before);
+  }
+
+  if (argc <= 2) {
+    std::filesystem::remove_all(cache_dir);
+  }
+
+  if (!success) {
+    std::cout << "Checkpoint is wrong!" << std::endl;
+    return 1;
+  }
+  return 0;
+}
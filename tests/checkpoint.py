@@ -0,0 +1,80 @@
+"""Checks the checkpoints of the Python bindings of LeggedStateEstimator.
+
+An estimate_record view taken before load_checkpoint() must show the restored
+estimates afterwards, and a pickled estimator must reproduce the updates of
+the original one.
+
+Usage (e.g., from the build directory, with the bindings on PYTHONPATH):
+    python3 ../tests/checkpoint.py \\
+        --urdf ../examples_python/a1_description/urdf/a1_friction.urdf
+"""
+import argparse
+import pickle
+import sys
+
+import numpy as np
+
+import legged_state_estimator
+
+
+TIME_STEP = 0.0025
+NUM_STEPS = 200
+NUM_JOINTS = 12
+
+
+def step(estimator, rng):
+    qJ = np.tile([0.0, 0.67, -1.3], NUM_JOINTS//3) + 0.001 * rng.standard_normal(NUM_JOINTS)
+    estimator.update(imu_gyro_raw=0.01 * rng.standard_normal(3),
+                     imu_lin_accel_raw=np.array([0.0, 0.0, 9.81]) + 0.1 * rng.standard_normal(3),
+                     qJ=qJ, dqJ=0.1 * rng.standard_normal(NUM_JOINTS),
+                     tauJ=np.tile([0.0, 0.0, 5.0], NUM_JOINTS//3) + 0.1 * rng.standard_normal(NUM_JOINTS))
+
+
+def record_values(record):
+    return np.concatenate([np.ravel(record[name]) for name in record.dtype.names])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urdf', default='a1_description/urdf/a1_friction.urdf')
+    args = parser.parse_args()
+
+    settings = legged_state_estimator.LeggedStateEstimatorSettings.UnitreeA1(args.urdf, TIME_STEP)
+    estimator = legged_state_estimator.LeggedStateEstimator(settings)
+    estimator.init(base_pos=np.array([0.0, 0.0, 0.3]), base_quat=np.array([0.0, 0.0, 0.0, 1.0]))
+    rng = np.random.default_rng(0)
+    for _ in range(NUM_STEPS):
+        step(estimator, rng)
+    checkpoint = estimator.save_checkpoint()
+    checkpoint_values = record_values(estimator.estimate_record)
+
+    success = True
+
+    # A view taken before load_checkpoint() shows the restored estimates
+    record = estimator.estimate_record
+    for _ in range(NUM_STEPS):
+        step(estimator, rng)
+    estimator.load_checkpoint(checkpoint)
+    diff = np.max(np.abs(record_values(record) - checkpoint_values))
+    print('Difference of the estimate record view after load_checkpoint():', diff)
+    success = success and diff == 0.0
+
+    # A pickled estimator reproduces the updates
+    restored_estimator = pickle.loads(pickle.dumps(estimator))
+    diff = 0.0
+    for k in range(NUM_STEPS):
+        seed = 1000 + k
+        step(estimator, np.random.default_rng(seed))
+        step(restored_estimator, np.random.default_rng(seed))
+        diff = max(diff, np.max(np.abs(record_values(estimator.estimate_record)
+                                       - record_values(restored_estimator.estimate_record))))
+    print('Difference of the pickled and original estimators:', diff)
+    success = success and diff == 0.0
+
+    if not success:
+        print('Checkpoint is wrong!')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#include <iostream>
+#include <string>
+#include <vector>
+#include <thread>
+#include <algorithm>
+#include <cstdlib>
+#include <cmath>
+#include <Eigen/Dense>
+#include <Eigen/StdVector>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/robot_model.hpp"
+#include "legged_state_estimator/contact_estimator.hpp"
+
+using namespace std;
+using namespace legged_state_estimator;
+
+// Distinct instances must be updatable from different threads at the same
+// time and give the same results as updating them one after another.
+
+struct Measurements {
+  std::vector<Eigen::Vector3d, Eigen::aligned_allocator<Eigen::Vector3d>> gyro, accel;
+  std::vector<Eigen::VectorXd> qJ, dqJ, tauJ;
+};
+
+
+Measurements generateMeasurements(const int nJ, const int num_steps) {
+  Measurements m;
+  Eigen::VectorXd qJ0(nJ), tauJ0(nJ);
+  for (int j=0; j<nJ/3; ++j) {
+    qJ0.segment<3>(3*j) << 0.0, 0.67, -1.3;
+    tauJ0.segment<3>(3*j) << 0.0, 0.0, -8.0;
+  }
+  for (int k=0; k<num_steps; ++k) {
+    m.gyro.push_back(0.01*Eigen::Vector3d::Random());
+    m.accel.push_back(0.1*Eigen::Vector3d::Random() + Eigen::Vector3d(0, 0, 9.81));
+    m.qJ.push_back(qJ0 + 0.01*Eigen::VectorXd::Random(nJ));
+    m.dqJ.push_back(0.1*Eigen::VectorXd::Random(nJ));
+    m.tauJ.push_back(tauJ0 + Eigen::VectorXd::Random(nJ));
+  }
+  return m;
+}
+
+
+void runEstimator(LeggedStateEstimator& estimator, const Measurements& m) {
+  estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+  for (int k=0; k<m.gyro.size(); ++k) {
+    estimator.update(m.gyro[k], m.accel[k], m.qJ[k], m.dqJ[k], m.tauJ[k]);
+  }
+}
+
+
+void runContactEstimator(RobotModel& robot_model,
+                         ContactEstimator& contact_estimator,
+                         const Measurements& m) {
+  for (int k=0; k<m.gyro.size(); ++k) {
+    robot_model.updateLegKinematics(m.qJ[k]);
+    robot_model.updateLegDynamics(m.qJ[k], m.dqJ[k]);
+    contact_estimator.update(robot_model, m.tauJ[k]);
+  }
+}
+
+
+int main() {
+  const std::string urdf_path = "../examples_python/a1_description/urdf/a1_friction.urdf";
+  const double time_step = 0.0025;
+  const int num_threads = 8;
+  const int num_steps = 1000;
+
+  std::vector<LeggedStateEstimatorSettings> settings;
+  for (int i=0; i<num_threads; ++i) {
+    auto s = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, time_step);
+    s.dynamic_contact_estimation = (i%2 == 0);
+    settings.push_back(s);
+  }
+  std::srand(0);
+  std::vector<Measurements> measurements;
+  for (int i=0; i<num_threads; ++i) {
+    measurements.push_back(generateMeasurements(12, num_steps));
+  }
+
+  // Serial reference
+  std::vector<LeggedStateEstimator, Eigen::aligned_allocator<LeggedStateEstimator>> serial, concurrent;
+  for (int i=0; i<num_threads; ++i) {
+    serial.emplace_back(settings[i]);
+    concurrent.emplace_back(settings[i]);
+    runEstimator(serial[i], measurements[i]);
+  }
+  // One estimator per thread
+  std::vector<std::thread> threads;
+  for (int i=0; i<num_threads; ++i) {
+    threads.emplace_back(runEstimator, std::ref(concurrent[i]), std::cref(measurements[i]));
+  }
+  for (auto& e : threads) {
+    e.join();
+  }
+  double max_diff = 0;
+  for (int i=0; i<num_threads; ++i) {
+    max_diff = std::max(max_diff, (concurrent[i].getBasePositionEstimate()
+                                    - serial[i].getBasePositionEstimate()).lpNorm<Eigen::Infinity>());
+    max_diff = std::max(max_diff, (concurrent[i].getBaseQuaternionEstimate()
+                                    - serial[i].getBaseQuaternionEstimate()).lpNorm<Eigen::Infinity>());
+    max_diff = std::max(max_diff, (concurrent[i].getBaseLinearVelocityEstimateWorld()
+                                    - serial[i].getBaseLinearVelocityEstimateWorld()).lpNorm<Eigen::Infinity>());
+  }
+  cout << "Max difference of the state estimates: " << max_diff << endl;
+
+  // Robot models and contact estimators
+  std::vector<RobotModel, Eigen::aligned_allocator<RobotModel>> robot_models;
+  std::vector<ContactEstimator> contact_estimators;
+  for (int i=0; i<num_threads; ++i) {
+    robot_models.emplace_back(urdf_path, settings[i].imu_frame, settings[i].contact_frames);
+  }
+  for (int i=0; i<num_threads; ++i) {
+    contact_estimators.emplace_back(robot_models[i], settings[i].contact_estimator_settings);
+  }
+  RobotModel robot_model_ref(urdf_path, settings[0].imu_frame, settings[0].contact_frames);
+  threads.clear();
+  for (int i=0; i<num_threads; ++i) {
+    threads.emplace_back(runContactEstimator, std::ref(robot_models[i]),
+                         std::ref(contact_estimators[i]), std::cref(measurements[i]));
+  }
+  for (auto& e : threads) {
+    e.join();
+  }
+  double max_prob_diff = 0;
+  for (int i=0; i<num_threads; ++i) {
+    ContactEstimator contact_estimator_ref(robot_model_ref, settings[i].contact_estimator_settings);
+    runContactEstimator(robot_model_ref, contact_estimator_ref, measurements[i]);
+    for (int j=0; j<robot_model_ref.numContacts(); ++j) {
+      max_prob_diff = std::max(max_prob_diff,
+                               std::abs(contact_estimators[i].getContactProbability()[j]
+                                         - contact_estimator_ref.getContactProbability()[j]));
+    }
+  }
+  cout << "Max difference of the contact probabilities: " << max_prob_diff << endl;
+
+  if (max_diff > 1.0e-12 || max_prob_diff > 1.0e-12) {
+    cout << "Concurrent updates differ from serial updates!" << endl;
+    return 1;
+  }
+  return 0;
+}
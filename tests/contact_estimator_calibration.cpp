@@ -0,0 +1,128 @@
+#include <iostream>
+#include <string>
+#include <chrono>
+#include <cmath>
+#include <algorithm>
+#include <Eigen/Core>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/contact_estimator_calibration.hpp"
+
+using namespace legged_state_estimator;
+
+// Evaluates a grid of the contact estimator parameters on a synthetic trotting
+// log, checks the metrics of one combination against LeggedStateEstimator, and
+// measures the computational time of the batch evaluation.
+
+const int NUM_SAMPLES = 4000;
+const int NUM_BETA0 = 40;
+const int NUM_BETA1 = 25;
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "../examples_python/a1_description/urdf/a1_friction.urdf";
+  const double time_step = 0.0025;
+  const auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, time_step);
+  RobotModel robot_model(settings.urdf_path, settings.imu_frame, settings.contact_frames);
+  const int nJ = robot_model.nJ();
+  const int num_contacts = robot_model.numContacts();
+
+  // Synthetic trotting log
+  std::srand(0);
+  Eigen::MatrixXd qJ(NUM_SAMPLES, nJ), dqJ(NUM_SAMPLES, nJ), tauJ(NUM_SAMPLES, nJ);
+  ContactEstimatorCalibration::ContactLabels contact_labels(NUM_SAMPLES, num_contacts);
+  Eigen::VectorXd qJ0(nJ);
+  for (int i=0; i<num_contacts; ++i) {
+    qJ0.segment<3>(3*i) << 0.0, 0.67, -1.3;
+  }
+  for (int k=0; k<NUM_SAMPLES; ++k) {
+    const double t = k * time_step;
+    for (int j=0; j<nJ; ++j) {
+      qJ(k, j) = qJ0(j) + 0.1 * std::sin(2.0*M_PI*t + j);
+      dqJ(k, j) = 0.2 * M_PI * std::cos(2.0*M_PI*t + j);
+    }
+    const Eigen::VectorXd qJ_k = qJ.row(k).transpose();
+    const Eigen::VectorXd dqJ_k = dqJ.row(k).transpose();
+    robot_model.updateLegKinematicsAndDynamics(qJ_k, dqJ_k);
+    for (int i=0; i<num_contacts; ++i) {
+      const bool in_contact = (std::sin(4.0*M_PI*t + ((i == 0 || i == 3) ? 0.0 : M_PI)) > 0.0);
+      contact_labels(k, i) = in_contact;
+      const Eigen::Vector3d f(0.0, 0.0, in_contact ? 40.0 : 0.0);
+      tauJ.row(k).segment<3>(3*i)
+          = (robot_model.getJointInverseDynamics().segment<3>(3*i)
+              - robot_model.getJointContactJacobian(i).block<3, 3>(0, 3*i).transpose() * f
+              + 0.5 * Eigen::Vector3d::Random()).transpose();
+    }
+  }
+
+  ContactEstimatorCalibration calibration(settings);
+  auto start_time = std::chrono::high_resolution_clock::now();
+  calibration.setLog(qJ, dqJ, tauJ, contact_labels);
+  auto end_time = std::chrono::high_resolution_clock::now();
+  std::cout << "Normal contact force estimates of " << NUM_SAMPLES << " samples: "
+            << std::chrono::duration_cast<std::chrono::microseconds>(end_time - start_time).count()
+            << " us" << std::endl;
+
+  // Metrics of the estimator settings from the estimator loop
+  bool success = true;
+  LeggedStateEstimator estimator(settings);
+  estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+  Eigen::MatrixXi true_positives = Eigen::MatrixXi::Zero(1, num_contacts);
+  Eigen::MatrixXi num_switches = Eigen::MatrixXi::Zero(1, num_contacts);
+  std::vector<bool> contact_prev(num_contacts, false);
+  for (int k=0; k<NUM_SAMPLES; ++k) {
+    estimator.update(Eigen::Vector3d::Zero(), Eigen::Vector3d(0, 0, 9.81),
+                     qJ.row(k).transpose(), dqJ.row(k).transpose(), tauJ.row(k).transpose());
+    const auto& contact_estimator = estimator.getContactEstimator();
+    for (int i=0; i<num_contacts; ++i) {
+      const bool contact = contact_estimator.getContactState()[i].second;
+      if (contact && contact_labels(k, i)) ++true_positives(0, i);
+      if (k > 0 && contact != contact_prev[i]) ++num_switches(0, i);
+      contact_prev[i] = contact;
+      if (std::abs(contact_estimator.getNormalContactForceEstimate()[i]
+                    - calibration.getNormalContactForceEstimate()(k, i)) > 1.0e-9) {
+        success = false;
+      }
+    }
+  }
+  const auto& cs = settings.contact_estimator_settings;
+  const auto metrics = calibration.evaluate(
+      Eigen::Map<const Eigen::MatrixXd>(cs.beta0.data(), 1, num_contacts),
+      Eigen::Map<const Eigen::MatrixXd>(cs.beta1.data(), 1, num_contacts),
+      Eigen::VectorXd::Constant(1, cs.contact_force_covariance_alpha),
+      Eigen::VectorXd::Constant(1, cs.contact_probability_threshold));
+  success = success && (metrics.true_positives == true_positives)
+                    && (metrics.num_switches == num_switches);
+  std::cout << "Estimator settings: accuracy [" << metrics.accuracy << "], switches ["
+            << metrics.num_switches << "]" << std::endl;
+
+  // Grid search
+  const int num_combinations = NUM_BETA0 * NUM_BETA1;
+  Eigen::MatrixXd beta0(num_combinations, num_contacts), beta1(num_combinations, num_contacts);
+  for (int a=0; a<NUM_BETA0; ++a) {
+    for (int b=0; b<NUM_BETA1; ++b) {
+      beta0.row(a*NUM_BETA1+b).setConstant(-40.0 + a);
+      beta1.row(a*NUM_BETA1+b).setConstant(0.1 + 0.1*b);
+    }
+  }
+  const Eigen::VectorXd alpha = Eigen::VectorXd::Constant(num_combinations, cs.contact_force_covariance_alpha);
+  const Eigen::VectorXd threshold = Eigen::VectorXd::Constant(num_combinations, 0.5);
+  for (const int num_threads : {1, 0}) {
+    start_time = std::chrono::high_resolution_clock::now();
+    const auto grid_metrics = calibration.evaluate(beta0, beta1, alpha, threshold, num_threads);
+    end_time = std::chrono::high_resolution_clock::now();
+    int best = 0;
+    grid_metrics.f1_score.rowwise().mean().maxCoeff(&best);
+    std::cout << "Grid of " << num_combinations << " combinations ("
+              << ((num_threads == 1) ? "1 thread" : "all threads") << "): "
+              << std::chrono::duration_cast<std::chrono::milliseconds>(end_time - start_time).count()
+              << " ms, best F1 score " << grid_metrics.f1_score.row(best).mean()
+              << " at beta0 = " << beta0(best, 0) << ", beta1 = " << beta1(best, 0) << std::endl;
+    success = success && (grid_metrics.f1_score.row(best).mean() > 0.9);
+  }
+
+  if (!success) {
+    std::cout << "Calibration metrics differ from the estimator!" << std::endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,136 @@
+#include <iostream>
+#include <vector>
+#include <map>
+#include <algorithm>
+#include <cstdlib>
+#include <cmath>
+#include <Eigen/Dense>
+#include "legged_state_estimator/inekf/inekf.hpp"
+
+using namespace std;
+using namespace legged_state_estimator;
+
+// The slot-based contact state must give the same estimates as marginalizing
+// out and re-augmenting the contact positions at every gait transition.
+
+struct Step {
+  Eigen::Matrix<double,6,1> imu;
+  vector<pair<int,bool>> contacts;
+  vectorKinematics kinematics;
+  vectorLandmarks landmarks;
+  vector<int> removed_landmarks;
+};
+
+
+vector<Step> generateSteps(const int num_steps, const bool with_landmarks) {
+  const double x[4] = {0.18, 0.18, -0.18, -0.18};
+  const double y[4] = {-0.13, 0.13, -0.13, 0.13};
+  vector<Step> steps;
+  for (int k=0; k<num_steps; ++k) {
+    Step step;
+    step.imu << 0.1*Eigen::Vector3d::Random(),
+                Eigen::Vector3d(0, 0, 9.81) + 0.5*Eigen::Vector3d::Random();
+    for (int i=0; i<4; ++i) {
+      // Trotting gait with random early touchdowns and late lift-offs
+      const int phase = (i == 0 || i == 3) ? 0 : 1;
+      const bool stance = ((k/20)%2 == phase) || (std::rand()%10 == 0);
+      step.contacts.push_back(pair<int,bool>(i, stance));
+      Eigen::Matrix4d pose = Eigen::Matrix4d::Identity();
+      pose.block<3,1>(0,3) = Eigen::Vector3d(x[i], y[i], -0.3) + 0.01*Eigen::Vector3d::Random();
+      step.kinematics.push_back(Kinematics(i, pose, 0.01*Eigen::Matrix<double,6,6>::Identity()));
+    }
+    if (with_landmarks && k%7 == 0) {
+      const int id = 10 + (k/7)%5;
+      step.landmarks.push_back(Landmark(id, Eigen::Vector3d::Random(), 0.01*Eigen::Matrix3d::Identity()));
+    }
+    if (with_landmarks && k%50 == 49) {
+      step.removed_landmarks.push_back(10 + (k/50)%5);
+    }
+    steps.push_back(step);
+  }
+  return steps;
+}
+
+
+template <typename Filter>
+void runFilter(Filter& filter, const vector<Step>& steps) {
+  for (const auto& e : steps) {
+    filter.Propagate(e.imu, 0.005);
+    filter.setContacts(e.contacts);
+    filter.CorrectKinematics(e.kinematics);
+    if (!e.landmarks.empty()) filter.CorrectLandmarks(e.landmarks);
+    if (!e.removed_landmarks.empty()) filter.RemoveLandmarks(e.removed_landmarks);
+  }
+}
+
+
+// Compares the base state, the biases, their covariances, and the estimated
+// contacts and landmarks (matched by their IDs).
+template <typename Filter>
+double stateDifference(const Filter& filter1, const Filter& filter2) {
+  const auto& s1 = filter1.getState();
+  const auto& s2 = filter2.getState();
+  const int n1 = s1.dimP() - s1.dimTheta();
+  const int n2 = s2.dimP() - s2.dimTheta();
+  double diff = 0;
+  diff = std::max(diff, (s1.getX().template topLeftCorner<3,5>() - s2.getX().template topLeftCorner<3,5>()).template lpNorm<Eigen::Infinity>());
+  diff = std::max(diff, (s1.getTheta() - s2.getTheta()).template lpNorm<Eigen::Infinity>());
+  diff = std::max(diff, (s1.getP().template topLeftCorner<9,9>() - s2.getP().template topLeftCorner<9,9>()).template lpNorm<Eigen::Infinity>());
+  diff = std::max(diff, (s1.getP().bottomRightCorner(6,6) - s2.getP().bottomRightCorner(6,6)).template lpNorm<Eigen::Infinity>());
+  diff = std::max(diff, (s1.getP().block(0,n1,9,6) - s2.getP().block(0,n2,9,6)).template lpNorm<Eigen::Infinity>());
+  const std::map<int,int>* maps1[2] = {&filter1.getEstimatedContactPositions(), &filter1.getEstimatedLandmarks()};
+  const std::map<int,int>* maps2[2] = {&filter2.getEstimatedContactPositions(), &filter2.getEstimatedLandmarks()};
+  for (int j=0; j<2; ++j) {
+    if (maps1[j]->size() != maps2[j]->size()) return 1.0e10;
+    for (const auto& e : *maps1[j]) {
+      const auto it = maps2[j]->find(e.first);
+      if (it == maps2[j]->end()) return 1.0e10;
+      diff = std::max(diff, (s1.getVector(e.second) - s2.getVector(it->second)).template lpNorm<Eigen::Infinity>());
+      diff = std::max(diff, (s1.getP().template block<3,3>(3*e.second-6,3*e.second-6)
+                              - s2.getP().template block<3,3>(3*it->second-6,3*it->second-6)).template lpNorm<Eigen::Infinity>());
+      diff = std::max(diff, (s1.getP().template block<9,3>(0,3*e.second-6)
+                              - s2.getP().template block<9,3>(0,3*it->second-6)).template lpNorm<Eigen::Infinity>());
+    }
+  }
+  return diff;
+}
+
+
+template <typename Filter>
+double compareSlotMode(const ErrorType error_type, const vector<Step>& steps) {
+  InEKFState initial_state;
+  initial_state.setVelocity(Eigen::Vector3d(0.3, 0, 0));
+  initial_state.setPosition(Eigen::Vector3d(0, 0, 0.3));
+  NoiseParams noise_params;
+  typename Filter::State state(initial_state.getX(), initial_state.getTheta(), initial_state.getP());
+  Filter filter(state, noise_params, error_type);
+  Filter slot_filter(state, noise_params, error_type);
+  slot_filter.setContactSlotMode(true);
+  runFilter(filter, steps);
+  runFilter(slot_filter, steps);
+  const double diff = stateDifference(filter, slot_filter);
+  // Disabling the slot mode removes the inactive slots
+  slot_filter.setContactSlotMode(false);
+  return std::max(diff, stateDifference(filter, slot_filter));
+}
+
+
+int main() {
+  std::srand(0);
+  const vector<Step> steps = generateSteps(500, false);
+  const vector<Step> steps_landmarks = generateSteps(500, true);
+  double max_diff = 0;
+  for (const auto error_type : {ErrorType::LeftInvariant, ErrorType::RightInvariant}) {
+    const double diff_fixed = compareSlotMode<InEKFTpl<4>>(error_type, steps);
+    const double diff_dynamic = compareSlotMode<InEKF>(error_type, steps_landmarks);
+    cout << ((error_type == ErrorType::LeftInvariant) ? "Left" : "Right")
+         << "-invariant error, difference with and without slots: "
+         << diff_fixed << " (4 contacts), " << diff_dynamic << " (4 contacts and landmarks)" << endl;
+    max_diff = std::max(max_diff, std::max(diff_fixed, diff_dynamic));
+  }
+  if (max_diff > 1.0e-8) {
+    cout << "Slot-based contact state differs from marginalization!" << endl;
+    return 1;
+  }
+  return 0;
+}
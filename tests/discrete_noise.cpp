@@ -0,0 +1,86 @@
+#include <iostream>
+#include <Eigen/Dense>
+#include <unsupported/Eigen/MatrixFunctions>
+#include "legged_state_estimator/inekf/inekf.hpp"
+
+using namespace std;
+using namespace legged_state_estimator;
+
+// The discretized noise Qd of a propagation from P = 0 must match the
+// integral of exp(A*s)*G*Qc*G^T*exp(A*s)^T over the time step, computed by
+// Simpson's rule, for the left- and right-invariant errors.
+
+const double TOLERANCE = 1.0e-6;
+
+
+int main() {
+  Eigen::MatrixXd X = Eigen::MatrixXd::Identity(5,5);
+  const Eigen::Matrix3d R = Eigen::AngleAxisd(0.7, Eigen::Vector3d(1,2,3).normalized()).toRotationMatrix();
+  const Eigen::Vector3d v(0.3, -0.2, 0.1), p(1.0, 2.0, 0.5);
+  X.block<3,3>(0,0) = R;
+  X.block<3,1>(0,3) = v;
+  X.block<3,1>(0,4) = p;
+  NoiseParams params;
+  params.setGyroscopeNoise(Eigen::Vector3d(0.1, 0.2, 0.3));
+  params.setAccelerometerNoise(Eigen::Vector3d(0.3, 0.1, 0.2));
+  const Eigen::Vector3d w(1.0, -2.0, 3.0), a(0.5, 1.0, 9.0);
+  const Eigen::Matrix3d I = Eigen::Matrix3d::Identity();
+  const double dt = 0.0025;
+
+  bool success = true;
+  for (int left_invariant=0; left_invariant<2; ++left_invariant) {
+    // The bias columns of A of the right-invariant error depend on the
+    // propagated state, so the bias noise is checked for the left-invariant
+    // error only.
+    params.setGyroscopeBiasNoise(left_invariant ? 0.05 : 0.0);
+    params.setAccelerometerBiasNoise(left_invariant ? 0.07 : 0.0);
+    InEKF filter(InEKFState(X, Eigen::VectorXd::Zero(6), Eigen::MatrixXd::Zero(15,15)), params,
+                 left_invariant ? ErrorType::LeftInvariant : ErrorType::RightInvariant);
+    filter.Propagate((Eigen::Matrix<double,6,1>() << w, a).finished(), dt);
+    const Eigen::MatrixXd Qd = filter.getState().getP();
+
+    // Continuous-time error dynamics and noise
+    Eigen::MatrixXd A = Eigen::MatrixXd::Zero(15,15);
+    Eigen::MatrixXd G = Eigen::MatrixXd::Identity(15,15);
+    Eigen::MatrixXd Qc = Eigen::MatrixXd::Zero(15,15);
+    Qc.block<3,3>(0,0) = params.getGyroscopeCov();
+    Qc.block<3,3>(3,3) = params.getAccelerometerCov();
+    Qc.block<3,3>(9,9) = params.getGyroscopeBiasCov();
+    Qc.block<3,3>(12,12) = params.getAccelerometerBiasCov();
+    A.block<3,3>(6,3) = I;
+    if (left_invariant) {
+      for (int i=0; i<3; ++i) {
+        A.block<3,3>(3*i,3*i) = -skew(w);
+      }
+      A.block<3,3>(3,0) = -skew(a);
+      A.block<3,3>(0,9) = -I;
+      A.block<3,3>(3,12) = -I;
+    }
+    else {
+      A.block<3,3>(3,0) = skew(Eigen::Vector3d(0, 0, -9.81));
+      G.block<3,3>(0,0) = R;
+      G.block<3,3>(3,0) = skew(v) * R;
+      G.block<3,3>(6,0) = skew(p) * R;
+      G.block<3,3>(3,3) = R;
+    }
+    const Eigen::MatrixXd GQG = G * Qc * G.transpose();
+    const int N = 200;
+    Eigen::MatrixXd Qd_ref = Eigen::MatrixXd::Zero(15,15);
+    for (int k=0; k<=N; ++k) {
+      const double weight = (k == 0 || k == N) ? 1.0 : ((k%2 == 1) ? 4.0 : 2.0);
+      const Eigen::MatrixXd Phi = (A * (dt*k/N)).exp();
+      Qd_ref += weight * Phi * GQG * Phi.transpose();
+    }
+    Qd_ref *= dt / (3*N);
+    const double error = (Qd - Qd_ref).norm() / Qd_ref.norm();
+    cout << (left_invariant ? "Left" : "Right") << "-invariant error, relative error of Qd: "
+         << error << endl;
+    success = success && (error < TOLERANCE);
+  }
+
+  if (!success) {
+    cout << "Discretized noise is wrong!" << endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,202 @@
+#include <iostream>
+#include <string>
+#include <vector>
+#include <thread>
+#include <atomic>
+#include <chrono>
+#include <algorithm>
+#include <numeric>
+#include <cstdlib>
+#include <cstring>
+#include <unistd.h>
+#include <Eigen/Core>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/estimate_publisher.hpp"
+
+using namespace legged_state_estimator;
+
+// Checks that the subscribers of EstimatePublisher never observe torn
+// snapshots while the publisher writes at full speed, that
+// LeggedStateEstimator publishes every update, and reports the latencies of
+// publishing and reading.
+
+const int NUM_PUBLISHED = 2000000;
+const int NUM_SAMPLES = 100000;
+const double TIME_STEP = 0.0025;
+
+
+// Every field of the snapshot k is k
+void fillSnapshot(const std::uint64_t k, EstimateSnapshot& snapshot) {
+  double* begin = &snapshot.time;
+  double* end = snapshot.imu_linear_acceleration_bias + 3;
+  std::fill(begin, end, static_cast<double>(k));
+  snapshot.num_contacts = EstimateSnapshot::kMaxContacts;
+  std::fill(snapshot.contact_state, snapshot.contact_state+EstimateSnapshot::kMaxContacts, k%2);
+  std::fill(snapshot.contact_probability, snapshot.contact_probability+EstimateSnapshot::kMaxContacts,
+            static_cast<double>(k));
+}
+
+
+bool isConsistent(const EstimateSnapshot& snapshot) {
+  const double k = snapshot.time;
+  const double* begin = &snapshot.time;
+  const double* end = snapshot.imu_linear_acceleration_bias + 3;
+  bool consistent = std::all_of(begin, end, [k](const double e) { return e == k; });
+  consistent = consistent && std::all_of(snapshot.contact_probability, snapshot.contact_probability+EstimateSnapshot::kMaxContacts,
+                                         [k](const double e) { return e == k; });
+  consistent = consistent && std::all_of(snapshot.contact_state, snapshot.contact_state+EstimateSnapshot::kMaxContacts,
+                                         [k](const std::uint8_t e) { return e == static_cast<std::uint64_t>(k)%2; });
+  // The publisher publishes the snapshot k as the (k+1)-th snapshot
+  return consistent && (snapshot.sequence_number == 0 || snapshot.sequence_number == static_cast<std::uint64_t>(k)+1);
+}
+
+
+void printLatency(const std::string& name, std::vector<double>& latency_ns) {
+  std::sort(latency_ns.begin(), latency_ns.end());
+  const int n = latency_ns.size();
+  std::cout << name << ": mean " << std::accumulate(latency_ns.begin(), latency_ns.end(), 0.0) / n
+            << " ns, p50 " << latency_ns[(n-1)/2] << " ns, p99 " << latency_ns[static_cast<int>(0.99*n)]
+            << " ns, max " << latency_ns.back() << " ns" << std::endl;
+}
+
+
+template <typename Function>
+std::vector<double> measureLatency(const Function& function) {
+  std::vector<double> latency_ns(NUM_SAMPLES);
+  for (int i=0; i<NUM_SAMPLES; ++i) {
+    const auto start_time = std::chrono::steady_clock::now();
+    function(i);
+    const auto end_time = std::chrono::steady_clock::now();
+    latency_ns[i] = std::chrono::duration_cast<std::chrono::nanoseconds>(end_time - start_time).count();
+  }
+  return latency_ns;
+}
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  const std::string name = "legged_state_estimator_test_" + std::to_string(::getpid());
+  bool success = true;
+
+  // A subscriber reads while the publisher writes at full speed
+  {
+    EstimatePublisher publisher(name);
+    EstimateSubscriber subscriber(name);
+    EstimateSnapshot snapshot;
+    subscriber.read(snapshot);
+    success = success && (snapshot.sequence_number == 0);
+    // A second publisher of the segment is rejected
+    bool thrown_second_publisher = false;
+    try {
+      EstimatePublisher second_publisher(name);
+    }
+    catch (const std::runtime_error& e) {
+      thrown_second_publisher = true;
+    }
+    std::cout << "Second publisher rejected: " << thrown_second_publisher << std::endl;
+    success = success && thrown_second_publisher;
+    std::atomic<bool> done(false);
+    long num_reads = 0, num_torn = 0, num_retries = 0, num_backwards = 0;
+    std::thread reader([&]() {
+      EstimateSnapshot read_snapshot;
+      std::uint64_t prev_sequence_number = 0;
+      while (!done.load(std::memory_order_relaxed)) {
+        if (!subscriber.tryRead(read_snapshot)) {
+          ++num_retries;
+          continue;
+        }
+        ++num_reads;
+        if (!isConsistent(read_snapshot)) ++num_torn;
+        if (read_snapshot.sequence_number < prev_sequence_number) ++num_backwards;
+        prev_sequence_number = read_snapshot.sequence_number;
+      }
+    });
+    EstimateSnapshot published_snapshot;
+    std::memset(&published_snapshot, 0, sizeof(EstimateSnapshot));
+    for (std::uint64_t k=0; k<NUM_PUBLISHED; ++k) {
+      fillSnapshot(k, published_snapshot);
+      publisher.publish(published_snapshot);
+    }
+    done = true;
+    reader.join();
+    subscriber.read(snapshot);
+    std::cout << "Concurrent reads: " << num_reads << ", torn: " << num_torn
+              << ", retries: " << num_retries << ", out of order: " << num_backwards << std::endl;
+    success = success && (num_reads > 0) && (num_torn == 0) && (num_backwards == 0)
+                      && (snapshot.sequence_number == NUM_PUBLISHED)
+                      && (subscriber.sequenceNumber() == NUM_PUBLISHED) && isConsistent(snapshot);
+
+    // Latencies without contention
+    auto publish_latency = measureLatency([&](const int i) { publisher.publish(published_snapshot); });
+    auto read_latency = measureLatency([&](const int i) { subscriber.read(snapshot); });
+    printLatency("publish", publish_latency);
+    printLatency("read", read_latency);
+  }
+
+  // The segment is unlinked with the publisher
+  bool thrown = false;
+  try {
+    EstimateSubscriber subscriber(name);
+  }
+  catch (const std::runtime_error& e) {
+    thrown = true;
+  }
+  success = success && thrown;
+
+  // LeggedStateEstimator publishes every update
+  {
+    auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, TIME_STEP);
+    settings.estimate_publisher_name = name;
+    LeggedStateEstimator estimator(settings);
+    estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+    EstimateSubscriber subscriber(name);
+    const int nJ = estimator.getRobotModel().nJ();
+    Eigen::VectorXd qJ0(nJ);
+    for (int i=0; i<nJ/3; ++i) {
+      qJ0.segment<3>(3*i) << 0.0, 0.67, -1.3;
+    }
+    std::srand(0);
+    double diff = 0;
+    EstimateSnapshot snapshot;
+    const int num_updates = 1000;
+    for (int k=0; k<num_updates; ++k) {
+      estimator.update(0.01*Eigen::Vector3d::Random(),
+                       0.1*Eigen::Vector3d::Random() + Eigen::Vector3d(0, 0, 9.81),
+                       qJ0 + 0.001*Eigen::VectorXd::Random(nJ), 0.1*Eigen::VectorXd::Random(nJ),
+                       Eigen::VectorXd::Zero(nJ));
+      subscriber.read(snapshot);
+      diff = std::max(diff, (Eigen::Map<const Eigen::Vector3d>(snapshot.base_position)
+                              - estimator.getBasePositionEstimate()).lpNorm<Eigen::Infinity>());
+      diff = std::max(diff, (Eigen::Map<const Eigen::Vector4d>(snapshot.base_quaternion)
+                              - estimator.getBaseQuaternionEstimate()).lpNorm<Eigen::Infinity>());
+      diff = std::max(diff, (Eigen::Map<const Eigen::Vector3d>(snapshot.base_linear_velocity_local)
+                              - estimator.getBaseLinearVelocityEstimateLocal()).lpNorm<Eigen::Infinity>());
+      diff = std::max(diff, (Eigen::Map<const Eigen::Vector3d>(snapshot.imu_gyro_bias)
+                              - estimator.getIMUGyroBiasEstimate()).lpNorm<Eigen::Infinity>());
+      for (int i=0; i<snapshot.num_contacts; ++i) {
+        diff = std::max(diff, std::abs(snapshot.contact_probability[i]
+                                        - estimator.getContactEstimator().getContactProbability()[i]));
+      }
+      diff = std::max(diff, std::abs(snapshot.time - estimator.getEstimateTime()));
+    }
+    std::cout << "LeggedStateEstimator: published " << snapshot.sequence_number << " updates, "
+              << "difference from the estimates: " << diff << std::endl;
+    success = success && (snapshot.sequence_number == num_updates) && (diff == 0.0)
+                      && (snapshot.num_contacts == 4) && (std::abs(snapshot.time - num_updates*TIME_STEP) < 1.0e-9);
+
+    // A copy of the estimator does not publish
+    LeggedStateEstimator estimator_copy(estimator);
+    estimator_copy.update(Eigen::Vector3d::Zero(), Eigen::Vector3d(0, 0, 9.81), qJ0,
+                          Eigen::VectorXd::Zero(nJ), Eigen::VectorXd::Zero(nJ));
+    subscriber.read(snapshot);
+    std::cout << "Copy of the estimator publishes: " << (snapshot.sequence_number != num_updates) << std::endl;
+    success = success && (snapshot.sequence_number == num_updates)
+                      && estimator_copy.getSettings().estimate_publisher_name.empty();
+  }
+
+  if (!success) {
+    std::cout << "Estimate publisher is wrong!" << std::endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,200 @@
+#include <iostream>
+#include <fstream>
+#include <string>
+#include <cstdlib>
+#include <vector>
+#include <algorithm>
+#include <boost/date_time/posix_time/posix_time.hpp>
+#include <Eigen/Dense>
+#include <Eigen/StdVector>
+#include <boost/algorithm/string.hpp>
+#include "legged_state_estimator/inekf/inekf.hpp"
+
+#define DT_MIN 1e-6
+#define DT_MAX 1
+
+using namespace std;
+using namespace legged_state_estimator;
+using namespace boost::posix_time;
+
+// Compares the latency of the dynamic-size InEKF and the fixed-capacity
+// InEKFTpl<4> used by LeggedStateEstimator on the data of propagation_speed
+// and correction_speed. Both filters must give the same estimates. The
+// filters are timed alternately and the fastest of NUM_REPEATS runs is
+// reported, so that the order of the runs does not bias the comparison.
+
+typedef vector<pair<double,Eigen::Matrix<double,6,1> > > vectorPairIntVector6d;
+
+const int NUM_REPEATS = 5;
+
+
+void readData(const std::string& file_name, const int max_landmark_id,
+              vectorPairIntVector6d& imu, vectorLandmarks& landmarks) {
+  ifstream infile(file_name);
+  string line;
+  while (getline(infile, line)) {
+    vector<string> measurement;
+    boost::split(measurement, line, boost::is_any_of(" "));
+    if (measurement[0].compare("IMU")==0) {
+      Eigen::Matrix<double,6,1> m;
+      for (int i=0; i<6; ++i) {
+        m(i) = atof(measurement[i+2].c_str());
+      }
+      imu.push_back(make_pair(atof(measurement[1].c_str()), m));
+    }
+    else if (measurement[0].compare("LANDMARK")==0) {
+      for (int i=2; i+3<measurement.size(); i+=4) {
+        const int id = atoi(measurement[i].c_str());
+        if (id > max_landmark_id) continue;
+        const Eigen::Vector3d p_bl(atof(measurement[i+1].c_str()),
+                                   atof(measurement[i+2].c_str()),
+                                   atof(measurement[i+3].c_str()));
+        landmarks.push_back(Landmark(id, p_bl, 0.01*Eigen::Matrix3d::Identity()));
+      }
+    }
+  }
+}
+
+
+vectorKinematics quadrupedKinematics() {
+  vectorKinematics kinematics;
+  const double x[4] = {0.18, 0.18, -0.18, -0.18};
+  const double y[4] = {-0.13, 0.13, -0.13, 0.13};
+  for (int i=0; i<4; ++i) {
+    kinematics.push_back(Kinematics(i, Eigen::Matrix3d::Identity(),
+                                    Eigen::Vector3d(x[i], y[i], -0.3),
+                                    0.01*Eigen::Matrix<double,6,6>::Identity()));
+  }
+  return kinematics;
+}
+
+
+// Returns the average duration of Propagate() in microseconds
+template <typename Filter>
+double propagate(Filter& filter, const vectorPairIntVector6d& imu) {
+  ptime start = microsec_clock::local_time();
+  for (int i=1; i<imu.size(); ++i) {
+    const double dt = imu[i].first - imu[i-1].first;
+    if (dt > DT_MIN && dt < DT_MAX) {
+      filter.Propagate(imu[i-1].second, dt);
+    }
+  }
+  ptime end = microsec_clock::local_time();
+  return (end - start).total_microseconds() / double(imu.size());
+}
+
+
+// Returns the average duration of CorrectKinematics() in microseconds
+template <typename Filter>
+double correctKinematics(Filter& filter, const vectorKinematics& kinematics,
+                         const int num_corrections) {
+  ptime start = microsec_clock::local_time();
+  for (int i=0; i<num_corrections; ++i) {
+    filter.CorrectKinematics(kinematics);
+  }
+  ptime end = microsec_clock::local_time();
+  return (end - start).total_microseconds() / double(num_corrections);
+}
+
+
+// Returns the average duration of CorrectLandmarks() in microseconds
+template <typename Filter>
+double correctLandmarks(Filter& filter, const vectorLandmarks& measured_landmarks) {
+  ptime start = microsec_clock::local_time();
+  for (const auto& e : measured_landmarks) {
+    filter.CorrectLandmarks(vectorLandmarks(1, e));
+  }
+  ptime end = microsec_clock::local_time();
+  return (end - start).total_microseconds() / double(measured_landmarks.size());
+}
+
+
+template <typename Filter1, typename Filter2>
+double stateDifference(const Filter1& filter1, const Filter2& filter2) {
+  const Eigen::MatrixXd X1 = filter1.getState().getX();
+  const Eigen::MatrixXd X2 = filter2.getState().getX();
+  if (X1.rows() != X2.rows()) return 1.0e10;
+  return (X1 - X2).lpNorm<Eigen::Infinity>() / std::max(1.0, X1.lpNorm<Eigen::Infinity>());
+}
+
+
+void printResult(const std::string& name, const double dynamic_time,
+                 const double fixed_time) {
+  cout << name << ": dynamic " << dynamic_time << " us, fixed " << fixed_time
+       << " us (x" << dynamic_time / fixed_time << ")" << endl;
+}
+
+
+int main() {
+  vectorPairIntVector6d propagation_imu, correction_imu;
+  vectorLandmarks unused, landmarks;
+  readData("../data/propagation_speed_test_data.txt", 3, propagation_imu, unused);
+  readData("../data/correction_speed_test_data.txt", 3, correction_imu, landmarks);
+  if (propagation_imu.empty() || correction_imu.empty() || landmarks.empty()) {
+    cout << "Failed to read the test data in ../data" << endl;
+    return 1;
+  }
+  const vectorKinematics kinematics = quadrupedKinematics();
+  vector<pair<int,bool>> contacts;
+  for (const auto& e : kinematics) {
+    contacts.push_back(pair<int,bool>(e.id, true));
+  }
+
+  // Propagation and kinematics correction with four contacts in the state
+  InEKF dynamic_filter;
+  InEKFTpl<4> fixed_filter;
+  dynamic_filter.setContacts(contacts);
+  fixed_filter.setContacts(contacts);
+  dynamic_filter.CorrectKinematics(kinematics);
+  fixed_filter.CorrectKinematics(kinematics);
+  const int num_corrections = 2000;
+  double dynamic_propagation = 1.0e10, fixed_propagation = 1.0e10;
+  double dynamic_kinematics = 1.0e10, fixed_kinematics = 1.0e10;
+  for (int i=0; i<NUM_REPEATS; ++i) {
+    dynamic_propagation = std::min(dynamic_propagation, propagate(dynamic_filter, propagation_imu));
+    fixed_propagation = std::min(fixed_propagation, propagate(fixed_filter, propagation_imu));
+    dynamic_kinematics = std::min(dynamic_kinematics, correctKinematics(dynamic_filter, kinematics, num_corrections));
+    fixed_kinematics = std::min(fixed_kinematics, correctKinematics(fixed_filter, kinematics, num_corrections));
+  }
+  const double diff_contacts = stateDifference(dynamic_filter, fixed_filter);
+
+  // Landmark correction of correction_speed with four landmarks in the state
+  InEKF dynamic_landmark_filter;
+  InEKFTpl<4> fixed_landmark_filter;
+  propagate(dynamic_landmark_filter, correction_imu);
+  propagate(fixed_landmark_filter, correction_imu);
+  double dynamic_landmarks = 1.0e10, fixed_landmarks = 1.0e10;
+  for (int i=0; i<NUM_REPEATS; ++i) {
+    dynamic_landmarks = std::min(dynamic_landmarks, correctLandmarks(dynamic_landmark_filter, landmarks));
+    fixed_landmarks = std::min(fixed_landmarks, correctLandmarks(fixed_landmark_filter, landmarks));
+  }
+  const double diff_landmarks = stateDifference(dynamic_landmark_filter, fixed_landmark_filter);
+
+  cout << "Fastest average durations of " << NUM_REPEATS << " runs (dimP = " << fixed_filter.getState().dimP() << ")" << endl;
+  printResult("Propagate", dynamic_propagation, fixed_propagation);
+  printResult("CorrectKinematics", dynamic_kinematics, fixed_kinematics);
+  printResult("CorrectLandmarks", dynamic_landmarks, fixed_landmarks);
+  cout << "Relative difference of the states: " << diff_contacts << ", "
+       << diff_landmarks << endl;
+
+  // A fifth contact exceeds the capacity of InEKFTpl<4> and is dropped
+  vectorKinematics five_kinematics = kinematics;
+  five_kinematics.push_back(Kinematics(4, kinematics[0].pose, kinematics[0].covariance));
+  vector<pair<int,bool>> five_contacts = contacts;
+  five_contacts.push_back(pair<int,bool>(4, true));
+  fixed_filter.setContacts(five_contacts);
+  fixed_filter.CorrectKinematics(five_kinematics);
+  cout << "Dropped augmentations: " << fixed_filter.getNumDroppedAugmentations()
+       << ", dropped measurements: " << fixed_filter.getNumDroppedMeasurements() << endl;
+  if (fixed_filter.getNumDroppedAugmentations() != 1 
+      || fixed_filter.getEstimatedContactPositions().size() != 4) {
+    cout << "Fixed-size InEKF does not report the dropped augmentation!" << endl;
+    return 1;
+  }
+
+  if (diff_contacts > 1.0e-8 || diff_landmarks > 1.0e-8) {
+    cout << "Fixed-size InEKF differs from dynamic-size InEKF!" << endl;
+    return 1;
+  }
+  return 0;
+}
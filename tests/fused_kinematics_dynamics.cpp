@@ -0,0 +1,107 @@
+#include <iostream>
+#include <string>
+#include <chrono>
+#include <algorithm>
+#include <Eigen/Core>
+#include <Eigen/Geometry>
+#include "legged_state_estimator/robot_model.hpp"
+
+using namespace legged_state_estimator;
+
+// Compares the fused kinematics and dynamics update of RobotModel with the 
+// separate kinematics and dynamics updates and measures the computational 
+// time of each stage.
+
+const int NUM_SAMPLES = 1000;
+
+
+double modelDifference(const RobotModel& model1, const RobotModel& model2) {
+  double diff = (model1.getBasePosition() - model2.getBasePosition()).lpNorm<Eigen::Infinity>();
+  diff = std::max(diff, (model1.getBaseRotation() - model2.getBaseRotation()).lpNorm<Eigen::Infinity>());
+  for (int i=0; i<model1.numContacts(); ++i) {
+    diff = std::max(diff, (model1.getContactPosition(i) - model2.getContactPosition(i)).lpNorm<Eigen::Infinity>());
+    diff = std::max(diff, (model1.getContactRotation(i) - model2.getContactRotation(i)).lpNorm<Eigen::Infinity>());
+    diff = std::max(diff, (model1.getContactJacobian(i) - model2.getContactJacobian(i)).lpNorm<Eigen::Infinity>());
+  }
+  diff = std::max(diff, (model1.getInverseDynamics() - model2.getInverseDynamics()).lpNorm<Eigen::Infinity>());
+  return diff;
+}
+
+
+double elapsedTime(const std::chrono::high_resolution_clock::time_point& start_time) {
+  const auto end_time = std::chrono::high_resolution_clock::now();
+  return std::chrono::duration_cast<std::chrono::nanoseconds>(end_time - start_time).count();
+}
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  const std::vector<std::string> contact_frames = {"FL_foot", "FR_foot", "RL_foot", "RR_foot"};
+  RobotModel separate_model(urdf_path, "imu_link", contact_frames);
+  RobotModel fused_model(separate_model);
+  const int nJ = separate_model.nJ();
+
+  std::srand(0);
+  double max_diff = 0;
+  for (const bool dynamic : {false, true}) {
+    double kinematics_time = 0;
+    double dynamics_time = 0;
+    double fused_time = 0;
+    double cached_time = 0;
+    for (int k=0; k<NUM_SAMPLES; ++k) {
+      const Eigen::Vector3d base_pos = Eigen::Vector3d::Random();
+      const Eigen::Vector4d base_quat = Eigen::Quaterniond::UnitRandom().coeffs();
+      const Eigen::Vector3d base_linear_vel = Eigen::Vector3d::Random();
+      const Eigen::Vector3d base_angular_vel = Eigen::Vector3d::Random();
+      const Eigen::Vector3d base_linear_acc = Eigen::Vector3d::Random();
+      const Eigen::Vector3d base_angular_acc = Eigen::Vector3d::Random();
+      const Eigen::VectorXd qJ = Eigen::VectorXd::Random(nJ);
+      const Eigen::VectorXd dqJ = Eigen::VectorXd::Random(nJ);
+      const Eigen::VectorXd ddqJ = Eigen::VectorXd::Random(nJ);
+      // Separate kinematics and dynamics
+      auto start_time = std::chrono::high_resolution_clock::now();
+      separate_model.updateLegKinematics(qJ);
+      kinematics_time += elapsedTime(start_time);
+      start_time = std::chrono::high_resolution_clock::now();
+      if (dynamic) {
+        separate_model.updateDynamics(base_pos, base_quat, base_linear_vel, base_angular_vel,
+                                      base_linear_acc, base_angular_acc, qJ, dqJ, ddqJ);
+      }
+      else {
+        separate_model.updateLegDynamics(qJ, dqJ);
+      }
+      dynamics_time += elapsedTime(start_time);
+      // Fused kinematics and dynamics
+      start_time = std::chrono::high_resolution_clock::now();
+      if (dynamic) {
+        fused_model.updateLegKinematicsAndDynamics(base_quat, base_linear_vel, base_angular_vel,
+                                                   base_linear_acc, base_angular_acc, qJ, dqJ, ddqJ);
+      }
+      else {
+        fused_model.updateLegKinematicsAndDynamics(qJ, dqJ);
+      }
+      fused_time += elapsedTime(start_time);
+      // Same inputs as the previous update
+      start_time = std::chrono::high_resolution_clock::now();
+      if (dynamic) {
+        fused_model.updateLegKinematicsAndDynamics(base_quat, base_linear_vel, base_angular_vel,
+                                                   base_linear_acc, base_angular_acc, qJ, dqJ, ddqJ);
+      }
+      else {
+        fused_model.updateLegKinematicsAndDynamics(qJ, dqJ);
+      }
+      cached_time += elapsedTime(start_time);
+      max_diff = std::max(max_diff, modelDifference(separate_model, fused_model));
+    }
+    std::cout << (dynamic ? "Inverse dynamics" : "Nonlinear effects")
+              << ": kinematics " << kinematics_time/NUM_SAMPLES << " ns + dynamics " 
+              << dynamics_time/NUM_SAMPLES << " ns, fused " << fused_time/NUM_SAMPLES 
+              << " ns, unchanged inputs " << cached_time/NUM_SAMPLES << " ns" << std::endl;
+  }
+  std::cout << "Difference between the separate and fused updates: " << max_diff << std::endl;
+  if (max_diff > 1.0e-10) {
+    std::cout << "Fused update differs from the separate updates!" << std::endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,104 @@
+#include <iostream>
+#include <chrono>
+#include <algorithm>
+#include <Eigen/Dense>
+#include "legged_state_estimator/inekf/inekf.hpp"
+
+using namespace std;
+using namespace legged_state_estimator;
+
+// Streams new landmarks into the filter (large_state_speed-style workload in
+// which most landmarks are observed only once) and measures the per-frame
+// latency with and without the landmark budget.
+
+const int NUM_FRAMES = 30;
+const int NUM_NEW_LANDMARKS = 6;
+const int NUM_REOBSERVED_LANDMARKS = 3;
+const int NUM_IMU = 30;
+
+
+// Returns false if the landmark budget is violated
+bool runFrames(InEKF& filter, const string& name) {
+  bool success = true;
+  double max_time = 0;
+  double total_time = 0;
+  const Eigen::Matrix3d cov = 0.01*Eigen::Matrix3d::Identity();
+  for (int k=0; k<NUM_FRAMES; ++k) {
+    vectorLandmarks measured_landmarks;
+    // Re-observe some of the landmarks of the previous frame
+    for (int i=0; i<NUM_REOBSERVED_LANDMARKS && k>0; ++i) {
+      const int id = (k-1)*NUM_NEW_LANDMARKS + i;
+      measured_landmarks.push_back(Landmark(id, Eigen::Vector3d(id%7, id%5, 1), cov));
+    }
+    for (int i=0; i<NUM_NEW_LANDMARKS; ++i) {
+      const int id = k*NUM_NEW_LANDMARKS + i;
+      measured_landmarks.push_back(Landmark(id, Eigen::Vector3d(id%7, id%5, 1), cov));
+    }
+    const auto start_time = chrono::high_resolution_clock::now();
+    filter.CorrectLandmarks(measured_landmarks);
+    Eigen::Matrix<double,6,1> imu;
+    imu << 0.1, 0.2, 0.3, 0, 0, 9.81;
+    for (int i=0; i<NUM_IMU; ++i) {
+      filter.Propagate(imu, 0.001);
+    }
+    const auto end_time = chrono::high_resolution_clock::now();
+    const double time = chrono::duration_cast<chrono::microseconds>(end_time - start_time).count();
+    max_time = std::max(max_time, time);
+    total_time += time;
+    const int budget = filter.getLandmarkBudget();
+    if (budget >= 0) {
+      const int dimX = filter.getState().dimX();
+      if (filter.getEstimatedLandmarks().size() > budget || dimX != 5 + filter.getEstimatedLandmarks().size()) {
+        success = false;
+      }
+      // The re-observed landmarks must remain in the state
+      for (int i=0; i<NUM_REOBSERVED_LANDMARKS && k>0; ++i) {
+        const int id = (k-1)*NUM_NEW_LANDMARKS + i;
+        if (filter.getEstimatedLandmarks().count(id) == 0) success = false;
+      }
+    }
+  }
+  cout << name << ": " << filter.getEstimatedLandmarks().size() << " estimated landmarks, "
+       << filter.getPriorLandmarks().size() << " prior landmarks, average frame time "
+       << total_time/NUM_FRAMES << " us, max frame time " << max_time << " us" << endl;
+  return success;
+}
+
+
+int main() {
+  bool success = true;
+  InEKF filter;
+  success = success && runFrames(filter, "Unlimited");
+
+  InEKF filter_lro;
+  filter_lro.setLandmarkBudget(30, LandmarkEvictionPolicy::LeastRecentlyObserved);
+  success = success && runFrames(filter_lro, "Budget 30 (least recently observed)");
+  // All the landmarks are kept either in the state or as priors
+  success = success && (filter_lro.getEstimatedLandmarks().size() + filter_lro.getPriorLandmarks().size()
+                          == NUM_FRAMES*NUM_NEW_LANDMARKS);
+
+  InEKF filter_info;
+  filter_info.setLandmarkBudget(30, LandmarkEvictionPolicy::LowestInformation, false);
+  success = success && runFrames(filter_info, "Budget 30 (lowest information)");
+  success = success && filter_info.getPriorLandmarks().empty();
+
+  // New landmarks beyond a budget that cannot be freed by the eviction are
+  // dropped and counted
+  InEKF filter_small;
+  filter_small.setLandmarkBudget(2);
+  vectorLandmarks new_landmarks;
+  for (int i=0; i<5; ++i) {
+    new_landmarks.push_back(Landmark(i, Eigen::Vector3d(i, 1, 1), 0.01*Eigen::Matrix3d::Identity()));
+  }
+  filter_small.CorrectLandmarks(new_landmarks);
+  cout << "Budget 2: " << filter_small.getEstimatedLandmarks().size() << " estimated landmarks, "
+       << filter_small.getNumDroppedLandmarks() << " dropped landmarks" << endl;
+  success = success && (filter_small.getEstimatedLandmarks().size() == 2)
+                    && (filter_small.getNumDroppedLandmarks() == 3);
+
+  if (!success) {
+    cout << "Landmark budget is violated!" << endl;
+    return 1;
+  }
+  return 0;
+}
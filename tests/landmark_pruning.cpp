@@ -0,0 +1,147 @@
+#include <iostream>
+#include <chrono>
+#include <vector>
+#include <map>
+#include <algorithm>
+#include <Eigen/Dense>
+#include "legged_state_estimator/inekf/inekf.hpp"
+
+using namespace std;
+using namespace legged_state_estimator;
+
+// Prunes landmarks and contacts in bulk and checks that the pruned state is
+// the marginal of the original state, i.e., that the remaining mean and
+// covariance blocks are unchanged.
+
+const int NUM_LANDMARKS = 200;
+const int NUM_CONTACTS = 4;
+
+
+InEKF createFilter() {
+  InEKF filter;
+  vector<pair<int,bool>> contacts;
+  vectorKinematics kinematics;
+  for (int i=0; i<NUM_CONTACTS; ++i) {
+    contacts.push_back(pair<int,bool>(i, true));
+    Eigen::Matrix4d pose = Eigen::Matrix4d::Identity();
+    pose.block<3,1>(0,3) = Eigen::Vector3d::Random();
+    kinematics.push_back(Kinematics(i, pose, 0.01*Eigen::Matrix<double,6,6>::Identity()));
+  }
+  filter.setContacts(contacts);
+  filter.CorrectKinematics(kinematics);
+  vectorLandmarks landmarks;
+  for (int i=0; i<NUM_LANDMARKS; ++i) {
+    landmarks.push_back(Landmark(100+i, Eigen::Vector3d::Random(), 0.01*Eigen::Matrix3d::Identity()));
+  }
+  filter.CorrectLandmarks(landmarks);
+  Eigen::Matrix<double,6,1> imu;
+  imu << 0.1, 0.2, 0.3, 0, 0, 9.81;
+  filter.Propagate(imu, 0.01);
+  filter.CorrectLandmarks(landmarks);
+  return filter;
+}
+
+
+// Returns the maximum difference of the remaining blocks of the pruned filter
+// from the ones of the original filter
+double marginalDifference(const InEKF& original, const InEKF& pruned) {
+  const auto& P0 = original.getState().getP();
+  const auto& P1 = pruned.getState().getP();
+  const int dimTheta = original.getState().dimTheta();
+  // Index of each remaining contact or landmark in the original and pruned states
+  vector<pair<int,int>> indices;
+  for (int i=0; i<5; ++i) {
+    indices.push_back(pair<int,int>(i, i));
+  }
+  const std::map<int,int>* maps0[2] = {&original.getEstimatedContactPositions(), &original.getEstimatedLandmarks()};
+  const std::map<int,int>* maps1[2] = {&pruned.getEstimatedContactPositions(), &pruned.getEstimatedLandmarks()};
+  for (int j=0; j<2; ++j) {
+    for (const auto& e : *maps1[j]) {
+      indices.push_back(pair<int,int>(maps0[j]->find(e.first)->second, e.second));
+    }
+  }
+  if (indices.size() != pruned.getState().dimX()) return 1.0e10;
+  double diff = 0;
+  for (const auto& e : indices) {
+    diff = std::max(diff, (original.getState().getX().col(e.first).head<3>()
+                            - pruned.getState().getX().col(e.second).head<3>()).lpNorm<Eigen::Infinity>());
+    // Blocks of P (the indices 0, 1, 2 of X share the rotation block of P)
+    if (e.first < 3) continue;
+    const int i0 = 3*e.first-6;
+    const int i1 = 3*e.second-6;
+    for (const auto& f : indices) {
+      if (f.first < 3 && f.first != 0) continue;
+      const int j0 = (f.first == 0) ? 0 : 3*f.first-6;
+      const int j1 = (f.second == 0) ? 0 : 3*f.second-6;
+      diff = std::max(diff, (P0.block<3,3>(i0,j0) - P1.block<3,3>(i1,j1)).lpNorm<Eigen::Infinity>());
+    }
+    diff = std::max(diff, (P0.block(i0,P0.cols()-dimTheta,3,dimTheta)
+                            - P1.block(i1,P1.cols()-dimTheta,3,dimTheta)).lpNorm<Eigen::Infinity>());
+  }
+  diff = std::max(diff, (P0.topLeftCorner<3,3>() - P1.topLeftCorner<3,3>()).lpNorm<Eigen::Infinity>());
+  diff = std::max(diff, (P0.bottomRightCorner(dimTheta,dimTheta)
+                          - P1.bottomRightCorner(dimTheta,dimTheta)).lpNorm<Eigen::Infinity>());
+  return diff;
+}
+
+
+int main() {
+  std::srand(0);
+  const InEKF filter = createFilter();
+  double max_diff = 0;
+
+  // Remove every other landmark
+  vector<int> remove_ids;
+  for (int i=0; i<NUM_LANDMARKS; i+=2) {
+    remove_ids.push_back(100+i);
+  }
+  InEKF filter_remove = filter;
+  auto start_time = chrono::high_resolution_clock::now();
+  filter_remove.RemoveLandmarks(remove_ids);
+  auto end_time = chrono::high_resolution_clock::now();
+  cout << "RemoveLandmarks (" << remove_ids.size() << " of " << NUM_LANDMARKS << " landmarks): "
+       << chrono::duration_cast<chrono::microseconds>(end_time - start_time).count() << " us" << endl;
+  max_diff = std::max(max_diff, marginalDifference(filter, filter_remove));
+  if (filter_remove.getEstimatedLandmarks().size() != NUM_LANDMARKS-remove_ids.size()) max_diff = 1.0e10;
+
+  // Keep the last 10 landmarks
+  vector<int> keep_ids;
+  for (int i=NUM_LANDMARKS-10; i<NUM_LANDMARKS; ++i) {
+    keep_ids.push_back(100+i);
+  }
+  InEKF filter_keep = filter;
+  start_time = chrono::high_resolution_clock::now();
+  filter_keep.KeepLandmarks(keep_ids);
+  end_time = chrono::high_resolution_clock::now();
+  cout << "KeepLandmarks (" << keep_ids.size() << " of " << NUM_LANDMARKS << " landmarks): "
+       << chrono::duration_cast<chrono::microseconds>(end_time - start_time).count() << " us" << endl;
+  max_diff = std::max(max_diff, marginalDifference(filter, filter_keep));
+  if (filter_keep.getEstimatedLandmarks().size() != keep_ids.size()) max_diff = 1.0e10;
+
+  // Lift off two legs (the contact positions are removed at once)
+  InEKF filter_contacts = filter_keep;
+  vector<pair<int,bool>> contacts;
+  vectorKinematics kinematics;
+  for (int i=0; i<NUM_CONTACTS; ++i) {
+    contacts.push_back(pair<int,bool>(i, i%2 == 0));
+    kinematics.push_back(Kinematics(i, Eigen::Matrix4d::Identity(), 0.01*Eigen::Matrix<double,6,6>::Identity()));
+  }
+  filter_contacts.setContacts(contacts);
+  InEKF filter_corrected = filter_contacts;
+  filter_contacts.CorrectKinematics(kinematics);
+  // The remaining contacts are corrected before the removal
+  vectorKinematics stance_kinematics;
+  for (const auto& e : kinematics) {
+    if (e.id%2 == 0) stance_kinematics.push_back(e);
+  }
+  filter_corrected.CorrectKinematics(stance_kinematics);
+  max_diff = std::max(max_diff, marginalDifference(filter_corrected, filter_contacts));
+  if (filter_contacts.getEstimatedContactPositions().size() != NUM_CONTACTS/2) max_diff = 1.0e10;
+
+  cout << "Difference from the marginal state: " << max_diff << endl;
+  if (max_diff > 1.0e-12) {
+    cout << "Pruned state differs from the marginal state!" << endl;
+    return 1;
+  }
+  return 0;
+}
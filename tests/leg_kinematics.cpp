@@ -0,0 +1,63 @@
+#include <iostream>
+#include <string>
+#include <chrono>
+#include <algorithm>
+#include <Eigen/Core>
+#include "legged_state_estimator/robot_model.hpp"
+
+using namespace legged_state_estimator;
+
+// Compares the closed-form leg kinematics (KinematicsBackend::LegChain) with
+// the kinematics of the full model computed by Pinocchio and measures the
+// computational time of both backends.
+
+const int NUM_SAMPLES = 1000;
+
+
+double kinematicsDifference(const RobotModel& model1, const RobotModel& model2) {
+  double diff = (model1.getBasePosition() - model2.getBasePosition()).lpNorm<Eigen::Infinity>();
+  diff = std::max(diff, (model1.getBaseRotation() - model2.getBaseRotation()).lpNorm<Eigen::Infinity>());
+  for (int i=0; i<model1.numContacts(); ++i) {
+    diff = std::max(diff, (model1.getContactPosition(i) - model2.getContactPosition(i)).lpNorm<Eigen::Infinity>());
+    diff = std::max(diff, (model1.getContactRotation(i) - model2.getContactRotation(i)).lpNorm<Eigen::Infinity>());
+    diff = std::max(diff, (model1.getContactJacobian(i) - model2.getContactJacobian(i)).lpNorm<Eigen::Infinity>());
+  }
+  return diff;
+}
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  const std::vector<std::string> contact_frames = {"FL_foot", "FR_foot", "RL_foot", "RR_foot"};
+  RobotModel pinocchio_model(urdf_path, "imu_link", contact_frames);
+  RobotModel leg_chain_model(pinocchio_model);
+  leg_chain_model.setKinematicsBackend(KinematicsBackend::LegChain);
+
+  std::srand(0);
+  double max_diff = 0;
+  for (const auto rf : {pinocchio::LOCAL_WORLD_ALIGNED, pinocchio::LOCAL}) {
+    double pinocchio_time = 0;
+    double leg_chain_time = 0;
+    for (int k=0; k<NUM_SAMPLES; ++k) {
+      const Eigen::VectorXd qJ = Eigen::VectorXd::Random(pinocchio_model.nJ());
+      auto start_time = std::chrono::high_resolution_clock::now();
+      pinocchio_model.updateLegKinematics(qJ, rf);
+      auto end_time = std::chrono::high_resolution_clock::now();
+      pinocchio_time += std::chrono::duration_cast<std::chrono::nanoseconds>(end_time - start_time).count();
+      start_time = std::chrono::high_resolution_clock::now();
+      leg_chain_model.updateLegKinematics(qJ, rf);
+      end_time = std::chrono::high_resolution_clock::now();
+      leg_chain_time += std::chrono::duration_cast<std::chrono::nanoseconds>(end_time - start_time).count();
+      max_diff = std::max(max_diff, kinematicsDifference(pinocchio_model, leg_chain_model));
+    }
+    std::cout << ((rf == pinocchio::LOCAL) ? "LOCAL" : "LOCAL_WORLD_ALIGNED")
+              << ": Pinocchio " << pinocchio_time/NUM_SAMPLES << " ns, LegChain "
+              << leg_chain_time/NUM_SAMPLES << " ns" << std::endl;
+  }
+  std::cout << "Difference between the backends: " << max_diff << std::endl;
+  if (max_diff > 1.0e-10) {
+    std::cout << "LegChain kinematics differ from Pinocchio!" << std::endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,153 @@
+#include <iostream>
+#include <string>
+#include <vector>
+#include <chrono>
+#include <cmath>
+#include <cstdlib>
+#include <random>
+#include <Eigen/Core>
+#include <Eigen/LU>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+
+using namespace legged_state_estimator;
+
+// Compares the leg odometry velocity correction mode (LegOdometryMode::
+// BaseVelocity) with the contact position correction mode (LegOdometryMode::
+// ContactPosition) on a synthetic A1 trajectory, in which the base sways
+// while all the feet stay on the ground. Measures the computational time
+// and the estimation errors of both modes.
+
+const int NUM_STEPS = 4000;
+const double TIME_STEP = 0.0025;
+const double CONTACT_FORCE = 30.0;
+
+
+struct Trajectory {
+  std::vector<Eigen::Vector3d> base_pos, base_lin_vel, imu_gyro, imu_lin_accel;
+  std::vector<Eigen::VectorXd> qJ, dqJ, tauJ;
+};
+
+
+// Solves the inverse kinematics of the legs so that the feet stay at
+// the initial positions while the base translates by base_pos - base_pos0.
+void solveLegIK(RobotModel& robot_model, const std::vector<Eigen::Vector3d>& feet,
+                const Eigen::Vector3d& base_pos, Eigen::VectorXd& qJ) {
+  const int nJ = robot_model.nJ();
+  Eigen::MatrixXd J(nJ, nJ);
+  Eigen::VectorXd e(nJ);
+  for (int iter=0; iter<10; ++iter) {
+    robot_model.updateLegKinematics(qJ);
+    for (int i=0; i<robot_model.numContacts(); ++i) {
+      J.middleRows(3*i, 3) = robot_model.getJointContactJacobian(i);
+      e.segment<3>(3*i) = (feet[i] - base_pos)
+                            - (robot_model.getContactPosition(i) - robot_model.getBasePosition());
+    }
+    if (e.lpNorm<Eigen::Infinity>() < 1.0e-12) break;
+    qJ += J.partialPivLu().solve(e);
+  }
+}
+
+
+Trajectory generateTrajectory(RobotModel& robot_model) {
+  const int nJ = robot_model.nJ();
+  std::mt19937 gen(0);
+  std::normal_distribution<double> gyro_noise(0.0, 0.01), lin_accel_noise(0.0, 0.1),
+                                   qJ_noise(0.0, 0.001), dqJ_noise(0.0, 0.1), tauJ_noise(0.0, 0.1);
+  Eigen::VectorXd qJ(nJ);
+  for (int i=0; i<nJ/3; ++i) {
+    qJ.segment<3>(3*i) << 0.0, 0.67, -1.3;
+  }
+  const Eigen::Vector3d base_pos0(0, 0, 0.3);
+  robot_model.updateLegKinematics(qJ);
+  std::vector<Eigen::Vector3d> feet;
+  for (int i=0; i<robot_model.numContacts(); ++i) {
+    feet.push_back(base_pos0 + robot_model.getContactPosition(i) - robot_model.getBasePosition());
+  }
+  const Eigen::Vector3d amplitude(0.03, 0.02, 0.02);
+  const Eigen::Vector3d frequency(2.0*M_PI*0.5, 2.0*M_PI*0.7, 2.0*M_PI*1.1);
+  const Eigen::Vector3d gravity(0, 0, 9.81);
+  Trajectory traj;
+  Eigen::VectorXd qJ_prev = qJ, dqJ_true(nJ), tauJ(nJ);
+  for (int k=0; k<=NUM_STEPS; ++k) {
+    const double t = k * TIME_STEP;
+    const Eigen::Vector3d base_pos = base_pos0 + amplitude.cwiseProduct(
+        Eigen::Vector3d(std::sin(frequency(0)*t), std::sin(frequency(1)*t), std::sin(frequency(2)*t)));
+    const Eigen::Vector3d base_lin_vel = amplitude.cwiseProduct(frequency).cwiseProduct(
+        Eigen::Vector3d(std::cos(frequency(0)*t), std::cos(frequency(1)*t), std::cos(frequency(2)*t)));
+    const Eigen::Vector3d base_lin_acc = - amplitude.cwiseProduct(frequency).cwiseProduct(frequency).cwiseProduct(
+        Eigen::Vector3d(std::sin(frequency(0)*t), std::sin(frequency(1)*t), std::sin(frequency(2)*t)));
+    solveLegIK(robot_model, feet, base_pos, qJ);
+    dqJ_true = (k == 0) ? Eigen::VectorXd::Zero(nJ) : Eigen::VectorXd((qJ - qJ_prev) / TIME_STEP);
+    qJ_prev = qJ;
+    // Joint torques that balance the contact forces
+    robot_model.updateLegKinematicsAndDynamics(qJ, dqJ_true);
+    tauJ = robot_model.getJointInverseDynamics();
+    for (int i=0; i<robot_model.numContacts(); ++i) {
+      tauJ.noalias() -= robot_model.getJointContactJacobian(i).transpose()
+                          * Eigen::Vector3d(0, 0, CONTACT_FORCE);
+    }
+    traj.base_pos.push_back(base_pos);
+    traj.base_lin_vel.push_back(base_lin_vel);
+    traj.imu_gyro.push_back(Eigen::Vector3d(gyro_noise(gen), gyro_noise(gen), gyro_noise(gen)));
+    traj.imu_lin_accel.push_back(base_lin_acc + gravity
+        + Eigen::Vector3d(lin_accel_noise(gen), lin_accel_noise(gen), lin_accel_noise(gen)));
+    Eigen::VectorXd qJ_meas(nJ), dqJ_meas(nJ), tauJ_meas(nJ);
+    for (int j=0; j<nJ; ++j) {
+      qJ_meas(j) = qJ(j) + qJ_noise(gen);
+      dqJ_meas(j) = dqJ_true(j) + dqJ_noise(gen);
+      tauJ_meas(j) = tauJ(j) + tauJ_noise(gen);
+    }
+    traj.qJ.push_back(qJ_meas);
+    traj.dqJ.push_back(dqJ_meas);
+    traj.tauJ.push_back(tauJ_meas);
+  }
+  return traj;
+}
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, TIME_STEP);
+  RobotModel robot_model(urdf_path, settings.imu_frame, settings.contact_frames);
+  const Trajectory traj = generateTrajectory(robot_model);
+
+  bool success = true;
+  for (const auto mode : {LegOdometryMode::ContactPosition, LegOdometryMode::BaseVelocity}) {
+    settings.leg_odometry_mode = mode;
+    LeggedStateEstimator estimator(settings);
+    estimator.init(traj.base_pos[0], Eigen::Vector4d(0, 0, 0, 1), traj.base_lin_vel[0]);
+    double time = 0;
+    double vel_error = 0;
+    double num_stance = 0;
+    int max_dimX = 0;
+    for (int k=1; k<=NUM_STEPS; ++k) {
+      // The IMU measurements at the previous step are integrated to the current step
+      const auto start_time = std::chrono::high_resolution_clock::now();
+      estimator.update(traj.imu_gyro[k-1], traj.imu_lin_accel[k-1], traj.qJ[k], traj.dqJ[k], traj.tauJ[k]);
+      const auto end_time = std::chrono::high_resolution_clock::now();
+      time += std::chrono::duration_cast<std::chrono::nanoseconds>(end_time - start_time).count();
+      vel_error += (estimator.getBaseLinearVelocityEstimateWorld() - traj.base_lin_vel[k]).squaredNorm();
+      for (const auto& e : estimator.getContactEstimator().getContactState()) {
+        num_stance += e.second ? 1 : 0;
+      }
+      max_dimX = std::max(max_dimX, static_cast<int>(estimator.getInEKFState().dimX()));
+    }
+    const double vel_rmse = std::sqrt(vel_error / NUM_STEPS);
+    const double pos_error = (estimator.getBasePositionEstimate() - traj.base_pos[NUM_STEPS]).norm();
+    std::cout << ((mode == LegOdometryMode::BaseVelocity) ? "BaseVelocity" : "ContactPosition") << ": "
+              << "update: " << 1.0e-3 * time / NUM_STEPS << " us, "
+              << "velocity RMSE: " << vel_rmse << " m/s, "
+              << "final position error: " << pos_error << " m, "
+              << "mean stance legs: " << num_stance / NUM_STEPS << ", "
+              << "max dimX: " << max_dimX << std::endl;
+    success = success && std::isfinite(vel_rmse) && (vel_rmse < 0.1);
+    if (mode == LegOdometryMode::BaseVelocity) {
+      success = success && (max_dimX == 5);
+    }
+  }
+  if (!success) {
+    std::cout << "Leg odometry estimation failed!" << std::endl;
+    return 1;
+  }
+  return 0;
+}
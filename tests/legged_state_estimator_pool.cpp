@@ -0,0 +1,135 @@
+#include <iostream>
+#include <string>
+#include <vector>
+#include <algorithm>
+#include <cstdlib>
+#include <cmath>
+#include <boost/date_time/posix_time/posix_time.hpp>
+#include <Eigen/Dense>
+#include <Eigen/StdVector>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/legged_state_estimator_pool.hpp"
+
+using namespace std;
+using namespace legged_state_estimator;
+using namespace boost::posix_time;
+
+
+int main() {
+  const std::string urdf_path = "../examples_python/a1_description/urdf/a1_friction.urdf";
+  const double time_step = 0.0025;
+  const int num_estimators = 16;
+  const int num_steps = 1000;
+
+  std::vector<LeggedStateEstimatorSettings> settings;
+  for (int i=0; i<num_estimators; ++i) {
+    auto s = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, time_step);
+    s.dynamic_contact_estimation = (i%2 == 0);
+    settings.push_back(s);
+  }
+  LeggedStateEstimatorPool pool(settings);
+  std::vector<LeggedStateEstimator, Eigen::aligned_allocator<LeggedStateEstimator>> serial;
+  for (const auto& s : settings) {
+    serial.emplace_back(s);
+  }
+  const int nJ = pool.nJ();
+
+  Eigen::MatrixXd base_pos = Eigen::MatrixXd::Zero(num_estimators, 3);
+  base_pos.col(2).setConstant(0.3);
+  Eigen::MatrixXd base_quat = Eigen::MatrixXd::Zero(num_estimators, 4);
+  base_quat.col(3).setOnes();
+  pool.init(base_pos, base_quat);
+  for (int i=0; i<num_estimators; ++i) {
+    serial[i].init(base_pos.row(i).transpose(), base_quat.row(i).transpose());
+  }
+
+  std::srand(0);
+  std::vector<Eigen::MatrixXd> gyro, accel, qJ, dqJ, tauJ;
+  Eigen::VectorXd qJ0(nJ), tauJ0(nJ);
+  for (int j=0; j<nJ/3; ++j) {
+    qJ0.segment<3>(3*j) << 0.0, 0.67, -1.3;
+    tauJ0.segment<3>(3*j) << 0.0, 0.0, -8.0;
+  }
+  for (int k=0; k<num_steps; ++k) {
+    gyro.push_back(0.01*Eigen::MatrixXd::Random(num_estimators, 3));
+    accel.push_back(0.1*Eigen::MatrixXd::Random(num_estimators, 3));
+    accel.back().col(2).array() += 9.81;
+    qJ.push_back(0.01*Eigen::MatrixXd::Random(num_estimators, nJ));
+    qJ.back().rowwise() += qJ0.transpose();
+    dqJ.push_back(0.1*Eigen::MatrixXd::Random(num_estimators, nJ));
+    tauJ.push_back(Eigen::MatrixXd::Random(num_estimators, nJ));
+    tauJ.back().rowwise() += tauJ0.transpose();
+  }
+
+  ptime start = microsec_clock::local_time();
+  for (int k=0; k<num_steps; ++k) {
+    for (int i=0; i<num_estimators; ++i) {
+      serial[i].update(gyro[k].row(i).transpose(), accel[k].row(i).transpose(),
+                       qJ[k].row(i).transpose(), dqJ[k].row(i).transpose(),
+                       tauJ[k].row(i).transpose());
+    }
+  }
+  ptime end = microsec_clock::local_time();
+  const double serial_time = (end - start).total_microseconds() * 1.0e-6;
+
+  start = microsec_clock::local_time();
+  for (int k=0; k<num_steps; ++k) {
+    pool.update(gyro[k], accel[k], qJ[k], dqJ[k], tauJ[k]);
+  }
+  end = microsec_clock::local_time();
+  const double pool_time = (end - start).total_microseconds() * 1.0e-6;
+
+  double max_diff = 0;
+  for (int i=0; i<num_estimators; ++i) {
+    max_diff = std::max(max_diff, (pool.getBasePositionEstimate().row(i).transpose()
+                                    - serial[i].getBasePositionEstimate()).lpNorm<Eigen::Infinity>());
+    max_diff = std::max(max_diff, (pool.getBaseQuaternionEstimate().row(i).transpose()
+                                    - serial[i].getBaseQuaternionEstimate()).lpNorm<Eigen::Infinity>());
+    max_diff = std::max(max_diff, (pool.getBaseLinearVelocityEstimateWorld().row(i).transpose()
+                                    - serial[i].getBaseLinearVelocityEstimateWorld()).lpNorm<Eigen::Infinity>());
+  }
+  cout << "Updated " << num_estimators << " estimators for " << num_steps << " steps" << endl;
+  cout << "Serial: " << serial_time << " seconds" << endl;
+  cout << "Pool (" << pool.numThreads() << " threads): " << pool_time << " seconds" << endl;
+  cout << "Max difference from serial estimates: " << max_diff << endl;
+  if (max_diff > 1.0e-12) {
+    cout << "Pool estimates differ from serial estimates!" << endl;
+    return 1;
+  }
+
+  // The outputs of the pool are the estimates of the estimators right after
+  // the initialization, including those not given to init()
+  base_quat.col(2).setConstant(std::sin(0.25));
+  base_quat.col(3).setConstant(std::cos(0.25));
+  const Eigen::MatrixXd base_lin_vel_world = Eigen::MatrixXd::Random(num_estimators, 3);
+  const Eigen::MatrixXd imu_gyro_bias = 0.01*Eigen::MatrixXd::Random(num_estimators, 3);
+  const Eigen::MatrixXd imu_lin_accel_bias = 0.01*Eigen::MatrixXd::Random(num_estimators, 3);
+  pool.init(base_pos, base_quat, base_lin_vel_world, imu_gyro_bias, imu_lin_accel_bias);
+  double max_init_diff = 0;
+  for (int i=0; i<num_estimators; ++i) {
+    const LeggedStateEstimator& estimator = pool.getEstimator(i);
+    const Eigen::Vector4d quat = base_quat.row(i).transpose();
+    const Eigen::Matrix3d R = Eigen::Quaterniond(quat).toRotationMatrix();
+    max_init_diff = std::max(max_init_diff, (pool.getBaseLinearVelocityEstimateLocal().row(i).transpose()
+                                              - R.transpose()*base_lin_vel_world.row(i).transpose()).lpNorm<Eigen::Infinity>());
+    max_init_diff = std::max(max_init_diff, (pool.getBaseLinearVelocityEstimateLocal().row(i).transpose()
+                                              - estimator.getBaseLinearVelocityEstimateLocal()).lpNorm<Eigen::Infinity>());
+    max_init_diff = std::max(max_init_diff, (pool.getBaseAngularVelocityEstimateWorld().row(i).transpose()
+                                              - estimator.getBaseAngularVelocityEstimateWorld()).lpNorm<Eigen::Infinity>());
+    max_init_diff = std::max(max_init_diff, (pool.getBaseAngularVelocityEstimateLocal().row(i).transpose()
+                                              - estimator.getBaseAngularVelocityEstimateLocal()).lpNorm<Eigen::Infinity>());
+    max_init_diff = std::max(max_init_diff, (pool.getIMUGyroBiasEstimate().row(i)
+                                              - imu_gyro_bias.row(i)).lpNorm<Eigen::Infinity>());
+    const std::vector<double>& contact_probability = estimator.getContactEstimator().getContactProbability();
+    for (int j=0; j<pool.numContacts(); ++j) {
+      max_init_diff = std::max(max_init_diff, std::abs(pool.getContactProbability().coeff(i, j)
+                                                        - contact_probability[j]));
+    }
+  }
+  cout << "Max difference from the estimates after init(): " << max_init_diff << endl;
+  if (max_init_diff > 1.0e-12) {
+    cout << "Pool estimates after init() are wrong!" << endl;
+    return 1;
+  }
+  return 0;
+}
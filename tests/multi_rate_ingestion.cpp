@@ -0,0 +1,133 @@
+#include <iostream>
+#include <string>
+#include <cmath>
+#include <cstdlib>
+#include <stdexcept>
+#include <Eigen/Core>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/low_pass_filter.hpp"
+
+using namespace legged_state_estimator;
+
+// Checks pushIMU() and pushJoints(). At a common rate, they must reproduce
+// update(). With the IMU at 2 kHz and the joints at 500 Hz, both with jittered
+// timestamps, the estimate of a standing robot must stay still.
+
+const int NUM_STEPS = 2000;
+const double TIME_STEP = 0.002;
+const int IMU_PER_JOINTS = 4;
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  bool success = true;
+
+  // LowPassFilter with a variable sampling time
+  LowPassFilter<double, 3> lpf(TIME_STEP, 10.0), lpf_variable(TIME_STEP, 10.0);
+  for (int i=0; i<10; ++i) {
+    const Eigen::Vector3d x = Eigen::Vector3d::Random();
+    lpf.update(x);
+    lpf_variable.update(x, TIME_STEP);
+  }
+  const double lpf_diff = (lpf.getEstimate() - lpf_variable.getEstimate()).norm();
+  std::cout << "Difference of the low pass filters with fixed and variable sampling times: " << lpf_diff << std::endl;
+  success = success && (lpf_diff < 1.0e-15);
+
+  // Synthetic stance of all legs
+  auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, TIME_STEP);
+  RobotModel robot_model(urdf_path, settings.imu_frame, settings.contact_frames);
+  const int nJ = robot_model.nJ();
+  Eigen::VectorXd qJ0(nJ);
+  for (int i=0; i<nJ/3; ++i) {
+    qJ0.segment<3>(3*i) << 0.0, 0.67, -1.3;
+  }
+  robot_model.updateLegKinematicsAndDynamics(qJ0, Eigen::VectorXd::Zero(nJ));
+  Eigen::VectorXd tauJ_stance = robot_model.getJointInverseDynamics();
+  for (int i=0; i<robot_model.numContacts(); ++i) {
+    tauJ_stance -= robot_model.getJointContactJacobian(i).transpose() * Eigen::Vector3d(0, 0, 30.0);
+  }
+  const Eigen::Vector4d base_quat(0, 0, 0, 1);
+
+  // pushIMU() and pushJoints() at a common rate reproduce update(). The first
+  // IMU measurement only sets the time origin.
+  {
+    LeggedStateEstimator estimator(settings), pushed_estimator(settings);
+    estimator.init(Eigen::Vector3d::Zero(), base_quat, qJ0);
+    pushed_estimator.init(Eigen::Vector3d::Zero(), base_quat, qJ0);
+    pushed_estimator.pushIMU(-TIME_STEP, Eigen::Vector3d::Zero(), Eigen::Vector3d::Zero());
+    std::srand(0);
+    double diff = 0;
+    for (int k=0; k<NUM_STEPS; ++k) {
+      const Eigen::Vector3d imu_gyro = 0.01 * Eigen::Vector3d::Random();
+      const Eigen::Vector3d imu_lin_accel = 0.1 * Eigen::Vector3d::Random() + Eigen::Vector3d(0, 0, 9.81);
+      const Eigen::VectorXd qJ = qJ0 + 0.001 * Eigen::VectorXd::Random(nJ);
+      const Eigen::VectorXd dqJ = 0.1 * Eigen::VectorXd::Random(nJ);
+      const Eigen::VectorXd tauJ = tauJ_stance + 0.1 * Eigen::VectorXd::Random(nJ);
+      estimator.update(imu_gyro, imu_lin_accel, qJ, dqJ, tauJ);
+      pushed_estimator.pushIMU(k*TIME_STEP, imu_gyro, imu_lin_accel);
+      pushed_estimator.pushJoints(k*TIME_STEP, qJ, dqJ, tauJ);
+      diff = std::max(diff, (estimator.getEstimateRecord() - pushed_estimator.getEstimateRecord()).lpNorm<Eigen::Infinity>());
+    }
+    std::cout << "Difference of update() and pushIMU()/pushJoints() at a common rate: " << diff << std::endl;
+    success = success && (diff < 1.0e-9);
+  }
+
+  // IMU at 2 kHz and joints at 500 Hz with jittered timestamps
+  {
+    auto multi_rate_settings = settings;
+    multi_rate_settings.enable_timing_stats = true;
+    LeggedStateEstimator estimator(multi_rate_settings);
+    estimator.init(Eigen::Vector3d::Zero(), base_quat, qJ0);
+    Eigen::Vector3d base_pos0 = Eigen::Vector3d::Zero();
+    std::srand(1);
+    const double imu_time_step = TIME_STEP / IMU_PER_JOINTS;
+    int num_imu = 0;
+    int num_joints = 0;
+    for (int k=0; k<NUM_STEPS*IMU_PER_JOINTS; ++k) {
+      const double jitter = 0.2 * imu_time_step * Eigen::Vector2d::Random().coeff(0);
+      const Eigen::Vector3d imu_gyro = 0.01 * Eigen::Vector3d::Random();
+      const Eigen::Vector3d imu_lin_accel = 0.1 * Eigen::Vector3d::Random() + Eigen::Vector3d(0, 0, 9.81);
+      estimator.pushIMU(k*imu_time_step + jitter, imu_gyro, imu_lin_accel);
+      ++num_imu;
+      if (k%IMU_PER_JOINTS == IMU_PER_JOINTS-1) {
+        const Eigen::VectorXd qJ = qJ0 + 0.001 * Eigen::VectorXd::Random(nJ);
+        const Eigen::VectorXd dqJ = 0.1 * Eigen::VectorXd::Random(nJ);
+        const Eigen::VectorXd tauJ = tauJ_stance + 0.1 * Eigen::VectorXd::Random(nJ);
+        estimator.pushJoints(k*imu_time_step + 0.5*imu_time_step, qJ, dqJ, tauJ);
+        ++num_joints;
+        if (num_joints == 1) {
+          base_pos0 = estimator.getBasePositionEstimate();
+        }
+      }
+    }
+    const double pos_drift = (estimator.getBasePositionEstimate() - base_pos0).norm();
+    const double vel_error = estimator.getBaseLinearVelocityEstimateWorld().norm();
+    std::cout << "Multi-rate: " << num_imu << " IMU and " << num_joints << " joint measurements in "
+              << estimator.getEstimateTime() << " s, position drift: " << pos_drift
+              << ", velocity error: " << vel_error << std::endl;
+    success = success && (pos_drift < 0.02) && (vel_error < 0.05);
+    const TimingStats& stats = estimator.getTimingStats();
+    const long num_corrections = stats.getStageLatency(KinematicsCorrectionStage).count()
+                                 + stats.getStageLatency(ContactSwitchCorrectionStage).count();
+    std::cout << "Propagations: " << stats.getStageLatency(PropagationStage).count()
+              << ", corrections: " << num_corrections << std::endl;
+    success = success && (num_corrections == num_joints)
+                      && (stats.getStageLatency(PropagationStage).count() >= num_imu-1);
+
+    // Timestamps must increase
+    bool thrown = false;
+    try {
+      estimator.pushJoints(0.0, qJ0, Eigen::VectorXd::Zero(nJ), tauJ_stance);
+    }
+    catch (const std::invalid_argument& e) {
+      thrown = true;
+    }
+    success = success && thrown;
+  }
+
+  if (!success) {
+    std::cout << "Multi-rate ingestion is wrong!" << std::endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,203 @@
+#include <iostream>
+#include <fstream>
+#include <string>
+#include <vector>
+#include <chrono>
+#include <cstdlib>
+#include <cmath>
+#include <algorithm>
+#include <cstdio>
+#include <unistd.h>
+#include <Eigen/Dense>
+#include <boost/algorithm/string.hpp>
+#include "legged_state_estimator/sensor_log.hpp"
+#include "legged_state_estimator/sensor_log_replay.hpp"
+
+using namespace std;
+using namespace legged_state_estimator;
+
+// Converts a text log into the binary sensor log, compares the replay of the
+// memory-mapped log with the replay of the text log parsed line by line, and
+// measures the loading time of both.
+
+const double DT_MIN = 1e-6;
+const double DT_MAX = 1;
+const int NUM_STEPS = 1000;
+
+
+// Replays the text log in the same way as tests/correction_speed.cpp
+void replayTextLog(const string& path, InEKF& filter) {
+  ifstream infile(path);
+  string line;
+  Eigen::Matrix<double,6,1> m, m_last = Eigen::Matrix<double,6,1>::Zero();
+  double t, t_last = 0;
+  while (getline(infile, line)) {
+    vector<string> measurement;
+    boost::split(measurement, line, boost::is_any_of(" "));
+    if (measurement[0].compare("IMU") == 0) {
+      t = atof(measurement[1].c_str());
+      for (int i=0; i<6; ++i) {
+        m(i) = atof(measurement[i+2].c_str());
+      }
+      const double dt = t - t_last;
+      if (dt > DT_MIN && dt < DT_MAX) {
+        filter.Propagate(m_last, dt);
+      }
+      t_last = t;
+      m_last = m;
+    }
+    else if (measurement[0].compare("LANDMARK") == 0) {
+      vectorLandmarks landmarks;
+      for (int i=2; i<measurement.size(); i+=4) {
+        const int id = atof(measurement[i].c_str());
+        const Eigen::Vector3d p_bl(atof(measurement[i+1].c_str()),
+                                   atof(measurement[i+2].c_str()),
+                                   atof(measurement[i+3].c_str()));
+        landmarks.push_back(Landmark(id, p_bl, 0.01*Eigen::Matrix3d::Identity()));
+      }
+      filter.CorrectLandmarks(landmarks);
+    }
+  }
+}
+
+
+// Parses the text log and returns the sum of all the values (excluding the
+// timestamps)
+double loadTextLog(const string& path) {
+  ifstream infile(path);
+  string line;
+  double sum = 0;
+  while (getline(infile, line)) {
+    vector<string> measurement;
+    boost::split(measurement, line, boost::is_any_of(" "));
+    for (int i=2; i<measurement.size(); ++i) {
+      sum += atof(measurement[i].c_str());
+    }
+  }
+  return sum;
+}
+
+
+// Maps the binary log and returns the sum of all the records
+double loadBinaryLog(const string& path) {
+  const SensorLog log(path);
+  double sum = 0;
+  for (const auto type : {IMUStream, JointStream, ContactStream, KinematicStream, LandmarkStream, GroundTruthStream}) {
+    sum += log.getValues(type).sum();
+  }
+  return sum;
+}
+
+
+int main(int argc, char* argv[]) {
+  const string data_dir = (argc > 1) ? argv[1] : "../data";
+  const string urdf_path = (argc > 2) ? argv[2] : "../examples_python/a1_description/urdf/a1_friction.urdf";
+  const string text_path = data_dir + "/imu_landmark_measurements.txt";
+  // The binary logs are written into a temporary directory, which is removed
+  // at the end
+  char tmp_dir_template[] = "/tmp/legged_state_estimator_sensor_log_XXXXXX";
+  if (mkdtemp(tmp_dir_template) == nullptr) {
+    cout << "Failed to create a temporary directory!" << endl;
+    return 1;
+  }
+  const string tmp_dir = tmp_dir_template;
+  const string binary_path = tmp_dir + "/imu_landmark_measurements.bin";
+  const string estimator_log_path = tmp_dir + "/legged_state_estimation.bin";
+  bool success = true;
+
+  // InEKF
+  auto start_time = chrono::high_resolution_clock::now();
+  convertTextSensorLog(text_path, binary_path);
+  auto end_time = chrono::high_resolution_clock::now();
+  cout << "Conversion: " << chrono::duration_cast<chrono::microseconds>(end_time - start_time).count()
+       << " us" << endl;
+  start_time = chrono::high_resolution_clock::now();
+  const double text_sum = loadTextLog(text_path);
+  end_time = chrono::high_resolution_clock::now();
+  cout << "Loading of the text log: " << chrono::duration_cast<chrono::microseconds>(end_time - start_time).count()
+       << " us" << endl;
+  start_time = chrono::high_resolution_clock::now();
+  const double binary_sum = loadBinaryLog(binary_path);
+  end_time = chrono::high_resolution_clock::now();
+  cout << "Loading of the binary log: " << chrono::duration_cast<chrono::microseconds>(end_time - start_time).count()
+       << " us" << endl;
+  success = success && (std::abs(text_sum - binary_sum) < 1.0e-9 * std::abs(text_sum));
+  InEKF text_filter;
+  start_time = chrono::high_resolution_clock::now();
+  replayTextLog(text_path, text_filter);
+  end_time = chrono::high_resolution_clock::now();
+  cout << "Replay of the text log: " << chrono::duration_cast<chrono::microseconds>(end_time - start_time).count()
+       << " us" << endl;
+  InEKF binary_filter;
+  start_time = chrono::high_resolution_clock::now();
+  const SensorLog log(binary_path);
+  replaySensorLog(log, binary_filter);
+  end_time = chrono::high_resolution_clock::now();
+  cout << "Replay of the binary log (" << log.numRecords(IMUStream) << " IMU and "
+       << log.numRecords(LandmarkStream) << " landmark records): "
+       << chrono::duration_cast<chrono::microseconds>(end_time - start_time).count() << " us" << endl;
+  const double inekf_diff = std::max(
+      (text_filter.getState().getX() - binary_filter.getState().getX()).lpNorm<Eigen::Infinity>(),
+      (text_filter.getState().getP() - binary_filter.getState().getP()).lpNorm<Eigen::Infinity>());
+  cout << "Difference of InEKF: " << inekf_diff << endl;
+  success = success && (inekf_diff < 1.0e-12);
+
+  // LeggedStateEstimator
+  const auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, 0.0025);
+  LeggedStateEstimator estimator(settings), binary_estimator(settings);
+  const int nJ = estimator.getRobotModel().nJ();
+  srand(0);
+  // The IMU is sampled at twice the rate of the joints with jittered
+  // timestamps, and each joint record lies between two IMU records
+  const int num_joint_steps = NUM_STEPS / 2;
+  Eigen::VectorXd imu_time(NUM_STEPS), joint_time(num_joint_steps);
+  SensorLogWriter::MatrixXdRowMajor imu(NUM_STEPS, 6), joint(num_joint_steps, 3*nJ);
+  Eigen::VectorXd qJ0(nJ), tauJ0(nJ);
+  for (int i=0; i<nJ/3; ++i) {
+    qJ0.segment<3>(3*i) << 0.0, 0.67, -1.3;
+    tauJ0.segment<3>(3*i) << 0.0, 0.0, -8.0;
+  }
+  for (int k=0; k<NUM_STEPS; ++k) {
+    imu_time(k) = (k + 0.2*std::rand()/RAND_MAX) * settings.sampling_time;
+    imu.row(k) = 0.01 * Eigen::Matrix<double, 1, 6>::Random();
+    imu(k, 5) += 9.81;
+  }
+  for (int j=0; j<num_joint_steps; ++j) {
+    joint_time(j) = (2*j + 0.5) * settings.sampling_time;
+    joint.row(j).segment(0, nJ) = (qJ0 + 0.01*Eigen::VectorXd::Random(nJ)).transpose();
+    joint.row(j).segment(nJ, nJ) = 0.1*Eigen::VectorXd::Random(nJ).transpose();
+    joint.row(j).segment(2*nJ, nJ) = (tauJ0 + Eigen::VectorXd::Random(nJ)).transpose();
+  }
+  {
+    SensorLogWriter writer(estimator_log_path);
+    writer.write(IMUStream, imu_time, imu);
+    writer.write(JointStream, joint_time, joint);
+  }
+  estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+  binary_estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+  double estimator_diff = 0;
+  const SensorLog estimator_log(estimator_log_path);
+  const auto records = replaySensorLog(estimator_log, binary_estimator);
+  for (int j=0; j<num_joint_steps; ++j) {
+    estimator.pushIMU(imu_time(2*j), imu.row(2*j).head<3>().transpose(), imu.row(2*j).tail<3>().transpose());
+    estimator.pushJoints(joint_time(j), joint.row(j).segment(0, nJ).transpose(),
+                         joint.row(j).segment(nJ, nJ).transpose(), joint.row(j).segment(2*nJ, nJ).transpose());
+    estimator_diff = std::max(estimator_diff,
+                              (records.row(j).transpose() - estimator.getEstimateRecord()).lpNorm<Eigen::Infinity>());
+    estimator.pushIMU(imu_time(2*j+1), imu.row(2*j+1).head<3>().transpose(), imu.row(2*j+1).tail<3>().transpose());
+  }
+  estimator_diff = std::max(estimator_diff, 
+                            (binary_estimator.getEstimateRecord() - estimator.getEstimateRecord()).lpNorm<Eigen::Infinity>());
+  cout << "Difference of LeggedStateEstimator: " << estimator_diff << endl;
+  success = success && (records.rows() == num_joint_steps) && (estimator_diff < 1.0e-12)
+                    && (binary_estimator.getEstimateTime() == imu_time(NUM_STEPS-1));
+  std::remove(binary_path.c_str());
+  std::remove(estimator_log_path.c_str());
+  rmdir(tmp_dir.c_str());
+
+  if (!success) {
+    cout << "Replay of the binary log differs!" << endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,160 @@
+#include <iostream>
+#include <vector>
+#include <map>
+#include <algorithm>
+#include <cstdlib>
+#include <cmath>
+#include <Eigen/Dense>
+#include "legged_state_estimator/inekf/inekf.hpp"
+
+using namespace std;
+using namespace legged_state_estimator;
+
+// Landmark measurements applied late (and out of order) with the state history
+// must give the same estimates as the measurements applied at their true time.
+
+const int NUM_STEPS = 400;
+const double TIME_STEP = 0.005;
+const int HISTORY_LENGTH = 32;
+
+struct Step {
+  Eigen::Matrix<double,6,1> imu;
+  vector<pair<int,bool>> contacts;
+  vectorKinematics kinematics;
+  vectorLandmarks landmarks;
+  int delay; // Number of steps until the landmarks arrive
+};
+
+
+vector<Step> generateSteps(const int num_steps) {
+  const double x[4] = {0.18, 0.18, -0.18, -0.18};
+  const double y[4] = {-0.13, 0.13, -0.13, 0.13};
+  vector<Step> steps;
+  for (int k=0; k<num_steps; ++k) {
+    Step step;
+    step.imu << 0.1*Eigen::Vector3d::Random(),
+                Eigen::Vector3d(0, 0, 9.81) + 0.5*Eigen::Vector3d::Random();
+    for (int i=0; i<4; ++i) {
+      // Trotting gait
+      const int phase = (i == 0 || i == 3) ? 0 : 1;
+      step.contacts.push_back(pair<int,bool>(i, ((k/20)%2 == phase)));
+      Eigen::Matrix4d pose = Eigen::Matrix4d::Identity();
+      pose.block<3,1>(0,3) = Eigen::Vector3d(x[i], y[i], -0.3) + 0.01*Eigen::Vector3d::Random();
+      step.kinematics.push_back(Kinematics(i, pose, 0.01*Eigen::Matrix<double,6,6>::Identity()));
+    }
+    // The delays alternate so that some measurements arrive out of order. All
+    // the measurements arrive before the last step.
+    step.delay = 0;
+    if (k%10 == 0 && k+24 < num_steps) {
+      const int id = 10 + (k/10)%3;
+      step.landmarks.push_back(Landmark(id, Eigen::Vector3d(1.0, 0.2*id-2.2, 0.1) + 0.01*Eigen::Vector3d::Random(),
+                                        0.01*Eigen::Matrix3d::Identity()));
+      step.delay = ((k/10)%2 == 0) ? 24 : 8;
+    }
+    steps.push_back(step);
+  }
+  return steps;
+}
+
+
+// Runs the filter and applies the landmarks of each step after its delay. If
+// delayed is false, the landmarks are applied at their true time.
+template <typename Filter>
+void runFilter(Filter& filter, const vector<Step>& steps, const bool delayed,
+               const bool use_history, int& max_replay_steps, double& max_replay_latency) {
+  vector<double> measurement_time(steps.size(), 0.0);
+  max_replay_steps = 0;
+  max_replay_latency = 0;
+  for (int k=0; k<steps.size(); ++k) {
+    filter.Propagate(steps[k].imu, TIME_STEP);
+    filter.setContacts(steps[k].contacts);
+    filter.CorrectKinematics(steps[k].kinematics);
+    measurement_time[k] = filter.getTime();
+    if (!delayed) {
+      if (!steps[k].landmarks.empty()) filter.CorrectLandmarks(steps[k].landmarks);
+      continue;
+    }
+    // Landmarks measured at the steps j that arrive at the step k
+    for (int j=std::max(k-32, 0); j<=k; ++j) {
+      if (steps[j].landmarks.empty() || j+steps[j].delay != k) continue;
+      if (use_history) {
+        filter.CorrectLandmarksAt(measurement_time[j], steps[j].landmarks);
+        max_replay_steps = std::max(max_replay_steps, filter.getLastReplaySteps());
+        max_replay_latency = std::max(max_replay_latency, filter.getLastReplayLatency());
+      }
+      else {
+        filter.CorrectLandmarks(steps[j].landmarks);
+      }
+    }
+  }
+}
+
+
+// Compares the base state, the biases, and their covariances.
+template <typename Filter>
+double stateDifference(const Filter& filter1, const Filter& filter2) {
+  const auto& s1 = filter1.getState();
+  const auto& s2 = filter2.getState();
+  double diff = 0;
+  diff = std::max(diff, (s1.getX().template topLeftCorner<3,5>() - s2.getX().template topLeftCorner<3,5>()).template lpNorm<Eigen::Infinity>());
+  diff = std::max(diff, (s1.getTheta() - s2.getTheta()).template lpNorm<Eigen::Infinity>());
+  diff = std::max(diff, (s1.getP().template topLeftCorner<9,9>() - s2.getP().template topLeftCorner<9,9>()).template lpNorm<Eigen::Infinity>());
+  diff = std::max(diff, (s1.getP().bottomRightCorner(6,6) - s2.getP().bottomRightCorner(6,6)).template lpNorm<Eigen::Infinity>());
+  if (filter1.getEstimatedLandmarks().size() != filter2.getEstimatedLandmarks().size()) {
+    diff = 1.0e10;
+  }
+  return diff;
+}
+
+
+template <typename Filter>
+bool testStateHistory(const string& name, const vector<Step>& steps) {
+  Filter filter, delayed_filter, stale_filter;
+  delayed_filter.setStateHistoryLength(HISTORY_LENGTH);
+  int max_replay_steps;
+  double max_replay_latency;
+  runFilter(filter, steps, false, false, max_replay_steps, max_replay_latency);
+  runFilter(stale_filter, steps, true, false, max_replay_steps, max_replay_latency);
+  runFilter(delayed_filter, steps, true, true, max_replay_steps, max_replay_latency);
+  const double diff = stateDifference(filter, delayed_filter);
+  const double stale_diff = stateDifference(filter, stale_filter);
+  cout << name << ": difference of the delayed and in-time landmarks: " << diff
+       << " (without the state history: " << stale_diff << ")" << endl;
+  cout << name << ": max replayed steps: " << max_replay_steps
+       << ", max replay latency: " << max_replay_latency << " us" << endl;
+  bool success = (diff < 1.0e-9) && (stale_diff > 1.0e-6) && (max_replay_steps == 25)
+                  && (max_replay_latency > 0) && (delayed_filter.getStateHistorySize() == HISTORY_LENGTH);
+
+  // Measurements older than the history are skipped
+  const auto state = delayed_filter.getState();
+  const bool applied = delayed_filter.CorrectLandmarksAt(0.0, steps[0].landmarks);
+  success = success && !applied && (delayed_filter.getLastReplaySteps() == 0)
+                    && ((delayed_filter.getState().getX() - state.getX()).norm() == 0.0);
+
+  // Landmarks dropped due to the landmark budget are counted once, also if
+  // they are first processed in a replay
+  Filter budget_filter, delayed_budget_filter;
+  budget_filter.setLandmarkBudget(0);
+  delayed_budget_filter.setLandmarkBudget(0);
+  delayed_budget_filter.setStateHistoryLength(HISTORY_LENGTH);
+  runFilter(budget_filter, steps, false, false, max_replay_steps, max_replay_latency);
+  runFilter(delayed_budget_filter, steps, true, true, max_replay_steps, max_replay_latency);
+  cout << name << ": dropped landmarks of the delayed and in-time landmarks: " 
+       << delayed_budget_filter.getNumDroppedLandmarks() << ", " << budget_filter.getNumDroppedLandmarks() << endl;
+  success = success && (budget_filter.getNumDroppedLandmarks() > 0)
+                    && (delayed_budget_filter.getNumDroppedLandmarks() == budget_filter.getNumDroppedLandmarks());
+  return success;
+}
+
+
+int main() {
+  std::srand(0);
+  const vector<Step> steps = generateSteps(NUM_STEPS);
+  bool success = true;
+  success = testStateHistory<InEKF>("InEKF", steps) && success;
+  if (!success) {
+    cout << "State history is wrong!" << endl;
+    return 1;
+  }
+  return 0;
+}
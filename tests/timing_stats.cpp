@@ -0,0 +1,117 @@
+#include <iostream>
+#include <string>
+#include <chrono>
+#include <cmath>
+#include <cstdlib>
+#include <Eigen/Core>
+#include "legged_state_estimator/legged_state_estimator.hpp"
+#include "legged_state_estimator/timing_stats.hpp"
+
+using namespace legged_state_estimator;
+
+// Checks the latency histogram and the per-stage timing stats of
+// LeggedStateEstimator::update(), and measures the overhead of the
+// instrumentation. One leg periodically lifts off to cause contact
+// augmentations and removals.
+
+const int NUM_STEPS = 4000;
+const double TIME_STEP = 0.0025;
+
+
+int main(int argc, char* argv[]) {
+  const std::string urdf_path = (argc > 1) ? argv[1] : "a1_description/urdf/a1_friction.urdf";
+  bool success = true;
+
+  // LatencyHistogram
+  LatencyHistogram histogram;
+  for (int i=1; i<=1000; ++i) {
+    histogram.record(i);
+  }
+  const double p99 = histogram.percentile(99.0);
+  std::cout << "Histogram of 1, ..., 1000 us: count: " << histogram.count() << ", mean: "
+            << histogram.mean() << " us, p99: " << p99 << " us, max: " << histogram.max() << " us" << std::endl;
+  success = success && (histogram.count() == 1000) && (std::abs(histogram.mean() - 500.5) < 1.0e-9)
+                    && (histogram.max() == 1000.0) && (p99 >= 990.0) && (p99 <= 990.0*std::exp2(0.25));
+  histogram.reset();
+  success = success && (histogram.count() == 0) && (histogram.percentile(99.0) == 0.0);
+
+  // Synthetic stance with a periodic lift-off of the first leg
+  auto settings = LeggedStateEstimatorSettings::UnitreeA1(urdf_path, TIME_STEP);
+  RobotModel robot_model(urdf_path, settings.imu_frame, settings.contact_frames);
+  const int nJ = robot_model.nJ();
+  Eigen::VectorXd qJ0(nJ);
+  for (int i=0; i<nJ/3; ++i) {
+    qJ0.segment<3>(3*i) << 0.0, 0.67, -1.3;
+  }
+  robot_model.updateLegKinematicsAndDynamics(qJ0, Eigen::VectorXd::Zero(nJ));
+  Eigen::VectorXd tauJ_stance = robot_model.getJointInverseDynamics();
+  Eigen::VectorXd tauJ_swing = tauJ_stance;
+  for (int i=0; i<robot_model.numContacts(); ++i) {
+    const Eigen::VectorXd tau_contact
+        = robot_model.getJointContactJacobian(i).transpose() * Eigen::Vector3d(0, 0, 30.0);
+    tauJ_stance -= tau_contact;
+    if (i > 0) {
+      tauJ_swing -= tau_contact;
+    }
+  }
+
+  std::srand(0);
+  settings.enable_timing_stats = false;
+  LeggedStateEstimator estimator(settings);
+  settings.enable_timing_stats = true;
+  LeggedStateEstimator timed_estimator(settings);
+  estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+  timed_estimator.init(Eigen::Vector3d(0, 0, 0.3), Eigen::Vector4d(0, 0, 0, 1));
+  double time = 0;
+  double timed_time = 0;
+  double diff = 0;
+  for (int k=0; k<NUM_STEPS; ++k) {
+    const Eigen::Vector3d imu_gyro = 0.01 * Eigen::Vector3d::Random();
+    const Eigen::Vector3d imu_lin_accel = 0.1 * Eigen::Vector3d::Random() + Eigen::Vector3d(0, 0, 9.81);
+    const Eigen::VectorXd qJ = qJ0 + 0.001 * Eigen::VectorXd::Random(nJ);
+    const Eigen::VectorXd dqJ = 0.1 * Eigen::VectorXd::Random(nJ);
+    const Eigen::VectorXd tauJ = ((k%200 < 100) ? tauJ_stance : tauJ_swing) + 0.1 * Eigen::VectorXd::Random(nJ);
+    auto start_time = std::chrono::steady_clock::now();
+    estimator.update(imu_gyro, imu_lin_accel, qJ, dqJ, tauJ);
+    auto end_time = std::chrono::steady_clock::now();
+    time += std::chrono::duration_cast<std::chrono::nanoseconds>(end_time - start_time).count();
+    start_time = std::chrono::steady_clock::now();
+    timed_estimator.update(imu_gyro, imu_lin_accel, qJ, dqJ, tauJ);
+    end_time = std::chrono::steady_clock::now();
+    timed_time += std::chrono::duration_cast<std::chrono::nanoseconds>(end_time - start_time).count();
+    diff = std::max(diff, (estimator.getEstimateRecord() - timed_estimator.getEstimateRecord()).lpNorm<Eigen::Infinity>());
+  }
+  std::cout << "update without timing stats: " << 1.0e-3 * time / NUM_STEPS << " us, "
+            << "with timing stats: " << 1.0e-3 * timed_time / NUM_STEPS << " us" << std::endl;
+  std::cout << "Difference of the estimates with and without timing stats: " << diff << std::endl;
+  success = success && (diff == 0.0);
+
+  const TimingStats& stats = timed_estimator.getTimingStats();
+  for (int i=0; i<TimingStats::kNumStages; ++i) {
+    const auto stage = static_cast<UpdateStage>(i);
+    const LatencyHistogram& latency = stats.getStageLatency(stage);
+    std::cout << TimingStats::stageName(stage) << ": count: " << latency.count()
+              << ", mean: " << latency.mean() << " us, p99: " << latency.percentile(99.0)
+              << " us, max: " << latency.max() << " us" << std::endl;
+  }
+  std::cout << "Contact augmentations: " << stats.numContactAugmentations()
+            << ", removals: " << stats.numContactRemovals() << std::endl;
+  for (const auto stage : {PropagationStage, LowPassFilterStage, RobotModelStage,
+                           ContactEstimationStage, EstimateOutputStage, TotalStage}) {
+    success = success && (stats.getStageLatency(stage).count() == NUM_STEPS);
+  }
+  success = success && (stats.getStageLatency(KinematicsCorrectionStage).count()
+                        + stats.getStageLatency(ContactSwitchCorrectionStage).count() == NUM_STEPS);
+  success = success && (stats.getStageLatency(ContactSwitchCorrectionStage).count() > 0);
+  success = success && (stats.numContactAugmentations() > 0) && (stats.numContactRemovals() > 0);
+  success = success && (estimator.getTimingStats().getStageLatency(TotalStage).count() == 0);
+  timed_estimator.resetTimingStats();
+  success = success && (stats.getStageLatency(TotalStage).count() == 0)
+                    && (stats.numContactAugmentations() == 0);
+
+  if (!success) {
+    std::cout << "Timing stats are wrong!" << std::endl;
+    return 1;
+  }
+  return 0;
+}